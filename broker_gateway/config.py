@@ -9,3 +9,9 @@ load_dotenv()
 GATEWAY_PORT: int = int(os.getenv("GATEWAY_PORT", "7070"))
 # 可选：evolving 项目父目录，用于 sys.path（若未安装 evolving 包）
 EVOLVING_PATH: str = (os.getenv("EVOLVING_PATH") or "").strip()
+# 券商后端：evolving=同花顺 Mac 版（默认）；fake=内存假券商（Linux 压测 / 联调）
+BROKER_BACKEND: str = (os.getenv("BROKER_BACKEND") or "evolving").strip().lower()
+# 持仓 / 账户 / 委托等只读快照的缓存秒数（下单、撤单后立即失效）
+SNAPSHOT_TTL_SEC: float = float(os.getenv("SNAPSHOT_TTL_SEC", "2"))
+# fake 后端每次调用的模拟耗时（秒）
+FAKE_LATENCY_SEC: float = float(os.getenv("FAKE_LATENCY_SEC", "0.3"))
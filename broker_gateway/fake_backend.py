@@ -0,0 +1,123 @@
+"""
+假券商后端（BROKER_BACKEND=fake）
+与 evolving 同名方法、同返回结构，内存记账；每次调用阻塞 latency 秒模拟桌面自动化耗时，
+并统计调用次数与最大并发，便于在 Linux 上压测网关的排队 / 合并 / 缓存行为。
+"""
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+_ENTRUST_COMMENT = ["委托日期", "委托时间", "证券代码", "证券名称", "操作", "委托数量", "委托价格", "成交价格", "合同编号", "委托属性"]
+_HOLDING_COMMENT = ["证券代码", "证券名称", "市价", "盈亏", "浮动盈亏比(%)", "实际数量", "股票余额", "可用余额", "冻结数量", "成本价", "市值"]
+
+
+class FakeEvolving:
+    def __init__(self, latency: float = 0.0, cash: float = 1_000_000.0, price: float = 10.0):
+        self.latency = latency
+        self.cash = cash
+        self.price = price                                   # 市价单 / 估值统一用该价
+        self.holdings: Dict[str, List[float]] = {}           # 代码 -> [数量, 成本价]
+        self.entrusts: List[List[str]] = []
+        self.calls: Counter = Counter()
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def _enter(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _exit(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def _entrust(self, code: str, side: str, qty: int, price: float) -> str:
+        self._seq += 1
+        contract_no = f"F{self._seq:06d}"
+        now = time.localtime()
+        self.entrusts.append([
+            time.strftime("%Y%m%d", now), time.strftime("%H:%M:%S", now), code, f"股票{code}",
+            "买入" if side == "BUY" else "卖出", str(qty), f"{price:.2f}", f"{price:.2f}", contract_no, "限价",
+        ])
+        return contract_no
+
+    # ── 交易 ──────────────────────────────────────────
+    def buy(self, code: str, qty: int, price: Optional[float] = None) -> Tuple[bool, str]:
+        self._enter("buy")
+        try:
+            px = price or self.price
+            if px * qty > self.cash:
+                return False, "可用资金不足"
+            self.cash -= px * qty
+            held = self.holdings.setdefault(code, [0, 0.0])
+            held[1] = (held[0] * held[1] + qty * px) / (held[0] + qty)
+            held[0] += qty
+            return True, self._entrust(code, "BUY", qty, px)
+        finally:
+            self._exit()
+
+    def sell(self, code: str, qty: int, price: Optional[float] = None) -> Tuple[bool, str]:
+        self._enter("sell")
+        try:
+            held = self.holdings.get(code)
+            if not held or held[0] < qty:
+                return False, "可用股份不足"
+            px = price or self.price
+            held[0] -= qty
+            self.cash += px * qty
+            if held[0] == 0:
+                del self.holdings[code]
+            return True, self._entrust(code, "SELL", qty, px)
+        finally:
+            self._exit()
+
+    def revokeContractNoEntrust(self, asset: str, contract_no: str) -> bool:
+        self._enter("revokeContractNoEntrust")
+        try:
+            # 假后端委托即时成交，无可撤委托
+            return False
+        finally:
+            self._exit()
+
+    # ── 查询 ──────────────────────────────────────────
+    def getEntrust(self, asset: str = "stock", day: str = "today", refresh: bool = False) -> dict:
+        self._enter("getEntrust")
+        try:
+            rows = [list(r) for r in self.entrusts] if asset == "stock" else []
+            return {"status": True, "comment": _ENTRUST_COMMENT, "data": rows}
+        finally:
+            self._exit()
+
+    def getAllHoldingShares(self) -> dict:
+        self._enter("getAllHoldingShares")
+        try:
+            rows = []
+            for code, (qty, cost) in self.holdings.items():
+                mv = qty * self.price
+                pnl = mv - qty * cost
+                pct = pnl / (qty * cost) * 100 if cost else 0.0
+                rows.append([code, f"股票{code}", f"{self.price:.2f}", f"{pnl:.2f}", f"{pct:.2f}",
+                             str(qty), str(qty), str(qty), "0", f"{cost:.3f}", f"{mv:.2f}"])
+            empty = {"status": True, "comment": _HOLDING_COMMENT, "data": []}
+            return {"stock": {"status": True, "comment": _HOLDING_COMMENT, "data": rows},
+                    "sciTech": dict(empty), "gem": dict(empty)}
+        finally:
+            self._exit()
+
+    def getAccountInfo(self) -> dict:
+        self._enter("getAccountInfo")
+        try:
+            mv = sum(qty * self.price for qty, _ in self.holdings.values())
+            pnl = sum(qty * (self.price - cost) for qty, cost in self.holdings.values())
+            return {"status": True, "data": {
+                "总资产": f"{self.cash + mv:.2f}", "可用金额": f"{self.cash:.2f}",
+                "总市值": f"{mv:.2f}", "总盈亏": f"{pnl:.2f}",
+            }}
+        finally:
+            self._exit()
@@ -4,22 +4,34 @@ QuantFree 券商网关（macOS + evolving）
 仅支持 macOS；需先安装并配置 evolving（同花顺 2.3.1、cliclick、~/.config/evolving/config.xml）。
 邮件：QQ/163/Gmail 等在 broker_gateway/mail_sender.py 中走 465/SSL，不修改 evolving 子模块。
 evolving_repo 与远程完全一致；财通证券(CTZQ)等通过 ascmds_adapter 在运行时注入。
+所有 evolving 调用经 worker.BrokerWorker 单线程排队执行（下单优先、查询合并 + 短期缓存）；
+BROKER_BACKEND=fake 时换成内存假券商，可在 Linux 上联调 / 压测。
 """
-import asyncio
 import os
 import sys
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Any, List, Optional
 
 from fastapi import FastAPI, HTTPException
 
-from config import EVOLVING_PATH, GATEWAY_PORT
+from config import BROKER_BACKEND, EVOLVING_PATH, FAKE_LATENCY_SEC, GATEWAY_PORT, SNAPSHOT_TTL_SEC
 from schemas import OrderCreate, Order, Position, AccountInfo
+from worker import PRIORITY_ORDER, PRIORITY_QUERY, BrokerWorker
 
-app = FastAPI(title="QuantFree Broker Gateway (macOS + evolving)", version="0.2.0")
+_worker = BrokerWorker(ttl=SNAPSHOT_TTL_SEC)
+
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    yield
+    _worker.stop()
+
+
+app = FastAPI(title="QuantFree Broker Gateway (macOS + evolving)", version="0.2.0", lifespan=_lifespan)
 
 def _ensure_darwin():
-    if sys.platform != "darwin":
+    if sys.platform != "darwin" and BROKER_BACKEND != "fake":
         raise HTTPException(status_code=503, detail="本网关仅支持 macOS（evolving）。")
 
 if EVOLVING_PATH:
@@ -39,6 +51,9 @@ _evolving_instance: Any = None
 
 def _get_evolving():
     global _evolving_instance
+    if _evolving_instance is None and BROKER_BACKEND == "fake":
+        from fake_backend import FakeEvolving
+        _evolving_instance = FakeEvolving(latency=FAKE_LATENCY_SEC)
     if _evolving_instance is None:
         try:
             from mail_sender import install_mail_adapter
@@ -56,9 +71,9 @@ def _get_evolving():
     return _evolving_instance
 
 
-async def _run_evolving_sync(fn, *args, **kwargs):
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, lambda: fn(*args, **kwargs))
+async def _run_evolving_sync(fn, *args, priority: int = PRIORITY_QUERY, cache_key: Optional[str] = None):
+    """在券商专用线程执行；下单 / 撤单传 PRIORITY_ORDER，只读查询传 cache_key 以合并并缓存"""
+    return await _worker.call(fn, *args, priority=priority, cache_key=cache_key)
 
 
 # ---------------------------------------------------------------------------
@@ -196,9 +211,11 @@ async def place_order(order: OrderCreate):
     ev = _get_evolving()
     price_arg = order.price if order.order_type == "LIMIT" and order.price is not None else None
     if order.type == "BUY":
-        status, contract_no = await _run_evolving_sync(ev.buy, order.stock_code, order.quantity, price_arg)
+        status, contract_no = await _run_evolving_sync(
+            ev.buy, order.stock_code, order.quantity, price_arg, priority=PRIORITY_ORDER)
     else:
-        status, contract_no = await _run_evolving_sync(ev.sell, order.stock_code, order.quantity, price_arg)
+        status, contract_no = await _run_evolving_sync(
+            ev.sell, order.stock_code, order.quantity, price_arg, priority=PRIORITY_ORDER)
     if not status:
         raise HTTPException(status_code=400, detail=contract_no or "委托失败")
     order_id = contract_no or ""
@@ -225,7 +242,7 @@ async def get_orders(status: Optional[str] = None) -> List[Order]:
     all_entrust: List[dict] = []
     for asset in ("stock", "sciTech", "gem"):
         try:
-            res = await _run_evolving_sync(ev.getEntrust, asset, "today", False)
+            res = await _run_evolving_sync(ev.getEntrust, asset, "today", False, cache_key=f"entrust:{asset}")
         except Exception:
             continue
         if not res.get("status") or not res.get("data"):
@@ -243,7 +260,7 @@ async def get_positions() -> List[Position]:
     """持仓列表（合并 A 股 / 科创板 / 创业板）。"""
     _ensure_darwin()
     ev = _get_evolving()
-    all_holding = await _run_evolving_sync(ev.getAllHoldingShares)
+    all_holding = await _run_evolving_sync(ev.getAllHoldingShares, cache_key="holdings")
     positions: List[Position] = []
     for _key, res in (all_holding or {}).items():
         if not isinstance(res, dict) or not res.get("status") or not res.get("data"):
@@ -261,7 +278,7 @@ async def get_account() -> AccountInfo:
     """账户资金。"""
     _ensure_darwin()
     ev = _get_evolving()
-    res = await _run_evolving_sync(ev.getAccountInfo)
+    res = await _run_evolving_sync(ev.getAccountInfo, cache_key="account")
     if not res.get("status"):
         raise HTTPException(status_code=502, detail=res.get("info", "获取账户失败"))
     data = res.get("data") or {}
@@ -276,7 +293,8 @@ async def cancel_order(order_id: str):
         raise HTTPException(status_code=400, detail="order_id 不能为空")
     ev = _get_evolving()
     for asset in ("stock", "sciTech", "gem"):
-        ok = await _run_evolving_sync(ev.revokeContractNoEntrust, asset, order_id.strip())
+        ok = await _run_evolving_sync(
+            ev.revokeContractNoEntrust, asset, order_id.strip(), priority=PRIORITY_ORDER)
         if ok:
             return {"success": True, "data": True}
     raise HTTPException(status_code=400, detail="撤单失败或合同编号不存在")
@@ -284,4 +302,4 @@ async def cancel_order(order_id: str):
 
 @app.get("/health")
 async def health():
-    return {"status": "ok", "platform": sys.platform, "backend": "evolving"}
+    return {"status": "ok", "platform": sys.platform, "backend": BROKER_BACKEND, "queued": _worker.pending()}
@@ -0,0 +1,89 @@
+"""
+网关压测（fake 后端，进程内 ASGI，不需 macOS / 同花顺）
+若干轮询方持续拉 /positions、/account、/orders，同时按间隔下单；
+输出下单 / 查询的延迟分位与后端实际调用次数，用于观察优先级、合并与缓存效果。
+
+cd broker_gateway && python scripts/load_test.py [--pollers 20] [--orders 20] [--latency 0.3] [--ttl 2]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import main
+from fake_backend import FakeEvolving
+from worker import BrokerWorker
+
+
+def _pct(xs, q):
+    if not xs:
+        return None
+    xs = sorted(xs)
+    return round(xs[min(len(xs) - 1, int(len(xs) * q))] * 1000, 1)
+
+
+async def run(pollers: int, orders: int, latency: float, ttl: float, order_gap: float) -> dict:
+    fake = FakeEvolving(latency=latency)
+    main._worker = BrokerWorker(ttl=ttl)
+    main._get_evolving = lambda: fake
+    main._ensure_darwin = lambda: None
+
+    query_ms, order_ms = [], []
+    stop = asyncio.Event()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gw", timeout=120) as client:
+        async def poll(i):
+            paths = ("/positions", "/account", "/orders")
+            n = i
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                await client.get(paths[n % len(paths)])
+                query_ms.append(time.perf_counter() - t0)
+                n += 1
+
+        async def place():
+            for i in range(orders):
+                t0 = time.perf_counter()
+                await client.post("/order", json={
+                    "stock_code": f"600{i % 10:03d}", "type": "BUY", "order_type": "MARKET", "quantity": 100,
+                })
+                order_ms.append(time.perf_counter() - t0)
+                await asyncio.sleep(order_gap)
+
+        t0 = time.perf_counter()
+        tasks = [asyncio.create_task(poll(i)) for i in range(pollers)]
+        await place()
+        stop.set()
+        await asyncio.gather(*tasks)
+        wall = time.perf_counter() - t0
+    main._worker.stop()
+    return {
+        "pollers": pollers, "orders": orders, "latency_s": latency, "ttl_s": ttl,
+        "wall_s": round(wall, 2),
+        "queries": len(query_ms),
+        "query_ms_p50": _pct(query_ms, 0.5), "query_ms_p95": _pct(query_ms, 0.95),
+        "order_ms_p50": _pct(order_ms, 0.5), "order_ms_p95": _pct(order_ms, 0.95),
+        "backend_calls": dict(fake.calls), "backend_max_concurrency": fake.max_active,
+    }
+
+
+def parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pollers", type=int, default=20)
+    ap.add_argument("--orders", type=int, default=20)
+    ap.add_argument("--latency", type=float, default=0.3)
+    ap.add_argument("--ttl", type=float, default=2.0)
+    ap.add_argument("--order-gap", type=float, default=0.2)
+    return ap.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print(json.dumps(asyncio.run(run(args.pollers, args.orders, args.latency, args.ttl, args.order_gap)),
+                     ensure_ascii=False))
@@ -0,0 +1,96 @@
+"""
+券商工作线程测试：下单优先于查询、同键查询合并、快照短期缓存与下单后失效。
+使用 fake 后端，Linux 下可直接运行：cd broker_gateway && python -m unittest
+"""
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+import main
+from fake_backend import FakeEvolving
+from worker import PRIORITY_ORDER, PRIORITY_QUERY, BrokerWorker
+
+
+class TestBrokerWorker(unittest.TestCase):
+    def setUp(self):
+        self.worker = BrokerWorker(ttl=5.0)
+        self.addCleanup(self.worker.stop)
+
+    def test_orders_outrank_queued_queries(self):
+        done = []
+        gate = threading.Event()
+
+        def job(name):
+            if name == "blocker":
+                gate.wait(2)
+            done.append(name)
+            return name
+
+        async def scenario():
+            first = asyncio.ensure_future(self.worker.call(job, "blocker"))
+            await asyncio.sleep(0.05)                       # blocker 已占住工作线程
+            rest = [asyncio.ensure_future(self.worker.call(job, f"q{i}", priority=PRIORITY_QUERY)) for i in range(3)]
+            rest.append(asyncio.ensure_future(self.worker.call(job, "order", priority=PRIORITY_ORDER)))
+            await asyncio.sleep(0.05)
+            gate.set()
+            await asyncio.gather(first, *rest)
+
+        asyncio.run(scenario())
+        self.assertEqual(done, ["blocker", "order", "q0", "q1", "q2"])
+
+    def test_failed_snapshots_are_not_cached(self):
+        results = iter([{"status": False}, {"status": True, "data": 1}])
+
+        async def scenario():
+            a = await self.worker.call(lambda: next(results), cache_key="account")
+            b = await self.worker.call(lambda: next(results), cache_key="account")
+            c = await self.worker.call(lambda: {"status": True, "data": 2}, cache_key="account")
+            return a, b, c
+
+        a, b, c = asyncio.run(scenario())
+        self.assertEqual((a["status"], b["data"], c["data"]), (False, 1, 1))
+
+
+class TestGatewayWithFakeBackend(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeEvolving(latency=0.05)
+        worker = BrokerWorker(ttl=5.0)
+        self.addCleanup(worker.stop)
+        for p in (patch("main._worker", worker), patch("main._get_evolving", return_value=self.fake),
+                  patch("main._ensure_darwin")):
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_concurrent_polls_coalesce_and_orders_invalidate(self):
+        async def scenario():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://gw") as client:
+                t0 = time.perf_counter()
+                polls = await asyncio.gather(*(
+                    client.get(path) for path in ["/positions", "/account"] * 8
+                ))
+                elapsed = time.perf_counter() - t0
+                cached = await client.get("/account")
+                order = await client.post("/order", json={
+                    "stock_code": "600519", "type": "BUY", "order_type": "LIMIT", "price": 20.0, "quantity": 100,
+                })
+                after = await client.get("/positions")
+            return polls, elapsed, cached, order, after
+
+        polls, elapsed, cached, order, after = asyncio.run(scenario())
+        self.assertTrue(all(r.status_code == 200 for r in polls))
+        self.assertEqual(self.fake.calls["getAllHoldingShares"], 2)
+        self.assertEqual(self.fake.calls["getAccountInfo"], 1)
+        self.assertEqual(self.fake.max_active, 1)             # 券商调用从不并发
+        self.assertLess(elapsed, 0.5)                          # 16 个请求只排了 2 次调用
+        self.assertEqual(cached.json()["available_cash"], 1_000_000.0)
+        self.assertEqual(order.status_code, 200)
+        self.assertEqual([(p["stock_code"], p["quantity"]) for p in after.json()], [("600519", 100)])
+
+
+if __name__ == "__main__":
+    unittest.main()
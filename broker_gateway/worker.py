@@ -0,0 +1,116 @@
+"""
+券商调用专用工作线程
+同花顺桌面自动化同一时刻只能做一件事：所有 evolving 调用都在这一个线程里串行执行。
+- 优先队列：下单 / 撤单（PRIORITY_ORDER）先于查询（PRIORITY_QUERY），同优先级先到先做
+- 只读查询带 cache_key：同键并发请求合并为一次调用，成功结果缓存 ttl 秒
+- 下单 / 撤单完成后清空缓存，之后的查询不会复用下单前的快照
+"""
+import asyncio
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+PRIORITY_ORDER = 0
+PRIORITY_QUERY = 1
+
+
+def _resolve(fut: asyncio.Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+    if fut.done():
+        return
+    if error is not None:
+        fut.set_exception(error)
+    else:
+        fut.set_result(result)
+
+
+def _cacheable(result: Any) -> bool:
+    """evolving 失败时返回 {"status": False, ...}，不缓存"""
+    return not (isinstance(result, dict) and "status" in result and not result["status"])
+
+
+class BrokerWorker:
+    def __init__(self, ttl: float = 0.0):
+        self.ttl = ttl
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        self._generation = 0
+
+    # ── 线程 ──────────────────────────────────────────
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="broker-worker", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._queue.put((-1, next(self._seq), None))
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                break
+            fn, args, loop, fut = job
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                loop.call_soon_threadsafe(_resolve, fut, None, e)
+            else:
+                loop.call_soon_threadsafe(_resolve, fut, result)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    # ── 调用 ──────────────────────────────────────────
+    def _submit(self, priority: int, fn: Callable, args: tuple) -> asyncio.Future:
+        self.start()
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._queue.put((priority, next(self._seq), (fn, args, loop, fut)))
+        return fut
+
+    async def call(
+        self, fn: Callable, *args, priority: int = PRIORITY_QUERY, cache_key: Optional[str] = None,
+    ) -> Any:
+        if cache_key is None:
+            try:
+                return await self._submit(priority, fn, args)
+            finally:
+                if priority == PRIORITY_ORDER:
+                    self.invalidate()
+
+        hit = self._cache.get(cache_key)
+        if hit is not None and time.monotonic() - hit[0] <= self.ttl:
+            return hit[1]
+        fut = self._inflight.get(cache_key)
+        if fut is None:
+            fut = asyncio.ensure_future(self._fetch(cache_key, priority, fn, args))
+            self._inflight[cache_key] = fut
+        # shield：某个请求方断开不应取消其他合并等待者共享的那次调用
+        return await asyncio.shield(fut)
+
+    async def _fetch(self, key: str, priority: int, fn: Callable, args: tuple) -> Any:
+        generation = self._generation
+        try:
+            result = await self._submit(priority, fn, args)
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+        if generation == self._generation and self.ttl > 0 and _cacheable(result):
+            self._cache[key] = (time.monotonic(), result)
+        return result
+
+    def invalidate(self) -> None:
+        """清空快照缓存；已在途的查询照常返回给原等待者，但不再被新请求合并、结果不入缓存"""
+        self._generation += 1
+        self._cache.clear()
+        self._inflight.clear()
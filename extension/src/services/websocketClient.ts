@@ -19,7 +19,16 @@ export class WebSocketClient {
     private maxReconnectAttempts: number = 5;
     private reconnectTimer: NodeJS.Timeout | null = null;
     private subscribers: Map<string, Set<(data: any) => void>> = new Map();
+    // 已订阅的行情代码，重连后自动重新订阅
+    private marketCodes: Set<string> = new Set();
     private manualDisconnect: boolean = false;
+    // 已发出、待服务端回执的订阅请求（同一连接上按发送顺序回执）
+    private pendingSubscribes: string[][] = [];
+    // 服务端因单连接代码上限未接受的代码：这些代码仍需轮询
+    private rejectedCodes: Set<string> = new Set();
+    // 连接已打开且服务端已确认全部行情订阅：此时行情由推送送达，视图无需轮询
+    private streaming: boolean = false;
+    private streamingListeners: Set<(streaming: boolean) => void> = new Set();
 
     constructor(url: string) {
         // 正确转换协议: http->ws, https->wss
@@ -46,6 +55,9 @@ export class WebSocketClient {
                 this.ws.on('open', () => {
                     console.log('[WebSocket] Connected to', this.url);
                     this.reconnectAttempts = 0;
+                    if (this.marketCodes.size > 0) {
+                        this.sendSubscribe([...this.marketCodes]);
+                    }
                     resolve();
                 });
 
@@ -64,6 +76,9 @@ export class WebSocketClient {
 
                 this.ws.on('close', () => {
                     console.log('[WebSocket] Disconnected');
+                    this.pendingSubscribes = [];
+                    this.rejectedCodes.clear();
+                    this.setStreaming(false);
                     if (!this.manualDisconnect) {
                         this.scheduleReconnect();
                     }
@@ -97,7 +112,39 @@ export class WebSocketClient {
         };
     }
 
+    isStreaming(): boolean {
+        return this.streaming;
+    }
+
+    getRejectedCodes(): string[] {
+        return [...this.rejectedCodes];
+    }
+
+    onStreamingChange(callback: (streaming: boolean) => void): () => void {
+        this.streamingListeners.add(callback);
+        return () => {
+            this.streamingListeners.delete(callback);
+        };
+    }
+
+    private setStreaming(streaming: boolean): void {
+        if (this.streaming === streaming) {
+            return;
+        }
+        this.streaming = streaming;
+        this.streamingListeners.forEach(callback => {
+            try {
+                callback(streaming);
+            } catch (error) {
+                console.error('[WebSocket] Streaming callback error:', error);
+            }
+        });
+    }
+
     private handleMessage(message: WebSocketMessage): void {
+        if (message.type === 'subscribed') {
+            this.handleSubscribed(message.data);
+        }
         const callbacks = this.subscribers.get(message.type);
         if (callbacks) {
             callbacks.forEach(callback => {
@@ -110,6 +157,31 @@ export class WebSocketClient {
         }
     }
 
+    /** 对照订阅回执：只有请求的代码全部被接受时才视为推送模式，否则视图继续轮询 */
+    private handleSubscribed(data: any): void {
+        const requested = this.pendingSubscribes.shift() || [];
+        const accepted: string[] = Array.isArray(data?.codes) ? data.codes : [];
+        // 旧版服务端回执不带 rejected：生效数少于请求数时保守地认为本次请求都未生效
+        const rejected: string[] = Array.isArray(data?.rejected)
+            ? data.rejected
+            : (accepted.length < requested.length ? requested : []);
+        requested.forEach(code => this.rejectedCodes.delete(code));
+        rejected.filter(code => this.marketCodes.has(code)).forEach(code => this.rejectedCodes.add(code));
+        if (rejected.length > 0) {
+            console.warn(`[WebSocket] Server rejected ${rejected.length} code(s), polling them instead`);
+        }
+        if (this.pendingSubscribes.length === 0) {
+            this.setStreaming(this.rejectedCodes.size === 0);
+        }
+    }
+
+    private sendSubscribe(codes: string[]): void {
+        if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+            this.pendingSubscribes.push(codes);
+            this.send({ type: 'subscribe', data: { codes } });
+        }
+    }
+
     send(message: WebSocketMessage): void {
         if (this.ws && this.ws.readyState === WebSocket.OPEN) {
             this.ws.send(JSON.stringify(message));
@@ -117,17 +189,25 @@ export class WebSocketClient {
     }
 
     subscribeMarketData(codes: string[]): void {
-        this.send({
-            type: 'subscribe',
-            data: { codes }
-        });
+        codes.forEach(code => this.marketCodes.add(code));
+        this.sendSubscribe(codes);
     }
 
     unsubscribeMarketData(codes: string[]): void {
+        codes.forEach(code => this.marketCodes.delete(code));
+        const hadRejected = this.rejectedCodes.size > 0;
+        codes.forEach(code => this.rejectedCodes.delete(code));
         this.send({
             type: 'unsubscribe',
             data: { codes }
         });
+        // 退订腾出名额后重试此前被拒的代码；全部生效时由回执切回推送模式
+        if (this.rejectedCodes.size > 0) {
+            this.sendSubscribe([...this.rejectedCodes]);
+        } else if (hadRejected && this.pendingSubscribes.length === 0
+            && this.ws && this.ws.readyState === WebSocket.OPEN) {
+            this.setStreaming(true);
+        }
     }
 
     private scheduleReconnect(): void {
@@ -15,6 +15,7 @@ export class MarketDataView {
     private storageService: StorageService;
     private view: StockTreeDataProvider;
     private refreshTimer: NodeJS.Timeout | null = null;
+    private unsubscribeStreaming: () => void;
 
     constructor(
         context: vscode.ExtensionContext,
@@ -40,9 +41,19 @@ export class MarketDataView {
         this.wsClient.subscribe('market_data', (data: Stock) => {
             this.view.updateStock(data);
         });
-
-        // 启动定时刷新
-        this.startRefresh();
+        this.storageService.getStocks().then(codes => this.wsClient.subscribeMarketData(codes));
+
+        // 定时刷新只在 WebSocket 未连接 / 未订阅时兜底；推送恢复后停止轮询
+        this.unsubscribeStreaming = this.wsClient.onStreamingChange(streaming => {
+            if (streaming) {
+                this.stopRefresh();
+            } else {
+                this.startRefresh();
+            }
+        });
+        if (!this.wsClient.isStreaming()) {
+            this.startRefresh();
+        }
     }
 
     async addStock(code: string): Promise<void> {
@@ -83,6 +94,7 @@ export class MarketDataView {
                 stocks.splice(idx, 1);
                 await this.storageService.saveStocks(stocks);
                 this.view.refresh();
+                this.wsClient.unsubscribeMarketData([selected]);
                 vscode.window.showInformationMessage(`已删除 ${selected}`);
             }
         }
@@ -437,6 +449,9 @@ resize();
     }
 
     private startRefresh(): void {
+        if (this.refreshTimer) {
+            return;
+        }
         const config = vscode.workspace.getConfiguration('quantFree');
         const interval = config.get<number>('refreshInterval', 5000);
 
@@ -445,11 +460,17 @@ resize();
         }, interval);
     }
 
-    dispose(): void {
+    private stopRefresh(): void {
         if (this.refreshTimer) {
             clearInterval(this.refreshTimer);
+            this.refreshTimer = null;
         }
     }
+
+    dispose(): void {
+        this.unsubscribeStreaming();
+        this.stopRefresh();
+    }
 }
 
 class StockItem extends vscode.TreeItem {
@@ -2,9 +2,11 @@
 DeepSeek服务适配器
 """
 
+import httpx
 from openai import OpenAI
 from loguru import logger
 from app.core.config import settings
+from app.core.instrumentation import InstrumentedTransport
 
 
 class DeepSeekService:
@@ -16,7 +18,8 @@ class DeepSeekService:
             # DeepSeek API兼容OpenAI SDK，只需要修改baseURL
             self.client = OpenAI(
                 api_key=self.api_key,
-                base_url="https://api.deepseek.com"
+                base_url="https://api.deepseek.com",
+                http_client=httpx.Client(transport=InstrumentedTransport()),
             )
         else:
             logger.warning("DEEPSEEK_API_KEY not set, strategy generation will use mock data")
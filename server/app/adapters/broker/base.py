@@ -3,8 +3,9 @@
 实盘模式下 TradeService 通过此接口调用具体券商 API。
 """
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import List, Optional, Sequence, Union
 
 from app.schemas.trade import Order, OrderCreate, Position, AccountInfo
 
@@ -17,6 +18,10 @@ class BrokerAdapter(ABC):
         """提交订单，返回成交结果（含 id、filled_price 等）"""
         pass
 
+    async def place_orders(self, orders: Sequence[OrderCreate]) -> List[Union[Order, Exception]]:
+        """批量提交，结果与入参一一对应（失败项为异常对象）；默认逐笔并发调用 place_order"""
+        return list(await asyncio.gather(*(self.place_order(o) for o in orders), return_exceptions=True))
+
     @abstractmethod
     async def cancel_order(self, order_id: str) -> bool:
         """撤销订单"""
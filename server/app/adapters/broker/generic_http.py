@@ -2,32 +2,65 @@
 通用 HTTP 券商适配器
 通过可配置的 BROKER_API_URL 调用券商网关，请求/响应与 app.schemas.trade 对齐。
 若网关返回格式不同，可在此做字段映射。
+
+- 长连接池复用，下单并发受 BROKER_MAX_CONCURRENCY 限制（多笔订单并发提交而非逐笔串行）
+- 每笔订单带 Idempotency-Key（OrderCreate.client_order_id，未给时生成），重试沿用同一个键
+- 查询（GET）遇网络错误 / 5xx / 429 自动退避重试；下单 / 撤单只在请求确定未送达（连接失败）
+  或网关声明支持幂等键时才重试，避免重复委托
+- 网关 /health 返回 features 含 "batch_order" 时，place_orders 走 POST /orders/batch 一次提交；
+  /health 只探一次不重试，失败结果缓存 BROKER_FEATURES_RETRY_SEC，不在每笔下单前重复退避
 """
 
+import asyncio
+import random
+import time
+import uuid
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Sequence, Set, Union
 import httpx
 from loguru import logger
 
 from app.schemas.trade import Order, OrderCreate, Position, AccountInfo
 from app.adapters.broker.base import BrokerAdapter
 from app.core.config import settings
+from app.core.instrumentation import InstrumentedAsyncTransport
+
+# 可重试的 HTTP 状态：限流 / 网关暂不可用
+_RETRY_STATUS = {429, 502, 503, 504}
+_MAX_BACKOFF = 10.0
+# 连接阶段失败：请求确定未送达网关，下单也可安全重试
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
 
 
 class GenericHttpBrokerAdapter(BrokerAdapter):
     """通过 HTTP 调用券商网关的通用实现"""
 
-    def __init__(self, base_url: str, timeout: float = 15.0):
+    def __init__(
+        self, base_url: str, timeout: Optional[float] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
         self.base_url = base_url.rstrip("/")
-        self.timeout = timeout
+        self.timeout = timeout or settings.BROKER_TIMEOUT_SEC
+        self.max_retries = settings.BROKER_MAX_RETRIES
+        self.backoff = settings.BROKER_RETRY_BACKOFF_SEC
+        self._transport = transport
         self._client: Optional[httpx.AsyncClient] = None
+        self._order_sem = asyncio.Semaphore(max(1, settings.BROKER_MAX_CONCURRENCY))
+        self._features: Optional[Set[str]] = None
+        self._features_failed_at: Optional[float] = None    # 上次探测失败的 monotonic 时间
 
     async def _client_get(self) -> httpx.AsyncClient:
         if self._client is None:
+            # 下单并发 + 查询留 2 条，长连接复用
+            n = max(1, settings.BROKER_MAX_CONCURRENCY) + 2
+            inner = self._transport or httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_connections=n, max_keepalive_connections=n),
+            )
             self._client = httpx.AsyncClient(
                 base_url=self.base_url,
                 timeout=self.timeout,
                 headers={"Content-Type": "application/json"},
+                transport=InstrumentedAsyncTransport(inner),
             )
         return self._client
 
@@ -36,6 +69,74 @@ class GenericHttpBrokerAdapter(BrokerAdapter):
             await self._client.aclose()
             self._client = None
 
+    # ── 请求 / 重试 ───────────────────────────────────
+    async def features(self) -> Set[str]:
+        """
+        网关能力（/health 的 features 字段），探测成功后缓存。
+        探测不重试；失败视为无扩展能力，BROKER_FEATURES_RETRY_SEC 内不再探
+        """
+        if self._features is not None:
+            return self._features
+        if (
+            self._features_failed_at is not None
+            and time.monotonic() - self._features_failed_at < settings.BROKER_FEATURES_RETRY_SEC
+        ):
+            return set()
+        try:
+            data = await self._request("GET", "/health", safe=False, unwrap=False, retries=0)
+            self._features = set((data or {}).get("features") or [])
+            self._features_failed_at = None
+            return self._features
+        except Exception as e:
+            self._features_failed_at = time.monotonic()
+            logger.warning(f"[Broker] 网关能力探测失败，{settings.BROKER_FEATURES_RETRY_SEC:.0f}s 内按无扩展能力处理: {e}")
+            return set()
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None:
+            try:
+                return min(float(response.headers["Retry-After"]), _MAX_BACKOFF)
+            except (KeyError, ValueError):
+                pass
+        return min(self.backoff * (2 ** attempt), _MAX_BACKOFF) * random.uniform(0.5, 1.0)
+
+    async def _request(
+        self, method: str, path: str, *, safe: bool, idempotency_key: Optional[str] = None,
+        unwrap: bool = True, retries: Optional[int] = None, **kwargs,
+    ):
+        """
+        发请求，unwrap 时解包 {"data": ...}。safe=True（查询 / 带幂等键且网关支持）时网络错误、5xx、429 均重试；
+        否则只重试连接阶段失败（请求未送达）。重试按指数退避加抖动，优先遵循 Retry-After。
+        retries 覆盖 BROKER_MAX_RETRIES（0 = 不重试）。
+        """
+        max_retries = self.max_retries if retries is None else retries
+        client = await self._client_get()
+        if idempotency_key:
+            kwargs["headers"] = {**kwargs.get("headers", {}), "Idempotency-Key": idempotency_key}
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = await client.request(method, path, **kwargs)
+                response.raise_for_status()
+                data = response.json()
+                if unwrap and isinstance(data, dict) and "data" in data:
+                    data = data["data"]
+                return data
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = isinstance(e, _NOT_SENT) or (
+                    safe and (isinstance(e, httpx.TransportError) or response.status_code in _RETRY_STATUS)
+                )
+                if not retryable or attempt >= max_retries:
+                    raise
+                delay = self._delay(attempt, response)
+                attempt += 1
+                logger.warning(f"[Broker] {method} {path} 失败（{e!r}），{delay:.2f}s 后第 {attempt} 次重试")
+                await asyncio.sleep(delay)
+
+    async def _orders_safe(self) -> bool:
+        return "idempotency" in await self.features()
+
     def _order_from_dict(self, d: dict) -> Order:
         """将网关返回的 dict 转为 Order"""
         return Order(
@@ -95,66 +196,86 @@ class GenericHttpBrokerAdapter(BrokerAdapter):
             total_fees_paid=float(d.get("total_fees_paid", 0)),
         )
 
-    async def place_order(self, order: OrderCreate) -> Order:
-        client = await self._client_get()
+    @staticmethod
+    def _order_payload(order: OrderCreate) -> dict:
         payload = order.model_dump()
+        payload["client_order_id"] = order.client_order_id or uuid.uuid4().hex
+        return payload
+
+    async def place_order(self, order: OrderCreate) -> Order:
+        payload = self._order_payload(order)
+        safe = await self._orders_safe()
         try:
-            r = await client.post("/order", json=payload)
-            r.raise_for_status()
-            data = r.json()
-            if isinstance(data, dict) and "data" in data:
-                data = data["data"]
+            async with self._order_sem:
+                data = await self._request(
+                    "POST", "/order", json=payload, safe=safe, idempotency_key=payload["client_order_id"],
+                )
             return self._order_from_dict(data)
         except Exception as e:
             logger.error(f"Broker place_order error: {e}")
             raise
 
+    async def place_orders(self, orders: Sequence[OrderCreate]) -> List[Union[Order, Exception]]:
+        """
+        批量下单，结果与入参一一对应（失败项为异常对象）。
+        网关支持批量接口时一次提交，否则按 BROKER_MAX_CONCURRENCY 并发逐笔提交。
+        """
+        if not orders:
+            return []
+        if "batch_order" not in await self.features():
+            return list(await asyncio.gather(*(self.place_order(o) for o in orders), return_exceptions=True))
+
+        payloads = [self._order_payload(o) for o in orders]
+        batch_key = uuid.uuid5(uuid.NAMESPACE_OID, ",".join(p["client_order_id"] for p in payloads)).hex
+        try:
+            async with self._order_sem:
+                data = await self._request(
+                    "POST", "/orders/batch", json={"orders": payloads},
+                    safe=await self._orders_safe(), idempotency_key=batch_key,
+                )
+        except Exception as e:
+            logger.error(f"Broker place_orders error: {e}")
+            raise
+        results: List[Union[Order, Exception]] = []
+        for i in range(len(payloads)):
+            item = data[i] if isinstance(data, list) and i < len(data) else None
+            if isinstance(item, dict) and item.get("error") is None and item.get("id") is not None:
+                results.append(self._order_from_dict(item))
+            else:
+                detail = item.get("error") if isinstance(item, dict) else "网关未返回结果"
+                results.append(RuntimeError(f"{payloads[i]['stock_code']}: {detail}"))
+        return results
+
     async def cancel_order(self, order_id: str) -> bool:
-        client = await self._client_get()
         try:
-            r = await client.delete(f"/order/{order_id}")
-            r.raise_for_status()
-            data = r.json()
+            data = await self._request(
+                "DELETE", f"/order/{order_id}", safe=await self._orders_safe(), unwrap=False,
+            )
             return data.get("success", data.get("data", False))
         except Exception as e:
             logger.error(f"Broker cancel_order error: {e}")
             raise
 
     async def get_orders(self, status: Optional[str] = None) -> List[Order]:
-        client = await self._client_get()
         params = {} if status is None else {"status": status}
         try:
-            r = await client.get("/orders", params=params)
-            r.raise_for_status()
-            data = r.json()
-            if isinstance(data, dict) and "data" in data:
-                data = data["data"]
+            data = await self._request("GET", "/orders", params=params, safe=True)
             return [self._order_from_dict(item) for item in (data or [])]
         except Exception as e:
             logger.error(f"Broker get_orders error: {e}")
             raise
 
     async def get_positions(self) -> List[Position]:
-        client = await self._client_get()
         try:
-            r = await client.get("/positions")
-            r.raise_for_status()
-            data = r.json()
-            if isinstance(data, dict) and "data" in data:
-                data = data["data"]
+            data = await self._request("GET", "/positions", safe=True)
             return [self._position_from_dict(item) for item in (data or [])]
         except Exception as e:
             logger.error(f"Broker get_positions error: {e}")
             raise
 
     async def get_account(self) -> AccountInfo:
-        client = await self._client_get()
         try:
-            r = await client.get("/account")
-            r.raise_for_status()
-            data = r.json()
-            if isinstance(data, dict) and "data" in data:
-                data = data["data"]
+            data = await self._request("GET", "/account", safe=True)
             return self._account_from_dict(data or {})
         except Exception as e:
             logger.error(f"Broker get_account error: {e}")
@@ -11,6 +11,10 @@ from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from loguru import logger
 
+from app.core import diagnostics
+from app.core.instrumentation import InstrumentedAsyncTransport, cache_lookup
+from app.utils.date_index import KlineSeries
+
 
 class SinaAdapter:
     """行情数据适配器（新浪实时 + 腾讯K线）"""
@@ -28,6 +32,16 @@ class SinaAdapter:
         # 美股腾讯K线符号缓存：{AAPL: usAAPL.OQ}（首次探测 .OQ/.N 成功后缓存）
         self._us_symbol_cache: Dict[str, str] = {}
 
+    async def _http_get(
+        self, url: str, timeout: float, follow_redirects: bool = False, **kwargs
+    ) -> httpx.Response:
+        """统一 GET 出口（计入当前管线的 http_calls）"""
+        diagnostics.count("http_calls")
+        async with httpx.AsyncClient(
+            timeout=timeout, follow_redirects=follow_redirects, transport=InstrumentedAsyncTransport(),
+        ) as client:
+            return await client.get(url, **kwargs)
+
     def _normalize_code(self, code: str) -> str:
         """
         将股票代码标准化为新浪行情格式：
@@ -265,10 +279,9 @@ class SinaAdapter:
         url = self.REALTIME_URL + ",".join(sina_codes)
 
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(url, headers=self.headers)
-                response.encoding = "gbk"
-                text = response.text
+            response = await self._http_get(url, timeout=10.0, headers=self.headers)
+            response.encoding = "gbk"
+            text = response.text
 
             results = []
             for line in text.strip().split("\n"):
@@ -312,10 +325,9 @@ class SinaAdapter:
         url = "https://qt.gtimg.cn/q=" + ",".join(tencent_codes)
 
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(url)
-                response.encoding = "gbk"
-                text = response.text
+            response = await self._http_get(url, timeout=10.0)
+            response.encoding = "gbk"
+            text = response.text
 
             results = []
             for line in text.strip().split("\n"):
@@ -392,9 +404,8 @@ class SinaAdapter:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
-                response = await client.get(url, params=params)
-                data = response.json()
+            response = await self._http_get(url, timeout=10.0, follow_redirects=True, params=params)
+            data = response.json()
 
             if data.get("rc") != 0:
                 logger.warning(f"East Money API error: {data}")
@@ -453,7 +464,9 @@ class SinaAdapter:
         norm = self._normalize_code(code)
         if norm.startswith("gb_"):
             base = norm[3:].upper()
-            if base in self._us_symbol_cache:
+            hit = base in self._us_symbol_cache
+            cache_lookup("us_symbol", hit)
+            if hit:
                 return [self._us_symbol_cache[base]]
             return [f"us{base}.OQ", f"us{base}.N"]
         return [norm]
@@ -482,8 +495,7 @@ class SinaAdapter:
         for tencent_code in symbols:
             url = f"{self.TENCENT_KLINE_URL}?param={tencent_code},{period},{start_date},{end_date},{datalen},qfq"
             try:
-                async with httpx.AsyncClient(timeout=timeout) as client:
-                    response = await client.get(url)
+                response = await self._http_get(url, timeout=timeout)
 
                 data = json.loads(response.text)
                 if data.get("code") != 0:
@@ -496,7 +508,7 @@ class SinaAdapter:
                 if not kline_list:
                     continue
 
-                results = []
+                results = KlineSeries()
                 for item in kline_list:
                     # 格式: [日期, 开盘, 收盘, 最高, 最低, 成交量]
                     if len(item) >= 6:
@@ -572,9 +584,8 @@ class SinaAdapter:
                 "secids": batch_secids,
             }
             try:
-                async with httpx.AsyncClient(timeout=12.0, follow_redirects=True) as client:
-                    resp = await client.get(url, params=params)
-                    body = resp.json()
+                resp = await self._http_get(url, timeout=12.0, follow_redirects=True, params=params)
+                body = resp.json()
                 diffs = body.get("data", {}).get("diff", [])
                 for item in diffs:
                     code = str(item.get("f12", ""))
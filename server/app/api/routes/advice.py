@@ -1,7 +1,7 @@
 """
 每日交易建议路由（Phase 2）
 - POST /api/v1/advice/daily/run   立即生成一次每日建议（可选发邮件）
-- GET  /api/v1/advice/history     查询推荐历史（按日期/股票）
+- GET  /api/v1/advice/history     查询推荐历史（按日期/股票；热表不足 limit 时续读保留策略归档）
 """
 
 from typing import Optional, List
@@ -11,13 +11,22 @@ from loguru import logger
 from sqlalchemy import select
 
 from app.schemas.common import ApiResponse
-from app.core.database import AsyncSessionLocal
+from app.core.database import AsyncReadSessionLocal
 from app.models.recommendation import RecommendationHistory
 from app.services.daily_advice_service import DailyAdviceService
 from app.services.email_service import send_daily_advice
+from app.services.retention_service import RetentionService
 
 router = APIRouter()
 advice_service = DailyAdviceService()
+retention_service = RetentionService()
+
+HISTORY_FIELDS = (
+    "date", "market", "stock_code", "stock_name", "strategy_label", "signal", "status",
+    "current_price", "entry_ref_price", "target_price", "stop_loss", "return_since_rec_pct",
+    "first_recommended_date", "days_held", "miss_count", "confidence", "composite_score",
+    "pe", "pb", "roe", "ai_comment", "exit_reason",
+)
 
 
 @router.post("/daily/run", response_model=ApiResponse)
@@ -47,9 +56,10 @@ async def get_history(
     date: Optional[str] = Query(None, description="按日期过滤 YYYY-MM-DD"),
     stock_code: Optional[str] = Query(None, description="按股票代码过滤"),
     limit: int = Query(100, ge=1, le=500),
+    include_archived: bool = Query(True, description="热表不足 limit 条时续读已归档的更早记录"),
 ):
-    """查询推荐历史记录。"""
-    async with AsyncSessionLocal() as db:
+    """查询推荐历史记录（已归档的行带 archived=true）。"""
+    async with AsyncReadSessionLocal() as db:
         q = select(RecommendationHistory)
         if date:
             q = q.where(RecommendationHistory.date == date)
@@ -58,20 +68,12 @@ async def get_history(
         q = q.order_by(RecommendationHistory.date.desc()).limit(limit)
         rows = (await db.execute(q)).scalars().all()
 
-    data = [
-        {
-            "date": r.date, "market": r.market, "stock_code": r.stock_code,
-            "stock_name": r.stock_name, "strategy_label": r.strategy_label,
-            "signal": r.signal, "status": r.status,
-            "current_price": r.current_price, "entry_ref_price": r.entry_ref_price,
-            "target_price": r.target_price, "stop_loss": r.stop_loss,
-            "return_since_rec_pct": r.return_since_rec_pct,
-            "first_recommended_date": r.first_recommended_date,
-            "days_held": r.days_held, "miss_count": r.miss_count,
-            "confidence": r.confidence, "composite_score": r.composite_score,
-            "pe": r.pe, "pb": r.pb, "roe": r.roe, "ai_comment": r.ai_comment,
-            "exit_reason": r.exit_reason,
-        }
-        for r in rows
-    ]
+    data = [{"archived": False, **{f: getattr(r, f) for f in HISTORY_FIELDS}} for r in rows]
+    if include_archived and len(data) < limit:
+        filters = {k: v for k, v in (("date", date), ("stock_code", stock_code)) if v}
+        month = date[:7] if date else None
+        archived = await retention_service.query_archive_desc(
+            "recommendation_history", month, month, filters, limit=limit - len(data),
+        )
+        data.extend({"archived": True, **{f: a.get(f) for f in HISTORY_FIELDS}} for a in archived)
     return ApiResponse(success=True, data=data)
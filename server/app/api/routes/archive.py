@@ -0,0 +1,75 @@
+"""
+数据归档路由
+- GET  /api/v1/archive/{table}          查询已归档明细（按月文件，字段等值过滤）
+- GET  /api/v1/archive/{table}/monthly  查询已归档部分的月汇总
+- POST /api/v1/archive/run              立即执行一次保留/归档（可选 VACUUM）
+table: auto_trade_signals / orders / recommendation_history
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from loguru import logger
+
+from app.schemas.common import ApiResponse
+from app.services.retention_service import RetentionService
+
+router = APIRouter()
+retention_service = RetentionService()
+
+
+def _filters(stock_code: Optional[str], session_id: Optional[str]) -> dict:
+    out = {}
+    if stock_code:
+        out["stock_code"] = stock_code
+    if session_id:
+        out["session_id"] = session_id
+    return out
+
+
+@router.post("/run", response_model=ApiResponse)
+async def run_retention(vacuum: bool = Query(False, description="归档后是否 VACUUM（会短暂独占数据库）")):
+    """立即执行保留策略：超期整月归档 + 月汇总 + ANALYZE"""
+    try:
+        archived = await retention_service.run(vacuum=vacuum)
+        return ApiResponse(success=True, data=archived)
+    except Exception as e:
+        logger.error(f"Run retention error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{table}/monthly", response_model=ApiResponse)
+async def get_monthly(
+    table: str,
+    month_from: Optional[str] = Query(None, description="起始月 YYYY-MM"),
+    month_to: Optional[str] = Query(None, description="结束月 YYYY-MM（含）"),
+    stock_code: Optional[str] = Query(None),
+    session_id: Optional[str] = Query(None, description="仅 auto_trade_signals"),
+):
+    """已归档部分的月汇总"""
+    try:
+        data = await retention_service.get_monthly(
+            table, month_from, month_to, _filters(stock_code, session_id)
+        )
+        return ApiResponse(success=True, data=data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{table}", response_model=ApiResponse)
+async def get_archived_rows(
+    table: str,
+    month_from: Optional[str] = Query(None, description="起始月 YYYY-MM"),
+    month_to: Optional[str] = Query(None, description="结束月 YYYY-MM（含）"),
+    stock_code: Optional[str] = Query(None),
+    session_id: Optional[str] = Query(None),
+    limit: int = Query(500, ge=1, le=5000),
+):
+    """已归档明细（按月份顺序）"""
+    try:
+        data = await retention_service.query_archive(
+            table, month_from, month_to, _filters(stock_code, session_id), limit=limit
+        )
+        return ApiResponse(success=True, data=data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
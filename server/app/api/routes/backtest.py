@@ -55,12 +55,12 @@ async def get_backtest_result(id: str):
     """获取回测结果"""
     try:
         result = await backtest_service.get_backtest_result(id)
-        return ApiResponse(success=True, data=result)
-    except NotImplementedError:
-        raise HTTPException(status_code=501, detail="Not implemented yet")
     except Exception as e:
         logger.error(f"Get backtest result error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="回测结果不存在或已失效")
+    return ApiResponse(success=True, data=result)
 
 
 @router.post("/smart-screen", response_model=ApiResponse[SmartScreenResult])
@@ -2,17 +2,16 @@
 交易路由
 """
 
-import csv
-import io
-from datetime import datetime
+from datetime import date, datetime
 from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from loguru import logger
 
-from app.schemas.trade import Order, OrderCreate, Position, AccountInfo
+from app.schemas.trade import BatchOrderResult, Order, OrderCreate, Position, AccountInfo
 from app.schemas.common import ApiResponse
-from app.services.trade_service import TradeService
+from app.services.trade_service import ORDER_EXPORT_FIELDS, POSITION_EXPORT_FIELDS, TradeService
+from app.utils.export_stream import csv_chunks, encode_chunks, ndjson_chunks
 
 router = APIRouter()
 trade_service = TradeService()
@@ -29,6 +28,22 @@ async def place_order(order: OrderCreate):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/orders/batch", response_model=ApiResponse[List[BatchOrderResult]])
+async def place_orders(orders: List[OrderCreate]):
+    """批量提交订单（实盘并发 / 批量委托），逐项返回结果"""
+    try:
+        results = await trade_service.place_orders(orders)
+    except Exception as e:
+        logger.error(f"Place orders error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    data = [
+        BatchOrderResult(success=False, error=str(r)) if isinstance(r, Exception)
+        else BatchOrderResult(success=True, order=r)
+        for r in results
+    ]
+    return ApiResponse(success=all(r.success for r in data), data=data)
+
+
 @router.delete("/order/{order_id}", response_model=ApiResponse[bool])
 async def cancel_order(order_id: str):
     """撤销订单"""
@@ -52,10 +67,10 @@ async def get_orders(status: Optional[str] = Query(None, description="订单状
 
 
 @router.get("/positions", response_model=ApiResponse[List[Position]])
-async def get_positions():
+async def get_positions(refresh: bool = Query(False, description="跳过快照，立即与库 / 券商对账")):
     """查询持仓"""
     try:
-        positions = await trade_service.get_positions()
+        positions = await trade_service.get_positions(refresh)
         return ApiResponse(success=True, data=positions)
     except Exception as e:
         logger.error(f"Get positions error: {e}")
@@ -63,85 +78,85 @@ async def get_positions():
 
 
 @router.get("/account", response_model=ApiResponse[AccountInfo])
-async def get_account_info():
+async def get_account_info(refresh: bool = Query(False, description="跳过快照，立即与库 / 券商对账")):
     """查询账户信息"""
     try:
-        account_info = await trade_service.get_account_info()
+        account_info = await trade_service.get_account_info(refresh)
         return ApiResponse(success=True, data=account_info)
     except Exception as e:
         logger.error(f"Get account info error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def _dicts_to_csv(rows: List[dict], fieldnames: List[str], write_bom: bool = True) -> str:
-    """将字典列表转为 CSV 字符串，UTF-8 BOM 便于 Excel 打开"""
-    buf = io.StringIO()
-    if write_bom:
-        buf.write("\ufeff")
-    writer = csv.DictWriter(buf, fieldnames=fieldnames, extrasaction="ignore")
-    writer.writeheader()
-    writer.writerows(rows)
-    return buf.getvalue()
+def _parse_date(value: Optional[str], name: str) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} 须为 YYYY-MM-DD")
 
 
 @router.get("/export")
 async def export_trades(
-    format: str = Query("csv", description="格式: csv"),
+    format: str = Query("csv", description="格式: csv | ndjson"),
     type: str = Query("orders", description="类型: orders | positions | all"),
+    start_date: Optional[str] = Query(None, description="订单起始日期 YYYY-MM-DD（含）"),
+    end_date: Optional[str] = Query(None, description="订单结束日期 YYYY-MM-DD（含）"),
+    stock_code: Optional[str] = Query(None, description="按股票代码过滤"),
+    gzip: bool = Query(False, description="gzip 压缩（文件名追加 .gz）"),
+    include_archived: bool = Query(True, description="含保留策略已归档的早期订单（热表之后按月续接）"),
 ):
-    """导出交易记录为 CSV"""
-    if format != "csv":
-        raise HTTPException(status_code=400, detail="仅支持 format=csv")
+    """流式导出交易记录（分块传输，内存占用与历史长度无关）"""
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format 须为 csv / ndjson")
     if type not in ("orders", "positions", "all"):
         raise HTTPException(status_code=400, detail="type 须为 orders / positions / all")
-
-    try:
-        date_suffix = datetime.now().strftime("%Y%m%d")
-        if type == "orders":
-            rows = await trade_service.export_orders()
-            fieldnames = [
-                "id", "stock_code", "stock_name", "type", "order_type", "price", "quantity",
-                "status", "filled_quantity", "filled_price", "stamp_tax", "commission",
-                "transfer_fee", "total_fee", "slippage", "created_at", "updated_at",
-            ]
-            filename = f"orders_{date_suffix}.csv"
-        elif type == "positions":
-            rows = await trade_service.export_positions()
-            fieldnames = [
-                "stock_code", "stock_name", "quantity", "cost_price", "current_price",
-                "market_value", "profit", "profit_percent", "total_fees", "realized_profit",
-            ]
-            filename = f"positions_{date_suffix}.csv"
-        else:
-            orders = await trade_service.export_orders()
-            positions = await trade_service.export_positions()
-            order_fields = [
-                "id", "stock_code", "stock_name", "type", "order_type", "price", "quantity",
-                "status", "filled_quantity", "filled_price", "stamp_tax", "commission",
-                "transfer_fee", "total_fee", "slippage", "created_at", "updated_at",
-            ]
-            pos_fields = [
-                "stock_code", "stock_name", "quantity", "cost_price", "current_price",
-                "market_value", "profit", "profit_percent", "total_fees", "realized_profit",
-            ]
-            csv1 = _dicts_to_csv(orders, order_fields, write_bom=True)
-            csv2 = _dicts_to_csv(positions, pos_fields, write_bom=False)
-            content = csv1.strip() + "\n\n[持仓]\n" + csv2.strip()
-            body = content.encode("utf-8-sig")
-            return StreamingResponse(
-                io.BytesIO(body),
-                media_type="text/csv; charset=utf-8",
-                headers={"Content-Disposition": f'attachment; filename="trades_{date_suffix}.csv"'},
-            )
-
-        content = _dicts_to_csv(rows, fieldnames)
-        body = content.encode("utf-8-sig")
-        return StreamingResponse(
-            io.BytesIO(body),
-            media_type="text/csv; charset=utf-8",
-            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-        )
-    except Exception as e:
-        logger.error(f"Export trades error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-
+    start, end = _parse_date(start_date, "start_date"), _parse_date(end_date, "end_date")
+
+    def orders():
+        return trade_service.export_orders(start, end, stock_code, include_archived=include_archived)
+
+    def positions():
+        return trade_service.export_positions(stock_code)
+
+    async def body():
+        if format == "ndjson":
+            if type in ("orders", "all"):
+                extra = {"record": "order"} if type == "all" else None
+                async for chunk in ndjson_chunks(orders(), extra):
+                    yield chunk
+            if type in ("positions", "all"):
+                extra = {"record": "position"} if type == "all" else None
+                async for chunk in ndjson_chunks(positions(), extra):
+                    yield chunk
+            return
+        if type in ("orders", "all"):
+            async for chunk in csv_chunks(orders(), ORDER_EXPORT_FIELDS):
+                yield chunk
+        if type == "all":
+            yield "\n[持仓]\n"
+        if type in ("positions", "all"):
+            async for chunk in csv_chunks(positions(), POSITION_EXPORT_FIELDS, bom=type != "all"):
+                yield chunk
+
+    async def stream():
+        try:
+            async for data in encode_chunks(body(), gzip=gzip):
+                yield data
+        except Exception as e:
+            # 响应头已发出，只能记录并中断传输
+            logger.error(f"Export trades error: {e}")
+            raise
+
+    name = "trades" if type == "all" else type
+    filename = f"{name}_{datetime.now():%Y%m%d}.{format}"
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
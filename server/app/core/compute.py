@@ -0,0 +1,66 @@
+"""
+计算线程池
+- 阻塞/CPU 密集任务统一经 run_compute 提交，避免占满默认 executor
+- 排队深度与执行中任务数以 gauge 暴露（/metrics）
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from app.core.metrics import REGISTRY
+
+T = TypeVar("T")
+
+COMPUTE_WORKERS = max(2, min(8, os.cpu_count() or 2))
+
+_pool = ThreadPoolExecutor(max_workers=COMPUTE_WORKERS, thread_name_prefix="compute")
+_lock = threading.Lock()
+_queued = 0
+_running = 0
+
+COMPUTE_QUEUE_DEPTH = REGISTRY.gauge(
+    "quant_compute_queue_depth", "Tasks waiting for a compute worker",
+)
+COMPUTE_ACTIVE = REGISTRY.gauge(
+    "quant_compute_active", "Tasks running on compute workers",
+)
+COMPUTE_QUEUE_DEPTH.set_function(lambda: _queued)
+COMPUTE_ACTIVE.set_function(lambda: _running)
+
+
+def _run(fn: Callable[..., T], *args) -> T:
+    global _queued, _running
+    with _lock:
+        _queued -= 1
+        _running += 1
+    try:
+        return fn(*args)
+    finally:
+        with _lock:
+            _running -= 1
+
+
+def _on_done(fut: Future) -> None:
+    # 排队中被取消：_run 未执行，补扣排队计数
+    global _queued
+    if fut.cancelled():
+        with _lock:
+            _queued -= 1
+
+
+async def run_compute(fn: Callable[..., T], *args) -> T:
+    """在计算线程池中执行 fn(*args)"""
+    global _queued
+    with _lock:
+        _queued += 1
+    try:
+        fut = _pool.submit(_run, fn, *args)
+    except RuntimeError:
+        with _lock:
+            _queued -= 1
+        raise
+    fut.add_done_callback(_on_done)
+    return await asyncio.wrap_future(fut)
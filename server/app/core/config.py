@@ -40,6 +40,11 @@ class Settings(BaseSettings):
     BROKER_API_SECRET: Optional[str] = None
     # 实盘时是否随后端自动启动券商网关（evolving，仅当 BROKER_API_URL 为本地 7070 时生效）
     AUTO_START_BROKER_GATEWAY: bool = False
+    BROKER_TIMEOUT_SEC: float = 15.0            # 单次网关请求超时
+    BROKER_MAX_CONCURRENCY: int = 4             # 同时在途的下单请求上限
+    BROKER_MAX_RETRIES: int = 3                 # 查询 / 幂等请求的最大重试次数
+    BROKER_RETRY_BACKOFF_SEC: float = 0.5       # 重试退避基数（指数增长，上限 10 秒）
+    BROKER_FEATURES_RETRY_SEC: float = 30.0     # /health 能力探测失败后多久再探（期间按无扩展能力处理）
     
     # 邮件通知配置（每日交易报告）
     EMAIL_ENABLED: bool = False
@@ -64,8 +69,40 @@ class Settings(BaseSettings):
     SMS_TWILIO_AUTH_TOKEN: Optional[str] = None
     SMS_TWILIO_FROM: Optional[str] = None
 
+    # 行情接口限流（全自动交易收盘批量取 K 线）
+    MARKET_FETCH_CONCURRENCY: int = 8       # 同时在途请求上限
+    MARKET_FETCH_RATE_PER_SEC: float = 10.0 # 每秒发起请求上限
+
+    # 日内止损引擎（交易时段内轮询实时报价）
+    INTRADAY_STOP_POLL_SEC: float = 3.0         # 报价轮询间隔
+    INTRADAY_TRIGGER_REFRESH_SEC: float = 60.0  # 触发表从数据库重建间隔
+
+    # 模拟限价单撮合（TRADING_MODE=sim）
+    SIM_MATCH_POLL_SEC: float = 3.0             # 有挂单时的报价轮询间隔
+    SIM_FILL_PARTICIPATION: float = 0.25        # 每次报价可成交量 = 两次报价间成交量增量 × 该比例
+
+    # WebSocket 行情推送：单一轮询取全部订阅代码并集，只推送变化的报价
+    WS_QUOTE_POLL_SEC: float = 3.0
+    WS_MAX_CODES_PER_CONN: int = 200            # 单个连接最多订阅代码数
+
+    # 账户快照：成交增量更新、市值随共享报价缓存重算；超过该间隔（秒）的读取先从库 / 券商全量对账
+    ACCOUNT_RECONCILE_SEC: float = 60.0
+
     # 数据库配置
     DB_PATH: str = "./data/quant_free.db"
+    DB_ECHO: bool = False                   # 打印全部 SQL（排查用，与 DEBUG 无关）
+    DB_READ_POOL_SIZE: int = 4              # 只读连接池大小；写连接固定 1 个，写入串行
+    DB_WRITE_WAIT_SEC: float = 0            # 写事务排队等写连接的上限（秒）；<=0 表示一直排队，不因长事务报 TimeoutError
+    DB_BUSY_TIMEOUT_MS: int = 5000          # 锁等待超时
+    DB_CACHE_SIZE_KB: int = 20000           # 每个连接的页缓存
+
+    # 数据保留：热表只留近期明细，更早的整月汇总到 *_monthly 并压缩归档到 ARCHIVE_DIR
+    RETENTION_ENABLED: bool = False         # 默认关闭：开启后超期明细移出热表（导出 / 推荐历史会续读归档文件）
+    RETENTION_SIGNAL_DAYS: int = 365        # auto_trade_signals 保留天数
+    RETENTION_ORDER_DAYS: int = 365         # orders（已终结）保留天数
+    RETENTION_ADVICE_DAYS: int = 180        # recommendation_history 保留天数
+    RETENTION_RUN_HOUR: int = 3             # 每日维护时间：归档 + ANALYZE；非交易日另做 VACUUM
+    ARCHIVE_DIR: str = "./data/archive"     # 归档文件目录（{表}/{YYYY-MM}.ndjson.gz，只追加）
     
     # 日志配置
     LOG_LEVEL: str = "INFO"
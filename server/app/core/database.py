@@ -1,37 +1,88 @@
 """
 数据库初始化
+- SQLite WAL 模式：读不阻塞写、写不阻塞读
+- 写引擎只有 1 个连接：所有写事务经连接池排队串行执行，避免多连接抢写锁报 database is locked
+- 读引擎独立连接池（query_only），API 查询不必排在调度器/每日建议的写事务之后
 """
 
 import os
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from loguru import logger
 from app.core.config import settings
+from app.core.instrumentation import instrument_engine
 
 # 确保数据目录存在
 os.makedirs(os.path.dirname(settings.DB_PATH) or ".", exist_ok=True)
 
-# 创建异步引擎（SQLite使用aiosqlite）
 database_url = f"sqlite+aiosqlite:///{settings.DB_PATH}"
+
+# aiosqlite 对文件库默认 NullPool（每次新建连接、每次重设 PRAGMA），这里显式使用连接池
+
+
+def _apply_pragmas(engine, read_only: bool) -> None:
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_conn, record):
+        cur = dbapi_conn.cursor()
+        if not read_only:
+            cur.execute("PRAGMA journal_mode=WAL")       # 持久化到库文件，写连接设置一次即可
+        cur.execute("PRAGMA synchronous=NORMAL")         # WAL 下 NORMAL 不会损坏库，只可能丢最后一次提交
+        cur.execute(f"PRAGMA busy_timeout={int(settings.DB_BUSY_TIMEOUT_MS)}")
+        cur.execute(f"PRAGMA cache_size=-{int(settings.DB_CACHE_SIZE_KB)}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cur.execute("PRAGMA query_only=ON")
+        cur.close()
+
+
+# 写引擎：单连接，写事务串行；排队等待不套默认 30 秒 pool_timeout（归档/批量回测的长事务会超过）
 engine = create_async_engine(
     database_url,
-    echo=settings.DEBUG,
-    future=True
+    echo=settings.DB_ECHO,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=settings.DB_WRITE_WAIT_SEC if settings.DB_WRITE_WAIT_SEC > 0 else None,
+    future=True,
+)
+_apply_pragmas(engine, read_only=False)
+instrument_engine(engine.sync_engine)
+
+# 读引擎：只读连接池
+read_engine = create_async_engine(
+    database_url,
+    echo=settings.DB_ECHO,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=max(1, settings.DB_READ_POOL_SIZE),
+    max_overflow=0,
+    future=True,
 )
+_apply_pragmas(read_engine, read_only=True)
+instrument_engine(read_engine.sync_engine)
 
-# 创建会话工厂
+# 创建会话工厂：AsyncSessionLocal 用于读写，AsyncReadSessionLocal 仅用于查询
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
+AsyncReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
 
 Base = declarative_base()
 
 
 async def init_db():
     """初始化数据库"""
-    from app.models import stock, strategy, order, position, market_cache, recommendation
+    from app.models import (
+        stock, strategy, order, position, market_cache, recommendation, backtest_run,
+        auto_trade, archive,
+    )
     
     async with engine.begin() as conn:
         # 创建所有表
@@ -39,6 +90,15 @@ async def init_db():
         logger.info("Database tables created")
 
 
+def migrate_indexes(sync_conn, drop=()) -> None:
+    """为已有库补建模型声明的索引（create_all 不会给已存在的表加索引），并删除被取代的旧索引"""
+    for name in drop:
+        sync_conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
 async def get_db():
     """获取数据库会话"""
     async with AsyncSessionLocal() as session:
@@ -46,4 +106,3 @@ async def get_db():
             yield session
         finally:
             await session.close()
-
@@ -0,0 +1,117 @@
+"""
+管线诊断：分阶段耗时 + 计数器
+- Diagnostics 作为上下文管理器激活后，同一协程/子任务内可通过 count() 上报（HTTP 调用、缓存命中、回测次数等）
+- 阶段用 begin(name) 切换：结束上一个阶段、开始下一个；同名阶段累加
+- 退出时把阶段耗时与计数导出到 metrics 注册表
+"""
+
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from app.core.metrics import REGISTRY
+from app.schemas.common import PipelineDiagnostics, StageTiming
+
+_current: ContextVar[Optional["Diagnostics"]] = ContextVar("pipeline_diagnostics", default=None)
+
+PIPELINE_SECONDS = REGISTRY.histogram(
+    "quant_pipeline_seconds", "Pipeline wall time", ("pipeline",),
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "quant_pipeline_stage_seconds", "Pipeline stage wall time", ("pipeline", "stage"),
+)
+PIPELINE_EVENTS = REGISTRY.counter(
+    "quant_pipeline_events_total", "Pipeline counters (http calls, cache hits, backtests, stocks)",
+    ("pipeline", "name"),
+)
+
+
+def count(name: str, n: int = 1) -> None:
+    """给当前激活的管线计数；无激活管线时为空操作"""
+    d = _current.get()
+    if d is not None:
+        d.count(name, n)
+
+
+def stage(name: str) -> None:
+    """切换当前激活管线的阶段；无激活管线时为空操作"""
+    d = _current.get()
+    if d is not None:
+        d.begin(name)
+
+
+def current() -> Optional["Diagnostics"]:
+    return _current.get()
+
+
+class Diagnostics:
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.children: List[PipelineDiagnostics] = []
+        self._t0 = time.perf_counter()
+        self._total: Optional[float] = None
+        self._stage: Optional[str] = None
+        self._stage_t0 = 0.0
+        self._token = None
+
+    def __enter__(self) -> "Diagnostics":
+        self._t0 = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end()
+        self._total = time.perf_counter() - self._t0
+        _current.reset(self._token)
+        self._export(failed=exc_type is not None)
+
+    # ── 阶段 ──────────────────────────────────────────
+    def begin(self, stage: str) -> None:
+        """结束当前阶段并开始新阶段"""
+        now = time.perf_counter()
+        if self._stage is not None:
+            self.stages[self._stage] = self.stages.get(self._stage, 0.0) + (now - self._stage_t0)
+        self._stage = stage
+        self._stage_t0 = now
+
+    def end(self) -> None:
+        if self._stage is not None:
+            self.stages[self._stage] = self.stages.get(self._stage, 0.0) + (time.perf_counter() - self._stage_t0)
+            self._stage = None
+
+    # ── 计数 ──────────────────────────────────────────
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name: str, value: int) -> None:
+        self.counters[name] = value
+
+    def attach(self, child: Optional[PipelineDiagnostics]) -> None:
+        """挂载子管线（如每日建议内部的 smart-screen）的诊断结果"""
+        if child is not None:
+            self.children.append(child)
+
+    # ── 输出 ──────────────────────────────────────────
+    @property
+    def total_seconds(self) -> float:
+        return self._total if self._total is not None else time.perf_counter() - self._t0
+
+    def to_schema(self) -> PipelineDiagnostics:
+        return PipelineDiagnostics(
+            pipeline=self.pipeline,
+            total_seconds=round(self.total_seconds, 3),
+            stages=[StageTiming(name=k, seconds=round(v, 3)) for k, v in self.stages.items()],
+            counters=dict(self.counters),
+            children=list(self.children),
+        )
+
+    def _export(self, failed: bool) -> None:
+        PIPELINE_SECONDS.observe(self.total_seconds, self.pipeline)
+        for stage, sec in self.stages.items():
+            STAGE_SECONDS.observe(sec, self.pipeline, stage)
+        for name, n in self.counters.items():
+            PIPELINE_EVENTS.inc(self.pipeline, name, amount=n)
+        if failed:
+            PIPELINE_EVENTS.inc(self.pipeline, "failed")
@@ -0,0 +1,126 @@
+"""
+运行时埋点：HTTP 接口 / 上游 HTTP / 数据库 / 缓存
+- 指标统一注册在 app.core.metrics.REGISTRY，由 GET /metrics 输出
+- 上游 HTTP 通过 httpx transport 包装计时，按 host 分标签（腾讯/新浪/东财/DeepSeek/券商网关）
+- 数据库通过 SQLAlchemy cursor 事件计时，按语句类型分标签
+"""
+
+import time
+from typing import Optional
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.metrics import REGISTRY
+
+# ── 接口 ─────────────────────────────────────────────
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "quant_http_request_seconds", "API request latency", ("method", "route", "status"),
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "quant_http_requests_in_flight", "API requests currently being served",
+)
+
+# ── 上游 HTTP ────────────────────────────────────────
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "quant_upstream_request_seconds", "Upstream HTTP latency", ("host",),
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "quant_upstream_errors_total", "Upstream HTTP errors (transport errors and 5xx)", ("host", "kind"),
+)
+
+# ── 数据库 ───────────────────────────────────────────
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "quant_db_query_seconds", "SQL statement latency", ("op",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+# ── 缓存 ─────────────────────────────────────────────
+CACHE_REQUESTS = REGISTRY.counter(
+    "quant_cache_requests_total", "Cache lookups by result (hit/miss)", ("cache", "result"),
+)
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+# ── 上游 HTTP transport ──────────────────────────────
+def _host(request: httpx.Request) -> str:
+    url = request.url
+    return f"{url.host}:{url.port}" if url.port else url.host
+
+
+class InstrumentedAsyncTransport(httpx.AsyncBaseTransport):
+    """包装 AsyncHTTPTransport：记录每次上游请求的耗时与错误"""
+
+    def __init__(self, inner: Optional[httpx.AsyncBaseTransport] = None):
+        self._inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = _host(request)
+        t0 = time.perf_counter()
+        try:
+            response = await self._inner.handle_async_request(request)
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(host, type(e).__name__)
+            raise
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - t0, host)
+        if response.status_code >= 500:
+            UPSTREAM_ERRORS.inc(host, "http_5xx")
+        return response
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class InstrumentedTransport(httpx.BaseTransport):
+    """同步版本（OpenAI SDK 等同步客户端）"""
+
+    def __init__(self, inner: Optional[httpx.BaseTransport] = None):
+        self._inner = inner or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        host = _host(request)
+        t0 = time.perf_counter()
+        try:
+            response = self._inner.handle_request(request)
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(host, type(e).__name__)
+            raise
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - t0, host)
+        if response.status_code >= 500:
+            UPSTREAM_ERRORS.inc(host, "http_5xx")
+        return response
+
+    def close(self) -> None:
+        self._inner.close()
+
+
+# ── 数据库 ───────────────────────────────────────────
+def instrument_engine(engine: Engine) -> None:
+    """在（同步）Engine 上挂 cursor 事件；异步引擎传 engine.sync_engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_query_t0", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("_query_t0")
+        if not stack:
+            return
+        op = statement.lstrip()[:6].upper()
+        if op not in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+            op = "OTHER"
+        DB_QUERY_SECONDS.observe(time.perf_counter() - stack.pop(), op)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(ctx):
+        conn = ctx.connection
+        stack = conn.info.get("_query_t0") if conn is not None else None
+        if stack:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - stack.pop(), "ERROR")
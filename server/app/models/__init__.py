@@ -7,10 +7,14 @@ from app.models.strategy import Strategy
 from app.models.order import Order
 from app.models.position import Position
 from app.models.market_cache import MarketDataCache
-from app.models.auto_trade import AutoTradeSession, AutoTradeSignal, AutoTradePosition
+from app.models.auto_trade import (
+    AutoTradeSession, AutoTradeSessionStock, AutoTradeSignal, AutoTradePosition,
+)
+from app.models.backtest_run import BacktestRun
 
 __all__ = [
     "Stock", "Strategy", "Order", "Position", "MarketDataCache",
-    "AutoTradeSession", "AutoTradeSignal", "AutoTradePosition",
+    "AutoTradeSession", "AutoTradeSessionStock", "AutoTradeSignal", "AutoTradePosition",
+    "BacktestRun",
 ]
 
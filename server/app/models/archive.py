@@ -0,0 +1,70 @@
+"""
+数据保留 / 归档模型
+- SignalMonthly         : 全自动交易信号按 会话/月/股票/信号 汇总
+- OrderMonthly          : 订单按 月/股票/方向/状态 汇总
+- RecommendationMonthly : 推荐历史按 月/股票/状态 汇总
+- ArchiveBatch          : 归档批次清单（每批 = 一张表的一个月，明细在压缩文件中）
+汇总表只累计已归档（已从热表删除）的明细，近期数据仍以热表为准。
+"""
+
+from datetime import datetime
+from sqlalchemy import Column, String, Float, Integer, DateTime
+from app.models.base import Base
+
+
+class SignalMonthly(Base):
+    __tablename__ = "auto_trade_signal_monthly"
+
+    session_id = Column(String, primary_key=True)
+    month = Column(String, primary_key=True)                # YYYY-MM
+    stock_code = Column(String, primary_key=True)
+    signal = Column(String, primary_key=True)               # BUY / SELL / HOLD
+
+    rows = Column(Integer, default=0)                       # 信号条数
+    executed = Column(Integer, default=0)                   # 已执行条数
+    quantity = Column(Integer, default=0)                   # 已执行成交数量
+    amount = Column(Float, default=0.0)                     # 已执行成交金额
+    fees = Column(Float, default=0.0)                       # 已执行手续费
+    profit = Column(Float, default=0.0)                     # 已执行卖出盈亏
+    wins = Column(Integer, default=0)                       # 已执行且盈利的卖出笔数
+
+
+class OrderMonthly(Base):
+    __tablename__ = "orders_monthly"
+
+    month = Column(String, primary_key=True)                # YYYY-MM（按 created_at）
+    stock_code = Column(String, primary_key=True)
+    type = Column(String, primary_key=True)                 # BUY / SELL
+    status = Column(String, primary_key=True)               # FILLED / CANCELLED / REJECTED
+
+    orders = Column(Integer, default=0)
+    quantity = Column(Integer, default=0)
+    filled_quantity = Column(Integer, default=0)
+    filled_amount = Column(Float, default=0.0)              # sum(filled_price * filled_quantity)
+    total_fee = Column(Float, default=0.0)
+
+
+class RecommendationMonthly(Base):
+    __tablename__ = "recommendation_history_monthly"
+
+    month = Column(String, primary_key=True)                # YYYY-MM
+    stock_code = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)               # new / holding / exit
+
+    rows = Column(Integer, default=0)                       # 推荐天数
+    stock_name = Column(String, default="")
+    sum_confidence = Column(Float, default=0.0)
+    sum_composite_score = Column(Float, default=0.0)
+    sum_return_since_rec_pct = Column(Float, default=0.0)
+    max_days_held = Column(Integer, default=0)
+
+
+class ArchiveBatch(Base):
+    __tablename__ = "archive_batches"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String, nullable=False, index=True)
+    month = Column(String, nullable=False)                  # YYYY-MM
+    rows = Column(Integer, default=0)
+    path = Column(String, default="")                       # 相对 ARCHIVE_DIR 的文件路径
+    archived_at = Column(DateTime, default=datetime.now)
@@ -1,13 +1,15 @@
 """
 全自动交易系统 DB 模型
 - AutoTradeSession : 一个30天交易会话
+- AutoTradeSessionStock: 会话股票池及每只股票的策略分配（每股一行）
 - AutoTradeSignal  : 每日信号记录
 - AutoTradePosition: 独立持仓（与手动账户隔离）
 """
 
 import json
 from datetime import datetime
-from sqlalchemy import Column, String, Float, Integer, Boolean, DateTime, Text
+from typing import Optional
+from sqlalchemy import Column, String, Float, Integer, Boolean, DateTime, Text, Index
 from app.models.base import Base
 
 
@@ -17,7 +19,7 @@ class AutoTradeSession(Base):
     id = Column(String, primary_key=True)
     name = Column(String, default="")
 
-    # 股票池 & 策略映射（JSON 序列化存储）
+    # 旧版股票池 & 策略映射 JSON（已迁移到 auto_trade_session_stocks，仅保留供启动迁移读取）
     stock_codes_json = Column(Text, default="[]")          # List[str]
     strategy_map_json = Column(Text, default="{}")         # {code: {strategy,short_w,long_w,label,confidence}}
 
@@ -58,26 +60,16 @@ class AutoTradeSession(Base):
     last_run_date = Column(String, default="")             # 最近一次执行日期
     validate_summary_json = Column(Text, default="{}")     # 历史验证摘要
 
+    # 成交统计（随信号在同一事务内累加，绩效查询不再扫描信号表）
+    stats_trades = Column(Integer, default=0)              # 已执行卖出笔数
+    stats_wins = Column(Integer, default=0)                # 其中盈利笔数
+    stats_realized_profit = Column(Float, default=0.0)     # 已实现盈亏（卖出 profit 合计）
+    stats_total_fees = Column(Float, default=0.0)          # 已执行信号手续费合计
+
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
     # ── helpers ──────────────────────────────────────────
-    @property
-    def stock_codes(self):
-        return json.loads(self.stock_codes_json or "[]")
-
-    @stock_codes.setter
-    def stock_codes(self, value):
-        self.stock_codes_json = json.dumps(value, ensure_ascii=False)
-
-    @property
-    def strategy_map(self):
-        return json.loads(self.strategy_map_json or "{}")
-
-    @strategy_map.setter
-    def strategy_map(self, value):
-        self.strategy_map_json = json.dumps(value, ensure_ascii=False)
-
     @property
     def validate_summary(self):
         return json.loads(self.validate_summary_json or "{}")
@@ -87,11 +79,58 @@ class AutoTradeSession(Base):
         self.validate_summary_json = json.dumps(value, ensure_ascii=False)
 
 
+class AutoTradeSessionStock(Base):
+    """
+    会话股票池的一只股票：seq 为股票池顺序，strategy 为空表示尚未分配策略（验证中）。
+    验证 / 轮换逐只按行更新，不再整体重写 JSON。
+    """
+    __tablename__ = "auto_trade_session_stocks"
+    __table_args__ = (
+        # 会话股票池按序读取：WHERE session_id (IN ...) ORDER BY seq
+        Index("ix_auto_trade_session_stocks_session_seq", "session_id", "seq"),
+    )
+
+    # strategy_map 条目字段（与 API 的 strategy_map 字典键一致）
+    ENTRY_FIELDS = (
+        "strategy", "short_window", "long_window", "label", "confidence",
+        "train_return_pct", "test_return_pct", "test_alpha_pct",
+    )
+
+    session_id = Column(String, primary_key=True)
+    stock_code = Column(String, primary_key=True)
+    seq = Column(Integer, default=0)
+
+    strategy = Column(String, default="")
+    short_window = Column(Integer, default=0)
+    long_window = Column(Integer, default=0)
+    label = Column(String, default="")
+    confidence = Column(Float, default=0.0)
+    train_return_pct = Column(Float, default=0.0)
+    test_return_pct = Column(Float, default=0.0)
+    test_alpha_pct = Column(Float, default=0.0)
+
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def entry(self) -> Optional[dict]:
+        """→ strategy_map 条目；未分配策略时为 None"""
+        if not self.strategy:
+            return None
+        return {f: getattr(self, f) for f in self.ENTRY_FIELDS}
+
+
 class AutoTradeSignal(Base):
     __tablename__ = "auto_trade_signals"
+    __table_args__ = (
+        # 最近信号列表：WHERE session_id ORDER BY created_at DESC LIMIT n
+        Index("ix_auto_trade_signals_session_created", "session_id", "created_at"),
+        # 按日查询：WHERE session_id AND date
+        Index("ix_auto_trade_signals_session_date", "session_id", "date"),
+        # 绩效统计：WHERE session_id AND executed，按 signal 分组
+        Index("ix_auto_trade_signals_session_exec", "session_id", "executed", "signal"),
+    )
 
     id = Column(String, primary_key=True)
-    session_id = Column(String, nullable=False, index=True)
+    session_id = Column(String, nullable=False)
 
     date = Column(String, nullable=False)           # YYYY-MM-DD
     stock_code = Column(String, nullable=False)
@@ -113,9 +152,15 @@ class AutoTradeSignal(Base):
 
 class AutoTradePosition(Base):
     __tablename__ = "auto_trade_positions"
+    __table_args__ = (
+        # 单只持仓：WHERE session_id AND stock_code；会话全部持仓走前缀
+        Index("ix_auto_trade_positions_session_code", "session_id", "stock_code"),
+        # 当前持仓：WHERE session_id (IN ...) AND quantity > 0
+        Index("ix_auto_trade_positions_session_qty", "session_id", "quantity"),
+    )
 
     id = Column(String, primary_key=True)
-    session_id = Column(String, nullable=False, index=True)
+    session_id = Column(String, nullable=False)
     stock_code = Column(String, nullable=False)
     stock_name = Column(String, default="")
 
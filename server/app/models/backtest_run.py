@@ -0,0 +1,27 @@
+"""
+回测结果持久化
+────────────
+BacktestRun: 以内容哈希 (参数, K线数据版本, 引擎版本) 为主键的回测结果。
+相同输入直接命中返回；同一股票写入基于更新 K 线的结果时，旧数据版本的行被作废。
+"""
+
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Text
+from app.models.base import Base
+
+
+class BacktestRun(Base):
+    __tablename__ = "backtest_runs"
+
+    id = Column(String(64), primary_key=True)              # 内容哈希，同时作为 BacktestResult.id
+    stock_code = Column(String, index=True, default="")
+    strategy = Column(String, default="")
+
+    params_json = Column(Text, default="{}")               # BacktestParams 规范化 JSON
+    data_version = Column(String(64), default="")          # K 线内容哈希
+    engine_version = Column(String, default="")
+    last_bar_date = Column(String, default="")             # 所用 K 线最后一根的日期
+
+    result_json = Column(Text, nullable=False)             # BacktestResult JSON
+
+    created_at = Column(DateTime, default=datetime.now)
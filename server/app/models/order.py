@@ -2,13 +2,17 @@
 订单模型
 """
 
-from sqlalchemy import Column, String, Integer, Float, DateTime
+from sqlalchemy import Column, String, Integer, Float, DateTime, Index
 from app.models.base import BaseModel
 
 
 class Order(BaseModel):
     """订单模型"""
     __tablename__ = "orders"
+    __table_args__ = (
+        # 订单列表 / 流式导出：ORDER BY created_at，按日期区间过滤
+        Index("ix_orders_created_at", "created_at"),
+    )
 
     stock_code = Column(String(20), nullable=False)
     stock_name = Column(String(100))
@@ -17,6 +21,7 @@ class Order(BaseModel):
     price = Column(Float)
     quantity = Column(Integer, nullable=False)
     status = Column(String(20), nullable=False)  # PENDING, FILLED, CANCELLED, REJECTED
+    time_in_force = Column(String(8), default="DAY")  # DAY, GTC, IOC, FOK（限价单有效期）
     filled_quantity = Column(Integer, default=0)
     filled_price = Column(Float, default=0)
 
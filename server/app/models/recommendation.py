@@ -3,22 +3,29 @@
 ────────────────────
 RecommendationHistory: 每日推荐快照。每个交易日为每只"活跃/新增/退出"的股票写一行，
 通过 first_recommended_date / entry_ref_price / miss_count 维持 day-to-day 延续性。
+RecommendationSnapshot: 每个快照日仍活跃（new/holding）的推荐 ID，对账时按主键一次取到上一日活跃集。
 """
 
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Float, Integer, DateTime, Text
+from sqlalchemy import Column, String, Float, Integer, DateTime, Text, Index
 from app.models.base import Base
 
 
 class RecommendationHistory(Base):
     __tablename__ = "recommendation_history"
+    __table_args__ = (
+        # 按日 / 按日+状态（活跃集）查询
+        Index("ix_recommendation_history_date_status_code", "date", "status", "stock_code"),
+        # 单股历史：WHERE stock_code ORDER BY date DESC
+        Index("ix_recommendation_history_code_date", "stock_code", "date"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
 
-    date = Column(String, index=True, default="")          # 本行所属交易日 YYYY-MM-DD
+    date = Column(String, default="")                      # 本行所属交易日 YYYY-MM-DD
     market = Column(String, default="")                    # A股 / 港股 / 美股
-    stock_code = Column(String, index=True, default="")
+    stock_code = Column(String, default="")
     stock_name = Column(String, default="")
 
     # 推荐当时的策略与信号
@@ -52,3 +59,11 @@ class RecommendationHistory(Base):
     exit_reason = Column(String, default="")
 
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RecommendationSnapshot(Base):
+    __tablename__ = "recommendation_snapshots"
+
+    date = Column(String, primary_key=True)                # 快照日 YYYY-MM-DD
+    active_ids_json = Column(Text, default="[]")           # 当日 new/holding 行的 id 列表
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
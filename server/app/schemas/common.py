@@ -2,7 +2,7 @@
 通用模式
 """
 
-from typing import Optional, Generic, TypeVar
+from typing import Dict, Generic, List, Optional, TypeVar
 from pydantic import BaseModel
 
 T = TypeVar('T')
@@ -15,3 +15,18 @@ class ApiResponse(BaseModel, Generic[T]):
     message: Optional[str] = None
     error: Optional[str] = None
 
+
+
+class StageTiming(BaseModel):
+    """管线单阶段耗时"""
+    name: str
+    seconds: float
+
+
+class PipelineDiagnostics(BaseModel):
+    """管线诊断：分阶段耗时 + 计数（stocks_in/out、http_calls、cache_hits、backtests 等）"""
+    pipeline: str
+    total_seconds: float
+    stages: List[StageTiming] = []
+    counters: Dict[str, int] = {}
+    children: List["PipelineDiagnostics"] = []
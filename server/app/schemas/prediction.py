@@ -5,6 +5,8 @@
 from pydantic import BaseModel
 from typing import Optional, List
 
+from app.schemas.common import PipelineDiagnostics
+
 
 class PredictionParams(BaseModel):
     """预测分析参数"""
@@ -72,3 +74,4 @@ class PredictionResult(BaseModel):
     total_analyzed: int
     time_taken_seconds: float
     rankings: List[PredictionItem]
+    diagnostics: Optional[PipelineDiagnostics] = None
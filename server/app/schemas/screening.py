@@ -6,6 +6,7 @@ from pydantic import BaseModel
 from typing import Optional, List
 
 from app.schemas.backtest import BacktestResult
+from app.schemas.common import PipelineDiagnostics
 
 
 class SmartScreenParams(BaseModel):
@@ -90,4 +91,6 @@ class SmartScreenResult(BaseModel):
     test_bnh_pct: Optional[float] = None        # 测试期买入持有基准
     avg_confidence: Optional[float] = None
     avg_predicted_return: Optional[float] = None  # 未来 N 月预测收益均值
-    prediction_months: Optional[int] = None     # 未来收益预测月数（与请求一致，表内预测收益即为此区间）
\ No newline at end of file
+    prediction_months: Optional[int] = None     # 未来收益预测月数（与请求一致，表内预测收益即为此区间）
+    # 分阶段耗时与计数（定位慢在哪一步）
+    diagnostics: Optional[PipelineDiagnostics] = None
\ No newline at end of file
@@ -15,6 +15,10 @@ class OrderCreate(BaseModel):
     order_type: Literal["MARKET", "LIMIT"]
     price: Optional[float] = None
     quantity: int
+    # 限价单有效期：DAY 当日有效 / GTC 撤单前有效 / IOC 立即成交剩余撤销 / FOK 全部成交否则撤销
+    time_in_force: Literal["DAY", "GTC", "IOC", "FOK"] = "DAY"
+    # 客户端订单号：实盘作为网关幂等键，重试 / 重复提交同一编号不会重复委托；留空自动生成
+    client_order_id: Optional[str] = None
 
 
 class Order(BaseModel):
@@ -29,6 +33,7 @@ class Order(BaseModel):
     status: Literal["PENDING", "FILLED", "CANCELLED", "REJECTED"]
     filled_quantity: int
     filled_price: float
+    time_in_force: str = "DAY"
     # 费用明细
     stamp_tax: float = 0.0
     commission: float = 0.0
@@ -42,6 +47,13 @@ class Order(BaseModel):
         from_attributes = True
 
 
+class BatchOrderResult(BaseModel):
+    """批量下单单项结果"""
+    success: bool
+    order: Optional[Order] = None
+    error: Optional[str] = None
+
+
 class Position(BaseModel):
     """持仓"""
     stock_code: str
@@ -0,0 +1,182 @@
+"""
+账户 / 持仓快照（进程内单例，见 get_account_snapshot）
+────────────────────────────────────────────
+- 读：现金、累计手续费、持仓市值总额都是维护好的数，get_account_info 为 O(1)，不查库不取行情
+- 写：每笔成交在落库提交后立即增量计入（现金、持仓数量 / 成本 / 已实现盈亏、市值）
+- 市值：订阅共享报价缓存，持仓代码的价格变动时只调整该持仓的市值差额
+- 对账：超过 ACCOUNT_RECONCILE_SEC 未对账时由 TradeService 从库（模拟）或券商（实盘）全量重载；
+  对账期间有新成交则本次结果不作数，下次读取再对一次
+"""
+
+import asyncio
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from app.schemas.trade import AccountInfo, Position
+from app.services.quote_cache import QuoteCache, get_quote_cache
+
+
+def roll_position(
+    quantity: int, cost_price: float, total_fees: float, realized_profit: float,
+    side: str, qty: int, price: float, fee: float,
+) -> Tuple[int, float, float, float]:
+    """一笔成交后的 (数量, 成本价, 累计费用, 已实现盈亏)；买入成本含费用，卖出按成本价结转盈亏。
+    卖出数量超过持仓时抛 ValueError（不允许卖空）"""
+    if side == "BUY":
+        new_qty = quantity + qty
+        cost = (cost_price * quantity + price * qty + fee) / new_qty
+        return new_qty, cost, total_fees + fee, realized_profit
+    if qty > quantity:
+        raise ValueError(f"卖出数量 {qty} 超过持仓 {quantity}")
+    realized = realized_profit + (price * qty - fee) - cost_price * qty
+    return quantity - qty, cost_price, total_fees + fee, realized
+
+
+def cash_delta(side: str, qty: int, price: float, fee: float) -> float:
+    return -(price * qty + fee) if side == "BUY" else price * qty - fee
+
+
+class Holding(NamedTuple):
+    stock_code: str
+    stock_name: str
+    quantity: int
+    cost_price: float
+    total_fees: float = 0.0
+    realized_profit: float = 0.0
+    price: Optional[float] = None        # 对账时的估值价（实盘取券商现价），缓存无价时使用
+
+
+class _Entry:
+    __slots__ = ("h", "key", "price")
+
+    def __init__(self, h: Holding, key: str, price: float):
+        self.h = h
+        self.key = key
+        self.price = price
+
+
+class AccountSnapshot:
+    def __init__(self, quotes: QuoteCache):
+        self.quotes = quotes
+        self.cash = 0.0
+        self.total_fees = 0.0
+        self.market_value = 0.0
+        self.base_asset = 0.0                       # 计算盈亏的基准资产（模拟为初始资金）
+        self.loaded_at: Optional[float] = None      # 上次对账完成时刻（monotonic）
+        self.seq = 0                                # 成交计数，用于识别对账期间的并发成交
+        self.lock = asyncio.Lock()
+        self._entries: Dict[str, _Entry] = {}       # 代码 -> 持仓
+        self._by_key: Dict[str, str] = {}           # 报价键 -> 代码
+        quotes.subscribe(self._on_quote)
+
+    # ── 对账 ──────────────────────────────────────────
+    def stale(self, max_age: float) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > max_age
+
+    def invalidate(self) -> None:
+        self.loaded_at = None
+
+    def load(
+        self, cash: float, total_fees: float, base_asset: float,
+        holdings: Iterable[Tuple[Holding, str]], seq: int,
+    ) -> None:
+        """全量替换；holdings 为 (持仓, 报价键)。seq 为对账开始时的成交计数，期间有成交则标记为待重对"""
+        self.cash, self.total_fees, self.base_asset = cash, total_fees, base_asset
+        self._entries.clear()
+        self._by_key.clear()
+        self.market_value = 0.0
+        for h, key in holdings:
+            if h.quantity > 0:
+                self._set(h, key)
+        self.loaded_at = time.monotonic() if seq == self.seq else None
+
+    # ── 增量 ──────────────────────────────────────────
+    def apply_fill(
+        self, code: str, key: str, name: str, side: str, qty: int, price: float, fee: float,
+    ) -> None:
+        """一笔（部分）成交计入快照；须在成交落库提交后、让出事件循环前调用"""
+        self.seq += 1
+        if qty <= 0:
+            return
+        e = self._entries.get(code)
+        if side != "BUY" and (e is None or e.h.quantity < qty):
+            # 快照与库不一致（库侧已拒绝超卖），下次读取时全量对账
+            self.invalidate()
+            return
+        self.cash += cash_delta(side, qty, price, fee)
+        self.total_fees += fee
+        h = e.h if e is not None else Holding(code, name, 0, 0.0)
+        q, cost, fees, realized = roll_position(
+            h.quantity, h.cost_price, h.total_fees, h.realized_profit, side, qty, price, fee,
+        )
+        h = h._replace(stock_name=name or h.stock_name, quantity=q, cost_price=cost,
+                       total_fees=fees, realized_profit=realized, price=price)
+        self._drop(code)
+        if q > 0:
+            self._set(h, key)
+
+    def _set(self, h: Holding, key: str) -> None:
+        price = self.quotes.get(key) or h.price or h.cost_price
+        self._entries[h.stock_code] = _Entry(h, key, price)
+        self._by_key[key] = h.stock_code
+        self.market_value += h.quantity * price
+
+    def _drop(self, code: str) -> None:
+        e = self._entries.pop(code, None)
+        if e is not None:
+            self._by_key.pop(e.key, None)
+            self.market_value -= e.h.quantity * e.price
+
+    def _on_quote(self, key: str, price: float) -> None:
+        code = self._by_key.get(key)
+        if code is None:
+            return
+        e = self._entries[code]
+        self.market_value += e.h.quantity * (price - e.price)
+        e.price = price
+
+    # ── 读取 ──────────────────────────────────────────
+    def keys(self) -> List[str]:
+        return list(self._by_key)
+
+    def account(self) -> AccountInfo:
+        total = self.cash + self.market_value
+        profit = total - self.base_asset
+        return AccountInfo(
+            total_asset=round(total, 2),
+            available_cash=round(self.cash, 2),
+            market_value=round(self.market_value, 2),
+            profit=round(profit, 2),
+            profit_percent=round(profit / self.base_asset * 100, 2) if self.base_asset > 0 else 0.0,
+            total_fees_paid=round(self.total_fees, 2),
+        )
+
+    def positions(self) -> List[Position]:
+        out = []
+        for e in self._entries.values():
+            h = e.h
+            market_value = e.price * h.quantity
+            cost_total = h.cost_price * h.quantity
+            profit = market_value - cost_total
+            out.append(Position(
+                stock_code=h.stock_code,
+                stock_name=h.stock_name or f"股票{h.stock_code}",
+                quantity=h.quantity,
+                cost_price=round(h.cost_price, 4),
+                current_price=e.price,
+                market_value=round(market_value, 2),
+                profit=round(profit, 2),
+                profit_percent=round(profit / cost_total * 100, 2) if cost_total > 0 else 0.0,
+                total_fees=round(h.total_fees, 2),
+                realized_profit=round(h.realized_profit, 2),
+            ))
+        return out
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@lru_cache(maxsize=1)
+def get_account_snapshot() -> AccountSnapshot:
+    return AccountSnapshot(get_quote_cache())
@@ -1,119 +1,228 @@
 """
 全自动交易调度器（asyncio 实现，无额外依赖）
 ────────────────────────────────────────────
-双模式触发：
-1. 日内实时止损/止盈（9:30-15:00，每5分钟）
-   - 用实时报价检查所有持仓
+按交易所日历（app/utils/trading_calendar）精确休眠到下一个事件，非交易日/非交易时段不唤醒：
+1. 日内实时止损/止盈（交易时段内，每 INTRADAY_STOP_POLL_SEC 秒；午休暂停）
+   - IntradayStopEngine 维护按触发价排序的触发表，一次报价 + bisect 找出被穿越的持仓
    - 触及止损/止盈/超期 → 立即平仓
-2. 收盘后策略信号（15:15 后，当日只执行一次）
+2. 收盘后策略信号（收盘后 15 分钟，当日只执行一次）
    - 用日K生成 BUY/SELL 策略信号
+3. 日报（EMAIL_SEND_HOUR 整点；早于收盘信号时紧随其后发送）
+4. 数据维护（每日 RETENTION_RUN_HOUR 整点）：超期明细归档 + ANALYZE；
+   非交易日且收盘信号 / 日报 / 日内止损都空闲时另做 VACUUM（独占写连接）
 """
 
 import asyncio
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from typing import Tuple
 from loguru import logger
 
 from app.core.config import settings
 from app.services.auto_trade_service import AutoTradeService
 from app.services.email_service import send_daily_report
+from app.services.retention_service import RetentionService
 from app.services.sms_service import send_event_sms
+from app.services.stop_engine import IntradayStopEngine
+from app.utils.trading_calendar import get_calendar
+
+_EOD_DELAY = timedelta(minutes=15)   # 收盘后等待日K落定
+_MAX_SLEEP = 3600.0                  # 单次休眠上限：系统休眠/校时后重新计算下一事件
 
 
 class AutoScheduler:
 
     def __init__(self):
         self.service = AutoTradeService()
+        self.stop_engine = IntradayStopEngine(self.service)
+        self.calendar = get_calendar()
+        self.retention = RetentionService()
         self._running = False
         self._task: asyncio.Task = None
+        self._stop_task: asyncio.Task = None
+        self._maint_task: asyncio.Task = None
+        self._active = 0                     # 正在执行的收盘信号 / 日报 / 日内止损任务数
 
     def start(self):
         if self._running:
             return
         self._running = True
         self._task = asyncio.create_task(self._loop())
-        logger.info("[AutoScheduler] 调度器已启动（每5分钟轮询）")
+        self._stop_task = asyncio.create_task(self._stop_loop())
+        if settings.RETENTION_ENABLED:
+            self._maint_task = asyncio.create_task(self._maintenance_loop())
+        at, kind = self._next_event(datetime.now())
+        logger.info(
+            f"[AutoScheduler] 调度器已启动（按交易日历调度，下一事件 {kind} @ {at:%Y-%m-%d %H:%M}，"
+            f"日内止损每{settings.INTRADAY_STOP_POLL_SEC:g}秒）"
+        )
 
     async def stop(self):
         self._running = False
-        if self._task:
-            self._task.cancel()
-            try:
-                await self._task
-            except asyncio.CancelledError:
-                pass
+        for task in (self._task, self._stop_task, self._maint_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
         logger.info("[AutoScheduler] 调度器已停止")
 
+    @contextmanager
+    def _busy(self):
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+
+    def idle(self) -> bool:
+        return self._active == 0
+
+    # ── 事件计算 ──────────────────────────────────────
+    def _day_events(self, d) -> list:
+        """交易日 d 的 (时间, 事件) 列表；非交易日为空"""
+        close = self.calendar.close_time(d)
+        if close is None:
+            return []
+        eod_at = close + _EOD_DELAY
+        if not (settings.EMAIL_ENABLED or settings.SMS_ENABLED):
+            return [(eod_at, "eod")]
+        report_at = datetime.combine(d, time(settings.EMAIL_SEND_HOUR))
+        if report_at <= eod_at:
+            return [(eod_at, "eod+report")]
+        return [(eod_at, "eod"), (report_at, "report")]
+
+    def _next_event(self, now: datetime) -> Tuple[datetime, str]:
+        """严格晚于 now 的下一个调度事件"""
+        d = now.date()
+        if not self.calendar.is_trading_day(d):
+            d = self.calendar.next_trading_day(d)
+        while True:
+            for at, kind in self._day_events(d):
+                if at > now:
+                    return at, kind
+            d = self.calendar.next_trading_day(d)
+
+    async def _sleep_until(self, at: datetime) -> bool:
+        """休眠到 at；因 _MAX_SLEEP 提前醒来返回 False"""
+        delay = (at - datetime.now()).total_seconds()
+        await asyncio.sleep(min(max(delay, 0.0), _MAX_SLEEP))
+        return datetime.now() >= at
+
+    # ── 主循环 ────────────────────────────────────────
     async def _loop(self):
         await asyncio.sleep(2)
+        try:
+            with self._busy():
+                await self._catch_up(datetime.now())
+        except Exception as e:
+            logger.error(f"[AutoScheduler] 启动补跑异常: {e}")
         while self._running:
+            at, kind = self._next_event(datetime.now())
             try:
-                await self._tick()
+                if not await self._sleep_until(at):
+                    continue
+                today = at.strftime("%Y-%m-%d")
+                with self._busy():
+                    if kind.startswith("eod"):
+                        ran = await self._run_eod(today)
+                        logger.info(f"[AutoScheduler] {today} 收盘信号完成：{ran} 个会话")
+                    if kind.endswith("report"):
+                        await self._send_report(today)
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.error(f"[AutoScheduler] 调度异常: {e}")
-            await asyncio.sleep(300)  # 每5分钟
+                logger.error(f"[AutoScheduler] 调度异常 {kind}: {e}")
 
-    async def _tick(self):
-        now = datetime.now()
-        if not self._is_trading_day(now):
+    async def _catch_up(self, now: datetime):
+        """启动时补跑：今日收盘信号已过点但会话未执行；若日报也已过点，补发一次"""
+        events = self._day_events(now.date())
+        if not events or now < events[0][0]:
             return
-
-        try:
-            sessions = await self.service.list_sessions()
-        except Exception as e:
-            logger.warning(f"[AutoScheduler] list_sessions 失败: {e}")
-            return
-
-        running = [s for s in sessions if s.status == "running"]
-        if not running:
-            return
-
-        total_min = now.hour * 60 + now.minute
-        in_trading = 9 * 60 + 30 <= total_min <= 15 * 60
-        after_close = now.hour > 15 or (now.hour == 15 and now.minute >= 15)
         today = now.strftime("%Y-%m-%d")
+        ran = await self._run_eod(today)
+        if ran and any(k.endswith("report") and at <= now for at, k in events):
+            await self._send_report(today)
 
-        eod_pending = []  # 收集需要跑 EOD 的会话
-        for session in running:
-            # ── 日内实时止损/止盈（9:30-15:00）────────────────────
-            if in_trading:
-                asyncio.create_task(self._run_intraday_stops(session.id))
+    async def _stop_loop(self):
+        """日内止损引擎：交易时段内轮询，其余时间休眠到下一次开盘"""
+        await asyncio.sleep(2)
+        while self._running:
+            now = datetime.now()
+            if not self.calendar.is_open(now):
+                await self._sleep_until(self.calendar.next_open(now))
+                continue
+            try:
+                with self._busy():
+                    fired = await self.stop_engine.tick(now.strftime("%Y-%m-%d"))
+                    for session_id, signals in fired.items():
+                        await self._notify_intraday(session_id, signals)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"[AutoScheduler] 日内止损引擎异常: {e}")
+            await asyncio.sleep(settings.INTRADAY_STOP_POLL_SEC)
 
-            # ── 收盘后日K策略信号（15:15 后，当日唯一）────────────
-            if after_close and session.last_run_date != today:
-                logger.info(
-                    f"[AutoScheduler] 触发收盘信号 session={session.id} ({session.name}) date={today}"
-                )
-                eod_pending.append(session)
+    async def _maintenance_loop(self):
+        """数据维护：每日定点归档超期明细；非交易日且其他调度任务空闲时额外 VACUUM"""
+        while self._running:
+            now = datetime.now()
+            at = datetime.combine(now.date(), time(settings.RETENTION_RUN_HOUR))
+            if at <= now:
+                at += timedelta(days=1)
+            try:
+                if not await self._sleep_until(at):
+                    continue
+                await self._maintain(at)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"[AutoScheduler] 数据维护异常: {e}")
 
-        if eod_pending:
-            asyncio.create_task(self._run_eod_and_notify(eod_pending, today))
+    async def _maintain(self, at: datetime) -> bool:
+        """归档 + ANALYZE；返回是否做了 VACUUM"""
+        archived = await self.retention.run(at.date())
+        # VACUUM 独占唯一写连接：只在非交易日、且收盘信号 / 日报 / 止损都不在执行时做
+        vacuum = not self.calendar.is_trading_day(at) and self.idle()
+        if vacuum:
+            await self.retention.optimize(vacuum=True)
+        logger.info(f"[AutoScheduler] 数据维护完成 归档={archived} vacuum={vacuum}")
+        return vacuum
 
-    async def _run_intraday_stops(self, session_id: str):
+    async def _notify_intraday(self, session_id: str, signals):
+        if not signals:
+            return
+        logger.info(
+            f"[AutoScheduler] 日内平仓 session={session_id}: "
+            f"{len(signals)} 笔 ({', '.join(s.stock_code for s in signals)})"
+        )
+        if not settings.SMS_ENABLED:
+            return
         try:
-            signals = await self.service.check_intraday_stops(session_id)
-            if signals:
-                logger.info(
-                    f"[AutoScheduler] 日内平仓 session={session_id}: "
-                    f"{len(signals)} 笔 ({', '.join(s.stock_code for s in signals)})"
+            for sig in signals[:10]:
+                action = "卖出" if sig.signal == "SELL" else sig.signal
+                content = (
+                    f"{sig.stock_code} {action} "
+                    f"@{sig.price:.2f} x{sig.quantity} "
+                    f"盈亏{sig.profit:+.0f} {sig.notes}"
                 )
-                if settings.SMS_ENABLED:
-                    for sig in signals[:10]:
-                        action = "卖出" if sig.signal == "SELL" else sig.signal
-                        content = (
-                            f"{sig.stock_code} {action} "
-                            f"@{sig.price:.2f} x{sig.quantity} "
-                            f"盈亏{sig.profit:+.0f} {sig.notes}"
-                        )
-                        await send_event_sms(session_id, content, event="intraday_stop")
+                await send_event_sms(session_id, content, event="intraday_stop")
         except Exception as e:
-            logger.error(f"[AutoScheduler] 日内止损检查失败 session={session_id}: {e}")
+            logger.error(f"[AutoScheduler] 日内平仓短信失败 session={session_id}: {e}")
 
-    async def _run_eod_and_notify(self, eod_sessions, today: str):
-        """依次执行需要 EOD 的会话，全部完成后汇总所有 running 会话绩效发邮件"""
-        # 1. 执行 EOD 信号
+    async def _run_eod(self, today: str) -> int:
+        """依次执行当日尚未跑过收盘信号的 running 会话，返回执行的会话数"""
+        try:
+            sessions = await self.service.list_sessions()
+        except Exception as e:
+            logger.warning(f"[AutoScheduler] list_sessions 失败: {e}")
+            return 0
+        eod_sessions = [s for s in sessions if s.status == "running" and s.last_run_date != today]
         for session in eod_sessions:
+            logger.info(
+                f"[AutoScheduler] 触发收盘信号 session={session.id} ({session.name}) date={today}"
+            )
             try:
                 signals = await self.service.process_daily(session.id, today)
                 executed = [s for s in signals if s.executed]
@@ -132,8 +241,10 @@ class AutoScheduler:
                     await send_event_sms(session.name or session.id, content, event="eod_summary")
             except Exception as e:
                 logger.error(f"[AutoScheduler] session={session.id} 执行失败: {e}")
+        return len(eod_sessions)
 
-        # 2. 汇总所有 running 会话的绩效（不只是今天跑过的）
+    async def _send_report(self, today: str):
+        """汇总所有 running 会话的绩效（不只是今天跑过的）发邮件/短信"""
         try:
             all_sessions = await self.service.list_sessions()
             running = [s for s in all_sessions if s.status == "running"]
@@ -141,10 +252,14 @@ class AutoScheduler:
             logger.warning(f"[AutoScheduler] 邮件报告: list_sessions 失败: {e}")
             return
 
+        # 所有会话持仓现价一次批量获取
+        codes = await self.service._open_position_codes([s.id for s in running])
+        price_map = await self.service._fetch_price_map(codes)
+
         session_reports = []
         for session in running:
             try:
-                perf = await self.service.get_performance(session.id)
+                perf = await self.service.get_performance(session.id, price_map=price_map)
                 # 取今日已执行信号
                 all_sigs = await self.service.get_signals(session.id, date=today, limit=50)
                 today_sigs = [
@@ -193,23 +308,6 @@ class AutoScheduler:
                 )
                 await send_event_sms("ALL", sms, event="daily_report")
 
-    async def _run_session(self, session_id: str, today: str):
-        try:
-            signals = await self.service.process_daily(session_id, today)
-            executed = [s for s in signals if s.executed]
-            buys  = [s for s in executed if s.signal == "BUY"]
-            sells = [s for s in executed if s.signal == "SELL"]
-            logger.info(
-                f"[AutoScheduler] session={session_id} 完成 {today}："
-                f"{len(signals)}条信号，买{len(buys)}笔 卖{len(sells)}笔"
-            )
-        except Exception as e:
-            logger.error(f"[AutoScheduler] session={session_id} 执行失败: {e}")
-
-    @staticmethod
-    def _is_trading_day(dt: datetime) -> bool:
-        return dt.weekday() < 5
-
 
 # 全局单例
 _scheduler: AutoScheduler = None
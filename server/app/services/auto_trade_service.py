@@ -12,14 +12,18 @@ import json
 import math
 import uuid
 from datetime import date, datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
 from loguru import logger
-from sqlalchemy import select
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from app.core.database import AsyncSessionLocal
+from app.core.compute import run_compute
+from app.core.config import settings
+from app.core.database import AsyncReadSessionLocal, AsyncSessionLocal
 from app.models.auto_trade import (
     AutoTradeSession as SessionModel,
+    AutoTradeSessionStock as StockModel,
     AutoTradeSignal as SignalModel,
     AutoTradePosition as PositionModel,
 )
@@ -42,8 +46,11 @@ from app.schemas.strategy_test import StrategyTestParams
 from app.services.backtest_service import BacktestService
 from app.services.strategy_test_service import StrategyTestService
 from app.services.strategy_constants import BACKTEST_STRATEGIES
+from app.services.quote_cache import get_quote_cache
 from app.services.trade_service import TradeService
 from app.adapters.market.sina_adapter import SinaAdapter
+from app.utils.rate_limit import AsyncRateLimiter
+from app.utils.trading_calendar import get_calendar
 
 # ── 模拟交易费率（与 TradeService 保持一致）──
 COMMISSION_RATE = 0.00025
@@ -62,8 +69,8 @@ def _calc_fees(action: str, price: float, qty: int) -> float:
 
 
 def _is_trading_day(dt: datetime) -> bool:
-    """简单判断：周一至周五（不含法定节假日，节假日跳过不影响正确性）"""
-    return dt.weekday() < 5
+    """A股交易日（交易所日历，含法定节假日）"""
+    return get_calendar().is_trading_day(dt)
 
 
 # strategy_info 中存储的键与 BACKTEST_STRATEGIES 元组的映射
@@ -74,6 +81,30 @@ def _strategy_tuple(name: str) -> Tuple[str, int, int, str]:
     return name, 5, 20, name
 
 
+# 验证失败时的默认策略
+_DEFAULT_STRATEGY_ENTRY = {
+    "strategy": "macd", "short_window": 12, "long_window": 26,
+    "label": "MACD", "confidence": 0.0,
+    "train_return_pct": 0.0, "test_return_pct": 0.0, "test_alpha_pct": 0.0,
+}
+
+
+def _strategy_entry(r: ValidateResult, fallback: Optional[dict] = None) -> dict:
+    """验证结果 → strategy_map 条目；验证失败时用 fallback（默认 MACD）"""
+    if r.error:
+        return dict(fallback or _DEFAULT_STRATEGY_ENTRY)
+    return {
+        "strategy": r.best_strategy,
+        "short_window": r.__dict__.get("short_window", 0),
+        "long_window": r.__dict__.get("long_window", 0),
+        "label": r.best_strategy_label,
+        "confidence": r.confidence,
+        "train_return_pct": r.train_return_pct,
+        "test_return_pct": r.test_return_pct,
+        "test_alpha_pct": r.test_alpha_pct,
+    }
+
+
 def _parse_preset_from_name(session_name: str) -> str:
     """
     从会话名 '{prefix}-{preset_name}' 中解析 preset_name。
@@ -85,6 +116,185 @@ def _parse_preset_from_name(session_name: str) -> str:
     return parts[1] if len(parts) == 2 and parts[1] in STRATEGY_PRESETS else ""
 
 
+def _apply_fill(
+    pos: Optional[PositionModel],
+    session_id: str,
+    stock_code: str,
+    action: str,
+    price: float,
+    qty: int,
+    fees: float,
+    trade_date: str = "",
+) -> Optional[PositionModel]:
+    """把一笔成交作用到持仓上（只改内存对象），返回更新后的持仓；BUY 无持仓时新建"""
+    if action == "BUY":
+        cost_with_fee = (price * qty + fees) / qty
+        if pos:
+            old_total = pos.avg_cost * pos.quantity
+            new_total = cost_with_fee * qty
+            pos.quantity += qty
+            pos.avg_cost = (old_total + new_total) / pos.quantity
+            pos.total_fees = (pos.total_fees or 0) + fees
+            if not pos.entry_date and trade_date:
+                pos.entry_date = trade_date
+        else:
+            pos = PositionModel(
+                id=str(uuid.uuid4()),
+                session_id=session_id,
+                stock_code=stock_code,
+                quantity=qty,
+                avg_cost=cost_with_fee,
+                entry_date=trade_date,
+                total_fees=fees,
+                realized_profit=0.0,
+            )
+    elif action == "SELL" and pos:
+        sell_revenue = price * qty - fees
+        cost_basis = pos.avg_cost * qty
+        realized = sell_revenue - cost_basis
+        pos.quantity -= qty
+        pos.total_fees = (pos.total_fees or 0) + fees
+        pos.realized_profit = (pos.realized_profit or 0) + realized
+    return pos
+
+
+async def _load_stocks(db, session_ids: List[str]) -> Dict[str, Tuple[List[str], Dict[str, dict]]]:
+    """批量读取会话股票池与策略分配：{session_id: (stock_codes, strategy_map)}，一次索引查询"""
+    out: Dict[str, Tuple[List[str], Dict[str, dict]]] = {sid: ([], {}) for sid in session_ids}
+    if not session_ids:
+        return out
+    stmt = (
+        select(StockModel)
+        .where(StockModel.session_id.in_(session_ids))
+        .order_by(StockModel.session_id, StockModel.seq)
+    )
+    for row in (await db.execute(stmt)).scalars():
+        codes, smap = out[row.session_id]
+        codes.append(row.stock_code)
+        entry = row.entry()
+        if entry:
+            smap[row.stock_code] = entry
+    return out
+
+
+class _SessionConfig:
+    """会话配置快照：每次运行读取一次，替代逐字段查询"""
+
+    __slots__ = (
+        "id", "status", "stock_codes", "strategy_map", "available_cash", "initial_capital",
+        "max_position_pct", "stop_loss_pct", "take_profit_pct", "max_hold_days",
+        "min_test_return_pct", "market_regime_filter", "data_scale", "execution_mode",
+        "cycle_end_date", "validate_years", "train_ratio", "cycle_days", "current_cycle",
+    )
+
+    def __init__(self, model: SessionModel, stock_codes: List[str], strategy_map: Dict[str, dict]):
+        self.id = model.id
+        self.status = model.status
+        self.stock_codes: List[str] = stock_codes
+        self.strategy_map: Dict[str, dict] = strategy_map
+        self.available_cash = model.available_cash
+        self.initial_capital = model.initial_capital
+        self.max_position_pct = model.max_position_pct
+        self.stop_loss_pct = float(model.stop_loss_pct or 0.06)
+        self.take_profit_pct = float(model.take_profit_pct or 0.05)
+        self.max_hold_days = int(model.max_hold_days or 15)
+        self.min_test_return_pct = float(model.min_test_return_pct or -1.0)
+        mrf = model.market_regime_filter
+        self.market_regime_filter = bool(mrf) if mrf is not None else True
+        self.data_scale = int(model.data_scale or 240)
+        self.execution_mode = str(model.execution_mode or "sim").lower()
+        self.cycle_end_date = model.cycle_end_date
+        self.validate_years = float(model.validate_years or 5.0)
+        self.train_ratio = float(model.train_ratio or 0.8)
+        self.cycle_days = int(model.cycle_days or 30)
+        self.current_cycle = int(model.current_cycle or 1)
+
+    @classmethod
+    async def load(cls, session_id: str) -> Optional["_SessionConfig"]:
+        async with AsyncSessionLocal() as db:
+            model = await db.get(SessionModel, session_id)
+            if not model:
+                return None
+            codes, smap = (await _load_stocks(db, [session_id]))[session_id]
+            return cls(model, codes, smap)
+
+
+class _RunWork:
+    """
+    单次运行（收盘处理 / 日内止损）的工作单元：
+    - 开始时一次查询载入会话全部持仓
+    - 运行中成交只更新内存中的持仓对象、信号只入队
+    - commit() 在一个事务里写入持仓、信号与会话字段（一次 fsync）
+    """
+
+    def __init__(self, session_id: str, positions: List[PositionModel]):
+        self.session_id = session_id
+        self._positions: Dict[str, PositionModel] = {p.stock_code: p for p in positions}
+        self._touched: Dict[str, PositionModel] = {}
+        self._signals: List[SignalModel] = []
+        self._session_fields: dict = {}
+
+    @classmethod
+    async def load(cls, session_id: str) -> "_RunWork":
+        async with AsyncSessionLocal() as db:
+            stmt = select(PositionModel).where(PositionModel.session_id == session_id)
+            return cls(session_id, list((await db.execute(stmt)).scalars().all()))
+
+    def position(self, stock_code: str) -> Optional[PositionModel]:
+        return self._positions.get(stock_code)
+
+    def open_positions(self) -> List[PositionModel]:
+        return [p for p in self._positions.values() if p.quantity > 0]
+
+    def fill(self, stock_code: str, action: str, price: float, qty: int, fees: float,
+             trade_date: str = "") -> None:
+        pos = _apply_fill(self._positions.get(stock_code), self.session_id, stock_code,
+                          action, price, qty, fees, trade_date)
+        if pos is not None:
+            self._positions[stock_code] = pos
+            self._touched[stock_code] = pos
+
+    def add_signal(self, signal: SignalModel) -> None:
+        self._signals.append(signal)
+
+    def set_session(self, **fields) -> None:
+        self._session_fields.update(fields)
+
+    def _stats_delta(self) -> dict:
+        """本次已执行信号对会话成交统计的增量（列表达式，原子累加）"""
+        executed = [s for s in self._signals if s.executed]
+        if not executed:
+            return {}
+        sells = [s for s in executed if s.signal == "SELL"]
+        c = SessionModel
+        return {
+            "stats_trades": func.coalesce(c.stats_trades, 0) + len(sells),
+            "stats_wins": func.coalesce(c.stats_wins, 0) + sum(1 for s in sells if (s.profit or 0) > 0),
+            "stats_realized_profit": func.coalesce(c.stats_realized_profit, 0.0)
+                                     + sum(s.profit or 0.0 for s in sells),
+            "stats_total_fees": func.coalesce(c.stats_total_fees, 0.0)
+                                + sum(s.fees or 0.0 for s in executed),
+        }
+
+    async def commit(self) -> None:
+        if not (self._touched or self._signals or self._session_fields):
+            return
+        fields = {**self._session_fields, **self._stats_delta()}
+        async with AsyncSessionLocal() as db:
+            db.add_all(list(self._touched.values()))
+            db.add_all(self._signals)
+            if fields:
+                await db.execute(
+                    update(SessionModel)
+                    .where(SessionModel.id == self.session_id)
+                    .values(**fields, updated_at=datetime.now())
+                )
+            await db.commit()
+        self._touched.clear()
+        self._signals.clear()
+        self._session_fields.clear()
+
+
 class AutoTradeService:
 
     def __init__(self):
@@ -134,10 +344,13 @@ class AutoTradeService:
             execution_mode=exec_mode,
             status="validating",
         )
-        model.stock_codes = cfg.stock_codes
 
         async with AsyncSessionLocal() as session:
             session.add(model)
+            session.add_all(
+                StockModel(session_id=session_id, stock_code=code, seq=i)
+                for i, code in enumerate(dict.fromkeys(cfg.stock_codes))
+            )
             await session.commit()
 
         logger.info(f"[AutoTrader] Session {session_id} created: {cfg.stock_codes}")
@@ -154,10 +367,7 @@ class AutoTradeService:
                 }
                 for code in cfg.stock_codes
             }
-            await self._update_session(session_id, {
-                "strategy_map_json": json.dumps(strategy_map, ensure_ascii=False),
-                "status": "running",
-            })
+            await self._save_strategies(session_id, strategy_map, {"status": "running"})
         else:
             # 异步历史验证（在后台完成）
             asyncio.create_task(self._validate_and_activate(session_id, cfg.stock_codes,
@@ -172,62 +382,50 @@ class AutoTradeService:
         validate_years: float,
         train_ratio: float,
     ):
-        """历史验证 → 选出最优策略 → 切换 running"""
+        """
+        历史验证 → 选出最优策略 → 切换 running
+        每只股票验证完成即落库并切换 running，已验证的股票可先开始交易。
+        只做 validating → running：验证期间被 stop 的会话保持 stopped
+        """
+        summary: Dict[str, dict] = {}
+
+        async def on_result(r: ValidateResult):
+            summary[r.stock_code] = {
+                "best_strategy": r.best_strategy,
+                "confidence": r.confidence,
+                "error": r.error,
+            }
+            await self._save_strategies(session_id, {r.stock_code: _strategy_entry(r)}, {
+                "validate_summary_json": json.dumps(summary, ensure_ascii=False),
+            }, activate=True)
+
         try:
             logger.info(f"[AutoTrader] 开始历史验证 session={session_id} stocks={stock_codes}")
-            results = await self._validate_stocks(stock_codes, validate_years, train_ratio)
-            strategy_map = {}
-            summary = {}
-            for r in results:
-                if r.error:
-                    # 验证失败的股票使用默认策略
-                    strategy_map[r.stock_code] = {
-                        "strategy": "macd", "short_window": 12, "long_window": 26,
-                        "label": "MACD", "confidence": 0.0,
-                        "train_return_pct": 0.0, "test_return_pct": 0.0, "test_alpha_pct": 0.0,
-                    }
-                else:
-                    strategy_map[r.stock_code] = {
-                        "strategy": r.best_strategy,
-                        "short_window": r.__dict__.get("short_window", 0),
-                        "long_window": r.__dict__.get("long_window", 0),
-                        "label": r.best_strategy_label,
-                        "confidence": r.confidence,
-                        "train_return_pct": r.train_return_pct,
-                        "test_return_pct": r.test_return_pct,
-                        "test_alpha_pct": r.test_alpha_pct,
-                    }
-                summary[r.stock_code] = {
-                    "best_strategy": r.best_strategy,
-                    "confidence": r.confidence,
-                    "error": r.error,
-                }
-            await self._update_session(session_id, {
-                "strategy_map_json": json.dumps(strategy_map, ensure_ascii=False),
-                "validate_summary_json": json.dumps(summary, ensure_ascii=False),
-                "status": "running",
-            })
+            await self._validate_stocks(stock_codes, validate_years, train_ratio, on_result=on_result)
+            await self._activate_session(session_id)
             logger.info(f"[AutoTrader] 历史验证完成 session={session_id}，切换为 running")
         except Exception as e:
             logger.error(f"[AutoTrader] 历史验证异常 session={session_id}: {e}")
-            await self._update_session(session_id, {"status": "running"})
+            await self._activate_session(session_id)
 
     async def stop_session(self, session_id: str):
         await self._update_session(session_id, {"status": "stopped"})
         logger.info(f"[AutoTrader] Session {session_id} stopped")
 
     async def get_session(self, session_id: str) -> Optional[AutoTradeSessionOut]:
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             model = await db.get(SessionModel, session_id)
             if not model:
                 return None
-            return self._model_to_out(model)
+            stocks = await _load_stocks(db, [session_id])
+            return self._model_to_out(model, *stocks[session_id])
 
     async def list_sessions(self) -> List[AutoTradeSessionOut]:
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             stmt = select(SessionModel).order_by(SessionModel.created_at.desc())
             rows = (await db.execute(stmt)).scalars().all()
-            return [self._model_to_out(r) for r in rows]
+            stocks = await _load_stocks(db, [r.id for r in rows])
+            return [self._model_to_out(r, *stocks[r.id]) for r in rows]
 
     # ══════════════════════════════════════════════════════
     #  多策略前向测试
@@ -262,7 +460,7 @@ class AutoTradeService:
 
     async def list_forward_tests(self) -> List[dict]:
         """列出所有前向测试组摘要（按创建时间降序）"""
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             stmt = (
                 select(SessionModel)
                 .where(SessionModel.group_id != "")
@@ -290,7 +488,7 @@ class AutoTradeService:
 
     async def get_forward_test_compare(self, group_id: str) -> Optional[ForwardTestGroupOut]:
         """查询某测试组所有会话的绩效，汇总为横向对比视图"""
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             stmt = (
                 select(SessionModel)
                 .where(SessionModel.group_id == group_id)
@@ -305,9 +503,13 @@ class AutoTradeService:
         first_preset = _parse_preset_from_name(first.name)
         group_name = first.name[:-(len(first_preset) + 1)] if first_preset else first.name
 
+        # 全组持仓现价一次批量获取，各会话绩效共用
+        codes = await self._open_position_codes([r.id for r in rows])
+        price_map = await self._fetch_price_map(codes)
+
         items: List[SessionCompareItem] = []
         for row in rows:
-            perf = await self.get_performance(row.id)
+            perf = await self.get_performance(row.id, price_map=price_map)
             preset_name = _parse_preset_from_name(row.name)
             preset_display = STRATEGY_PRESETS.get(preset_name, {}).get("display_name", preset_name)
             recent = perf.recent_signals[:5] if perf and perf.recent_signals else []
@@ -350,15 +552,39 @@ class AutoTradeService:
         stock_codes: List[str],
         validate_years: float,
         train_ratio: float,
+        on_result: Optional[Callable[[ValidateResult], Awaitable[None]]] = None,
     ) -> List[ValidateResult]:
-        results = []
-        for code in stock_codes:
-            r = await self._validate_one(code, validate_years, train_ratio)
-            results.append(r)
-        return results
+        """
+        并发验证：K 线限流并发获取，walk-forward 在计算线程池执行。
+        每完成一只即回调 on_result（按完成顺序），返回值按 stock_codes 顺序。
+        """
+        limiter = AsyncRateLimiter(
+            settings.MARKET_FETCH_RATE_PER_SEC, concurrency=settings.MARKET_FETCH_CONCURRENCY,
+        )
+        tasks = [
+            asyncio.ensure_future(self._validate_one(code, validate_years, train_ratio, limiter))
+            for code in stock_codes
+        ]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                r = await fut
+                if on_result is not None:
+                    try:
+                        await on_result(r)
+                    except Exception as e:
+                        logger.warning(f"[AutoTrader] 验证结果回写失败 {r.stock_code}: {e}")
+        finally:
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
+        return [t.result() for t in tasks]
 
     async def _validate_one(
-        self, stock_code: str, validate_years: float, train_ratio: float
+        self,
+        stock_code: str,
+        validate_years: float,
+        train_ratio: float,
+        limiter: Optional[AsyncRateLimiter] = None,
     ) -> ValidateResult:
         """
         对单只股票做历史验证：
@@ -366,14 +592,18 @@ class AutoTradeService:
         - 数据不足时自动取全量
         - 跑 Walk-Forward (80/20)，返回最优策略
         """
+        limiter = limiter or AsyncRateLimiter(
+            settings.MARKET_FETCH_RATE_PER_SEC, concurrency=settings.MARKET_FETCH_CONCURRENCY,
+        )
         try:
             # 目标 datalen：每年约 250 交易日
             target_bars = int(validate_years * 250) + 100
             kline = []
             for datalen in [target_bars, min(target_bars, 1500), 800, 400]:
-                kline = await self.market_adapter.get_kline_data(
-                    stock_code, scale=240, datalen=datalen
-                )
+                async with limiter:
+                    kline = await self.market_adapter.get_kline_data(
+                        stock_code, scale=240, datalen=datalen
+                    )
                 if kline and len(kline) >= 60:
                     break
 
@@ -400,7 +630,15 @@ class AutoTradeService:
                 train_ratio=train_ratio,
                 initial_capital=1_000_000.0,
             )
-            result = self.strategy_test_svc.run_test_with_kline(params, kline, stock_code)
+            # 同一 K 线上的训练/测试回测经结果存储复用（重复验证同一股票不再重算）
+            backtests = self.strategy_test_svc.backtest_service
+            batch = await backtests.open_batch({stock_code: kline})
+            try:
+                result = await run_compute(
+                    self.strategy_test_svc.run_test_with_kline, params, kline, stock_code, batch
+                )
+            finally:
+                await backtests.close_batch(batch)
 
             if not result or not result.items:
                 return ValidateResult(
@@ -460,8 +698,8 @@ class AutoTradeService:
         """
         处理当日信号：
         1. 加载会话策略 map
-        2. 逐股票生成当日信号
-        3. 执行模拟买卖（独立账户）
+        2. 限流并发预取全部 K 线，计算线程池并行生成当日信号
+        3. 按 stock_codes 顺序逐只执行模拟买卖（独立账户，资金占用顺序与串行一致）
         4. 写入 auto_trade_signals
         5. 若今日 >= cycle_end_date → 触发策略轮换
         """
@@ -478,26 +716,18 @@ class AutoTradeService:
                 return []
             model.last_run_date = today
             await db.commit()
+            cfg = _SessionConfig(model, *(await _load_stocks(db, [session_id]))[session_id])
 
         logger.info(f"[AutoTrader] 处理日信号 session={session_id} date={today}")
 
-        strategy_map = json.loads((await self._get_field(session_id, "strategy_map_json")) or "{}")
-        stock_codes = json.loads((await self._get_field(session_id, "stock_codes_json")) or "[]")
-        available_cash = await self._get_field(session_id, "available_cash")
-        initial_capital = await self._get_field(session_id, "initial_capital")
-        max_position_pct = await self._get_field(session_id, "max_position_pct")
-        stop_loss_pct = float((await self._get_field(session_id, "stop_loss_pct")) or 0.06)
-        take_profit_pct = float((await self._get_field(session_id, "take_profit_pct")) or 0.05)
-        max_hold_days = int((await self._get_field(session_id, "max_hold_days")) or 15)
-        min_test_return_pct = float((await self._get_field(session_id, "min_test_return_pct")) or -1.0)
-        mrf = await self._get_field(session_id, "market_regime_filter")
-        market_regime_filter = bool(mrf) if mrf is not None else True
-        data_scale = int((await self._get_field(session_id, "data_scale")) or 240)
-        execution_mode = str((await self._get_field(session_id, "execution_mode")) or "sim").lower()
+        strategy_map = cfg.strategy_map
+        stock_codes = cfg.stock_codes
+        initial_capital = cfg.initial_capital
+        execution_mode = cfg.execution_mode
 
         signals_out: List[SignalOut] = []
-        cash = float(available_cash or initial_capital or 1_000_000)
-        max_pct = float(max_position_pct or 0.3)
+        cash = float(cfg.available_cash or initial_capital or 1_000_000)
+        max_pct = float(cfg.max_position_pct or 0.3)
         if execution_mode == "live":
             try:
                 acc = await self.trade_service.get_account_info()
@@ -507,48 +737,53 @@ class AutoTradeService:
 
         # 市场环境过滤：一次性检查，所有股票共用
         market_ok = True
-        if market_regime_filter:
+        if cfg.market_regime_filter:
             market_ok = await self._check_market_regime()
 
-        for code in stock_codes:
-            info = strategy_map.get(code, {})
-            if not info:
-                continue
-            # 每只股票之间加小延迟，避免行情接口限速
-            if signals_out:
-                await asyncio.sleep(0.5)
-            sig_out = await self._process_stock_signal(
-                session_id, code, info, today, cash,
-                float(initial_capital or 1_000_000), max_pct,
-                stop_loss_pct=stop_loss_pct,
-                take_profit_pct=take_profit_pct,
-                max_hold_days=max_hold_days,
-                min_test_return_pct=min_test_return_pct,
-                market_ok=market_ok,
-                execution_mode=execution_mode,
-            )
-            if sig_out:
-                signals_out.append(sig_out)
-                if sig_out.signal == "BUY" and sig_out.executed:
-                    cash -= sig_out.amount + sig_out.fees
-                elif sig_out.signal == "SELL" and sig_out.executed:
-                    cash += sig_out.amount - sig_out.fees
+        # 实盘：运行开始时一次性同步本会话股票的实盘持仓
+        active = [(c, strategy_map[c]) for c in stock_codes if strategy_map.get(c)]
+        live_codes = [c for c, _ in active]
+        if execution_mode == "live" and live_codes:
+            await self._sync_position_from_trade_account(session_id, stock_codes=live_codes)
+        work = await _RunWork.load(session_id)
 
-        if execution_mode == "live":
-            try:
-                acc = await self.trade_service.get_account_info()
-                cash = float(acc.available_cash)
-            except Exception as e:
-                logger.warning(f"[AutoTrader] 刷新实盘可用资金失败，保留估算值: {e}")
+        # 行情与信号计算彼此独立，可并行；资金/持仓结算必须按固定顺序串行
+        kline_map = await self._prefetch_klines(live_codes)
+        signal_map = await self._compute_signals(active, kline_map)
 
-        # 更新 available_cash & last_run_date（日K用日期防重）
-        await self._update_session(session_id, {
-            "available_cash": max(cash, 0.0),
-            "last_run_date": today,
-        })
+        try:
+            for code, info in active:
+                sig_out = await self._process_stock_signal(
+                    work, code, info, kline_map.get(code), signal_map.get(code),
+                    today, cash,
+                    float(initial_capital or 1_000_000), max_pct,
+                    stop_loss_pct=cfg.stop_loss_pct,
+                    take_profit_pct=cfg.take_profit_pct,
+                    max_hold_days=cfg.max_hold_days,
+                    min_test_return_pct=cfg.min_test_return_pct,
+                    market_ok=market_ok,
+                    execution_mode=execution_mode,
+                )
+                if sig_out:
+                    signals_out.append(sig_out)
+                    if sig_out.signal == "BUY" and sig_out.executed:
+                        cash -= sig_out.amount + sig_out.fees
+                    elif sig_out.signal == "SELL" and sig_out.executed:
+                        cash += sig_out.amount - sig_out.fees
+
+            if execution_mode == "live":
+                try:
+                    acc = await self.trade_service.get_account_info()
+                    cash = float(acc.available_cash)
+                except Exception as e:
+                    logger.warning(f"[AutoTrader] 刷新实盘可用资金失败，保留估算值: {e}")
+        finally:
+            # 更新 available_cash & last_run_date（日K用日期防重），与持仓/信号同一事务落库
+            work.set_session(available_cash=max(cash, 0.0), last_run_date=today)
+            await work.commit()
 
         # 检查是否到达周期结束日
-        cycle_end = await self._get_field(session_id, "cycle_end_date")
+        cycle_end = cfg.cycle_end_date
         if cycle_end and today >= cycle_end:
             logger.info(f"[AutoTrader] 周期结束 session={session_id}，触发策略轮换")
             asyncio.create_task(self._rotate_strategy(session_id))
@@ -581,11 +816,59 @@ class AutoTradeService:
             logger.warning(f"[AutoTrader] 市场环境检测失败: {e}，默认放行")
             return True
 
+    async def _prefetch_klines(self, codes: List[str], datalen: int = 200) -> Dict[str, List[dict]]:
+        """限流并发获取日 K；不足 30 根时 1 秒后重试一次"""
+        limiter = AsyncRateLimiter(
+            settings.MARKET_FETCH_RATE_PER_SEC, concurrency=settings.MARKET_FETCH_CONCURRENCY,
+        )
+
+        async def fetch(code: str) -> List[dict]:
+            kline: List[dict] = []
+            for attempt in range(2):
+                if attempt:
+                    await asyncio.sleep(1.0)
+                try:
+                    async with limiter:
+                        kline = await self.market_adapter.get_kline_data(code, scale=240, datalen=datalen)
+                except Exception as e:
+                    logger.warning(f"[AutoTrader] {code} K线获取异常: {e}")
+                    kline = []
+                if kline and len(kline) >= 30:
+                    break
+            return kline or []
+
+        results = await asyncio.gather(*(fetch(c) for c in codes))
+        return dict(zip(codes, results))
+
+    async def _compute_signals(
+        self, active: List[Tuple[str, dict]], kline_map: Dict[str, List[dict]],
+    ) -> Dict[str, Optional[str]]:
+        """在计算线程池中并行生成各股票当前信号；失败的股票为 None"""
+
+        async def one(code: str, info: dict) -> Optional[str]:
+            kline = kline_map.get(code)
+            if not kline or len(kline) < 30:
+                return None
+            try:
+                return await run_compute(
+                    self.backtest_svc.get_current_signal,
+                    info.get("strategy", "macd"), kline,
+                    info.get("short_window", 0), info.get("long_window", 0),
+                )
+            except Exception as e:
+                logger.error(f"[AutoTrader] {code} 信号计算失败: {e}")
+                return None
+
+        results = await asyncio.gather(*(one(c, i) for c, i in active))
+        return {c: sig for (c, _), sig in zip(active, results)}
+
     async def _process_stock_signal(
         self,
-        session_id: str,
+        work: _RunWork,
         stock_code: str,
         strategy_info: dict,
+        kline: Optional[List[dict]],
+        signal: Optional[str],
         today: str,
         available_cash: float,
         initial_capital: float,
@@ -597,29 +880,20 @@ class AutoTradeService:
         market_ok: bool = True,
         execution_mode: str = "sim",
     ) -> Optional[SignalOut]:
-        """对单只股票生成信号并执行模拟交易"""
+        """按预取的 K 线与信号执行模拟交易（持仓/信号写入 work，由调用方统一提交）"""
+        session_id = work.session_id
         try:
             strategy = strategy_info.get("strategy", "macd")
-            short_w = strategy_info.get("short_window", 0)
-            long_w = strategy_info.get("long_window", 0)
             label = strategy_info.get("label", strategy)
 
-            # 获取最新日K（失败重试1次）
-            kline = await self.market_adapter.get_kline_data(stock_code, scale=240, datalen=200)
-            if not kline or len(kline) < 30:
-                await asyncio.sleep(1.0)
-                kline = await self.market_adapter.get_kline_data(stock_code, scale=240, datalen=200)
-            if not kline or len(kline) < 30:
-                logger.warning(f"[AutoTrader] {stock_code} 行情获取失败，跳过")
+            if not kline or len(kline) < 30 or signal is None:
+                logger.warning(f"[AutoTrader] {stock_code} 行情获取或信号计算失败，跳过")
                 return None
 
             latest_price = kline[-1]["close"]
-            signal = self.backtest_svc.get_current_signal(strategy, kline, short_w, long_w)
 
-            # 查当前持仓
-            if execution_mode == "live":
-                await self._sync_position_from_trade_account(session_id, stock_code=stock_code)
-            position = await self._get_position(session_id, stock_code)
+            # 查当前持仓（实盘持仓已在运行开始时同步）
+            position = work.position(stock_code)
             holding_qty = position.quantity if position else 0
 
             qty = 0
@@ -689,17 +963,14 @@ class AutoTradeService:
                                 qty = fill["qty"]
                                 amount = round(latest_price * qty, 2)
                                 fees = fill["fees"]
-                                await self._update_position(
-                                    session_id, stock_code, "BUY", latest_price, qty, fees, today
-                                )
+                                work.fill(stock_code, "BUY", latest_price, qty, fees, today)
                                 executed = True
                                 notes = f"[实盘] 买入 {qty} 股 @{latest_price}"
                             else:
                                 signal = "HOLD"
                                 notes = "实盘下单失败，已跳过"
                         else:
-                            await self._update_position(session_id, stock_code, "BUY",
-                                                         latest_price, qty, fees, today)
+                            work.fill(stock_code, "BUY", latest_price, qty, fees, today)
                             executed = True
                             notes = f"买入 {qty} 股 @{latest_price}"
                     else:
@@ -723,16 +994,14 @@ class AutoTradeService:
                         amount = round(latest_price * qty, 2)
                         fees = fill["fees"]
                         profit = round((latest_price - avg_cost) * qty - fees, 2)
-                        await self._update_position(session_id, stock_code, "SELL",
-                                                     latest_price, qty, fees)
+                        work.fill(stock_code, "SELL", latest_price, qty, fees)
                         executed = True
                         notes = f"[实盘] 卖出 {qty} 股 @{latest_price}，盈亏¥{profit:.1f}"
                     else:
                         signal = "HOLD"
                         notes = "实盘卖出失败，已跳过"
                 else:
-                    await self._update_position(session_id, stock_code, "SELL",
-                                                 latest_price, qty, fees)
+                    work.fill(stock_code, "SELL", latest_price, qty, fees)
                     executed = True
                     notes = f"卖出 {qty} 股 @{latest_price}，盈亏¥{profit:.1f}"
             else:
@@ -755,9 +1024,7 @@ class AutoTradeService:
                 executed=executed,
                 notes=notes,
             )
-            async with AsyncSessionLocal() as db:
-                db.add(sig_model)
-                await db.commit()
+            work.add_signal(sig_model)
 
             logger.info(f"[AutoTrader] {stock_code} {signal} executed={executed} {notes}")
 
@@ -799,42 +1066,23 @@ class AutoTradeService:
         """
         try:
             logger.info(f"[AutoTrader] 策略轮换 session={session_id}")
-            stock_codes = json.loads((await self._get_field(session_id, "stock_codes_json")) or "[]")
-            validate_years = float((await self._get_field(session_id, "validate_years")) or 5.0)
-            train_ratio = float((await self._get_field(session_id, "train_ratio")) or 0.8)
-            cycle_days = int((await self._get_field(session_id, "cycle_days")) or 30)
-            current_cycle = int((await self._get_field(session_id, "current_cycle")) or 1)
-
-            results = await self._validate_stocks(stock_codes, validate_years, train_ratio)
-
-            strategy_map = {}
-            for r in results:
-                sw = r.__dict__.get("short_window", 0)
-                lw = r.__dict__.get("long_window", 0)
-                if r.error:
-                    # 保留原策略，不替换
-                    orig = json.loads((await self._get_field(session_id, "strategy_map_json")) or "{}")
-                    strategy_map[r.stock_code] = orig.get(r.stock_code, {
-                        "strategy": "macd", "short_window": 12, "long_window": 26,
-                        "label": "MACD", "confidence": 0.0,
-                        "train_return_pct": 0.0, "test_return_pct": 0.0, "test_alpha_pct": 0.0,
-                    })
-                else:
-                    strategy_map[r.stock_code] = {
-                        "strategy": r.best_strategy,
-                        "short_window": sw,
-                        "long_window": lw,
-                        "label": r.best_strategy_label,
-                        "confidence": r.confidence,
-                        "train_return_pct": r.train_return_pct,
-                        "test_return_pct": r.test_return_pct,
-                        "test_alpha_pct": r.test_alpha_pct,
-                    }
+            cfg = await _SessionConfig.load(session_id)
+            if cfg is None:
+                return
+            current_cycle = cfg.current_cycle
+
+            # 逐只完成即按行回写（验证失败保留原策略），轮换期间其余股票继续沿用旧策略
+            async def on_result(r: ValidateResult):
+                entry = _strategy_entry(r, fallback=cfg.strategy_map.get(r.stock_code))
+                await self._save_strategies(session_id, {r.stock_code: entry})
+
+            await self._validate_stocks(
+                cfg.stock_codes, cfg.validate_years, cfg.train_ratio, on_result=on_result
+            )
 
             now = datetime.now()
-            new_cycle_end = now + timedelta(days=cycle_days)
+            new_cycle_end = now + timedelta(days=cfg.cycle_days)
             await self._update_session(session_id, {
-                "strategy_map_json": json.dumps(strategy_map, ensure_ascii=False),
                 "current_cycle": current_cycle + 1,
                 "cycle_start_date": now.strftime("%Y-%m-%d"),
                 "cycle_end_date": new_cycle_end.strftime("%Y-%m-%d"),
@@ -854,7 +1102,7 @@ class AutoTradeService:
         date: Optional[str] = None,
         limit: int = 100,
     ) -> List[SignalOut]:
-        async with AsyncSessionLocal() as db:
+        async with AsyncReadSessionLocal() as db:
             stmt = (
                 select(SignalModel)
                 .where(SignalModel.session_id == session_id)
@@ -866,8 +1114,11 @@ class AutoTradeService:
             rows = (await db.execute(stmt)).scalars().all()
             return [self._signal_to_out(r) for r in rows]
 
-    async def get_positions(self, session_id: str) -> List[PositionOut]:
-        async with AsyncSessionLocal() as db:
+    async def get_positions(
+        self, session_id: str, price_map: Optional[Dict[str, float]] = None,
+    ) -> List[PositionOut]:
+        """持仓估值；price_map 为空时对本会话全部持仓一次批量取现价"""
+        async with AsyncReadSessionLocal() as db:
             stmt = (
                 select(PositionModel)
                 .where(PositionModel.session_id == session_id)
@@ -875,16 +1126,17 @@ class AutoTradeService:
             )
             rows = (await db.execute(stmt)).scalars().all()
 
+        if price_map is None:
+            price_map = await self._fetch_price_map([pos.stock_code for pos in rows])
+        return self._positions_out(session_id, rows, price_map)
+
+    @staticmethod
+    def _positions_out(
+        session_id: str, rows: List[PositionModel], price_map: Dict[str, float],
+    ) -> List[PositionOut]:
         result = []
         for pos in rows:
-            # 获取实时价格
-            current_price = pos.avg_cost
-            try:
-                stocks = await self.market_adapter.get_realtime_data([pos.stock_code])
-                if stocks:
-                    current_price = stocks[0].get("price", pos.avg_cost)
-            except Exception:
-                pass
+            current_price = price_map.get(pos.stock_code) or pos.avg_cost
             market_value = round(current_price * pos.quantity, 2)
             cost_total = round(pos.avg_cost * pos.quantity, 2)
             unrealized = round(market_value - cost_total, 2)
@@ -913,41 +1165,81 @@ class AutoTradeService:
             ))
         return result
 
-    async def check_intraday_stops(self, session_id: str) -> List[SignalOut]:
+    async def _open_position_codes(self, session_ids: List[str]) -> List[str]:
+        """多个会话的持仓代码并集"""
+        if not session_ids:
+            return []
+        async with AsyncReadSessionLocal() as db:
+            stmt = (
+                select(PositionModel.stock_code)
+                .where(PositionModel.session_id.in_(session_ids))
+                .where(PositionModel.quantity > 0)
+                .distinct()
+            )
+            return list((await db.execute(stmt)).scalars().all())
+
+    def _quote_key(self, code: str) -> str:
+        """跨市场统一匹配键（行情返回的 code 可能不带 sh/sz/hk 前缀）"""
+        n = self.market_adapter._normalize_code(code)
+        if n.startswith(("sh", "sz", "hk")):
+            return n[2:]
+        if n.startswith("gb_"):
+            return n[3:].upper()
+        return n.upper()
+
+    async def _fetch_price_map(self, codes: List[str]) -> Dict[str, float]:
+        """一次行情请求批量取现价，返回 {原始代码: 价格}；失败或无价的代码不在结果中"""
+        codes = list(dict.fromkeys(c for c in codes if c))
+        if not codes:
+            return {}
+        try:
+            quotes = await self.market_adapter.get_realtime_data(codes)
+        except Exception as e:
+            logger.warning(f"[AutoTrader] 批量实时报价失败 {len(codes)} 只: {e}")
+            return {}
+        by_key = {}
+        for q in quotes:
+            price = q.get("price") or 0.0
+            if price > 0:
+                key = self._quote_key(str(q.get("code", "")))
+                by_key[key] = float(price)
+                get_quote_cache().put(key, price)
+        out = {}
+        for c in codes:
+            price = by_key.get(self._quote_key(c))
+            if price:
+                out[c] = price
+        return out
+
+    async def check_intraday_stops(
+        self, session_id: str, price_map: Optional[Dict[str, float]] = None,
+    ) -> List[SignalOut]:
         """
         日内实时止损/止盈/超期检查（不依赖K线，使用实时报价）。
         只产生 SELL 信号，BUY 信号仍在收盘后由 process_daily 处理。
+        price_map 由调度器跨会话一次取好时直接使用，否则自行批量取价。
         """
-        async with AsyncSessionLocal() as db:
-            model = await db.get(SessionModel, session_id)
-            if not model or model.status != "running":
-                return []
-            execution_mode = (getattr(model, "execution_mode", "sim") or "sim").lower()
-
-        stop_loss_pct = float((await self._get_field(session_id, "stop_loss_pct")) or 0.06)
-        take_profit_pct = float((await self._get_field(session_id, "take_profit_pct")) or 0.05)
-        max_hold_days = int((await self._get_field(session_id, "max_hold_days")) or 15)
-        available_cash = float((await self._get_field(session_id, "available_cash")) or 0)
+        cfg = await _SessionConfig.load(session_id)
+        if cfg is None or cfg.status != "running":
+            return []
+        execution_mode = cfg.execution_mode
+        stop_loss_pct = cfg.stop_loss_pct
+        take_profit_pct = cfg.take_profit_pct
+        max_hold_days = cfg.max_hold_days
+        available_cash = float(cfg.available_cash or 0)
 
         # 获取所有持仓
-        async with AsyncSessionLocal() as db:
-            stmt = (
-                select(PositionModel)
-                .where(PositionModel.session_id == session_id)
-                .where(PositionModel.quantity > 0)
-            )
-            positions = (await db.execute(stmt)).scalars().all()
+        work = await _RunWork.load(session_id)
+        positions = work.open_positions()
 
         if not positions:
             return []
 
         # 批量获取实时报价
-        codes = [p.stock_code for p in positions]
-        try:
-            realtime = await self.market_adapter.get_realtime_data(codes)
-            price_map = {r["code"]: r.get("price", 0.0) for r in realtime if r.get("price")}
-        except Exception as e:
-            logger.warning(f"[AutoTrader] 日内实时报价失败 session={session_id}: {e}")
+        if price_map is None:
+            price_map = await self._fetch_price_map([p.stock_code for p in positions])
+        if not price_map:
+            logger.warning(f"[AutoTrader] 日内实时报价为空 session={session_id}")
             return []
 
         today = datetime.now().strftime("%Y-%m-%d")
@@ -955,93 +1247,110 @@ class AutoTradeService:
         signals_out: List[SignalOut] = []
         cash = available_cash
 
-        for pos in positions:
-            current_price = price_map.get(pos.stock_code, 0.0)
-            if not current_price:
-                continue
-
-            sell_reason = ""
-            loss_pct = (current_price - pos.avg_cost) / pos.avg_cost
-
-            if loss_pct <= -stop_loss_pct:
-                sell_reason = f"[日内止损] 亏损{loss_pct*100:.1f}%，触发{stop_loss_pct*100:.0f}%阈值"
-            elif loss_pct >= take_profit_pct:
-                sell_reason = f"[日内止盈] 盈利{loss_pct*100:.1f}%，触发{take_profit_pct*100:.0f}%阈值"
-            elif pos.entry_date:
-                hold_days = (
-                    datetime.strptime(today, "%Y-%m-%d") -
-                    datetime.strptime(pos.entry_date[:10], "%Y-%m-%d")
-                ).days
-                if hold_days >= max_hold_days:
-                    sell_reason = f"[日内超期] 已持{hold_days}天，上限{max_hold_days}天"
-
-            if not sell_reason:
-                continue
-
-            qty = pos.quantity
-            amount = round(current_price * qty, 2)
-            fees = _calc_fees("SELL", current_price, qty)
-            profit = round((current_price - pos.avg_cost) * qty - fees, 2)
+        try:
+            for pos in positions:
+                current_price = price_map.get(pos.stock_code, 0.0)
+                if not current_price:
+                    continue
 
-            if execution_mode == "live":
-                fill = await self._execute_live_order(pos.stock_code, "SELL", qty)
-                if not fill:
-                    logger.warning(f"[AutoTrader] 日内实盘卖出失败 {pos.stock_code}")
+                sell_reason = ""
+                loss_pct = (current_price - pos.avg_cost) / pos.avg_cost
+
+                if loss_pct <= -stop_loss_pct:
+                    sell_reason = f"[日内止损] 亏损{loss_pct*100:.1f}%，触发{stop_loss_pct*100:.0f}%阈值"
+                elif loss_pct >= take_profit_pct:
+                    sell_reason = f"[日内止盈] 盈利{loss_pct*100:.1f}%，触发{take_profit_pct*100:.0f}%阈值"
+                elif pos.entry_date:
+                    hold_days = (
+                        datetime.strptime(today, "%Y-%m-%d") -
+                        datetime.strptime(pos.entry_date[:10], "%Y-%m-%d")
+                    ).days
+                    if hold_days >= max_hold_days:
+                        sell_reason = f"[日内超期] 已持{hold_days}天，上限{max_hold_days}天"
+
+                if not sell_reason:
                     continue
-                current_price = fill["price"]
-                qty = fill["qty"]
+
+                qty = pos.quantity
                 amount = round(current_price * qty, 2)
-                fees = fill["fees"]
+                fees = _calc_fees("SELL", current_price, qty)
                 profit = round((current_price - pos.avg_cost) * qty - fees, 2)
-                await self._update_position(session_id, pos.stock_code, "SELL", current_price, qty, fees)
-                cash += amount - fees
-            else:
-                await self._update_position(session_id, pos.stock_code, "SELL", current_price, qty, fees)
-                cash += amount - fees
 
-            sig_model = SignalModel(
-                id=str(uuid.uuid4()),
-                session_id=session_id,
-                date=now_str,
-                stock_code=pos.stock_code,
-                strategy="intraday_stop",
-                strategy_label="日内止损/止盈",
-                signal="SELL",
-                price=current_price,
-                quantity=qty,
-                amount=amount,
-                fees=fees,
-                profit=profit,
-                executed=True,
-                notes=(f"[实盘]{sell_reason}" if execution_mode == "live" else sell_reason),
-            )
-            async with AsyncSessionLocal() as db:
-                db.add(sig_model)
-                await db.commit()
-
-            logger.info(f"[AutoTrader] 日内平仓 {pos.stock_code} {sell_reason} profit={profit:.1f}")
-            signals_out.append(SignalOut(
-                id=sig_model.id, session_id=session_id, date=now_str,
-                stock_code=pos.stock_code, strategy="intraday_stop",
-                strategy_label="日内止损/止盈", signal="SELL",
-                price=current_price, quantity=qty, amount=amount,
-                fees=fees, profit=profit, executed=True,
-                notes=(f"[实盘]{sell_reason}" if execution_mode == "live" else sell_reason),
-            ))
-
-        if signals_out:
-            await self._update_session(session_id, {"available_cash": max(cash, 0.0)})
+                if execution_mode == "live":
+                    fill = await self._execute_live_order(pos.stock_code, "SELL", qty)
+                    if not fill:
+                        logger.warning(f"[AutoTrader] 日内实盘卖出失败 {pos.stock_code}")
+                        continue
+                    current_price = fill["price"]
+                    qty = fill["qty"]
+                    amount = round(current_price * qty, 2)
+                    fees = fill["fees"]
+                    profit = round((current_price - pos.avg_cost) * qty - fees, 2)
+                    work.fill(pos.stock_code, "SELL", current_price, qty, fees)
+                    cash += amount - fees
+                else:
+                    work.fill(pos.stock_code, "SELL", current_price, qty, fees)
+                    cash += amount - fees
+
+                sig_model = SignalModel(
+                    id=str(uuid.uuid4()),
+                    session_id=session_id,
+                    date=now_str,
+                    stock_code=pos.stock_code,
+                    strategy="intraday_stop",
+                    strategy_label="日内止损/止盈",
+                    signal="SELL",
+                    price=current_price,
+                    quantity=qty,
+                    amount=amount,
+                    fees=fees,
+                    profit=profit,
+                    executed=True,
+                    notes=(f"[实盘]{sell_reason}" if execution_mode == "live" else sell_reason),
+                )
+                work.add_signal(sig_model)
+
+                logger.info(f"[AutoTrader] 日内平仓 {pos.stock_code} {sell_reason} profit={profit:.1f}")
+                signals_out.append(SignalOut(
+                    id=sig_model.id, session_id=session_id, date=now_str,
+                    stock_code=pos.stock_code, strategy="intraday_stop",
+                    strategy_label="日内止损/止盈", signal="SELL",
+                    price=current_price, quantity=qty, amount=amount,
+                    fees=fees, profit=profit, executed=True,
+                    notes=(f"[实盘]{sell_reason}" if execution_mode == "live" else sell_reason),
+                ))
+        finally:
+            # 已成交（含实盘）的平仓与资金变动一次事务落库
+            if signals_out:
+                work.set_session(available_cash=max(cash, 0.0))
+            await work.commit()
 
         return signals_out
 
-    async def get_performance(self, session_id: str) -> Optional[PerformanceOut]:
-        async with AsyncSessionLocal() as db:
+    async def get_performance(
+        self, session_id: str, price_map: Optional[Dict[str, float]] = None,
+    ) -> Optional[PerformanceOut]:
+        """成交统计直接读会话上的累计列；持仓与最近信号各一次有界查询"""
+        async with AsyncReadSessionLocal() as db:
             model = await db.get(SessionModel, session_id)
             if not model:
                 return None
+            pos_rows = (await db.execute(
+                select(PositionModel)
+                .where(PositionModel.session_id == session_id)
+                .where(PositionModel.quantity > 0)
+            )).scalars().all()
+            sig_rows = (await db.execute(
+                select(SignalModel)
+                .where(SignalModel.session_id == session_id)
+                .order_by(SignalModel.created_at.desc())
+                .limit(20)
+            )).scalars().all()
 
-        positions = await self.get_positions(session_id)
-        recent_signals = await self.get_signals(session_id, limit=20)
+        if price_map is None:
+            price_map = await self._fetch_price_map([p.stock_code for p in pos_rows])
+        positions = self._positions_out(session_id, pos_rows, price_map)
+        recent_signals = [self._signal_to_out(r) for r in sig_rows]
 
         market_value = sum(p.market_value for p in positions)
         total_asset = float(model.available_cash) + market_value
@@ -1049,20 +1358,11 @@ class AutoTradeService:
         total_return_pct = round(total_return / float(model.initial_capital) * 100, 2)
 
         # 统计交易信息
-        async with AsyncSessionLocal() as db:
-            stmt = (
-                select(SignalModel)
-                .where(SignalModel.session_id == session_id)
-                .where(SignalModel.executed == True)
-            )
-            executed_sigs = (await db.execute(stmt)).scalars().all()
-
-        sell_sigs = [s for s in executed_sigs if s.signal == "SELL"]
-        win_trades = sum(1 for s in sell_sigs if s.profit > 0)
-        total_trades = len(sell_sigs)
+        total_trades = int(model.stats_trades or 0)
+        win_trades = int(model.stats_wins or 0)
         win_rate = round(win_trades / total_trades * 100 if total_trades > 0 else 0.0, 2)
-        total_fees = round(sum(s.fees for s in executed_sigs), 2)
-        realized_profit = round(sum(s.profit for s in sell_sigs), 2)
+        total_fees = round(float(model.stats_total_fees or 0.0), 2)
+        realized_profit = round(float(model.stats_realized_profit or 0.0), 2)
         unrealized_profit = round(sum(p.unrealized_profit for p in positions), 2)
 
         # 剩余天数
@@ -1101,15 +1401,6 @@ class AutoTradeService:
     #  内部工具
     # ══════════════════════════════════════════════════════
 
-    async def _get_position(self, session_id: str, stock_code: str) -> Optional[PositionModel]:
-        async with AsyncSessionLocal() as db:
-            stmt = (
-                select(PositionModel)
-                .where(PositionModel.session_id == session_id)
-                .where(PositionModel.stock_code == stock_code)
-            )
-            return (await db.execute(stmt)).scalar_one_or_none()
-
     async def _execute_live_order(
         self, stock_code: str, side: str, qty: int
     ) -> Optional[Dict[str, float]]:
@@ -1155,10 +1446,11 @@ class AutoTradeService:
             return float(current or 0.0)
 
     async def _sync_position_from_trade_account(
-        self, session_id: str, stock_code: Optional[str] = None
+        self, session_id: str, stock_codes: Optional[List[str]] = None
     ) -> None:
         """
         将实盘账户持仓同步到 auto_trade_positions（仅用于 live 会话读取风控）。
+        stock_codes 为空时同步全部持仓。
         """
         try:
             live_positions = await self.trade_service.get_positions()
@@ -1166,7 +1458,7 @@ class AutoTradeService:
             logger.warning(f"[AutoTrader] sync live positions failed: {e}")
             return
 
-        target_codes = {stock_code} if stock_code else None
+        target_codes = set(stock_codes) if stock_codes else None
         live_map = {
             p.stock_code: p for p in live_positions
             if (target_codes is None or p.stock_code in target_codes)
@@ -1206,56 +1498,6 @@ class AutoTradeService:
 
             await db.commit()
 
-    async def _update_position(
-        self,
-        session_id: str,
-        stock_code: str,
-        action: str,
-        price: float,
-        qty: int,
-        fees: float,
-        trade_date: str = "",
-    ):
-        async with AsyncSessionLocal() as db:
-            stmt = (
-                select(PositionModel)
-                .where(PositionModel.session_id == session_id)
-                .where(PositionModel.stock_code == stock_code)
-            )
-            pos = (await db.execute(stmt)).scalar_one_or_none()
-
-            if action == "BUY":
-                cost_with_fee = (price * qty + fees) / qty
-                if pos:
-                    old_total = pos.avg_cost * pos.quantity
-                    new_total = cost_with_fee * qty
-                    pos.quantity += qty
-                    pos.avg_cost = (old_total + new_total) / pos.quantity
-                    pos.total_fees = (pos.total_fees or 0) + fees
-                    if not pos.entry_date and trade_date:
-                        pos.entry_date = trade_date
-                else:
-                    pos = PositionModel(
-                        id=str(uuid.uuid4()),
-                        session_id=session_id,
-                        stock_code=stock_code,
-                        quantity=qty,
-                        avg_cost=cost_with_fee,
-                        entry_date=trade_date,
-                        total_fees=fees,
-                        realized_profit=0.0,
-                    )
-                    db.add(pos)
-            elif action == "SELL" and pos:
-                sell_revenue = price * qty - fees
-                cost_basis = pos.avg_cost * qty
-                realized = sell_revenue - cost_basis
-                pos.quantity -= qty
-                pos.total_fees = (pos.total_fees or 0) + fees
-                pos.realized_profit = (pos.realized_profit or 0) + realized
-
-            await db.commit()
-
     async def _update_session(self, session_id: str, fields: dict):
         async with AsyncSessionLocal() as db:
             model = await db.get(SessionModel, session_id)
@@ -1265,18 +1507,71 @@ class AutoTradeService:
                 model.updated_at = datetime.now()
                 await db.commit()
 
-    async def _get_field(self, session_id: str, field: str):
+    @staticmethod
+    def _activate_stmt(session_id: str):
+        """validating → running；已 stop 的会话不受影响"""
+        return (
+            update(SessionModel)
+            .where(SessionModel.id == session_id, SessionModel.status == "validating")
+            .values(status="running", updated_at=datetime.now())
+        )
+
+    async def _activate_session(self, session_id: str):
         async with AsyncSessionLocal() as db:
+            await db.execute(self._activate_stmt(session_id))
+            await db.commit()
+
+    async def _save_strategies(
+        self, session_id: str, entries: Dict[str, dict], session_fields: Optional[dict] = None,
+        activate: bool = False,
+    ):
+        """
+        按行写入策略分配（只动 entries 中的股票），可附带会话字段，同一事务提交。
+        股票不在池中时补一行（排在池尾）。activate=True 时同一事务内 validating → running。
+        """
+        if not entries:
+            return
+        rows = [
+            {"session_id": session_id, "stock_code": code, "updated_at": datetime.now(),
+             **{f: e.get(f, StockModel.__table__.c[f].default.arg) for f in StockModel.ENTRY_FIELDS}}
+            for code, e in entries.items()
+        ]
+        stmt = sqlite_insert(StockModel)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[StockModel.session_id, StockModel.stock_code],
+            set_={f: stmt.excluded[f] for f in (*StockModel.ENTRY_FIELDS, "updated_at")},
+        )
+        async with AsyncSessionLocal() as db:
+            tail = (await db.execute(
+                select(func.coalesce(func.max(StockModel.seq) + 1, 0))
+                .where(StockModel.session_id == session_id)
+            )).scalar()
+            for i, row in enumerate(rows):
+                row["seq"] = tail + i
+            await db.execute(stmt, rows)
+            if session_fields:
+                await db.execute(
+                    update(SessionModel).where(SessionModel.id == session_id)
+                    .values(**session_fields, updated_at=datetime.now())
+                )
+            if activate:
+                await db.execute(self._activate_stmt(session_id))
+            await db.commit()
+
+    async def _get_field(self, session_id: str, field: str):
+        async with AsyncReadSessionLocal() as db:
             model = await db.get(SessionModel, session_id)
             return getattr(model, field, None) if model else None
 
     @staticmethod
-    def _model_to_out(model: SessionModel) -> AutoTradeSessionOut:
+    def _model_to_out(
+        model: SessionModel, stock_codes: List[str], strategy_map: Dict[str, dict]
+    ) -> AutoTradeSessionOut:
         return AutoTradeSessionOut(
             id=model.id,
             name=model.name or "",
             status=model.status,
-            stock_codes=model.stock_codes,
+            stock_codes=stock_codes,
             initial_capital=model.initial_capital,
             available_cash=model.available_cash,
             cycle_days=model.cycle_days,
@@ -1287,7 +1582,7 @@ class AutoTradeService:
             max_position_pct=model.max_position_pct,
             data_scale=getattr(model, "data_scale", 240) or 240,
             execution_mode=getattr(model, "execution_mode", "sim") or "sim",
-            strategy_map=model.strategy_map,
+            strategy_map=strategy_map,
             last_run_date=model.last_run_date or "",
             created_at=model.created_at,
         )
@@ -17,8 +17,12 @@ from app.schemas.backtest import (
     BacktestOptimizeParams, BacktestOptimizeResult, BacktestOptimizeItem,
 )
 from app.adapters.market.sina_adapter import SinaAdapter
+from app.core import diagnostics
+from app.services.backtest_store import BacktestBatch, BacktestStore, backtest_key, kline_data_version
 from app.utils.indicators import adx as calc_adx
 from app.utils.indicators import obv as calc_obv
+from app.utils.date_index import date_index_of
+from app.utils.trading_calendar import get_calendar, market_of
 
 # ==================== 全局参数 ====================
 STOP_LOSS_PCT = 0.07
@@ -32,12 +36,29 @@ TREND_MA_LEN = 40
 VOLUME_MA_LEN = 20
 LOT_SIZE = 100
 
+# 引擎版本：信号/执行/指标逻辑变更时递增，使已持久化的回测结果失效
+ENGINE_VERSION = "3.0"
+
+
+class _Fill:
+    """引擎内部成交记录（按 bar 下标定位），组装结果时才转为 BacktestTrade"""
+    __slots__ = ("idx", "action", "price", "quantity", "profit")
+
+    def __init__(self, idx: int, action: str, price: float, quantity: int,
+                 profit: Optional[float] = None):
+        self.idx = idx
+        self.action = action
+        self.price = price
+        self.quantity = quantity
+        self.profit = profit
+
 
 class BacktestService:
     """回测服务"""
 
     def __init__(self):
         self.adapter = SinaAdapter()
+        self.store = BacktestStore()
 
     # ==================== 公开接口 ====================
 
@@ -61,19 +82,65 @@ class BacktestService:
                 logger.warning(f"No kline data for {params.stock_code}, skip")
                 return None
 
-            return self._run_backtest_on_kline(params, kline_data)
+            last_bar_date = str(kline_data[-1].get("date", ""))[:10]
+
+            data_version = kline_data_version(kline_data)
+            key = backtest_key(params, data_version, ENGINE_VERSION)
+            cached = await self.store.get(key)
+            if cached is not None:
+                logger.info(f"Backtest cache hit: {params.stock_code} / {params.strategy} ({key[:12]})")
+                return cached
+
+            result = self._run_backtest_on_kline(params, kline_data)
+            if result is not None:
+                result.id = key
+                # 盘中未收定的日K会在收盘前反复变化：结果只返回不落库
+                if get_calendar().is_bar_final(last_bar_date, market=market_of(params.stock_code)):
+                    await self.store.put(key, params, result, data_version, ENGINE_VERSION, last_bar_date)
+            return result
         except Exception as e:
             logger.error(f"Run backtest error: {e}")
             raise
 
+    async def get_backtest_result(self, backtest_id: str) -> Optional[BacktestResult]:
+        """按 id（内容哈希）读取已持久化的回测结果；不存在或已作废返回 None"""
+        return await self.store.get(backtest_id)
+
+    async def open_batch(self, klines: Dict[str, List[dict]]) -> BacktestBatch:
+        """批量回测开批：{股票: K线} 一次预取已存结果，供 run_backtest_sync(batch=...) 复用"""
+        return await self.store.open_batch(klines, ENGINE_VERSION)
+
+    async def close_batch(self, batch: BacktestBatch) -> None:
+        """批量回测收批：本批新算出的（K 线已收定的）结果一次写回"""
+        await self.store.close_batch(batch)
+
     def run_backtest_sync(
-        self, params: BacktestParams, kline_data: List[dict]
+        self,
+        params: BacktestParams,
+        kline_data: List[dict],
+        with_series: bool = True,
+        batch: Optional[BacktestBatch] = None,
     ) -> Optional[BacktestResult]:
-        """使用已有 K 线数据运行回测（批量场景，无网络）"""
+        """使用已有 K 线数据运行回测（批量场景，无网络）；
+        with_series=False 时不生成 price_series，供丢弃结果明细的寻优 / 训练测试循环使用。
+        传入 batch 时先查本批预取的存储结果，未命中才计算，新结果在 close_batch 时落库"""
         if not kline_data:
             return None
         try:
-            return self._run_backtest_on_kline(params, kline_data)
+            if batch is None:
+                return self._run_backtest_on_kline(params, kline_data, with_series=with_series)
+            data_version = batch.data_version(kline_data)
+            key = backtest_key(params, data_version, ENGINE_VERSION, with_series)
+            cached = batch.get(key)
+            if cached is not None:
+                return cached
+            result = self._run_backtest_on_kline(params, kline_data, with_series=with_series)
+            if result is not None:
+                result.id = key
+                last_bar_date = str(kline_data[-1].get("date", ""))[:10]
+                if get_calendar().is_bar_final(last_bar_date, market=market_of(params.stock_code)):
+                    batch.add(key, params, result, data_version, last_bar_date)
+            return result
         except Exception as e:
             logger.warning(f"Backtest sync error {params.stock_code}/{params.strategy}: {e}")
             return None
@@ -99,6 +166,15 @@ class BacktestService:
                 results=[],
             )
 
+        batch = await self.open_batch({params.stock_code: kline_data})
+        try:
+            return self._optimize_on_kline(params, kline_data, batch)
+        finally:
+            await self.close_batch(batch)
+
+    def _optimize_on_kline(
+        self, params: BacktestOptimizeParams, kline_data: List[dict], batch: BacktestBatch,
+    ) -> BacktestOptimizeResult:
         keys = list(params.param_grid.keys())
         values = list(params.param_grid.values())
         if not keys:
@@ -109,7 +185,7 @@ class BacktestService:
                 end_date=params.end_date,
                 initial_capital=params.initial_capital,
             )
-            res = self.run_backtest_sync(single, kline_data)
+            res = self.run_backtest_sync(single, kline_data, with_series=False, batch=batch)
             if res:
                 return BacktestOptimizeResult(
                     stock_code=params.stock_code,
@@ -150,7 +226,7 @@ class BacktestService:
                 if k in allowed and v is not None:
                     bp_kw[k] = v
             bp = BacktestParams(**bp_kw)
-            result = self.run_backtest_sync(bp, kline_data)
+            result = self.run_backtest_sync(bp, kline_data, with_series=False, batch=batch)
             if result and result.total_trades > 0:
                 collected.append((kw, result))
 
@@ -180,8 +256,9 @@ class BacktestService:
     # ==================== 核心引擎 ====================
 
     def _run_backtest_on_kline(
-        self, params: BacktestParams, kline_data: List[dict]
+        self, params: BacktestParams, kline_data: List[dict], with_series: bool = True,
     ) -> Optional[BacktestResult]:
+        diagnostics.count("backtests")
         # 用户参数覆盖默认值
         cfg = {
             "stop_loss_pct": params.stop_loss_pct if params.stop_loss_pct is not None else STOP_LOSS_PCT,
@@ -196,14 +273,13 @@ class BacktestService:
         }
 
         # 找到交易区间起止 index（保留前面的 warmup 数据给指标计算用）
-        trade_start = 0
-        trade_end = len(kline_data) - 1
-        for idx, k in enumerate(kline_data):
-            d = k["date"][:10]
-            if d >= params.start_date and trade_start == 0:
-                trade_start = idx
-            if d <= params.end_date:
-                trade_end = idx
+        didx = date_index_of(kline_data)
+        trade_start = didx.first_at_or_after(params.start_date)
+        if trade_start >= len(kline_data):
+            trade_start = 0
+        trade_end = didx.last_at_or_before(params.end_date)
+        if trade_end < 0:
+            trade_end = len(kline_data) - 1
 
         warmup_needed = max(cfg["trend_ma_len"], cfg["atr_period"], cfg["volume_ma_len"],
                             params.long_window, params.short_window, 30) + 5
@@ -239,7 +315,7 @@ class BacktestService:
 
         trades = self._execute(kline_data, raw_signals, ctx, params.initial_capital)
 
-        return self._calculate_metrics(params, kline_data, trades, ctx)
+        return self._calculate_metrics(params, kline_data, trades, ctx, with_series)
 
     # ==================== 信号生成 ====================
 
@@ -630,7 +706,7 @@ class BacktestService:
     def _execute(
         self, kline: List[dict], raw_signals: List[Tuple[int, str]],
         ctx: Dict, initial_capital: float,
-    ) -> List[BacktestTrade]:
+    ) -> List[_Fill]:
         closes = ctx["closes"]
         atr = ctx["atr"]
         vol_ma = ctx["vol_ma"]
@@ -644,7 +720,7 @@ class BacktestService:
             if trade_start <= idx <= trade_end:
                 signal_map[idx] = action
 
-        trades: List[BacktestTrade] = []
+        trades: List[_Fill] = []
         avail_capital = initial_capital
         holding = False
         buy_price = 0.0
@@ -668,20 +744,14 @@ class BacktestService:
                 if closes[i] <= stop_price:
                     profit = (closes[i] - buy_price) * qty
                     avail_capital += closes[i] * qty
-                    trades.append(BacktestTrade(
-                        date=kline[i]["date"][:10], action="SELL",
-                        price=closes[i], quantity=qty, profit=round(profit, 2),
-                    ))
+                    trades.append(_Fill(i, "SELL", closes[i], qty, round(profit, 2)))
                     holding = False
                     cooldown = cfg["cooldown_bars"]
                     continue
                 elif closes[i] <= trailing_stop_price and closes[i] > buy_price:
                     profit = (closes[i] - buy_price) * qty
                     avail_capital += closes[i] * qty
-                    trades.append(BacktestTrade(
-                        date=kline[i]["date"][:10], action="SELL",
-                        price=closes[i], quantity=qty, profit=round(profit, 2),
-                    ))
+                    trades.append(_Fill(i, "SELL", closes[i], qty, round(profit, 2)))
                     holding = False
                     continue
 
@@ -702,19 +772,13 @@ class BacktestService:
                 avail_capital -= closes[i] * qty
                 buy_price = closes[i]
                 peak_price = closes[i]
-                trades.append(BacktestTrade(
-                    date=kline[i]["date"][:10], action="BUY",
-                    price=closes[i], quantity=qty,
-                ))
+                trades.append(_Fill(i, "BUY", closes[i], qty))
                 holding = True
 
             elif sig == "SELL" and holding:
                 profit = (closes[i] - buy_price) * qty
                 avail_capital += closes[i] * qty
-                trades.append(BacktestTrade(
-                    date=kline[i]["date"][:10], action="SELL",
-                    price=closes[i], quantity=qty, profit=round(profit, 2),
-                ))
+                trades.append(_Fill(i, "SELL", closes[i], qty, round(profit, 2)))
                 holding = False
 
         return trades
@@ -781,7 +845,7 @@ class BacktestService:
 
     def _calculate_metrics(
         self, params: BacktestParams, kline: List[dict],
-        trades: List[BacktestTrade], ctx: Dict,
+        trades: List[_Fill], ctx: Dict, with_series: bool = True,
     ) -> BacktestResult:
         trade_start = ctx["trade_start"]
         trade_end = ctx["trade_end"]
@@ -798,7 +862,7 @@ class BacktestService:
         equity_curve: List[float] = []
 
         for i in range(trade_start, trade_end + 1):
-            while trade_idx < len(trades) and trades[trade_idx].date == kline[i]["date"][:10]:
+            while trade_idx < len(trades) and trades[trade_idx].idx == i:
                 t = trades[trade_idx]
                 if t.action == "BUY":
                     capital -= t.price * t.quantity
@@ -851,14 +915,26 @@ class BacktestService:
                 std_r = (sum((r - avg_r) ** 2 for r in daily_ret) / len(daily_ret)) ** 0.5
                 sharpe = (avg_r / std_r * math.sqrt(252)) if std_r > 0 else 0
 
-        # 每日收盘价序列（供前端画走势图），每 N 天取一个点控制数据量
-        raw_count = trade_end - trade_start + 1
-        sample_step = max(1, raw_count // 250)
+        # 每日收盘价序列（供前端画走势图），每 N 天取一个点控制数据量；批量场景不需要
         price_series: List[PricePoint] = []
-        for i in range(trade_start, trade_end + 1, sample_step):
-            price_series.append(PricePoint(date=kline[i]["date"][:10], close=closes[i]))
-        if (trade_end - trade_start) % sample_step != 0:
-            price_series.append(PricePoint(date=kline[trade_end]["date"][:10], close=closes[trade_end]))
+        if with_series:
+            raw_count = trade_end - trade_start + 1
+            sample_step = max(1, raw_count // 250)
+            price_series = [
+                PricePoint(date=kline[i]["date"][:10], close=closes[i])
+                for i in range(trade_start, trade_end + 1, sample_step)
+            ]
+            if (trade_end - trade_start) % sample_step != 0:
+                price_series.append(
+                    PricePoint(date=kline[trade_end]["date"][:10], close=closes[trade_end])
+                )
+        trade_models = [
+            BacktestTrade(
+                date=kline[t.idx]["date"][:10], action=t.action,
+                price=t.price, quantity=t.quantity, profit=t.profit,
+            )
+            for t in trades
+        ]
 
         return BacktestResult(
             id=str(uuid.uuid4()),
@@ -869,11 +945,11 @@ class BacktestService:
             initial_capital=params.initial_capital,
             final_capital=round(final_equity, 2),
             total_return=round(total_return, 2),
-            total_return_percent=round(total_return_pct, 2),
+            total_return_percent=round(float(total_return_pct), 2),
             max_drawdown=round(max_dd, 2),
-            sharpe_ratio=round(sharpe, 4),
-            win_rate=round(win_rate, 2),
+            sharpe_ratio=round(float(sharpe), 4),
+            win_rate=round(float(win_rate), 2),
             total_trades=total_trades,
-            trades=trades,
+            trades=trade_models,
             price_series=price_series,
         )
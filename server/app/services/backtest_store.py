@@ -0,0 +1,188 @@
+"""
+回测结果存储
+- 结果 id = sha256(规范化参数 + K线数据版本 + 引擎版本 + 是否含价格序列)，输入不变则直接复用
+- K线数据版本 = K线内容哈希（日期 + OHLCV），盘中最后一根变化也会产生新版本
+- 同一股票写入基于更新 K 线（最后日期前进）的结果时，同一事务内作废旧数据版本的结果；
+  读路径（命中）不产生写事务
+- BacktestBatch：批量回测（选股 / 策略测试 / 自动交易验证 / 寻优 / 预测）开批时按
+  (股票, 最后K线日期) 一次预取已存结果，同步计算中只查内存，收批时新结果一个事务写回
+"""
+
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple
+from loguru import logger
+from sqlalchemy import delete, select, tuple_
+
+from app.core import diagnostics
+from app.core.database import AsyncReadSessionLocal, AsyncSessionLocal
+from app.core.instrumentation import cache_lookup
+from app.models.backtest_run import BacktestRun
+from app.schemas.backtest import BacktestParams, BacktestResult
+
+_KLINE_FIELDS = ("date", "open", "high", "low", "close", "volume")
+
+
+def kline_data_version(kline_data: List[dict]) -> str:
+    """K 线内容哈希"""
+    h = hashlib.sha256()
+    for k in kline_data:
+        h.update("|".join(str(k.get(f, "")) for f in _KLINE_FIELDS).encode())
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def backtest_key(
+    params: BacktestParams, data_version: str, engine_version: str, with_series: bool = True,
+) -> str:
+    """回测内容哈希：参数 + 数据版本 + 引擎版本 + 是否含 price_series（不含序列的结果不会顶替含序列的）"""
+    payload = json.dumps(
+        {"params": params.model_dump(), "data": data_version, "engine": engine_version,
+         "series": with_series},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class BacktestBatch:
+    """
+    一批同步回测的结果视图（由 BacktestStore.open_batch 创建）。
+    get / add 只读写内存，可在计算线程池中使用；同一批不要跨线程并发使用。
+    """
+
+    def __init__(self, engine_version: str, stored: Optional[Dict[str, str]] = None):
+        self.engine_version = engine_version
+        self.stored = stored or {}                              # key -> result_json，命中时才解析
+        self.pending: Dict[str, Tuple[BacktestParams, str, str, str]] = {}   # key -> (参数, 结果JSON, 数据版本, 最后K线日期)
+        self._versions: Dict[int, Tuple[list, str]] = {}        # id(kline) -> (kline, 数据版本)
+
+    def data_version(self, kline_data: List[dict]) -> str:
+        """同一 K 线对象只哈希一次（保留引用，避免 id 复用）"""
+        hit = self._versions.get(id(kline_data))
+        if hit is None or hit[0] is not kline_data:
+            hit = self._versions[id(kline_data)] = (kline_data, kline_data_version(kline_data))
+        return hit[1]
+
+    def get(self, key: str) -> Optional[BacktestResult]:
+        raw = self.stored.get(key)
+        if raw is None:
+            pending = self.pending.get(key)
+            raw = pending[1] if pending else None
+        diagnostics.count("cache_hits" if raw is not None else "cache_misses")
+        cache_lookup("backtest_result", raw is not None)
+        return BacktestResult.model_validate_json(raw) if raw is not None else None
+
+    def add(self, key: str, params: BacktestParams, result: BacktestResult,
+            data_version: str, last_bar_date: str) -> None:
+        """记录新结果，收批时落库（在此序列化，之后调用方修改结果对象不影响存储）"""
+        self.pending[key] = (params, result.model_dump_json(), data_version, last_bar_date)
+
+
+class BacktestStore:
+    """回测结果持久化（SQLite）；存储异常只记日志，不影响回测本身"""
+
+    async def get(self, key: str) -> Optional[BacktestResult]:
+        try:
+            async with AsyncReadSessionLocal() as db:
+                row = await db.get(BacktestRun, key)
+                if row is None:
+                    diagnostics.count("cache_misses")
+                    cache_lookup("backtest_result", False)
+                    return None
+                diagnostics.count("cache_hits")
+                cache_lookup("backtest_result", True)
+                return BacktestResult.model_validate_json(row.result_json)
+        except Exception as e:
+            logger.warning(f"[BacktestStore] 读取 {key[:12]} 失败: {e}")
+            return None
+
+    async def open_batch(self, klines: Dict[str, List[dict]], engine_version: str) -> BacktestBatch:
+        """按 (股票, 最后K线日期) 预取已存结果；读取失败则返回空批（只是不命中）"""
+        last = sorted({
+            (code, str(k[-1].get("date", ""))[:10]) for code, k in klines.items() if k
+        })
+        stored: Dict[str, str] = {}
+        try:
+            async with AsyncReadSessionLocal() as db:
+                for i in range(0, len(last), 200):
+                    rows = await db.execute(
+                        select(BacktestRun.id, BacktestRun.result_json).where(
+                            BacktestRun.engine_version == engine_version,
+                            tuple_(BacktestRun.stock_code, BacktestRun.last_bar_date).in_(last[i:i + 200]),
+                        )
+                    )
+                    stored.update(rows.tuples().all())
+        except Exception as e:
+            logger.warning(f"[BacktestStore] 批量预取 {len(last)} 只失败: {e}")
+        return BacktestBatch(engine_version, stored)
+
+    async def close_batch(self, batch: BacktestBatch) -> int:
+        """一个写事务写回本批新结果（并作废各股票更早 K 线的结果），返回写入条数"""
+        if not batch.pending:
+            return 0
+        try:
+            async with AsyncSessionLocal() as db:
+                newest: Dict[str, str] = {}
+                for params, _, _, last_bar_date in batch.pending.values():
+                    newest[params.stock_code] = max(newest.get(params.stock_code, ""), last_bar_date)
+                for code, last_bar_date in newest.items():
+                    await self._drop_stale(db, code, last_bar_date)
+                for key, (params, result_json, data_version, last_bar_date) in batch.pending.items():
+                    await db.merge(BacktestRun(
+                        id=key,
+                        stock_code=params.stock_code,
+                        strategy=params.strategy,
+                        params_json=params.model_dump_json(),
+                        data_version=data_version,
+                        engine_version=batch.engine_version,
+                        last_bar_date=last_bar_date,
+                        result_json=result_json,
+                    ))
+                await db.commit()
+            n = len(batch.pending)
+            batch.pending.clear()
+            return n
+        except Exception as e:
+            logger.warning(f"[BacktestStore] 批量写入 {len(batch.pending)} 条失败: {e}")
+            return 0
+
+    async def put(
+        self,
+        key: str,
+        params: BacktestParams,
+        result: BacktestResult,
+        data_version: str,
+        engine_version: str,
+        last_bar_date: str,
+    ) -> None:
+        """写入结果；同一事务内作废该股票基于更早 K 线（最后日期 < last_bar_date）的旧结果"""
+        try:
+            async with AsyncSessionLocal() as db:
+                n = await self._drop_stale(db, params.stock_code, last_bar_date)
+                await db.merge(BacktestRun(
+                    id=key,
+                    stock_code=params.stock_code,
+                    strategy=params.strategy,
+                    params_json=params.model_dump_json(),
+                    data_version=data_version,
+                    engine_version=engine_version,
+                    last_bar_date=last_bar_date,
+                    result_json=result.model_dump_json(),
+                ))
+                await db.commit()
+            if n:
+                logger.info(f"[BacktestStore] {params.stock_code} 新K线 {last_bar_date}，作废 {n} 条旧结果")
+        except Exception as e:
+            logger.warning(f"[BacktestStore] 写入 {key[:12]} 失败: {e}")
+
+    @staticmethod
+    async def _drop_stale(db, stock_code: str, last_bar_date: str) -> int:
+        if not last_bar_date:
+            return 0
+        res = await db.execute(
+            delete(BacktestRun).where(
+                BacktestRun.stock_code == stock_code,
+                BacktestRun.last_bar_date < last_bar_date,
+            )
+        )
+        return res.rowcount or 0
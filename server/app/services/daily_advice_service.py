@@ -11,15 +11,18 @@
 
 from __future__ import annotations
 
+import json
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
 from loguru import logger
-from sqlalchemy import delete, select
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from app.core.database import AsyncSessionLocal
-from app.models.recommendation import RecommendationHistory
+from app.core.database import AsyncReadSessionLocal, AsyncSessionLocal
+from app.core.diagnostics import Diagnostics
+from app.models.recommendation import RecommendationHistory, RecommendationSnapshot
 from app.adapters.market.sina_adapter import SinaAdapter
 from app.schemas.screening import SmartScreenParams
 from app.services.screening_service import ScreeningService
@@ -58,6 +61,20 @@ class DailyAdviceService:
         top_n: int = 5,
         mode: str = "smart_v2",
         lookback_days: int = 730,
+    ) -> dict:
+        with Diagnostics("daily_advice") as diag:
+            report = await self._generate(diag, run_date, pool, top_n, mode, lookback_days)
+        report["diagnostics"] = diag.to_schema().model_dump()
+        return report
+
+    async def _generate(
+        self,
+        diag: Diagnostics,
+        run_date: Optional[str],
+        pool: str,
+        top_n: int,
+        mode: str,
+        lookback_days: int,
     ) -> dict:
         run_date = run_date or datetime.now().strftime("%Y-%m-%d")
         end_date = run_date
@@ -68,24 +85,29 @@ class DailyAdviceService:
         logger.info(f"[DailyAdvice] generate date={run_date} pool={pool} top_n={top_n} mode={mode}")
 
         # 1) 跑 smart-screen（放宽 top_n 以便对账延续性）
+        diag.begin("smart_screen")
         broad_top = max(top_n * 3, 15)
         params = SmartScreenParams(
             stock_pool=pool, start_date=start_date, end_date=end_date,
             top_n=broad_top, mode=mode,
         )
         screen = await self.screening.run_smart_screen(params)
+        diag.attach(screen.diagnostics)
         rankings = screen.rankings or []
         rank_map = {self._canon(r.stock_code): r for r in rankings}
         today_top = [self._canon(r.stock_code) for r in rankings[:top_n]]
         logger.info(f"[DailyAdvice] screen 得 {len(rankings)} 条，Top-{top_n}={today_top}")
 
         # 2) 加载昨日（及更早）仍活跃的推荐
+        diag.begin("load_prior")
         prior_map = await self._load_prior_active(run_date)
 
         # 3) 批量取现价（活跃 + 今日 Top-N 的并集）
+        diag.begin("fetch_prices")
         price_map = await self._fetch_prices(prior_map, rankings, top_n)
 
         # 4) 对账
+        diag.begin("reconcile")
         holding, new, exit_ = [], [], []
         handled = set()
 
@@ -142,7 +164,11 @@ class DailyAdviceService:
             handled.add(canon)
 
         # 6) 落库（先删同日旧数据，保证可重复运行）
+        diag.begin("persist")
         await self._persist(run_date, holding + new + exit_)
+        diag.end()
+        diag.set("prior_active", len(prior_map))
+        diag.set("stocks_out", len(holding) + len(new) + len(exit_))
 
         report = {
             "date": run_date, "pool": pool, "mode": mode, "top_n": top_n,
@@ -157,26 +183,24 @@ class DailyAdviceService:
     # ------------------------------------------------------------------
     async def _load_prior_active(self, run_date: str) -> Dict[str, RecommendationHistory]:
         """取 run_date 之前最近一个快照日、且状态为 new/holding 的推荐，键为 canon。"""
-        async with AsyncSessionLocal() as db:
-            # 最近的历史快照日期（严格早于 run_date）
-            latest = (
+        H = RecommendationHistory
+        async with AsyncReadSessionLocal() as db:
+            snap = (
                 await db.execute(
-                    select(RecommendationHistory.date)
-                    .where(RecommendationHistory.date < run_date)
-                    .order_by(RecommendationHistory.date.desc())
+                    select(RecommendationSnapshot)
+                    .where(RecommendationSnapshot.date < run_date)
+                    .order_by(RecommendationSnapshot.date.desc())
                     .limit(1)
                 )
             ).scalar_one_or_none()
-            if not latest:
-                return {}
-            rows = (
-                await db.execute(
-                    select(RecommendationHistory).where(
-                        RecommendationHistory.date == latest,
-                        RecommendationHistory.status.in_(["new", "holding"]),
-                    )
-                )
-            ).scalars().all()
+            if snap is not None:
+                ids = json.loads(snap.active_ids_json or "[]")
+                stmt = select(H).where(H.id.in_(ids)) if ids else None
+            else:
+                # 无快照（迁移前的历史）：按 (date, status) 复合索引一次查询
+                latest = select(func.max(H.date)).where(H.date < run_date).scalar_subquery()
+                stmt = select(H).where(H.date == latest, H.status.in_(["new", "holding"]))
+            rows = (await db.execute(stmt)).scalars().all() if stmt is not None else []
         return {self._canon(r.stock_code): r for r in rows}
 
     async def _fetch_prices(self, prior_map, rankings, top_n) -> Dict[str, float]:
@@ -262,22 +286,20 @@ class DailyAdviceService:
         }
 
     async def _persist(self, run_date: str, rows: List[dict]):
+        """同日整体替换：删旧行 + executemany 批量插入，并 upsert 当日活跃快照，一个事务完成"""
+        active_ids = [r["id"] for r in rows if r["status"] in ("new", "holding")]
+        snap = sqlite_insert(RecommendationSnapshot).values(
+            date=run_date, active_ids_json=json.dumps(active_ids), updated_at=datetime.utcnow(),
+        )
+        snap = snap.on_conflict_do_update(
+            index_elements=[RecommendationSnapshot.date],
+            set_={"active_ids_json": snap.excluded.active_ids_json, "updated_at": snap.excluded.updated_at},
+        )
         async with AsyncSessionLocal() as db:
             await db.execute(
                 delete(RecommendationHistory).where(RecommendationHistory.date == run_date)
             )
-            for r in rows:
-                db.add(RecommendationHistory(
-                    id=r["id"], date=r["date"], market=r["market"],
-                    stock_code=r["stock_code"], stock_name=r["stock_name"],
-                    strategy=r["strategy"], strategy_label=r["strategy_label"], signal=r["signal"],
-                    entry_ref_price=r["entry_ref_price"], current_price=r["current_price"],
-                    target_price=r["target_price"], stop_loss=r["stop_loss"],
-                    confidence=r["confidence"], composite_score=r["composite_score"],
-                    predicted_return_pct=r["predicted_return_pct"],
-                    pe=r["pe"], pb=r["pb"], roe=r["roe"], ai_comment=r["ai_comment"],
-                    status=r["status"], first_recommended_date=r["first_recommended_date"],
-                    days_held=r["days_held"], return_since_rec_pct=r["return_since_rec_pct"],
-                    miss_count=r["miss_count"], exit_reason=r["exit_reason"],
-                ))
+            if rows:
+                await db.execute(insert(RecommendationHistory), rows)
+            await db.execute(snap)
             await db.commit()
@@ -8,6 +8,7 @@ from loguru import logger
 
 from app.schemas.market import Stock, KLineData, HistoryData
 from app.adapters.market.sina_adapter import SinaAdapter
+from app.services.quote_cache import get_quote_cache
 
 
 class MarketDataService:
@@ -15,6 +16,16 @@ class MarketDataService:
 
     def __init__(self):
         self.adapter = SinaAdapter()
+        self.quotes = get_quote_cache()
+
+    def quote_key(self, code: str) -> str:
+        """行情返回的 code 可能不带 sh/sz/hk 前缀，统一去掉前缀作为报价缓存 / 匹配的键"""
+        n = self.adapter._normalize_code(code)
+        if n.startswith(("sh", "sz", "hk")):
+            return n[2:]
+        if n.startswith("gb_"):
+            return n[3:].upper()
+        return n.upper()
 
     async def get_realtime_data(self, codes: List[str], source: str = "auto") -> List[Stock]:
         """获取实时行情数据"""
@@ -53,6 +64,7 @@ class MarketDataService:
                         timestamp=timestamp,
                     )
                     stocks.append(stock)
+                    self.quotes.put(self.quote_key(stock.code), stock.price)
                 except Exception as e:
                     logger.error(f"Parse stock item error: {e}, data: {item}")
                     continue
@@ -30,6 +30,7 @@ from app.services.backtest_service import BacktestService
 from app.services.strategy_test_service import StrategyTestService
 from app.services.strategy_constants import BACKTEST_STRATEGIES
 from app.adapters.market.sina_adapter import SinaAdapter
+from app.utils.date_index import date_index_of, slice_by_date
 
 # ── 手续费（与 TradeService 一致）──
 _COMMISSION_RATE = 0.00025
@@ -145,9 +146,8 @@ class OfflineSimulationService:
 
         # ── 5. 模拟期逐日回放 ────────────────────────────
         all_sim_dates = sorted({
-            d for code in valid_codes
-            for d in price_lut[code].keys()
-            if cfg.start_date <= d <= cfg.end_date
+            k["date"][:10] for code in valid_codes
+            for k in slice_by_date(stock_klines[code], cfg.start_date, cfg.end_date)
         })
         if not all_sim_dates:
             raise ValueError(f"模拟期 {cfg.start_date}~{cfg.end_date} 内无交易日数据")
@@ -354,7 +354,7 @@ class OfflineSimulationService:
         for code in codes:
             kline = stock_klines[code]
             # 只取训练期内的 K 线
-            train_kline = [k for k in kline if train_start <= k["date"][:10] <= train_end]
+            train_kline = slice_by_date(kline, train_start, train_end)
             if len(train_kline) < 60:
                 # 训练数据不足，用全量
                 train_kline = kline
@@ -420,13 +420,12 @@ class OfflineSimulationService:
         if not kline or len(kline) < ma_days:
             return {}
         closes = [k["close"] for k in kline]
-        dates = [k["date"][:10] for k in kline]
+        didx = date_index_of(kline)
+        lo, hi = didx.range(sim_start, sim_end)
         result: Dict[str, bool] = {}
-        for i in range(ma_days - 1, len(closes)):
-            date = dates[i]
-            if sim_start <= date <= sim_end:
-                ma = sum(closes[i - ma_days + 1 : i + 1]) / ma_days
-                result[date] = closes[i] >= ma
+        for i in range(max(lo, ma_days - 1), hi):
+            ma = sum(closes[i - ma_days + 1 : i + 1]) / ma_days
+            result[didx.dates[i]] = closes[i] >= ma
         return result
 
     def _precompute_signals(self, kline: List[dict], strategy_info: dict) -> Dict[str, str]:
@@ -464,7 +463,7 @@ class OfflineSimulationService:
                     continue
 
                 # 过滤到模拟期
-                sim_bars = [k for k in kline if start_date <= k["date"][:10] <= end_date]
+                sim_bars = slice_by_date(kline, start_date, end_date)
                 if len(sim_bars) < 5:
                     logger.warning(f"[OfflineSim] 基准 {name} 模拟期数据不足")
                     continue
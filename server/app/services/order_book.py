@@ -0,0 +1,285 @@
+"""
+模拟限价订单簿（撮合引擎）
+────────────────────────────────────────────
+- 每个代码两侧挂单：买单限价高者优先、卖单限价低者优先，同价位按挂单先后（FIFO）
+- 价位用升序数组 + bisect 索引，价位内为 deque；新报价一次切出被穿越的价位区间：
+    买单  limit >= 现价  → 以 min(limit, 现价) 成交
+    卖单  limit <= 现价  → 以 max(limit, 现价) 成交
+  未被穿越的价位不触碰，单次报价的开销只与实际成交的挂单数有关
+- 报价附带可成交量（liquidity，股）时按价格优先、时间优先依次部分成交；None 表示不限量
+- 新到的可成交限价单（take）按报价立即全部成交，与市价单一致，不入簿也不触碰其他挂单
+- 撤单只打标记（惰性删除），撮合时跳过；被穿越的价位清空后整段删除
+- 有效期：DAY 当个交易日收盘失效；GTC 撤单前一直有效；IOC / FOK 不挂单（由 TradeService 处理）
+- 撮合是纯内存计算；成交回报由 SimOrderMatcher 交给 TradeService 批量落库
+"""
+
+import asyncio
+import math
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+from app.utils.trading_calendar import get_calendar
+
+TIME_IN_FORCE = ("DAY", "GTC", "IOC", "FOK")
+
+# 价位比较放宽一个极小值，避免浮点误差让"恰好等于限价"的报价漏撮
+_EPS = 1e-9
+_MAX_SLEEP = 3600.0
+
+
+class RestingOrder:
+    __slots__ = ("order_id", "code", "side", "limit", "quantity", "filled", "tif", "trade_date", "active")
+
+    def __init__(
+        self, order_id: str, code: str, side: str, limit: float, quantity: int,
+        tif: str = "DAY", trade_date: Optional[date] = None, filled: int = 0,
+    ):
+        self.order_id = order_id
+        self.code = code
+        self.side = side                  # BUY / SELL
+        self.limit = round(float(limit), 4)
+        self.quantity = int(quantity)
+        self.filled = int(filled)
+        self.tif = tif
+        self.trade_date = trade_date      # DAY 单所属交易日
+        self.active = True
+
+    @property
+    def remaining(self) -> int:
+        return self.quantity - self.filled
+
+
+class Fill(NamedTuple):
+    order_id: str
+    code: str
+    side: str
+    price: float
+    quantity: int
+    done: bool                            # 该订单是否已全部成交
+
+
+class _Levels:
+    """单代码、单方向的价位表：prices 升序，queues[price] 为该价位的挂单队列"""
+
+    __slots__ = ("prices", "queues")
+
+    def __init__(self):
+        self.prices: List[float] = []
+        self.queues: Dict[float, Deque[RestingOrder]] = {}
+
+    def add(self, order: RestingOrder) -> None:
+        q = self.queues.get(order.limit)
+        if q is None:
+            q = self.queues[order.limit] = deque()
+            self.prices.insert(bisect_left(self.prices, order.limit), order.limit)
+        q.append(order)
+
+    def match(self, price: float, buy: bool, left: float, fills: List[Fill]) -> List[RestingOrder]:
+        """
+        按优先级撮合被 price 穿越的价位，成交写入 fills，返回本次全部成交的挂单。
+        完全清空的价位总是从被穿越一端连续出现，最后一次性删除。
+        """
+        prices = self.prices
+        if buy:
+            lo = bisect_left(prices, price - _EPS)
+            order = range(len(prices) - 1, lo - 1, -1)
+        else:
+            order = range(bisect_right(prices, price + _EPS))
+        done: List[RestingOrder] = []
+        cleared = 0
+        for k in order:
+            if left <= 0:
+                break
+            lim = prices[k]
+            q = self.queues[lim]
+            px = min(lim, price) if buy else max(lim, price)
+            while q and left > 0:
+                o = q[0]
+                if not o.active:
+                    q.popleft()
+                    continue
+                n = int(min(o.remaining, left))
+                o.filled += n
+                left -= n
+                finished = o.remaining == 0
+                fills.append(Fill(o.order_id, o.code, o.side, px, n, finished))
+                if finished:
+                    o.active = False
+                    q.popleft()
+                    done.append(o)
+            if q:
+                break
+            del self.queues[lim]
+            cleared += 1
+        if cleared:
+            if buy:
+                del prices[len(prices) - cleared:]
+            else:
+                del prices[:cleared]
+        return done
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+
+class OrderBook:
+    """全部代码的模拟挂单簿（进程内单例，见 get_order_book）"""
+
+    def __init__(self):
+        self._sides: Dict[Tuple[str, str], _Levels] = {}
+        self._orders: Dict[str, RestingOrder] = {}
+        self._reserved: Dict[Tuple[str, str], int] = {}     # (code, side) -> 挂单未成交数量
+        self.last_volume: Dict[str, float] = {}              # 代码 -> 上次报价的累计成交量
+        self._expired_before: Optional[date] = None
+
+    # ── 挂单 / 撤单 ───────────────────────────────────
+    def add(self, order: RestingOrder) -> None:
+        if order.remaining <= 0:
+            return
+        key = (order.code, order.side)
+        side = self._sides.get(key)
+        if side is None:
+            side = self._sides[key] = _Levels()
+        side.add(order)
+        self._orders[order.order_id] = order
+        self._reserved[key] = self._reserved.get(key, 0) + order.remaining
+
+    def cancel(self, order_id: str) -> Optional[RestingOrder]:
+        """撤单：打标记并移出索引，返回被撤挂单；不存在或已完结返回 None"""
+        o = self._orders.pop(order_id, None)
+        if o is None:
+            return None
+        o.active = False
+        self._unreserve(o.code, o.side, o.remaining)
+        return o
+
+    def get(self, order_id: str) -> Optional[RestingOrder]:
+        return self._orders.get(order_id)
+
+    def _unreserve(self, code: str, side: str, qty: int) -> None:
+        key = (code, side)
+        left = self._reserved.get(key, 0) - qty
+        if left > 0:
+            self._reserved[key] = left
+        else:
+            self._reserved.pop(key, None)
+
+    # ── 撮合 ──────────────────────────────────────────
+    @staticmethod
+    def marketable(side: str, limit: float, price: float) -> bool:
+        return limit >= price - _EPS if side == "BUY" else limit <= price + _EPS
+
+    def match(self, code: str, price: float, liquidity: Optional[int] = None) -> List[Fill]:
+        """
+        用一笔报价撮合该代码两侧挂单。
+        liquidity：本次报价可成交量（股），两侧各自以此为上限；None 不限量。
+        """
+        if price is None or price <= 0:
+            return []
+        fills: List[Fill] = []
+        budget = math.inf if liquidity is None else liquidity
+        if budget <= 0:
+            return fills
+        for side_name, buy in (("BUY", True), ("SELL", False)):
+            side = self._sides.get((code, side_name))
+            if not side:
+                continue
+            n0 = len(fills)
+            for o in side.match(price, buy, budget, fills):
+                self._orders.pop(o.order_id, None)
+            self._unreserve(code, side_name, sum(f.quantity for f in fills[n0:]))
+            if not side:
+                del self._sides[(code, side_name)]
+        return fills
+
+    @staticmethod
+    def take(order: RestingOrder, price: float) -> Fill:
+        """新到的可成交订单按报价立即成交剩余数量（不入簿，其他挂单仍只由撮合循环按成交量撮合）"""
+        px = min(order.limit, price) if order.side == "BUY" else max(order.limit, price)
+        n = order.remaining
+        order.filled = order.quantity
+        order.active = False
+        return Fill(order.order_id, order.code, order.side, px, n, True)
+
+    def expire(self, session_date: date) -> List[RestingOrder]:
+        """session_date 为当前（或下一个）交易日：所属交易日更早的 DAY 单全部失效"""
+        if self._expired_before == session_date:
+            return []
+        self._expired_before = session_date
+        dead = [
+            o for o in self._orders.values()
+            if o.tif == "DAY" and o.trade_date is not None and o.trade_date < session_date
+        ]
+        for o in dead:
+            self.cancel(o.order_id)
+        return dead
+
+    # ── 查询 ──────────────────────────────────────────
+    def codes(self) -> List[str]:
+        return list({code for code, _ in self._reserved})
+
+    def resting_quantity(self, code: str, side: str) -> int:
+        return self._reserved.get((code, side), 0)
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+
+@lru_cache(maxsize=1)
+def get_order_book() -> OrderBook:
+    return OrderBook()
+
+
+class SimOrderMatcher:
+    """
+    模拟撮合循环：交易时段内每 SIM_MATCH_POLL_SEC 秒对有挂单的代码批量取一次报价撮合，
+    非交易时段休眠到下一次开盘；跨过收盘即让当日 DAY 单失效。
+    service 需提供 restore_order_book / expire_orders / match_quotes（TradeService）。
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self.calendar = get_calendar()
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._running:
+            return
+        n = await self.service.restore_order_book()
+        self._running = True
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"[OrderBook] 模拟撮合已启动，恢复挂单 {n} 笔，轮询 {settings.SIM_MATCH_POLL_SEC:g} 秒")
+
+    async def stop(self) -> None:
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self) -> None:
+        while self._running:
+            try:
+                now = datetime.now()
+                await self.service.expire_orders(now)
+                if not self.calendar.is_open(now):
+                    delay = (self.calendar.next_open(now) - now).total_seconds()
+                    await asyncio.sleep(min(max(delay, 1.0), _MAX_SLEEP))
+                    continue
+                codes = get_order_book().codes()
+                if codes:
+                    await self.service.match_quotes(codes)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"[OrderBook] 撮合循环异常: {e}")
+            await asyncio.sleep(settings.SIM_MATCH_POLL_SEC)
@@ -17,7 +17,9 @@ from app.schemas.prediction import (
     FundamentalInfo, ProjectedPoint,
 )
 from app.services.backtest_service import BacktestService
+from app.services.backtest_store import BacktestBatch
 from app.adapters.market.sina_adapter import SinaAdapter
+from app.core.diagnostics import Diagnostics
 
 from app.services.screening_service import (
     HOT_HS_CODES, INDUSTRY_LEADERS_CODES, HOT_HK_CODES,
@@ -40,19 +42,29 @@ class PredictionService:
     # ============================================================
 
     async def run_prediction(self, params: PredictionParams) -> PredictionResult:
+        with Diagnostics("prediction") as diag:
+            result = await self._run_prediction(params, diag)
+        result.diagnostics = diag.to_schema()
+        return result
+
+    async def _run_prediction(self, params: PredictionParams, diag: Diagnostics) -> PredictionResult:
         start_ts = time.time()
 
         codes = self._resolve_pool(params.stock_pool, params.custom_codes)
+        diag.set("stocks_in", len(codes))
         logger.info(f"Prediction: pool={params.stock_pool}, stocks={len(codes)}, months={params.prediction_months}")
 
         # 并行获取：K线 + 基本面 + 名称
+        diag.begin("fetch")
         kline_task = self._fetch_kline_batch(codes)
         fund_task = self.adapter.get_fundamental_data(codes)
         name_task = self._fetch_name_map(codes)
         kline_map, fund_map, name_map = await asyncio.gather(kline_task, fund_task, name_task)
 
         # 逐只股票分析
+        diag.begin("analyze")
         items: List[PredictionItem] = []
+        batch = await self.backtest_service.open_batch(kline_map)
         for code in codes:
             kline = kline_map.get(code, [])
             if len(kline) < 60:
@@ -64,15 +76,20 @@ class PredictionService:
                 code, name, kline, fund,
                 params.prediction_months,
                 params.initial_capital,
+                batch,
             )
             if item is not None:
                 items.append(item)
+        await self.backtest_service.close_batch(batch)
+        diag.set("analyzed", len(items))
 
         # 排序：按综合得分降序
+        diag.begin("rank")
         items.sort(key=lambda x: x.composite_score, reverse=True)
         items = items[: params.top_n]
         for i, item in enumerate(items):
             item.rank = i + 1
+        diag.set("stocks_out", len(items))
 
         elapsed = round(time.time() - start_ts, 2)
         return PredictionResult(
@@ -95,6 +112,7 @@ class PredictionService:
         fund: dict,
         pred_months: int,
         initial_capital: float,
+        batch: Optional[BacktestBatch] = None,
     ) -> Optional[PredictionItem]:
 
         closes = [k["close"] for k in kline]
@@ -142,7 +160,7 @@ class PredictionService:
                 short_window=short_w,
                 long_window=long_w,
             )
-            result = self.backtest_service.run_backtest_sync(bp, recent_kline)
+            result = self.backtest_service.run_backtest_sync(bp, recent_kline, batch=batch)
             if result is not None and result.total_trades >= 2:
                 if result.total_return_percent > best_ret:
                     best_ret = result.total_return_percent
@@ -0,0 +1,61 @@
+"""
+共享实时报价缓存（进程内单例，见 get_quote_cache）
+────────────────────────────────────────────
+- 任何地方取到实时报价都顺手写入：MarketDataService.get_realtime_data、模拟撮合、账户对账
+- 键为去掉市场前缀的代码（MarketDataService.quote_key），值为 (现价, 写入时刻 monotonic)
+- 订阅者在价格变动时同步回调（如账户快照据此增量重算持仓市值），回调须为轻量同步函数
+"""
+
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+QuoteListener = Callable[[str, float], None]
+
+
+class QuoteCache:
+    def __init__(self):
+        self._prices: Dict[str, Tuple[float, float]] = {}
+        self._listeners: List[QuoteListener] = []
+
+    def put(self, key: str, price: Optional[float]) -> None:
+        if not key or not price or price <= 0:
+            return
+        price = float(price)
+        old = self._prices.get(key)
+        self._prices[key] = (price, time.monotonic())
+        if old is not None and old[0] == price:
+            return
+        for fn in self._listeners:
+            try:
+                fn(key, price)
+            except Exception as e:
+                logger.warning(f"[QuoteCache] 订阅回调异常 {key}: {e}")
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[float]:
+        """最近价；max_age（秒）给定时过期返回 None"""
+        hit = self._prices.get(key)
+        if hit is None:
+            return None
+        if max_age is not None and time.monotonic() - hit[1] > max_age:
+            return None
+        return hit[0]
+
+    def missing(self, keys: Iterable[str], max_age: float) -> List[str]:
+        """无价或已超过 max_age 秒未更新的键"""
+        now = time.monotonic()
+        return [k for k in keys if (hit := self._prices.get(k)) is None or now - hit[1] > max_age]
+
+    def subscribe(self, fn: QuoteListener) -> None:
+        if fn not in self._listeners:
+            self._listeners.append(fn)
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+
+@lru_cache(maxsize=1)
+def get_quote_cache() -> QuoteCache:
+    return QuoteCache()
@@ -0,0 +1,353 @@
+"""
+数据保留与归档 RetentionService
+──────────────────────────────
+auto_trade_signals / orders / recommendation_history 只增不减，这里按整月滚动：
+1. 早于保留期所在月的明细 → 追加写入 ARCHIVE_DIR/{表}/{YYYY-MM}.ndjson.gz（gzip 多成员，只追加）
+2. 短写事务内（只含已写入文件的 id）：按月累加汇总到 *_monthly，删除热表明细，记一条 archive_batches
+   写文件走只读连接，不占用唯一的写连接
+3. ANALYZE；vacuum=True 时先 VACUUM 回收空间并截断 WAL（独占写连接，调度器只在其他任务空闲时执行）
+归档文件先落盘再删库：中途崩溃最多让下次重复追加同一批，读取时按 id 去重。
+"""
+
+import asyncio
+import gzip
+import json
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import delete, select, text
+
+from app.core.config import settings
+from app.core.database import AsyncReadSessionLocal, AsyncSessionLocal, engine
+from app.models.archive import ArchiveBatch, OrderMonthly, RecommendationMonthly, SignalMonthly
+from app.models.auto_trade import AutoTradeSignal
+from app.models.order import Order
+from app.models.recommendation import RecommendationHistory, RecommendationSnapshot
+
+_CHUNK = 1000   # 流式读取 / 写文件批大小
+
+SIGNAL_ROLLUP_SQL = """
+INSERT INTO auto_trade_signal_monthly
+    (session_id, month, stock_code, signal, rows, executed, quantity, amount, fees, profit, wins)
+SELECT session_id, :month, stock_code, signal, COUNT(*),
+       SUM(CASE WHEN executed THEN 1 ELSE 0 END),
+       SUM(CASE WHEN executed THEN quantity ELSE 0 END),
+       SUM(CASE WHEN executed THEN amount ELSE 0 END),
+       SUM(CASE WHEN executed THEN fees ELSE 0 END),
+       SUM(CASE WHEN executed THEN profit ELSE 0 END),
+       SUM(CASE WHEN executed AND signal = 'SELL' AND profit > 0 THEN 1 ELSE 0 END)
+FROM auto_trade_signals
+WHERE date >= :start AND date < :end
+  AND id IN (SELECT id FROM temp.archive_ids)
+GROUP BY session_id, stock_code, signal
+ON CONFLICT (session_id, month, stock_code, signal) DO UPDATE SET
+    rows = rows + excluded.rows,
+    executed = executed + excluded.executed,
+    quantity = quantity + excluded.quantity,
+    amount = amount + excluded.amount,
+    fees = fees + excluded.fees,
+    profit = profit + excluded.profit,
+    wins = wins + excluded.wins
+"""
+
+ORDER_ROLLUP_SQL = """
+INSERT INTO orders_monthly
+    (month, stock_code, type, status, orders, quantity, filled_quantity, filled_amount, total_fee)
+SELECT :month, stock_code, type, status, COUNT(*),
+       SUM(COALESCE(quantity, 0)),
+       SUM(COALESCE(filled_quantity, 0)),
+       SUM(COALESCE(filled_price, 0) * COALESCE(filled_quantity, 0)),
+       SUM(COALESCE(total_fee, 0))
+FROM orders
+WHERE created_at >= :start AND created_at < :end AND status != 'PENDING'
+  AND id IN (SELECT id FROM temp.archive_ids)
+GROUP BY stock_code, type, status
+ON CONFLICT (month, stock_code, type, status) DO UPDATE SET
+    orders = orders + excluded.orders,
+    quantity = quantity + excluded.quantity,
+    filled_quantity = filled_quantity + excluded.filled_quantity,
+    filled_amount = filled_amount + excluded.filled_amount,
+    total_fee = total_fee + excluded.total_fee
+"""
+
+RECOMMENDATION_ROLLUP_SQL = """
+INSERT INTO recommendation_history_monthly
+    (month, stock_code, status, rows, stock_name, sum_confidence, sum_composite_score,
+     sum_return_since_rec_pct, max_days_held)
+SELECT :month, stock_code, status, COUNT(*), MAX(stock_name),
+       SUM(COALESCE(confidence, 0)),
+       SUM(COALESCE(composite_score, 0)),
+       SUM(COALESCE(return_since_rec_pct, 0)),
+       MAX(COALESCE(days_held, 0))
+FROM recommendation_history
+WHERE date >= :start AND date < :end
+  AND id IN (SELECT id FROM temp.archive_ids)
+GROUP BY stock_code, status
+ON CONFLICT (month, stock_code, status) DO UPDATE SET
+    rows = rows + excluded.rows,
+    stock_name = excluded.stock_name,
+    sum_confidence = sum_confidence + excluded.sum_confidence,
+    sum_composite_score = sum_composite_score + excluded.sum_composite_score,
+    sum_return_since_rec_pct = sum_return_since_rec_pct + excluded.sum_return_since_rec_pct,
+    max_days_held = max(max_days_held, excluded.max_days_held)
+"""
+
+
+@dataclass(frozen=True)
+class _Spec:
+    model: type                 # 热表
+    date_col: str               # 按月切分的日期列（YYYY-MM-DD 开头的字符串 / DATETIME）
+    days_setting: str           # 保留天数配置项
+    rollup_model: type          # 月汇总表
+    rollup_sql: str
+    archivable: Optional[str] = None    # 额外条件：仅归档已终结的行
+    companion: Optional[type] = None    # 随同按日期删除的附属表（以 date 列为键）
+
+
+_SPECS: Dict[str, _Spec] = {
+    "auto_trade_signals": _Spec(
+        AutoTradeSignal, "date", "RETENTION_SIGNAL_DAYS", SignalMonthly, SIGNAL_ROLLUP_SQL,
+    ),
+    "orders": _Spec(
+        Order, "created_at", "RETENTION_ORDER_DAYS", OrderMonthly, ORDER_ROLLUP_SQL,
+        archivable="status != 'PENDING'",
+    ),
+    "recommendation_history": _Spec(
+        RecommendationHistory, "date", "RETENTION_ADVICE_DAYS", RecommendationMonthly,
+        RECOMMENDATION_ROLLUP_SQL, companion=RecommendationSnapshot,
+    ),
+}
+
+ARCHIVE_TABLES = tuple(_SPECS)
+
+_run_lock = asyncio.Lock()
+
+
+def _cutoff(today: date, days: int) -> str:
+    """保留期起点所在月的月初：早于它的整月才归档，月汇总不会被拆成两半"""
+    d = today - timedelta(days=max(int(days), 0))
+    return f"{d:%Y-%m}-01"
+
+
+def _month_bounds(month: str) -> Tuple[str, str]:
+    y, m = int(month[:4]), int(month[5:7])
+    ny, nm = (y + 1, 1) if m == 12 else (y, m + 1)
+    return f"{month}-01", f"{ny:04d}-{nm:02d}-01"
+
+
+def _json_default(v):
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    return str(v)
+
+
+def _write_lines(fh, rows) -> None:
+    fh.write("".join(
+        json.dumps(dict(r), ensure_ascii=False, default=_json_default) + "\n" for r in rows
+    ))
+
+
+def _fsync(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class RetentionService:
+
+    # ── 归档 ──────────────────────────────────────────
+    async def run(self, today: Optional[date] = None, vacuum: bool = False) -> Dict[str, int]:
+        """归档全部超期整月并优化库，返回 {表: 归档行数}"""
+        today = today or date.today()
+        out: Dict[str, int] = {}
+        async with _run_lock:
+            for name, spec in _SPECS.items():
+                cutoff = _cutoff(today, getattr(settings, spec.days_setting))
+                total = 0
+                for month in await self._pending_months(spec, cutoff):
+                    total += await self._archive_month(name, spec, month)
+                if total:
+                    logger.info(f"[Retention] {name} 归档 {total} 行（早于 {cutoff}）")
+                out[name] = total
+            await self.optimize(vacuum=vacuum)
+        return out
+
+    async def _pending_months(self, spec: _Spec, cutoff: str) -> List[str]:
+        table, col = spec.model.__tablename__, spec.date_col
+        sql = f"SELECT DISTINCT substr({col}, 1, 7) FROM {table} WHERE {col} < :cutoff"
+        if spec.archivable:
+            sql += f" AND {spec.archivable}"
+        async with AsyncReadSessionLocal() as db:
+            rows = (await db.execute(text(sql + " ORDER BY 1"), {"cutoff": cutoff})).scalars().all()
+        return [m for m in rows if m and len(m) == 7]
+
+    async def _archive_month(self, name: str, spec: _Spec, month: str) -> int:
+        """
+        一张表的一个月：读会话流式写归档文件并记下 id → 短写事务内只对这些 id 汇总、删除、记批次。
+        写连接只在最后的短事务中占用；写文件期间新变为可归档的行留给下次。
+        """
+        start, end = _month_bounds(month)
+        # 以文本比较日期列（DATETIME 存为 'YYYY-MM-DD HH:MM:SS'），与 _pending_months 口径一致
+        col = spec.date_col
+        cond = [text(f"{col} >= :start AND {col} < :end").bindparams(start=start, end=end)]
+        if spec.archivable:
+            cond.append(text(spec.archivable))
+
+        rel = os.path.join(name, f"{month}.ndjson.gz")
+        path = os.path.join(settings.ARCHIVE_DIR, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        ids: List[str] = []
+        async with AsyncReadSessionLocal() as db:
+            result = await db.stream(select(spec.model.__table__).where(*cond))
+            with gzip.open(path, "at", encoding="utf-8") as fh:
+                async for chunk in result.mappings().partitions(_CHUNK):
+                    await asyncio.to_thread(_write_lines, fh, chunk)
+                    ids.extend(r["id"] for r in chunk)
+        await asyncio.to_thread(_fsync, path)
+        if not ids:
+            return 0
+
+        table = spec.model.__table__
+        async with AsyncSessionLocal() as db:
+            # 无类型列：按原值比较，不做类型亲和转换
+            await db.execute(text("CREATE TEMP TABLE IF NOT EXISTS archive_ids (id PRIMARY KEY)"))
+            await db.execute(text("DELETE FROM temp.archive_ids"))
+            for i in range(0, len(ids), _CHUNK):
+                await db.execute(text("INSERT OR IGNORE INTO temp.archive_ids (id) VALUES (:id)"),
+                                 [{"id": x} for x in ids[i:i + _CHUNK]])
+            await db.execute(text(spec.rollup_sql), {"month": month, "start": start, "end": end})
+            await db.execute(delete(table).where(
+                table.c.id.in_(select(text("id")).select_from(text("temp.archive_ids")))
+            ))
+            if spec.companion is not None:
+                c = spec.companion.__table__.c.date
+                await db.execute(delete(spec.companion).where(c >= start, c < end))
+            db.add(ArchiveBatch(table_name=name, month=month, rows=len(ids), path=rel))
+            await db.execute(text("DELETE FROM temp.archive_ids"))
+            await db.commit()
+        return len(ids)
+
+    async def optimize(self, vacuum: bool = False) -> None:
+        """ANALYZE 更新统计信息；vacuum=True 时先 VACUUM（需独占，放在非交易日）"""
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            if vacuum:
+                await conn.exec_driver_sql("VACUUM")
+                await conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+                logger.info("[Retention] VACUUM 完成")
+            await conn.exec_driver_sql("ANALYZE")
+
+    # ── 查询 ──────────────────────────────────────────
+    @staticmethod
+    def _spec(table: str) -> _Spec:
+        try:
+            return _SPECS[table]
+        except KeyError:
+            raise ValueError(f"不支持的归档表: {table}")
+
+    def read_archive(
+        self,
+        table: str,
+        month_from: Optional[str] = None,
+        month_to: Optional[str] = None,
+        filters: Optional[dict] = None,
+    ) -> Iterator[dict]:
+        """按月顺序逐行读取归档明细（同月文件内按 id 去重），filters 为字段等值过滤"""
+        self._spec(table)
+        base = os.path.join(settings.ARCHIVE_DIR, table)
+        if not os.path.isdir(base):
+            return
+        for fn in sorted(os.listdir(base)):
+            month = fn[:7]
+            if not fn.endswith(".ndjson.gz") or (month_from and month < month_from) \
+                    or (month_to and month > month_to):
+                continue
+            seen = set()
+            with gzip.open(os.path.join(base, fn), "rt", encoding="utf-8") as fh:
+                for line in fh:
+                    row = json.loads(line)
+                    if row.get("id") in seen:
+                        continue
+                    seen.add(row.get("id"))
+                    if filters and any(row.get(k) != v for k, v in filters.items()):
+                        continue
+                    yield row
+
+    def archived_months(
+        self, table: str, month_from: Optional[str] = None, month_to: Optional[str] = None,
+    ) -> List[str]:
+        """有归档文件的月份（新→旧）"""
+        self._spec(table)
+        base = os.path.join(settings.ARCHIVE_DIR, table)
+        if not os.path.isdir(base):
+            return []
+        months = [
+            fn[:7] for fn in os.listdir(base)
+            if fn.endswith(".ndjson.gz")
+            and not (month_from and fn[:7] < month_from) and not (month_to and fn[:7] > month_to)
+        ]
+        return sorted(months, reverse=True)
+
+    def read_month_desc(self, table: str, month: str, filters: Optional[dict] = None) -> List[dict]:
+        """一个月的归档明细，按日期列新→旧（单月整体读入；供热表查询之后续接更早的记录）"""
+        col = self._spec(table).date_col
+        rows = list(self.read_archive(table, month, month, filters))
+        rows.sort(key=lambda r: str(r.get(col) or ""), reverse=True)
+        return rows
+
+    async def query_archive_desc(
+        self,
+        table: str,
+        month_from: Optional[str] = None,
+        month_to: Optional[str] = None,
+        filters: Optional[dict] = None,
+        limit: int = 500,
+    ) -> List[dict]:
+        """按月新→旧取归档明细，最多 limit 行"""
+        def collect() -> List[dict]:
+            out: List[dict] = []
+            for month in self.archived_months(table, month_from, month_to):
+                out.extend(self.read_month_desc(table, month, filters))
+                if len(out) >= limit:
+                    break
+            return out[:limit]
+        return await asyncio.to_thread(collect)
+
+    async def query_archive(
+        self,
+        table: str,
+        month_from: Optional[str] = None,
+        month_to: Optional[str] = None,
+        filters: Optional[dict] = None,
+        limit: int = 500,
+    ) -> List[dict]:
+        rows = self.read_archive(table, month_from, month_to, filters)
+        return await asyncio.to_thread(lambda: list(islice(rows, limit)))
+
+    async def get_monthly(
+        self,
+        table: str,
+        month_from: Optional[str] = None,
+        month_to: Optional[str] = None,
+        filters: Optional[dict] = None,
+    ) -> List[dict]:
+        """月汇总（仅含已归档部分）"""
+        model = self._spec(table).rollup_model
+        stmt = select(model.__table__).order_by(model.month)
+        if month_from:
+            stmt = stmt.where(model.month >= month_from)
+        if month_to:
+            stmt = stmt.where(model.month <= month_to)
+        for k, v in (filters or {}).items():
+            if k not in model.__table__.c:
+                raise ValueError(f"{table} 月汇总不支持按 {k} 过滤")
+            stmt = stmt.where(model.__table__.c[k] == v)
+        async with AsyncReadSessionLocal() as db:
+            return [dict(r) for r in (await db.execute(stmt)).mappings().all()]
@@ -10,6 +10,7 @@ import time
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 
+import httpx
 from loguru import logger
 
 from app.schemas.backtest import BacktestParams, BacktestResult
@@ -18,10 +19,16 @@ from app.schemas.screening import (
 )
 from app.schemas.strategy_test import StrategyTestParams
 from app.services.backtest_service import BacktestService
+from app.services.backtest_store import BacktestBatch
 from app.services.strategy_test_service import StrategyTestService
 from app.services.strategy_constants import BACKTEST_STRATEGIES
 from app.adapters.market.sina_adapter import SinaAdapter
+from app.utils.date_index import date_index_of
+from app.core import diagnostics
 from app.core.config import settings
+from app.core.compute import run_compute
+from app.core.diagnostics import Diagnostics
+from app.core.instrumentation import InstrumentedTransport
 
 
 # --------------- 股票池 ---------------
@@ -146,18 +153,29 @@ class ScreeningService:
         self.strategy_test_service = StrategyTestService()
 
     async def run_smart_screen(self, params: SmartScreenParams) -> SmartScreenResult:
-        """执行智能选股回测"""
+        """执行智能选股回测（附带分阶段耗时与计数诊断）"""
+        with Diagnostics("smart_screen") as diag:
+            result = await self._smart_screen(params, diag)
+        result.diagnostics = diag.to_schema()
+        return result
+
+    async def _smart_screen(self, params: SmartScreenParams, diag: Diagnostics) -> SmartScreenResult:
         start_time = time.time()
 
         # 1. 解析股票池
+        diag.begin("resolve_pool")
         codes = self._resolve_pool(params.stock_pool, params.custom_codes)
         total_stocks = len(codes)
+        diag.set("stocks_in", total_stocks)
         logger.info(f"Smart screen: pool={params.stock_pool}, {total_stocks} stocks, mode={params.mode}")
 
         # 2. 批量获取K线数据
+        diag.begin("kline_fetch")
         kline_map = await self._fetch_kline_batch(codes, params.start_date, params.end_date)
+        diag.set("kline_ok", sum(1 for c in codes if kline_map.get(c)))
 
         # 3. 获取股票名称
+        diag.begin("name_map")
         name_map = await self._fetch_name_map(codes)
 
         # smart_v2 走新管线
@@ -167,17 +185,25 @@ class ScreeningService:
             )
 
         # 4. 技术面筛选
+        diag.begin("screen")
         screened_list, passed_codes = self._screen_stocks(
             codes, kline_map, name_map, params.screening_strategy
         )
+        diag.set("screened", len(passed_codes))
 
         # 5. 批量回测 + 排名（复用已获取的 K 线数据，无额外网络开销）
-        rankings = self._rank_results(
-            passed_codes, kline_map, name_map, params
-        )
+        diag.begin("rank")
+        batch = await self.backtest_service.open_batch({c: kline_map.get(c, []) for c in passed_codes})
+        try:
+            rankings = self._rank_results(
+                passed_codes, kline_map, name_map, params, batch
+            )
+        finally:
+            await self.backtest_service.close_batch(batch)
 
         # 取 Top N
         rankings = rankings[: params.top_n]
+        diag.set("stocks_out", len(rankings))
 
         elapsed = round(time.time() - start_time, 2)
         total_backtests = len(passed_codes) * len(BACKTEST_STRATEGIES)
@@ -216,9 +242,11 @@ class ScreeningService:
         """
 
         # ---- (a) 获取基本面数据 ----
+        diagnostics.stage("fundamentals")
         fund_map = await self.adapter.get_fundamental_data(codes)
 
         # ---- (b) 池内百分位估值评分 + 过滤 ----
+        diagnostics.stage("valuation")
         kline_ok_codes = [c for c in codes if len(kline_map.get(c, [])) >= 60]
         pe_valid_codes = [c for c in kline_ok_codes
                           if fund_map.get(c, {}).get("pe") is not None
@@ -256,8 +284,10 @@ class ScreeningService:
             valuation_passed.append((code, v_score, fund.get("pe"), fund.get("pb")))
 
         logger.info(f"[smart_v2] valuation filter: {len(valuation_passed)}/{len(codes)} passed")
+        diagnostics.count("valuation_passed", len(valuation_passed))
 
         # ---- (b2) AI 基本面分析（DeepSeek） ----
+        diagnostics.stage("ai_analysis")
         ai_stocks_data = [
             {
                 "code": code, "name": name_map.get(code, code),
@@ -274,10 +304,15 @@ class ScreeningService:
         ]
         ai_map = await self._ai_fundamental_analysis(ai_stocks_data)
         logger.info(f"[smart_v2] AI analysis returned for {len(ai_map)} stocks")
+        diagnostics.count("ai_scored", len(ai_map))
 
         # ---- (c) 单股策略分析（80/20 多策略评分 + 最佳策略），与 POST /backtest/analyze 一致 ----
+        diagnostics.stage("walk_forward")
         candidates: List[dict] = []
         total_backtests = 0
+        batch = await self.backtest_service.open_batch(
+            {code: kline_map.get(code, []) for code, _, _, _ in valuation_passed}
+        )
 
         for code, v_score, pe, pb in valuation_passed:
             kline = kline_map.get(code, [])
@@ -292,7 +327,7 @@ class ScreeningService:
                 train_ratio=0.8,
             )
             result = self.strategy_test_service.run_test_with_kline(
-                test_params, kline, name_map.get(code, code)
+                test_params, kline, name_map.get(code, code), batch
             )
             if result is None or not result.items:
                 continue
@@ -371,8 +406,10 @@ class ScreeningService:
                 split_date=best.test_start,
             ))
 
+        await self.backtest_service.close_batch(batch)
         logger.info(f"[smart_v2] walk-forward done: {len(candidates)} candidates, "
                      f"{total_backtests} backtests")
+        diagnostics.count("candidates", len(candidates))
 
         if not candidates:
             elapsed = round(time.time() - start_time, 2)
@@ -389,6 +426,7 @@ class ScreeningService:
             )
 
         # ---- (e) 复合排名（含 AI 评分维度） ----
+        diagnostics.stage("ranking")
         v_scores = [c["v_score"] for c in candidates]
         ai_scores = [c["ai_score"] for c in candidates]
         confs = [c["confidence"] for c in candidates]
@@ -455,6 +493,7 @@ class ScreeningService:
                 split_date=c.get("split_date"),
             ))
 
+        diagnostics.count("stocks_out", len(rankings))
         avg_conf = sum(c["confidence"] for c in top) / len(top) if top else 0
         avg_pred = sum(c["predicted_return"] for c in top) / len(top) if top else 0
         avg_test_bnh = sum(c["test_bnh"] for c in top) / len(top) if top else 0
@@ -553,6 +592,7 @@ class ScreeningService:
             api_key=api_key,
             base_url="https://api.deepseek.com",
             timeout=60.0,
+            http_client=httpx.Client(transport=InstrumentedTransport()),
         )
         model = settings.DEEPSEEK_MODEL or "deepseek-chat"
         result: Dict[str, dict] = {}
@@ -632,11 +672,11 @@ class ScreeningService:
                 logger.error(f"AI fundamental analysis batch error: {type(e).__name__}: {e}")
                 return {}
 
-        loop = asyncio.get_running_loop()
         for idx, batch in enumerate(batches):
             try:
                 logger.info(f"AI batch {idx+1}/{len(batches)}: {len(batch)} stocks ...")
-                batch_result = await loop.run_in_executor(None, _call_batch, batch)
+                diagnostics.count("ai_calls")  # 线程池不继承上下文，在协程侧计数
+                batch_result = await run_compute(_call_batch, batch)
                 result.update(batch_result)
             except Exception as e:
                 logger.error(f"AI batch executor error: {type(e).__name__}: {e}")
@@ -714,30 +754,28 @@ class ScreeningService:
     @staticmethod
     def _build_equity_from_result(result, kline, start_date, end_date, initial_capital):
         """从回测结果构建权益曲线点 [{date, value}]"""
-        dates = [k["date"][:10] for k in kline]
-        closes = [k["close"] for k in kline]
-        trades = result.trades
+        didx = date_index_of(kline)
+        lo, hi = didx.range(start_date, end_date)
+        fills: Dict[int, list] = {}
+        for t in result.trades:
+            i = didx.index_of(t.date)
+            if i is not None and lo <= i < hi:
+                fills.setdefault(i, []).append(t)
 
         capital = initial_capital
         holding_qty = 0
-        t_idx = 0
         points = []
 
-        for i in range(len(dates)):
-            if dates[i] < start_date or dates[i] > end_date:
-                continue
-            while t_idx < len(trades) and trades[t_idx].date <= dates[i]:
-                t = trades[t_idx]
-                if t.date == dates[i]:
-                    if t.action == "BUY":
-                        capital -= t.price * t.quantity
-                        holding_qty += t.quantity
-                    elif t.action == "SELL":
-                        capital += t.price * t.quantity
-                        holding_qty -= t.quantity
-                t_idx += 1
-            eq = capital + holding_qty * closes[i]
-            points.append({"date": dates[i], "value": round(eq, 2)})
+        for i in range(lo, hi):
+            for t in fills.get(i, ()):
+                if t.action == "BUY":
+                    capital -= t.price * t.quantity
+                    holding_qty += t.quantity
+                elif t.action == "SELL":
+                    capital += t.price * t.quantity
+                    holding_qty -= t.quantity
+            eq = capital + holding_qty * kline[i]["close"]
+            points.append({"date": didx.dates[i], "value": round(eq, 2)})
 
         if len(points) > 200:
             step = max(1, len(points) // 200)
@@ -980,8 +1018,9 @@ class ScreeningService:
         kline_map: Dict[str, List[dict]],
         name_map: Dict[str, str],
         params: SmartScreenParams,
+        batch: Optional[BacktestBatch] = None,
     ) -> List[RankedResult]:
-        """对每只股票 × 多种策略回测，综合评分排名（纯计算，无网络IO）"""
+        """对每只股票 × 多种策略回测，综合评分排名（纯计算，无网络IO；batch 命中则复用已存结果）"""
         valid: List[Tuple[str, str, str, BacktestResult]] = []
 
         for code in codes:
@@ -1004,7 +1043,7 @@ class ScreeningService:
                     trend_ma_len=params.trend_ma_len,
                     cooldown_bars=params.cooldown_bars,
                 )
-                result = self.backtest_service.run_backtest_sync(bp, kline)
+                result = self.backtest_service.run_backtest_sync(bp, kline, batch=batch)
                 if result is not None:
                     valid.append((code, strategy, label, result))
 
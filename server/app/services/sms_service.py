@@ -14,6 +14,7 @@ import httpx
 from loguru import logger
 
 from app.core.config import settings
+from app.core.instrumentation import InstrumentedAsyncTransport
 
 
 def _split_receivers() -> List[str]:
@@ -42,7 +43,7 @@ async def _send_via_webhook(to_phone: str, content: str, event: str) -> bool:
         "timestamp": datetime.now().isoformat(),
     }
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with httpx.AsyncClient(timeout=10.0, transport=InstrumentedAsyncTransport()) as client:
             resp = await client.post(url, json=payload, headers=headers)
             if 200 <= resp.status_code < 300:
                 return True
@@ -64,7 +65,7 @@ async def _send_via_twilio(to_phone: str, content: str, event: str) -> bool:
     url = f"https://api.twilio.com/2010-04-01/Accounts/{sid}/Messages.json"
     data = {"To": to_phone, "From": from_phone, "Body": content}
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with httpx.AsyncClient(timeout=10.0, transport=InstrumentedAsyncTransport()) as client:
             resp = await client.post(url, data=data, auth=(sid, token))
             if 200 <= resp.status_code < 300:
                 return True
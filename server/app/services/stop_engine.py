@@ -0,0 +1,196 @@
+"""
+日内止损引擎（事件驱动）
+────────────────────────────────────────────
+- 把所有 running 会话的持仓预先换算成触发价：
+    止损  price <= avg_cost * (1 - stop_loss_pct)
+    止盈  price >= avg_cost * (1 + take_profit_pct)
+    超期  持有自然日 >= max_hold_days（与价格无关，见到报价即触发）
+- 每只代码维护两张按触发价排序的表，新报价用 bisect 一次切出被穿越的触发项并移除，
+  剩余项在上一价格下都未触发，因此每个 tick 只处理"自上次报价以来被穿越"的部分
+- 命中的会话交给 AutoTradeService.check_intraday_stops 复核并成交（模拟/实盘同一路径）
+- 触发表按 INTRADAY_TRIGGER_REFRESH_SEC 从数据库整体重建，捕捉新开仓与参数修改；
+  已触发但未成交（如实盘下单失败）的持仓也在重建后重新挂回
+"""
+
+import asyncio
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import AsyncReadSessionLocal
+from app.models.auto_trade import AutoTradePosition, AutoTradeSession
+from app.schemas.auto_trade import SignalOut
+
+# 触发价放宽一个极小比例，保证浮点误差下候选集是 check_intraday_stops 判定集的超集
+_EPS = 1e-9
+
+
+class _Side:
+    """单代码、单方向的有序触发表：prices 升序，owners 与之平行"""
+
+    __slots__ = ("prices", "owners")
+
+    def __init__(self):
+        self.prices: List[float] = []
+        self.owners: List[str] = []
+
+    def add(self, price: float, owner: str) -> None:
+        i = bisect_right(self.prices, price)
+        self.prices.insert(i, price)
+        self.owners.insert(i, owner)
+
+    def pop_at_or_above(self, price: float) -> List[str]:
+        """止损：触发价 >= 现价的全部弹出"""
+        i = bisect_left(self.prices, price)
+        out = self.owners[i:]
+        del self.prices[i:], self.owners[i:]
+        return out
+
+    def pop_at_or_below(self, price: float) -> List[str]:
+        """止盈：触发价 <= 现价的全部弹出"""
+        i = bisect_right(self.prices, price)
+        out = self.owners[:i]
+        del self.prices[:i], self.owners[:i]
+        return out
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+
+class TriggerBook:
+    """按代码组织的止损/止盈/超期触发表"""
+
+    def __init__(self):
+        self._stops: Dict[str, _Side] = {}
+        self._takes: Dict[str, _Side] = {}
+        self._due: Dict[str, Set[str]] = {}       # 已超期：code -> {session_id}
+        self._fired: Set[Tuple[str, str]] = set()  # 已触发 (session_id, code)，另一侧不再重复触发
+
+    def add(
+        self, session_id: str, code: str, avg_cost: float, entry_date: Optional[str],
+        stop_loss_pct: float, take_profit_pct: float, max_hold_days: int, today: str,
+    ) -> None:
+        if not code or not avg_cost or avg_cost <= 0:
+            return
+        if entry_date:
+            hold_days = (
+                datetime.strptime(today, "%Y-%m-%d") -
+                datetime.strptime(entry_date[:10], "%Y-%m-%d")
+            ).days
+            if hold_days >= max_hold_days:
+                self._due.setdefault(code, set()).add(session_id)
+                return
+        self._stops.setdefault(code, _Side()).add(
+            avg_cost * (1 - stop_loss_pct) * (1 + _EPS), session_id,
+        )
+        self._takes.setdefault(code, _Side()).add(
+            avg_cost * (1 + take_profit_pct) * (1 - _EPS), session_id,
+        )
+
+    def codes(self) -> List[str]:
+        return list(set(self._stops) | set(self._takes) | set(self._due))
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self._stops.values()) + sum(len(d) for d in self._due.values())
+
+    def crossed(self, code: str, price: float) -> List[str]:
+        """返回该代码在 price 下新触发的会话 ID，并从表中移除"""
+        if price <= 0:
+            return []
+        hits: List[str] = []
+        due = self._due.pop(code, None)
+        if due:
+            hits.extend(due)
+        side = self._stops.get(code)
+        if side:
+            hits.extend(side.pop_at_or_above(price))
+        side = self._takes.get(code)
+        if side:
+            hits.extend(side.pop_at_or_below(price))
+        out = []
+        for sid in hits:
+            key = (sid, code)
+            if key not in self._fired:
+                self._fired.add(key)
+                out.append(sid)
+        return out
+
+
+class IntradayStopEngine:
+    """
+    持有一份 TriggerBook，每个 tick：一次批量报价 → 逐代码 bisect → 命中会话并发复核成交。
+    由 AutoScheduler 在交易时段内按 INTRADAY_STOP_POLL_SEC 驱动。
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self.book = TriggerBook()
+        self._built_at = 0.0
+        self._built_day = ""
+
+    async def refresh(self, today: Optional[str] = None) -> int:
+        """从数据库重建触发表，返回挂单数"""
+        today = today or datetime.now().strftime("%Y-%m-%d")
+        async with AsyncReadSessionLocal() as db:
+            rows = (await db.execute(
+                select(
+                    AutoTradePosition.session_id, AutoTradePosition.stock_code,
+                    AutoTradePosition.avg_cost, AutoTradePosition.entry_date,
+                    AutoTradeSession.stop_loss_pct, AutoTradeSession.take_profit_pct,
+                    AutoTradeSession.max_hold_days,
+                )
+                .join(AutoTradeSession, AutoTradeSession.id == AutoTradePosition.session_id)
+                .where(AutoTradeSession.status == "running", AutoTradePosition.quantity > 0)
+            )).all()
+        book = TriggerBook()
+        for sid, code, cost, entry, sl, tp, mh in rows:
+            book.add(
+                sid, code, float(cost or 0), entry,
+                float(sl or 0.06), float(tp or 0.05), int(mh or 15), today,
+            )
+        self.book = book
+        self._built_at = time.monotonic()
+        self._built_day = today
+        return len(book)
+
+    async def tick(self, today: Optional[str] = None) -> Dict[str, List[SignalOut]]:
+        """执行一轮检查，返回 {session_id: 成交信号}"""
+        today = today or datetime.now().strftime("%Y-%m-%d")
+        if (
+            today != self._built_day
+            or time.monotonic() - self._built_at >= settings.INTRADAY_TRIGGER_REFRESH_SEC
+        ):
+            await self.refresh(today)
+
+        codes = self.book.codes()
+        if not codes:
+            return {}
+        price_map = await self.service._fetch_price_map(codes)
+        if not price_map:
+            return {}
+
+        hits: Dict[str, Dict[str, float]] = {}
+        for code, price in price_map.items():
+            for sid in self.book.crossed(code, price):
+                hits.setdefault(sid, {})[code] = price
+        if not hits:
+            return {}
+
+        sids = list(hits)
+        results = await asyncio.gather(
+            *(self.service.check_intraday_stops(sid, price_map=hits[sid]) for sid in sids),
+            return_exceptions=True,
+        )
+        out: Dict[str, List[SignalOut]] = {}
+        for sid, res in zip(sids, results):
+            if isinstance(res, Exception):
+                logger.error(f"[StopEngine] 日内平仓失败 session={sid}: {res}")
+            elif res:
+                out[sid] = res
+        return out
+
@@ -14,7 +14,7 @@ from app.adapters.ai.deepseek_service import DeepSeekService
 from app.adapters.ai.openai_service import OpenAIService
 from app.services.market_data_service import MarketDataService
 from app.core.config import settings
-from app.core.database import AsyncSessionLocal
+from app.core.database import AsyncReadSessionLocal, AsyncSessionLocal
 from app.models.strategy import Strategy as StrategyModel
 
 
@@ -65,7 +65,7 @@ class StrategyService:
     async def get_strategy(self, id: str) -> Strategy:
         """获取策略详情"""
         from sqlalchemy import select
-        async with AsyncSessionLocal() as session:
+        async with AsyncReadSessionLocal() as session:
             result = await session.get(StrategyModel, id)
             if not result:
                 raise ValueError("策略不存在")
@@ -74,7 +74,7 @@ class StrategyService:
     async def get_history_strategies(self, stock_code: Optional[str] = None) -> List[Strategy]:
         """获取历史策略"""
         from sqlalchemy import select
-        async with AsyncSessionLocal() as session:
+        async with AsyncReadSessionLocal() as session:
             stmt = select(StrategyModel)
             if stock_code:
                 stmt = stmt.where(StrategyModel.stock_code == stock_code)
@@ -20,8 +20,10 @@ from app.schemas.strategy_test import (
     StrategyAnalyzeParams, StrategyAnalyzeResult,
 )
 from app.services.backtest_service import BacktestService
+from app.services.backtest_store import BacktestBatch
 from app.adapters.market.sina_adapter import SinaAdapter
 from app.services.strategy_constants import BACKTEST_STRATEGIES
+from app.utils.date_index import as_kline_series, date_index_of, slice_by_date
 
 
 class StrategyTestService:
@@ -71,7 +73,7 @@ class StrategyTestService:
         except Exception:
             pass
 
-        filtered = [k for k in kline if params.start_date <= k["date"][:10] <= params.end_date]
+        filtered = slice_by_date(kline, params.start_date, params.end_date)
 
         # 如果选定区间内数据不足，自动使用全部可用数据
         if len(filtered) < 40 and len(kline) >= 40:
@@ -118,18 +120,23 @@ class StrategyTestService:
         # 价格序列
         price_series = self._sample_price_series(filtered)
 
-        # 策略测试
+        # 策略测试（训练/测试回测经结果存储复用）
         items: List[StrategyTestItem] = []
-        for strategy, short_w, long_w, label in BACKTEST_STRATEGIES:
-            item = self._test_one_strategy(
-                params, strategy, short_w, long_w, label,
-                kline, train_kline, test_kline,
-                train_start, train_end, test_start, test_end,
-                train_bars, test_bars,
-                train_bnh, test_bnh, price_series,
-            )
-            if item is not None:
-                items.append(item)
+        batch = await self.backtest_service.open_batch({params.stock_code: kline})
+        try:
+            for strategy, short_w, long_w, label in BACKTEST_STRATEGIES:
+                item = self._test_one_strategy(
+                    params, strategy, short_w, long_w, label,
+                    kline, train_kline, test_kline,
+                    train_start, train_end, test_start, test_end,
+                    train_bars, test_bars,
+                    train_bnh, test_bnh, price_series,
+                    batch=batch,
+                )
+                if item is not None:
+                    items.append(item)
+        finally:
+            await self.backtest_service.close_batch(batch)
 
         items.sort(key=lambda x: x.confidence_score, reverse=True)
         avg_conf = sum(it.confidence_score for it in items) / len(items) if items else 0
@@ -200,10 +207,7 @@ class StrategyTestService:
         except Exception:
             pass
 
-        filtered = [
-            k for k in kline
-            if test_params.start_date <= k["date"][:10] <= test_params.end_date
-        ]
+        filtered = slice_by_date(kline, test_params.start_date, test_params.end_date)
         if len(filtered) < 40 and len(kline) >= 40:
             filtered = kline
             test_params = StrategyTestParams(
@@ -251,17 +255,22 @@ class StrategyTestService:
         )
 
         items: List[StrategyTestItem] = []
-        for strategy, short_w, long_w, label, risk_cfg in plan:
-            item = self._test_one_strategy(
-                test_params, strategy, short_w, long_w, label,
-                kline, train_kline, test_kline,
-                train_start, train_end, test_start, test_end,
-                train_bars, test_bars,
-                train_bnh, test_bnh, price_series,
-                override_cfg=risk_cfg,
-            )
-            if item is not None:
-                items.append(item)
+        batch = await self.backtest_service.open_batch({params.stock_code: kline})
+        try:
+            for strategy, short_w, long_w, label, risk_cfg in plan:
+                item = self._test_one_strategy(
+                    test_params, strategy, short_w, long_w, label,
+                    kline, train_kline, test_kline,
+                    train_start, train_end, test_start, test_end,
+                    train_bars, test_bars,
+                    train_bnh, test_bnh, price_series,
+                    override_cfg=risk_cfg,
+                    batch=batch,
+                )
+                if item is not None:
+                    items.append(item)
+        finally:
+            await self.backtest_service.close_batch(batch)
 
         if not items:
             raise ValueError("精细策略搜索无有效结果，请放宽筛选范围")
@@ -301,15 +310,17 @@ class StrategyTestService:
         params: StrategyTestParams,
         kline: list,
         stock_name: str,
+        batch: Optional[BacktestBatch] = None,
     ) -> Optional[StrategyTestResult]:
         """
         使用已有 K 线执行策略测试（与 run_test 逻辑一致，供智能选股等复用）。
-        同步方法，无网络 IO。
+        同步方法，无网络 IO；传入 batch（BacktestService.open_batch）时训练/测试回测复用已存结果。
         """
         if not kline or len(kline) < 40:
             return None
         start_ts = time.time()
-        filtered = [k for k in kline if params.start_date <= k["date"][:10] <= params.end_date]
+        kline = as_kline_series(kline)  # 日期索引只建一次，训练/测试两段回测共用
+        filtered = slice_by_date(kline, params.start_date, params.end_date)
         if len(filtered) < 40 and len(kline) >= 40:
             filtered = kline
         split_idx = int(len(filtered) * params.train_ratio)
@@ -335,6 +346,7 @@ class StrategyTestService:
                 train_start, train_end, test_start, test_end,
                 train_bars, test_bars,
                 train_bnh, test_bnh, price_series,
+                batch=batch,
             )
             if item is not None:
                 items.append(item)
@@ -369,6 +381,7 @@ class StrategyTestService:
         train_bars, test_bars,
         train_bnh, test_bnh, price_series,
         override_cfg: Optional[Dict[str, Any]] = None,
+        batch: Optional[BacktestBatch] = None,
     ) -> Optional[StrategyTestItem]:
 
         # 策略测试专用参数：比默认更激进，更多交易，更少过滤
@@ -391,7 +404,7 @@ class StrategyTestService:
         # ---- 训练期 ----
         train_bp = BacktestParams(start_date=train_start, end_date=train_end, **common)
         try:
-            train_result = self.backtest_service.run_backtest_sync(train_bp, kline)
+            train_result = self.backtest_service.run_backtest_sync(train_bp, kline, with_series=False, batch=batch)
         except Exception as e:
             logger.warning(f"[StrategyTest] {label} train exception: {e}")
             return None
@@ -409,7 +422,7 @@ class StrategyTestService:
         # ---- 测试期 ----
         test_bp = BacktestParams(start_date=test_start, end_date=test_end, **common)
         try:
-            test_result = self.backtest_service.run_backtest_sync(test_bp, kline)
+            test_result = self.backtest_service.run_backtest_sync(test_bp, kline, with_series=False, batch=batch)
         except Exception as e:
             logger.warning(f"[StrategyTest] {label} test exception: {e}")
             return None
@@ -461,14 +474,9 @@ class StrategyTestService:
             last_train_eq, predicted_ret, test_start, test_bars
         )
         test_eq_actual = self._build_equity_points(
-            test_result, kline, test_start, test_end, params.initial_capital
+            test_result, kline, test_start, test_end, params.initial_capital,
+            offset=last_train_eq - params.initial_capital,
         )
-        if test_eq_actual:
-            offset = last_train_eq - params.initial_capital
-            test_eq_actual = [
-                ProjectedPoint(date=p.date, value=round(p.value + offset, 2))
-                for p in test_eq_actual
-            ]
 
         # 测试期买入持有权益线
         test_eq_bnh = self._build_bnh_equity(
@@ -738,36 +746,41 @@ class StrategyTestService:
     def _build_equity_points(
         self, result, kline: list,
         start_date: str, end_date: str, initial_capital: float,
+        offset: float = 0.0,
     ) -> list:
-        dates = [k["date"][:10] for k in kline]
-        closes = [k["close"] for k in kline]
-        trades = result.trades
+        """逐日权益（纯 float）→ 采样 ~200 点后再构造 ProjectedPoint；offset 为整体平移量"""
+        didx = date_index_of(kline)
+        lo, hi = didx.range(start_date, end_date)
+        dates = didx.dates
+
+        # 成交按日期映射到 bar 下标（当天首根），区间外的成交忽略
+        fills: Dict[int, list] = {}
+        for t in result.trades:
+            i = didx.index_of(t.date)
+            if i is not None and lo <= i < hi:
+                fills.setdefault(i, []).append(t)
 
         capital = initial_capital
         holding_qty = 0
-        t_idx = 0
-        points = []
-
-        for i in range(len(dates)):
-            if dates[i] < start_date or dates[i] > end_date:
-                continue
-            while t_idx < len(trades) and trades[t_idx].date <= dates[i]:
-                t = trades[t_idx]
-                if t.date == dates[i]:
-                    if t.action == "BUY":
-                        capital -= t.price * t.quantity
-                        holding_qty += t.quantity
-                    elif t.action == "SELL":
-                        capital += t.price * t.quantity
-                        holding_qty -= t.quantity
-                t_idx += 1
-            eq = capital + holding_qty * closes[i]
-            points.append(ProjectedPoint(date=dates[i], value=round(eq, 2)))
-
-        if len(points) > 200:
-            step = max(1, len(points) // 200)
-            sampled = [points[j] for j in range(0, len(points), step)]
-            if sampled[-1].date != points[-1].date:
-                sampled.append(points[-1])
-            return sampled
-        return points
+        values: List[float] = []
+        for i in range(lo, hi):
+            for t in fills.get(i, ()):
+                if t.action == "BUY":
+                    capital -= t.price * t.quantity
+                    holding_qty += t.quantity
+                elif t.action == "SELL":
+                    capital += t.price * t.quantity
+                    holding_qty -= t.quantity
+            values.append(capital + holding_qty * kline[i]["close"])
+
+        n = len(values)
+        idxs = range(n)
+        if n > 200:
+            step = max(1, n // 200)
+            idxs = list(range(0, n, step))
+            if idxs[-1] != n - 1:
+                idxs.append(n - 1)
+        return [
+            ProjectedPoint(date=dates[lo + j], value=round(values[j] + offset, 2))
+            for j in idxs
+        ]
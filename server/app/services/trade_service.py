@@ -3,19 +3,25 @@
 模拟：滑点、手续费、本地库；实盘：通过 BrokerAdapter 调用券商网关，成交结果落库便于导出。
 """
 
+import asyncio
 import uuid
 import random
-from typing import List, Optional
-from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+from datetime import date, datetime, timedelta
 from loguru import logger
-from sqlalchemy import select
+from sqlalchemy import func, select, tuple_, update
 
 from app.schemas.trade import Order, OrderCreate, Position, AccountInfo
-from app.core.database import AsyncSessionLocal
+from app.core.database import AsyncReadSessionLocal, AsyncSessionLocal
 from app.core.config import settings
+from app.models.archive import OrderMonthly
 from app.models.order import Order as OrderModel
 from app.models.position import Position as PositionModel
+from app.services.account_snapshot import AccountSnapshot, Holding, cash_delta, get_account_snapshot, roll_position
 from app.services.market_data_service import MarketDataService
+from app.services.order_book import Fill, RestingOrder, get_order_book
+from app.services.retention_service import RetentionService
+from app.utils.trading_calendar import get_calendar
 
 # ========== 模拟交易参数 ==========
 INITIAL_CASH = 1000000.0        # 初始资金 100万
@@ -25,6 +31,19 @@ COMMISSION_RATE = 0.00025       # 佣金费率 0.025%
 COMMISSION_MIN = 5.0            # 最低佣金 ¥5
 STAMP_TAX_RATE = 0.0005         # 印花税 0.05% (仅卖出)
 TRANSFER_FEE_RATE = 0.00001    # 过户费 0.001%
+LOT_SIZE = 100                  # 部分成交按整手
+
+# ========== 导出 ==========
+EXPORT_YIELD_PER = 500          # 导出每页行数（每页一个短读会话）
+ORDER_EXPORT_FIELDS = [
+    "id", "stock_code", "stock_name", "type", "order_type", "price", "quantity",
+    "status", "filled_quantity", "filled_price", "stamp_tax", "commission",
+    "transfer_fee", "total_fee", "slippage", "created_at", "updated_at",
+]
+POSITION_EXPORT_FIELDS = [
+    "stock_code", "stock_name", "quantity", "cost_price", "current_price",
+    "market_value", "profit", "profit_percent", "total_fees", "realized_profit",
+]
 
 
 class TradeService:
@@ -32,6 +51,9 @@ class TradeService:
 
     def __init__(self):
         self.market_service = MarketDataService()
+        self.book = get_order_book()
+        self.snapshot = get_account_snapshot()
+        self.calendar = get_calendar()
         self._broker = None
         if getattr(settings, "TRADING_MODE", "sim") == "live" and settings.BROKER_API_URL:
             from app.adapters.broker.generic_http import GenericHttpBrokerAdapter
@@ -100,34 +122,57 @@ class TradeService:
             return await self._place_order_live(order)
         return await self._place_order_simulated(order)
 
+    async def place_orders(self, orders: List[OrderCreate]) -> List[Union[Order, Exception]]:
+        """
+        批量下单，结果与入参一一对应（失败项为异常对象）。
+        实盘经券商适配器批量 / 有界并发提交；模拟逐笔执行（持仓与资金需按序结算）。
+        """
+        if self._is_live():
+            results = await self._broker.place_orders(orders)
+            for r in results:
+                if isinstance(r, Order):
+                    await self._record_live(r)
+            return results
+        out: List[Union[Order, Exception]] = []
+        for o in orders:
+            try:
+                out.append(await self._place_order_simulated(o))
+            except Exception as e:
+                out.append(e)
+        return out
+
     async def _place_order_live(self, order: OrderCreate) -> Order:
         """实盘：调用券商网关，结果落库"""
         result = await self._broker.place_order(order)
+        await self._record_live(result)
+        return result
+
+    async def _record_live(self, result: Order) -> None:
         await self._save_order(result)
+        self._snapshot_fill(result.stock_code, result.stock_name, result.type,
+                            result.filled_quantity, result.filled_price, result.total_fee)
         logger.info(f"Live order filled: {result.type} {result.stock_code} x{result.quantity} @{result.filled_price}")
-        return result
 
     async def _place_order_simulated(self, order: OrderCreate) -> Order:
-        """模拟：滑点、手续费、落库、更新持仓"""
+        """模拟：市价单按实时价加滑点立即成交；限价单进入模拟订单簿撮合"""
+        if order.order_type == "LIMIT":
+            return await self._place_limit_simulated(order)
         try:
             order_id = str(uuid.uuid4())
             now = datetime.now()
 
-            if order.order_type == "MARKET":
-                market_price = await self._get_market_price(order.stock_code)
-                if not market_price:
-                    raise ValueError(f"无法获取 {order.stock_code} 实时行情，市价单失败")
-                base_price = market_price
-            else:
-                if not order.price or order.price <= 0:
-                    raise ValueError("限价单必须指定价格")
-                base_price = order.price
+            market_price = await self._get_market_price(order.stock_code)
+            if not market_price:
+                raise ValueError(f"无法获取 {order.stock_code} 实时行情，市价单失败")
+            base_price = market_price
 
             fill_price, slip_pct = self._apply_slippage(base_price, order.type)
             fees = self._calculate_fees(order.type, fill_price, order.quantity)
 
             if order.type == "SELL":
-                has_position = await self._check_position(order.stock_code, order.quantity)
+                # 挂单中的限价卖单已占用持仓
+                reserved = self.book.resting_quantity(order.stock_code, "SELL")
+                has_position = await self._check_position(order.stock_code, order.quantity + reserved)
                 if not has_position:
                     raise ValueError(f"持仓不足: {order.stock_code}")
 
@@ -166,10 +211,11 @@ class TradeService:
             raise
 
     async def cancel_order(self, order_id: str) -> bool:
-        """撤销订单（模拟改状态，实盘调券商）"""
+        """撤销订单（模拟撤出订单簿并改状态，已部分成交的保留成交部分；实盘调券商）"""
         try:
             if self._is_live():
                 return await self._broker.cancel_order(order_id)
+            self.book.cancel(order_id)
             async with AsyncSessionLocal() as session:
                 order = await session.get(OrderModel, order_id)
                 if order and order.status == "PENDING":
@@ -185,7 +231,7 @@ class TradeService:
     async def get_orders(self, status: Optional[str] = None) -> List[Order]:
         """查询订单"""
         try:
-            async with AsyncSessionLocal() as session:
+            async with AsyncReadSessionLocal() as session:
                 stmt = select(OrderModel).order_by(OrderModel.created_at.desc())
                 if status:
                     stmt = stmt.where(OrderModel.status == status)
@@ -196,188 +242,406 @@ class TradeService:
             logger.error(f"Get orders error: {e}")
             raise
 
-    async def get_positions(self) -> List[Position]:
-        """查询持仓（实盘来自券商，模拟用实时行情估值）"""
+    async def get_positions(self, refresh: bool = False) -> List[Position]:
+        """查询持仓（读账户快照，现价取自共享报价缓存；到对账间隔或 refresh 时先全量对账）"""
         try:
-            if self._is_live():
-                return await self._broker.get_positions()
-            async with AsyncSessionLocal() as session:
-                stmt = select(PositionModel).where(PositionModel.quantity > 0)
-                result = await session.execute(stmt)
-                positions = result.scalars().all()
-
-                if not positions:
-                    return []
-
-                # 批量获取实时行情
-                codes = [p.stock_code for p in positions]
-                realtime = {}
-                try:
-                    stocks = await self.market_service.get_realtime_data(codes)
-                    for s in stocks:
-                        realtime[s.code] = s.price
-                except Exception as e:
-                    logger.warning(f"Failed to get realtime prices: {e}")
-
-                result_list = []
-                for p in positions:
-                    current_price = realtime.get(p.stock_code, p.cost_price)
-                    market_value = current_price * p.quantity
-                    cost_total = p.cost_price * p.quantity
-                    profit = market_value - cost_total
-                    profit_pct = (profit / cost_total * 100) if cost_total > 0 else 0.0
-
-                    result_list.append(Position(
-                        stock_code=p.stock_code,
-                        stock_name=p.stock_name or f"股票{p.stock_code}",
-                        quantity=p.quantity,
-                        cost_price=round(p.cost_price, 4),
-                        current_price=current_price,
-                        market_value=round(market_value, 2),
-                        profit=round(profit, 2),
-                        profit_percent=round(profit_pct, 2),
-                        total_fees=round(p.total_fees or 0, 2),
-                        realized_profit=round(p.realized_profit or 0, 2),
-                    ))
-
-                return result_list
+            return (await self._account_snapshot(refresh)).positions()
         except Exception as e:
             logger.error(f"Get positions error: {e}")
             raise
 
-    async def get_account_info(self) -> AccountInfo:
-        """查询账户信息（实盘来自券商，模拟本地计算）"""
+    async def get_account_info(self, refresh: bool = False) -> AccountInfo:
+        """查询账户信息（读账户快照，O(1)；到对账间隔或 refresh 时先全量对账）"""
         try:
-            if self._is_live():
-                return await self._broker.get_account()
-            positions = await self.get_positions()
-            market_value = sum(p.market_value for p in positions)
-
-            # 计算已花费资金和总手续费
-            async with AsyncSessionLocal() as session:
-                stmt = select(OrderModel).where(OrderModel.status == "FILLED")
-                result = await session.execute(stmt)
-                orders = result.scalars().all()
-
-            spent = 0.0
-            total_fees = 0.0
-            for o in orders:
-                fee = o.total_fee or 0
-                total_fees += fee
-                if o.type == "BUY":
-                    spent += (o.filled_price or 0) * (o.filled_quantity or 0) + fee
-                elif o.type == "SELL":
-                    spent -= (o.filled_price or 0) * (o.filled_quantity or 0) - fee
-
-            available_cash = INITIAL_CASH - spent
-            total_asset = available_cash + market_value
-            profit = total_asset - INITIAL_CASH
-            profit_pct = (profit / INITIAL_CASH * 100) if INITIAL_CASH > 0 else 0.0
-
-            return AccountInfo(
-                total_asset=round(total_asset, 2),
-                available_cash=round(available_cash, 2),
-                market_value=round(market_value, 2),
-                profit=round(profit, 2),
-                profit_percent=round(profit_pct, 2),
-                total_fees_paid=round(total_fees, 2),
-            )
+            return (await self._account_snapshot(refresh)).account()
         except Exception as e:
             logger.error(f"Get account info error: {e}")
             raise
 
+    async def _account_snapshot(self, refresh: bool = False) -> AccountSnapshot:
+        snap = self.snapshot
+        if refresh:
+            snap.invalidate()
+        if snap.stale(settings.ACCOUNT_RECONCILE_SEC):
+            async with snap.lock:
+                if snap.stale(settings.ACCOUNT_RECONCILE_SEC):
+                    await self.reconcile_account()
+        return snap
+
+    async def reconcile_account(self) -> None:
+        """
+        全量对账：实盘取券商账户与持仓；模拟从库汇总已成交资金流（含已归档订单的月汇总），
+        并对缓存中过期的持仓代码批量取一次报价。
+        """
+        snap = self.snapshot
+        seq = snap.seq
+        if self._is_live():
+            account = await self._broker.get_account()
+            positions = await self._broker.get_positions()
+            holdings = [
+                (Holding(p.stock_code, p.stock_name, p.quantity, p.cost_price, p.total_fees,
+                         p.realized_profit, p.current_price), self._quote_key(p.stock_code))
+                for p in positions
+            ]
+            snap.load(account.available_cash, account.total_fees_paid,
+                      account.total_asset - account.profit, holdings, seq)
+            return
+
+        async with AsyncReadSessionLocal() as session:
+            rows = (await session.execute(
+                select(PositionModel).where(PositionModel.quantity > 0)
+            )).scalars().all()
+            flows = (await session.execute(
+                select(OrderModel.type,
+                       func.sum(OrderModel.filled_price * OrderModel.filled_quantity),
+                       func.sum(OrderModel.total_fee))
+                .where(OrderModel.filled_quantity > 0)
+                .group_by(OrderModel.type)
+            )).all()
+            archived = (await session.execute(
+                select(OrderMonthly.type, func.sum(OrderMonthly.filled_amount), func.sum(OrderMonthly.total_fee))
+                .where(OrderMonthly.filled_quantity > 0)
+                .group_by(OrderMonthly.type)
+            )).all()
+
+        cash, total_fees = INITIAL_CASH, 0.0
+        for side, amount, fee in [*flows, *archived]:
+            cash += cash_delta(side, 1, amount or 0.0, fee or 0.0)
+            total_fees += fee or 0.0
+        holdings = [
+            (Holding(p.stock_code, p.stock_name, p.quantity, p.cost_price,
+                     p.total_fees or 0.0, p.realized_profit or 0.0), self._quote_key(p.stock_code))
+            for p in rows
+        ]
+        missing = set(self.market_service.quotes.missing(
+            [key for _, key in holdings], settings.ACCOUNT_RECONCILE_SEC,
+        ))
+        if missing:
+            await self._fetch_quotes([h.stock_code for h, key in holdings if key in missing])
+        snap.load(cash, total_fees, INITIAL_CASH, holdings, seq)
+
+    def _snapshot_fill(self, code: str, name: str, side: str, qty: int, price: float, fee: float) -> None:
+        self.snapshot.apply_fill(code, self._quote_key(code), name, side, qty or 0, price or 0.0, fee or 0.0)
+
     async def _check_position(self, stock_code: str, quantity: int) -> bool:
         """检查是否有足够持仓"""
-        async with AsyncSessionLocal() as session:
+        async with AsyncReadSessionLocal() as session:
             stmt = select(PositionModel).where(PositionModel.stock_code == stock_code)
             result = await session.execute(stmt)
             position = result.scalar_one_or_none()
             return position is not None and position.quantity >= quantity
 
     async def _update_position(self, order: Order):
-        """根据成交订单更新持仓"""
+        """根据成交订单更新持仓（提交后同步计入账户快照）"""
         async with AsyncSessionLocal() as session:
-            stmt = select(PositionModel).where(PositionModel.stock_code == order.stock_code)
-            result = await session.execute(stmt)
-            position = result.scalar_one_or_none()
+            await self._apply_position(
+                session, order.stock_code, order.stock_name, order.type,
+                order.filled_quantity, order.filled_price, order.total_fee,
+            )
+            await session.commit()
+            self._snapshot_fill(order.stock_code, order.stock_name, order.type,
+                                order.filled_quantity, order.filled_price, order.total_fee)
+
+    @staticmethod
+    async def _position(session, stock_code: str) -> Optional[PositionModel]:
+        stmt = select(PositionModel).where(PositionModel.stock_code == stock_code)
+        return (await session.execute(stmt)).scalar_one_or_none()
+
+    @staticmethod
+    async def _apply_position(
+        session, stock_code: str, stock_name: str, side: str, qty: int, price: float, fee: float,
+    ) -> None:
+        """一笔成交（可为部分成交）计入持仓，调用方负责提交；卖出超过持仓抛 ValueError"""
+        if qty <= 0:
+            return
+        position = await TradeService._position(session, stock_code)
+
+        if position is None:
+            if side != "BUY":
+                raise ValueError(f"持仓不足: {stock_code}")
+            position = PositionModel(
+                stock_code=stock_code, stock_name=stock_name, quantity=0,
+                cost_price=0.0, total_fees=0.0, realized_profit=0.0,
+            )
+            session.add(position)
+        # 买入成本含费用；卖出按成本价结转已实现盈亏（与账户快照共用同一算法）
+        (position.quantity, position.cost_price,
+         position.total_fees, position.realized_profit) = roll_position(
+            position.quantity or 0, position.cost_price or 0.0, position.total_fees or 0.0,
+            position.realized_profit or 0.0, side, qty, price, fee,
+        )
+        if side == "BUY":
+            position.stock_name = stock_name
+
+    # ══════════════════════════════════════════════════════
+    #  模拟限价单（订单簿撮合）
+    # ══════════════════════════════════════════════════════
+
+    async def _place_limit_simulated(self, order: OrderCreate) -> Order:
+        """
+        限价单：先落库为 PENDING；开市且报价可成交时按报价立即成交，否则挂入订单簿。
+        IOC 未成交部分立即撤销；FOK 不能立即全部成交则整单撤销（不挂单）。
+        """
+        if not order.price or order.price <= 0:
+            raise ValueError("限价单必须指定价格")
+        code, tif = order.stock_code, order.time_in_force
+        if order.type == "SELL":
+            reserved = self.book.resting_quantity(code, "SELL")
+            if not await self._check_position(code, order.quantity + reserved):
+                raise ValueError(f"持仓不足: {code}")
+
+        now = datetime.now()
+        price = None
+        if self.calendar.is_open(now):
+            price = (await self._fetch_quotes([code])).get(code, (None, None))[0]
+        marketable = price is not None and self.book.marketable(order.type, order.price, price)
+
+        new_order = Order(
+            id=str(uuid.uuid4()),
+            stock_code=code,
+            stock_name=order.stock_name or f"股票{code}",
+            type=order.type,
+            order_type="LIMIT",
+            price=order.price,
+            quantity=order.quantity,
+            status="PENDING",
+            filled_quantity=0,
+            filled_price=0.0,
+            time_in_force=tif,
+            created_at=now,
+            updated_at=now,
+        )
+        if tif in ("IOC", "FOK") and not marketable:
+            new_order.status = "CANCELLED"
+            await self._save_order(new_order)
+            logger.info(f"Limit order {tif} not marketable, cancelled: {order.type} {code} @{order.price}")
+            return new_order
+
+        await self._save_order(new_order)
+        resting = RestingOrder(
+            new_order.id, code, order.type, order.price, order.quantity, tif,
+            trade_date=self.calendar.next_open(now).date(),
+        )
+        if marketable:
+            # 只成交新单本身；已在簿中的挂单仍按成交量参与率由撮合循环处理
+            await self._apply_fills([self.book.take(resting, price)])
+        else:
+            self.book.add(resting)
+        if tif == "IOC" and self.book.cancel(new_order.id):
+            await self._mark_cancelled([new_order.id])
+        logger.info(f"Limit order placed: {order.type} {code} x{order.quantity} @{order.price} ({tif})")
+        return await self._get_order(new_order.id) or new_order
 
-            if order.type == "BUY":
-                if position:
-                    # 加仓: 成本含费用
-                    old_total = position.cost_price * position.quantity
-                    new_total = order.filled_price * order.filled_quantity + order.total_fee
-                    position.quantity += order.filled_quantity
-                    position.cost_price = (old_total + new_total) / position.quantity
-                    position.stock_name = order.stock_name
-                    position.total_fees = (position.total_fees or 0) + order.total_fee
-                else:
-                    # 新建持仓: 成本价含手续费
-                    cost_with_fee = (order.filled_price * order.filled_quantity + order.total_fee) / order.filled_quantity
-                    position = PositionModel(
-                        stock_code=order.stock_code,
-                        stock_name=order.stock_name,
-                        quantity=order.filled_quantity,
-                        cost_price=cost_with_fee,
-                        total_fees=order.total_fee,
-                        realized_profit=0.0,
-                    )
-                    session.add(position)
-            elif order.type == "SELL":
-                if position:
-                    # 计算已实现盈亏
-                    sell_revenue = order.filled_price * order.filled_quantity - order.total_fee
-                    cost_basis = position.cost_price * order.filled_quantity
-                    realized = sell_revenue - cost_basis
-                    position.quantity -= order.filled_quantity
-                    position.total_fees = (position.total_fees or 0) + order.total_fee
-                    position.realized_profit = (position.realized_profit or 0) + realized
+    def _quote_key(self, code: str) -> str:
+        return self.market_service.quote_key(code)
 
+    async def _fetch_quotes(self, codes: List[str]) -> Dict[str, Tuple[float, Optional[float]]]:
+        """一次行情请求批量取 {原始代码: (现价, 当日累计成交量)}；失败或无价的代码不在结果中"""
+        try:
+            quotes = await self.market_service.adapter.get_realtime_data(codes)
+        except Exception as e:
+            logger.warning(f"[OrderBook] 批量实时报价失败 {len(codes)} 只: {e}")
+            return {}
+        by_key = {}
+        for q in quotes:
+            price = q.get("price") or 0.0
+            if price > 0:
+                key = self._quote_key(str(q.get("code", "")))
+                by_key[key] = (float(price), q.get("volume"))
+                self.market_service.quotes.put(key, price)
+        return {c: by_key[k] for c in codes if (k := self._quote_key(c)) in by_key}
+
+    def _liquidity(self, code: str, volume: Optional[float]) -> Optional[int]:
+        """两次报价间的成交量增量 × 参与率，按整手取整；首个报价只记基准（返回 0）"""
+        if volume is None:
+            return None
+        prev = self.book.last_volume.get(code)
+        self.book.last_volume[code] = volume
+        if prev is None or volume < prev:
+            return 0
+        qty = int((volume - prev) * settings.SIM_FILL_PARTICIPATION)
+        return qty // LOT_SIZE * LOT_SIZE
+
+    async def match_quotes(self, codes: List[str]) -> List[Fill]:
+        """撮合循环入口：批量取报价 → 内存撮合 → 成交一次性落库"""
+        fills: List[Fill] = []
+        for code, (price, volume) in (await self._fetch_quotes(codes)).items():
+            fills.extend(self.book.match(code, price, self._liquidity(code, volume)))
+        if fills:
+            await self._apply_fills(fills)
+        return fills
+
+    async def _apply_fills(self, fills: List[Fill]) -> None:
+        """成交回报落库（同一事务）：订单累计成交量/均价/费用，持仓按每笔成交增量更新"""
+        if not fills:
+            return
+        now = datetime.now()
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(
+                select(OrderModel).where(OrderModel.id.in_({f.order_id for f in fills}))
+            )).scalars().all()
+            by_id = {o.id: o for o in rows}
+            applied = []
+            for f in fills:
+                o = by_id.get(f.order_id)
+                if o is None:
+                    continue
+                fill_qty = f.quantity
+                if o.type == "SELL":
+                    # 兜底：持仓已被其他卖单占用时只成交持有部分，其余撤单，不允许卖空
+                    position = await self._position(session, o.stock_code)
+                    fill_qty = min(fill_qty, position.quantity if position else 0)
+                    if fill_qty < f.quantity:
+                        logger.warning(f"[OrderBook] 卖单 {o.id} 超过持仓，成交 {fill_qty}/{f.quantity}，其余撤销")
+                        self.book.cancel(o.id)
+                        o.status, o.updated_at = "CANCELLED", now
+                        if fill_qty <= 0:
+                            continue
+                prev_qty = o.filled_quantity or 0
+                prev_fee = o.total_fee or 0.0
+                qty = prev_qty + fill_qty
+                avg = ((o.filled_price or 0.0) * prev_qty + f.price * fill_qty) / qty
+                # 费用按订单累计成交额计（最低佣金按单收一次），本笔只计增量
+                fees = self._calculate_fees(o.type, avg, qty)
+                o.filled_quantity = qty
+                o.filled_price = round(avg, 4)
+                o.stamp_tax, o.commission = fees["stamp_tax"], fees["commission"]
+                o.transfer_fee, o.total_fee = fees["transfer_fee"], fees["total_fee"]
+                if f.done and fill_qty == f.quantity:
+                    o.status = "FILLED"
+                o.updated_at = now
+                fee = round(fees["total_fee"] - prev_fee, 2)
+                await self._apply_position(session, o.stock_code, o.stock_name, o.type, fill_qty, f.price, fee)
+                applied.append((o.stock_code, o.stock_name, o.type, fill_qty, f.price, fee))
+            await session.commit()
+            for args in applied:
+                self._snapshot_fill(*args)
+        logger.info(f"[OrderBook] 成交 {len(fills)} 笔: " + ", ".join(
+            f"{f.side} {f.code} x{f.quantity}@{f.price}" for f in fills[:5]
+        ))
+
+    async def _mark_cancelled(self, order_ids: List[str]) -> None:
+        if not order_ids:
+            return
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(OrderModel)
+                .where(OrderModel.id.in_(order_ids), OrderModel.status == "PENDING")
+                .values(status="CANCELLED", updated_at=datetime.now())
+            )
             await session.commit()
 
-    async def export_orders(self) -> List[dict]:
-        """导出订单为可序列化列表（用于 CSV 等）"""
-        orders = await self.get_orders()
-        return [
-            {
-                "id": o.id,
-                "stock_code": o.stock_code,
-                "stock_name": o.stock_name,
-                "type": o.type,
-                "order_type": o.order_type,
-                "price": o.price,
-                "quantity": o.quantity,
-                "status": o.status,
-                "filled_quantity": o.filled_quantity,
-                "filled_price": o.filled_price,
-                "stamp_tax": o.stamp_tax,
-                "commission": o.commission,
-                "transfer_fee": o.transfer_fee,
-                "total_fee": o.total_fee,
-                "slippage": o.slippage,
-                "created_at": o.created_at.isoformat() if o.created_at else "",
-                "updated_at": o.updated_at.isoformat() if o.updated_at else "",
-            }
-            for o in orders
-        ]
+    async def expire_orders(self, now: datetime) -> int:
+        """所属交易日已收盘的 DAY 单失效（撤销剩余部分）"""
+        dead = self.book.expire(self.calendar.next_open(now).date())
+        await self._mark_cancelled([o.order_id for o in dead])
+        if dead:
+            logger.info(f"[OrderBook] DAY 单到期撤销 {len(dead)} 笔")
+        return len(dead)
 
-    async def export_positions(self) -> List[dict]:
-        """导出持仓为可序列化列表（用于 CSV 等）"""
-        positions = await self.get_positions()
-        return [
-            {
-                "stock_code": p.stock_code,
-                "stock_name": p.stock_name,
-                "quantity": p.quantity,
-                "cost_price": p.cost_price,
-                "current_price": p.current_price,
-                "market_value": p.market_value,
-                "profit": p.profit,
-                "profit_percent": p.profit_percent,
-                "total_fees": p.total_fees,
-                "realized_profit": p.realized_profit,
-            }
-            for p in positions
-        ]
+    async def restore_order_book(self) -> int:
+        """启动时把库中 PENDING 限价单重新挂入订单簿（按下单先后）"""
+        if self._is_live():
+            return 0
+        async with AsyncReadSessionLocal() as session:
+            rows = (await session.execute(
+                select(OrderModel)
+                .where(OrderModel.status == "PENDING", OrderModel.order_type == "LIMIT")
+                .order_by(OrderModel.created_at)
+            )).scalars().all()
+        for o in rows:
+            if self.book.get(o.id) is not None:
+                continue
+            self.book.add(RestingOrder(
+                o.id, o.stock_code, o.type, o.price or 0.0, o.quantity, o.time_in_force or "DAY",
+                trade_date=self.calendar.next_open(o.created_at).date() if o.created_at else None,
+                filled=o.filled_quantity or 0,
+            ))
+        return len(rows)
+
+    async def _get_order(self, order_id: str) -> Optional[Order]:
+        async with AsyncReadSessionLocal() as session:
+            row = await session.get(OrderModel, order_id)
+            return Order.model_validate(row) if row else None
+
+    async def export_orders(
+        self,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        stock_code: Optional[str] = None,
+        status: Optional[str] = None,
+        include_archived: bool = True,
+    ) -> AsyncIterator[dict]:
+        """
+        流式导出订单（新→旧）：按 (created_at, id) 键集分页，每页 EXPORT_YIELD_PER 行、
+        各用一个短读会话，下载期间不长期占用读连接池；内存占用与历史订单总量无关。日期区间含首尾。
+        include_archived 时热表之后续接保留策略归档的更早月份（逐月读入）。
+        """
+        t = OrderModel.__table__
+        stmt = select(t).order_by(t.c.created_at.desc(), t.c.id.desc()).limit(EXPORT_YIELD_PER)
+        if start_date:
+            stmt = stmt.where(t.c.created_at >= datetime.combine(start_date, datetime.min.time()))
+        if end_date:
+            stmt = stmt.where(t.c.created_at < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        if stock_code:
+            stmt = stmt.where(t.c.stock_code == stock_code)
+        if status:
+            stmt = stmt.where(t.c.status == status)
+
+        cursor = None
+        while True:
+            page = stmt if cursor is None else stmt.where(tuple_(t.c.created_at, t.c.id) < cursor)
+            async with AsyncReadSessionLocal() as session:
+                rows = (await session.execute(page)).mappings().all()
+            for row in rows:
+                out = {f: row[f] for f in ORDER_EXPORT_FIELDS}
+                for f in ("created_at", "updated_at"):
+                    out[f] = out[f].isoformat() if out[f] else ""
+                yield out
+            if len(rows) < EXPORT_YIELD_PER:
+                break
+            cursor = tuple_(rows[-1]["created_at"], rows[-1]["id"])
+
+        if include_archived:
+            async for out in self._export_archived_orders(start_date, end_date, stock_code, status):
+                yield out
+
+    async def _export_archived_orders(
+        self,
+        start_date: Optional[date],
+        end_date: Optional[date],
+        stock_code: Optional[str],
+        status: Optional[str],
+    ) -> AsyncIterator[dict]:
+        """保留策略归档的订单：逐月读入、按日期区间与等值条件过滤"""
+        retention = RetentionService()
+        filters = {k: v for k, v in (("stock_code", stock_code), ("status", status)) if v}
+        lo = start_date.isoformat() if start_date else ""
+        hi = (end_date + timedelta(days=1)).isoformat() if end_date else ""
+        months = retention.archived_months(
+            "orders", f"{start_date:%Y-%m}" if start_date else None, f"{end_date:%Y-%m}" if end_date else None,
+        )
+        for month in months:
+            rows = await asyncio.to_thread(retention.read_month_desc, "orders", month, filters)
+            for row in rows:
+                created = str(row.get("created_at") or "")
+                if (lo and created < lo) or (hi and created >= hi):
+                    continue
+                yield self._archived_export_row(row)
+
+    @staticmethod
+    def _archived_export_row(row: dict) -> dict:
+        out = {f: row.get(f) for f in ORDER_EXPORT_FIELDS}
+        for f in ("created_at", "updated_at"):
+            out[f] = out[f] or ""
+        return out
+
+    async def export_positions(self, stock_code: Optional[str] = None) -> AsyncIterator[dict]:
+        """导出持仓（持仓数有限，估值需一次批量行情，整体取回后逐行 yield）"""
+        for p in await self.get_positions():
+            if stock_code and p.stock_code != stock_code:
+                continue
+            yield {f: getattr(p, f) for f in POSITION_EXPORT_FIELDS}
 
     async def _save_order(self, order: Order):
         """保存订单到数据库"""
@@ -393,11 +657,14 @@ class TradeService:
                 status=order.status,
                 filled_quantity=order.filled_quantity,
                 filled_price=order.filled_price,
+                time_in_force=order.time_in_force,
                 stamp_tax=order.stamp_tax,
                 commission=order.commission,
                 transfer_fee=order.transfer_fee,
                 total_fee=order.total_fee,
                 slippage=order.slippage,
+                created_at=order.created_at,
+                updated_at=order.updated_at,
             )
             session.add(order_model)
             await session.commit()
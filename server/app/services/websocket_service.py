@@ -1,17 +1,30 @@
 """
 WebSocket服务
+- ConnectionManager：频道连接 + 按代码的行情订阅（连接 -> 代码、代码 -> 连接 双向索引）
+- QuotePoller：单一后台轮询，每 WS_QUOTE_POLL_SEC 秒对全部订阅代码的并集取一次行情，
+  只把有变化的报价推给订阅了该代码的连接；上游请求量只与不同代码数有关，与连接数无关
 """
 
+import asyncio
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
 from fastapi import WebSocket, WebSocketDisconnect
 from loguru import logger
-from typing import Dict, Set
+
+from app.core.config import settings
+from app.services.market_data_service import MarketDataService
 
 
 class ConnectionManager:
     """WebSocket连接管理器"""
 
-    def __init__(self):
+    def __init__(self, market_service: Optional[MarketDataService] = None):
         self.active_connections: Dict[str, Set[WebSocket]] = {}
+        self.market_service = market_service or MarketDataService()
+        self.subscriptions: Dict[WebSocket, Set[str]] = {}      # 连接 -> 订阅键
+        self.subscribers: Dict[str, Set[WebSocket]] = {}        # 订阅键 -> 连接
+        self.codes: Dict[str, str] = {}                         # 订阅键 -> 请求行情用的原始代码
+        self.changed = asyncio.Event()                          # 出现新订阅键时唤醒轮询
 
     async def connect(self, websocket: WebSocket, channel: str = "default"):
         """连接WebSocket（接受任意Origin）"""
@@ -22,11 +35,80 @@ class ConnectionManager:
         logger.info(f"WebSocket connected to channel: {channel}")
 
     def disconnect(self, websocket: WebSocket, channel: str = "default"):
-        """断开WebSocket连接"""
+        """断开WebSocket连接（同时退订全部代码）"""
         if channel in self.active_connections:
             self.active_connections[channel].discard(websocket)
+        self.unsubscribe(websocket)
         logger.info(f"WebSocket disconnected from channel: {channel}")
 
+    # ── 行情订阅 ──────────────────────────────────────
+    def subscribe(self, websocket: WebSocket, codes: Iterable[str]) -> List[str]:
+        """订阅代码，返回实际生效的键（超出 WS_MAX_CODES_PER_CONN 的部分忽略）"""
+        mine = self.subscriptions.setdefault(websocket, set())
+        added, new_key = [], False
+        for code in codes:
+            code = str(code or "").strip()
+            if not code:
+                continue
+            key = self.market_service.quote_key(code)
+            if key not in mine and len(mine) >= settings.WS_MAX_CODES_PER_CONN:
+                continue
+            mine.add(key)
+            if key not in self.subscribers:
+                self.subscribers[key] = set()
+                self.codes[key] = code
+                new_key = True
+            self.subscribers[key].add(websocket)
+            added.append(key)
+        if new_key:
+            self.changed.set()
+        return added
+
+    def unsubscribe(self, websocket: WebSocket, codes: Optional[Iterable[str]] = None) -> None:
+        """退订指定代码；codes 为 None 时退订该连接的全部代码"""
+        mine = self.subscriptions.get(websocket)
+        if not mine:
+            self.subscriptions.pop(websocket, None)
+            return
+        keys = set(mine) if codes is None else {self.market_service.quote_key(str(c)) for c in codes}
+        for key in keys & mine:
+            mine.discard(key)
+            subs = self.subscribers.get(key)
+            if subs is not None:
+                subs.discard(websocket)
+                if not subs:
+                    del self.subscribers[key]
+                    self.codes.pop(key, None)
+        if not mine:
+            del self.subscriptions[websocket]
+
+    def subscribed_codes(self) -> Dict[str, str]:
+        """{订阅键: 原始代码}，即轮询要取的代码并集"""
+        return dict(self.codes)
+
+    async def push(self, key: str, message: dict) -> int:
+        """
+        推给订阅了该键的连接；发送失败的连接整体退订并关闭，
+        客户端收到 close 后回退到轮询，而不是停在一条不再推送的连接上。返回送达数
+        """
+        sent, dead = 0, []
+        for ws in list(self.subscribers.get(key, ())):
+            try:
+                await ws.send_json(message)
+                sent += 1
+            except Exception as e:
+                logger.warning(f"[WS] 推送失败，关闭该连接: {e}")
+                dead.append(ws)
+        for ws in dead:
+            for conns in self.active_connections.values():
+                conns.discard(ws)
+            self.unsubscribe(ws)
+            try:
+                await ws.close(code=1011)
+            except Exception:
+                pass    # 已断开的连接 close 会再失败，忽略
+        return sent
+
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         """发送个人消息"""
         await websocket.send_json(message)
@@ -46,7 +128,92 @@ class ConnectionManager:
                 self.active_connections[channel].discard(conn)
 
 
+class QuotePoller:
+    """行情扇出轮询：无订阅时挂起，有订阅时按间隔批量取价并只推送变化"""
+
+    def __init__(self, manager: ConnectionManager):
+        self.manager = manager
+        self._last: Dict[str, Tuple[tuple, dict]] = {}          # 订阅键 -> (变化判定签名, 最近报价)
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _signature(quote: dict) -> tuple:
+        return quote.get("price"), quote.get("volume"), quote.get("amount"), quote.get("high"), quote.get("low")
+
+    def latest(self, key: str) -> Optional[dict]:
+        hit = self._last.get(key)
+        return hit[1] if hit else None
+
+    async def poll_once(self) -> int:
+        """取一次订阅并集的行情，推送有变化的报价，返回推送条数"""
+        codes = self.manager.subscribed_codes()
+        for key in set(self._last) - set(codes):
+            del self._last[key]
+        if not codes:
+            return 0
+        stocks = await self.manager.market_service.get_realtime_data(list(codes.values()))
+        pushed = 0
+        for s in stocks:
+            key = self.manager.market_service.quote_key(s.code)
+            if key not in codes:
+                continue
+            quote = s.model_dump(mode="json")
+            sig = self._signature(quote)
+            prev = self._last.get(key)
+            if prev is not None and prev[0] == sig:
+                continue
+            self._last[key] = (sig, quote)
+            pushed += await self.manager.push(key, {"type": "market_data", "data": quote})
+        return pushed
+
+    async def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"[WS] 行情推送轮询已启动，间隔 {settings.WS_QUOTE_POLL_SEC:g} 秒")
+
+    async def stop(self) -> None:
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self) -> None:
+        changed = self.manager.changed
+        while self._running:
+            try:
+                changed.clear()
+                if not self.manager.subscribers:
+                    await changed.wait()
+                    continue
+                await self.poll_once()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"[WS] 行情推送轮询异常: {e}")
+            # 间隔内出现新订阅代码则提前取一次，新代码不必等满一个周期
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=settings.WS_QUOTE_POLL_SEC)
+            except asyncio.TimeoutError:
+                pass
+
+
 manager = ConnectionManager()
+quote_poller = QuotePoller(manager)
+
+
+def _codes(data) -> List[str]:
+    """subscribe / unsubscribe 的 data 兼容 {"codes": [...]}、[...] 与单个代码字符串"""
+    if isinstance(data, dict):
+        data = data.get("codes") or data.get("code") or []
+    if isinstance(data, str):
+        data = [data]
+    return [str(c) for c in data or []]
 
 
 def setup_websocket(app):
@@ -58,13 +225,26 @@ def setup_websocket(app):
             while True:
                 data = await websocket.receive_json()
                 if data.get("type") == "subscribe":
-                    logger.info(f"Subscribe to: {data.get('data')}")
+                    codes = _codes(data.get("data"))
+                    keys = manager.subscribe(websocket, codes)
+                    # 超出 WS_MAX_CODES_PER_CONN 未生效的原始代码：客户端对这些代码继续轮询
+                    mine = manager.subscriptions.get(websocket, set())
+                    rejected = [c for c in codes if c.strip() and manager.market_service.quote_key(c.strip()) not in mine]
                     await manager.send_personal_message(
-                        {"type": "subscribed", "data": data.get("data")},
+                        {"type": "subscribed", "data": {"codes": keys, "rejected": rejected}},
                         websocket
                     )
+                    # 已在轮询中的代码立即补发最近报价，不必等下一次变化
+                    for key in keys:
+                        quote = quote_poller.latest(key)
+                        if quote is not None:
+                            await manager.send_personal_message({"type": "market_data", "data": quote}, websocket)
                 elif data.get("type") == "unsubscribe":
-                    logger.info(f"Unsubscribe from: {data.get('data')}")
+                    manager.unsubscribe(websocket, _codes(data.get("data")))
+                    await manager.send_personal_message(
+                        {"type": "unsubscribed", "data": {"codes": _codes(data.get("data"))}},
+                        websocket
+                    )
                 elif data.get("type") == "ping":
                     await manager.send_personal_message(
                         {"type": "pong", "data": {}},
@@ -0,0 +1,79 @@
+"""
+K 线日期索引
+- 日期转为 ordinal 整数，有序数组上 bisect 做 O(log n) 区间定位
+- date → 首个 bar 下标的 O(1) 映射（分钟 K 同一天多根时取当天第一根）
+- KlineSeries：行情适配器返回的 K 线列表，附带惰性构建的索引；切片后为普通 list
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+
+def _ordinal(d: str) -> int:
+    return date.fromisoformat(d[:10]).toordinal()
+
+
+class DateIndex:
+    """按 bar 顺序排列（升序）的日期索引"""
+    __slots__ = ("dates", "ordinals", "_pos")
+
+    def __init__(self, kline: List[dict]):
+        self.dates: List[str] = [k["date"][:10] for k in kline]
+        self.ordinals: List[int] = [_ordinal(d) for d in self.dates]
+        pos: Dict[str, int] = {}
+        for i, d in enumerate(self.dates):
+            pos.setdefault(d, i)
+        self._pos = pos
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def index_of(self, d: str) -> Optional[int]:
+        """日期 → 当天首个 bar 下标；不存在返回 None"""
+        return self._pos.get(d[:10])
+
+    def first_at_or_after(self, d: str) -> int:
+        """首个日期 >= d 的下标（全部早于 d 时返回 len）"""
+        return bisect_left(self.ordinals, _ordinal(d))
+
+    def last_at_or_before(self, d: str) -> int:
+        """最后一个日期 <= d 的下标（全部晚于 d 时返回 -1）"""
+        return bisect_right(self.ordinals, _ordinal(d)) - 1
+
+    def range(self, start: str, end: str) -> Tuple[int, int]:
+        """[start, end] 闭区间日期对应的半开下标区间 [lo, hi)"""
+        lo = self.first_at_or_after(start)
+        hi = bisect_right(self.ordinals, _ordinal(end))
+        return lo, max(lo, hi)
+
+
+class KlineSeries(list):
+    """带日期索引的 K 线列表（元素仍为 dict，兼容所有按 list 使用的调用方）"""
+
+    _date_index: Optional[DateIndex] = None
+
+    @property
+    def date_index(self) -> DateIndex:
+        idx = self._date_index
+        if idx is None or len(idx) != len(self):
+            idx = self._date_index = DateIndex(self)
+        return idx
+
+
+def as_kline_series(kline: List[dict]) -> KlineSeries:
+    """包装为 KlineSeries（浅拷贝引用），使后续多次区间查询共用同一份索引"""
+    return kline if isinstance(kline, KlineSeries) else KlineSeries(kline)
+
+
+def date_index_of(kline: List[dict]) -> DateIndex:
+    """取 K 线的日期索引：KlineSeries 复用缓存，普通 list 现建"""
+    if isinstance(kline, KlineSeries):
+        return kline.date_index
+    return DateIndex(kline)
+
+
+def slice_by_date(kline: List[dict], start: str, end: str) -> List[dict]:
+    """按 [start, end] 日期闭区间切片（等价于逐根比较 date[:10]，但为 O(log n)）"""
+    lo, hi = date_index_of(kline).range(start, end)
+    return kline[lo:hi]
@@ -0,0 +1,60 @@
+"""
+流式导出编码：异步行迭代 → CSV / NDJSON 文本块 → （可选 gzip）字节块
+每批 batch 行拼成一个块，内存只与批大小有关，与导出总行数无关。
+"""
+
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterable, AsyncIterator, List, Optional
+
+_BATCH = 500
+
+
+async def csv_chunks(
+    rows: AsyncIterable[dict], fieldnames: List[str], bom: bool = True, batch: int = _BATCH
+) -> AsyncIterator[str]:
+    """表头 + 逐批行；bom=True 时以 UTF-8 BOM 开头便于 Excel 打开"""
+    buf = io.StringIO()
+    if bom:
+        buf.write("\ufeff")
+    writer = csv.DictWriter(buf, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+    n = 0
+    async for row in rows:
+        writer.writerow(row)
+        n += 1
+        if n % batch == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+async def ndjson_chunks(
+    rows: AsyncIterable[dict], extra: Optional[dict] = None, batch: int = _BATCH
+) -> AsyncIterator[str]:
+    """每行一个 JSON 对象；extra 合并进每行（如 {"record": "order"}）"""
+    lines: List[str] = []
+    async for row in rows:
+        lines.append(json.dumps({**(extra or {}), **row}, ensure_ascii=False, default=str))
+        if len(lines) >= batch:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+async def encode_chunks(chunks: AsyncIterable[str], gzip: bool = False) -> AsyncIterator[bytes]:
+    """UTF-8 编码；gzip=True 时增量压缩为单个 gzip 流"""
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+    async for text in chunks:
+        data = text.encode("utf-8")
+        if comp is not None:
+            data = comp.compress(data)
+        if data:
+            yield data
+    if comp is not None:
+        yield comp.flush()
@@ -0,0 +1,45 @@
+"""
+异步限流器：并发上限 + 令牌桶速率限制
+用法：
+    limiter = AsyncRateLimiter(rate_per_sec=10, concurrency=8)
+    async with limiter:
+        await fetch(...)
+"""
+
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    def __init__(self, rate_per_sec: float, concurrency: int = 8, burst: int = 1):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec > 0 else 0.0
+        self.burst = max(1, burst)
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+        self._lock = asyncio.Lock()
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+
+    async def _take(self) -> None:
+        if self.interval <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) / self.interval)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) * self.interval)
+
+    async def __aenter__(self) -> "AsyncRateLimiter":
+        await self._sem.acquire()
+        try:
+            await self._take()
+        except BaseException:
+            self._sem.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._sem.release()
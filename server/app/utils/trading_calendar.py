@@ -0,0 +1,144 @@
+"""
+交易所日历（A股 / 港股）
+- 数据来自 app/data/trading_calendar.json：交易时段、休市日（工作日）、半日市
+- 周末恒休市；超出 covered_until 的日期退化为"工作日即交易日"并告警一次
+- 提供交易日判断、当日交易时段、是否开市、下一次开市/收盘时间
+"""
+
+import json
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from loguru import logger
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "data" / "trading_calendar.json"
+
+DateLike = Union[date, datetime, str]
+
+
+def _as_date(d: DateLike) -> date:
+    if isinstance(d, datetime):
+        return d.date()
+    if isinstance(d, date):
+        return d
+    return date.fromisoformat(str(d)[:10])
+
+
+def _hm(s: str) -> time:
+    h, m = s.split(":")
+    return time(int(h), int(m))
+
+
+def market_of(code: str) -> str:
+    """股票代码 → 市场：hk 前缀或 5 位纯数字为港股，其余按 A 股"""
+    c = (code or "").strip().lower()
+    if c.startswith("hk") or (c.isdigit() and len(c) == 5):
+        return "hk"
+    return "cn"
+
+
+class _Market:
+    __slots__ = ("sessions", "holidays", "half_days", "covered_until", "_warned")
+
+    def __init__(self, spec: dict):
+        self.sessions: List[Tuple[time, time]] = [(_hm(a), _hm(b)) for a, b in spec["sessions"]]
+        self.holidays = {date.fromisoformat(d) for d in spec.get("holidays", [])}
+        self.half_days: Dict[date, time] = {
+            date.fromisoformat(d): _hm(t) for d, t in (spec.get("half_days") or {}).items()
+        }
+        cu = spec.get("covered_until")
+        self.covered_until: Optional[date] = date.fromisoformat(cu) if cu else None
+        self._warned = False
+
+
+class TradingCalendar:
+
+    def __init__(self, data: dict):
+        self._markets = {k: _Market(v) for k, v in data["markets"].items()}
+
+    @classmethod
+    def load(cls, path: Optional[Union[str, Path]] = None) -> "TradingCalendar":
+        with open(path or DEFAULT_PATH, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _market(self, market: str) -> _Market:
+        try:
+            return self._markets[market]
+        except KeyError:
+            raise ValueError(f"未知市场: {market}")
+
+    # ── 交易日 ────────────────────────────────────────
+    def is_trading_day(self, d: DateLike, market: str = "cn") -> bool:
+        d = _as_date(d)
+        if d.weekday() >= 5:
+            return False
+        m = self._market(market)
+        if m.covered_until and d > m.covered_until and not m._warned:
+            m._warned = True
+            logger.warning(f"[Calendar] {market} 日历只覆盖到 {m.covered_until}，之后按工作日处理，请更新数据文件")
+        return d not in m.holidays
+
+    def next_trading_day(self, d: DateLike, market: str = "cn") -> date:
+        """严格晚于 d 的下一个交易日"""
+        d = _as_date(d) + timedelta(days=1)
+        while not self.is_trading_day(d, market):
+            d += timedelta(days=1)
+        return d
+
+    def prev_trading_day(self, d: DateLike, market: str = "cn") -> date:
+        """严格早于 d 的上一个交易日"""
+        d = _as_date(d) - timedelta(days=1)
+        while not self.is_trading_day(d, market):
+            d -= timedelta(days=1)
+        return d
+
+    # ── 交易时段 ──────────────────────────────────────
+    def sessions(self, d: DateLike, market: str = "cn") -> List[Tuple[datetime, datetime]]:
+        """当日交易时段（本地时间），非交易日为空；半日市截断到收市时间"""
+        d = _as_date(d)
+        if not self.is_trading_day(d, market):
+            return []
+        m = self._market(market)
+        cutoff = m.half_days.get(d)
+        out = []
+        for start, end in m.sessions:
+            if cutoff is not None:
+                if start >= cutoff:
+                    break
+                end = min(end, cutoff)
+            out.append((datetime.combine(d, start), datetime.combine(d, end)))
+        return out
+
+    def close_time(self, d: DateLike, market: str = "cn") -> Optional[datetime]:
+        s = self.sessions(d, market)
+        return s[-1][1] if s else None
+
+    def is_open(self, dt: datetime, market: str = "cn") -> bool:
+        """dt 是否处于连续交易时段内（含收盘时刻，午休不算）"""
+        return any(a <= dt <= b for a, b in self.sessions(dt, market))
+
+    def next_open(self, dt: datetime, market: str = "cn") -> datetime:
+        """dt 之后（含 dt）最近一个交易时段的开始时间；dt 在时段内时返回 dt"""
+        for a, b in self.sessions(dt, market):
+            if dt <= b:
+                return max(a, dt)
+        d = self.next_trading_day(dt, market)
+        return self.sessions(d, market)[0][0]
+
+    def is_bar_final(self, bar_date: DateLike, now: Optional[datetime] = None, market: str = "cn") -> bool:
+        """日K是否已收定：早于今天，或今天且已收盘"""
+        now = now or datetime.now()
+        d = _as_date(bar_date)
+        if d < now.date():
+            return True
+        if d > now.date():
+            return False
+        close = self.close_time(d, market)
+        return close is None or now >= close
+
+
+@lru_cache(maxsize=1)
+def get_calendar() -> TradingCalendar:
+    return TradingCalendar.load()
@@ -6,20 +6,72 @@ import os
 import sys
 import subprocess
 import asyncio
+import time
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from loguru import logger
 import uvicorn
 
 from app.core.config import settings
-from app.core.database import init_db, AsyncSessionLocal
+from app.core.database import init_db, engine, migrate_indexes, AsyncSessionLocal
+from app.core.instrumentation import HTTP_IN_FLIGHT, HTTP_REQUEST_SECONDS
+from app.core.metrics import REGISTRY
 from sqlalchemy import text
 from app.api.routes import market, strategy, trade, backtest
-from app.api.routes import auto_trade, advice
-from app.services.websocket_service import setup_websocket
+from app.api.routes import auto_trade, advice, archive
+from app.services.websocket_service import quote_poller, setup_websocket
 from app.services.auto_scheduler import get_scheduler
+from app.services.order_book import SimOrderMatcher
+
+# 会话成交统计回填（与 AutoTradeService 增量维护口径一致）
+STATS_BACKFILL_SQL = """
+UPDATE auto_trade_sessions SET
+    stats_trades = (SELECT COUNT(*) FROM auto_trade_signals s
+                    WHERE s.session_id = auto_trade_sessions.id AND s.executed = 1 AND s.signal = 'SELL'),
+    stats_wins = (SELECT COUNT(*) FROM auto_trade_signals s
+                  WHERE s.session_id = auto_trade_sessions.id AND s.executed = 1 AND s.signal = 'SELL'
+                    AND s.profit > 0),
+    stats_realized_profit = (SELECT COALESCE(SUM(s.profit), 0) FROM auto_trade_signals s
+                             WHERE s.session_id = auto_trade_sessions.id AND s.executed = 1
+                               AND s.signal = 'SELL'),
+    stats_total_fees = (SELECT COALESCE(SUM(s.fees), 0) FROM auto_trade_signals s
+                        WHERE s.session_id = auto_trade_sessions.id AND s.executed = 1)
+"""
+
+# 推荐活跃快照回填：为尚无快照的历史日期补一行（幂等）
+SNAPSHOT_BACKFILL_SQL = """
+INSERT INTO recommendation_snapshots (date, active_ids_json, updated_at)
+SELECT d.date,
+       (SELECT json_group_array(h.id) FROM recommendation_history h
+        WHERE h.date = d.date AND h.status IN ('new', 'holding')),
+       CURRENT_TIMESTAMP
+FROM (SELECT DISTINCT date FROM recommendation_history) d
+WHERE d.date NOT IN (SELECT date FROM recommendation_snapshots)
+"""
+
+# 会话股票池 / 策略映射 JSON → auto_trade_session_stocks（仅迁移尚无行的会话，幂等）
+SESSION_STOCKS_MIGRATE_SQL = """
+INSERT OR IGNORE INTO auto_trade_session_stocks
+    (session_id, stock_code, seq, strategy, short_window, long_window, label, confidence,
+     train_return_pct, test_return_pct, test_alpha_pct, updated_at)
+SELECT s.id, c.value, c.key,
+       COALESCE(json_extract(m.value, '$.strategy'), ''),
+       COALESCE(json_extract(m.value, '$.short_window'), 0),
+       COALESCE(json_extract(m.value, '$.long_window'), 0),
+       COALESCE(json_extract(m.value, '$.label'), ''),
+       COALESCE(json_extract(m.value, '$.confidence'), 0),
+       COALESCE(json_extract(m.value, '$.train_return_pct'), 0),
+       COALESCE(json_extract(m.value, '$.test_return_pct'), 0),
+       COALESCE(json_extract(m.value, '$.test_alpha_pct'), 0),
+       CURRENT_TIMESTAMP
+FROM auto_trade_sessions s
+JOIN json_each(CASE WHEN json_valid(s.stock_codes_json) THEN s.stock_codes_json ELSE '[]' END) c
+LEFT JOIN json_each(CASE WHEN json_valid(s.strategy_map_json) THEN s.strategy_map_json ELSE '{}' END) m
+       ON m.key = c.value
+WHERE NOT EXISTS (SELECT 1 FROM auto_trade_session_stocks t WHERE t.session_id = s.id)
+"""
 
 # 券商网关默认端口（与 broker_gateway 一致）
 BROKER_GATEWAY_PORT = 7070
@@ -82,10 +134,18 @@ async def lifespan(app: FastAPI):
         ("group_id",            "TEXT",    "''"),
         ("data_scale",          "INTEGER", "240"),
         ("execution_mode",      "TEXT",    "'sim'"),
+        ("stats_trades",        "INTEGER", "0"),
+        ("stats_wins",          "INTEGER", "0"),
+        ("stats_realized_profit", "REAL",  "0"),
+        ("stats_total_fees",    "REAL",    "0"),
     ]
     position_columns = [
         ("entry_date", "TEXT", "''"),
     ]
+    order_columns = [
+        ("time_in_force", "TEXT", "'DAY'"),
+    ]
+    added_columns = set()
     async with AsyncSessionLocal() as _db:
         for col, col_type, default in session_columns:
             try:
@@ -93,9 +153,15 @@ async def lifespan(app: FastAPI):
                     text(f"ALTER TABLE auto_trade_sessions ADD COLUMN {col} {col_type} DEFAULT {default}")
                 )
                 await _db.commit()
+                added_columns.add(col)
                 logger.info(f"[Migration] 新增列 auto_trade_sessions.{col}")
             except Exception:
                 pass  # 列已存在，忽略
+        if "stats_trades" in added_columns:
+            # 成交统计列首次加入：按历史信号回填一次，之后由每次运行的事务增量维护
+            await _db.execute(text(STATS_BACKFILL_SQL))
+            await _db.commit()
+            logger.info("[Migration] 已回填 auto_trade_sessions 成交统计")
         for col, col_type, default in position_columns:
             try:
                 await _db.execute(
@@ -105,12 +171,46 @@ async def lifespan(app: FastAPI):
                 logger.info(f"[Migration] 新增列 auto_trade_positions.{col}")
             except Exception:
                 pass  # 列已存在，忽略
+        for col, col_type, default in order_columns:
+            try:
+                await _db.execute(text(f"ALTER TABLE orders ADD COLUMN {col} {col_type} DEFAULT {default}"))
+                await _db.commit()
+                logger.info(f"[Migration] 新增列 orders.{col}")
+            except Exception:
+                pass  # 列已存在，忽略
+
+    # DB 迁移：补建热点查询的复合索引；被复合索引取代的单列索引删除
+    async with engine.begin() as _conn:
+        await _conn.run_sync(
+            migrate_indexes,
+            (
+                "ix_auto_trade_signals_session_id", "ix_auto_trade_positions_session_id",
+                "ix_recommendation_history_date", "ix_recommendation_history_stock_code",
+            ),
+        )
+        n = (await _conn.execute(text(SNAPSHOT_BACKFILL_SQL))).rowcount
+        if n:
+            logger.info(f"[Migration] 回填推荐活跃快照 {n} 天")
+        n = (await _conn.execute(text(SESSION_STOCKS_MIGRATE_SQL))).rowcount
+        if n:
+            logger.info(f"[Migration] 会话股票池 JSON 迁移为按股行 {n} 条")
+    logger.info("[Migration] 索引检查完成")
 
     # 启动全自动交易调度器
     scheduler = get_scheduler()
     scheduler.start()
     app.state.auto_scheduler = scheduler
 
+    # 模拟限价单撮合（实盘由券商撮合）
+    app.state.order_matcher = None
+    if settings.TRADING_MODE != "live":
+        matcher = SimOrderMatcher(trade.trade_service)
+        await matcher.start()
+        app.state.order_matcher = matcher
+
+    # WebSocket 行情推送（无订阅时挂起）
+    await quote_poller.start()
+
     app.state.broker_gateway_process = None
     if (
         settings.TRADING_MODE == "live"
@@ -128,6 +228,9 @@ async def lifespan(app: FastAPI):
     # 停止调度器
     if getattr(app.state, "auto_scheduler", None) is not None:
         await app.state.auto_scheduler.stop()
+    if getattr(app.state, "order_matcher", None) is not None:
+        await app.state.order_matcher.stop()
+    await quote_poller.stop()
 
     if getattr(app.state, "broker_gateway_process", None) is not None:
         try:
@@ -157,12 +260,39 @@ app.add_middleware(
 )
 
 
-# 请求日志中间件
+# endpoint → 路由模板（/api/v1/backtest/{backtest_id}），避免按原始路径产生高基数标签
+_route_templates: dict = {}
+
+
+def _route_label(request: Request) -> str:
+    endpoint = request.scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    label = _route_templates.get(endpoint)
+    if label is None:
+        label = next(
+            (r.path for r in app.routes if getattr(r, "endpoint", None) is endpoint), "unmatched"
+        )
+        _route_templates[endpoint] = label
+    return label
+
+
+# 请求日志 + 延迟指标中间件
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     logger.info(f"{request.method} {request.url.path}")
-    response = await call_next(request)
-    return response
+    HTTP_IN_FLIGHT.inc()
+    t0 = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - t0, request.method, _route_label(request), status
+        )
 
 
 # 健康检查
@@ -175,6 +305,12 @@ async def health_check():
     }
 
 
+# Prometheus 抓取端点
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # 注册路由
 app.include_router(market.router, prefix="/api/v1/market", tags=["行情数据"])
 app.include_router(strategy.router, prefix="/api/v1/strategy", tags=["策略推荐"])
@@ -182,6 +318,7 @@ app.include_router(trade.router, prefix="/api/v1/trade", tags=["交易执行"])
 app.include_router(backtest.router, prefix="/api/v1/backtest", tags=["策略回测"])
 app.include_router(auto_trade.router, prefix="/api/v1/auto-trade", tags=["全自动交易"])
 app.include_router(advice.router, prefix="/api/v1/advice", tags=["每日交易建议"])
+app.include_router(archive.router, prefix="/api/v1/archive", tags=["数据归档"])
 
 # 设置WebSocket
 setup_websocket(app)
@@ -0,0 +1,18 @@
+"""
+性能基准（不联网，使用合成 K 线）
+运行（仓库根目录）：python -m tests.benchmark.<模块>
+- run_suite               : 全部计算路径的耗时 + 峰值内存，输出 JSON（跨版本回归对比）
+- bench_backtest_records  : 回测成交/权益记录环节的专项对比
+"""
+
+import os
+import sys
+import tempfile
+
+# 基准脚本直接导入 server/app
+_SERVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "server")
+if _SERVER_DIR not in sys.path:
+    sys.path.insert(0, _SERVER_DIR)
+
+# 避免在仓库根目录创建 ./data/quant_free.db
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.gettempdir(), "quant_free_bench.db"))
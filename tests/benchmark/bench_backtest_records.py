@@ -0,0 +1,80 @@
+"""
+回测热路径记录开销基准：一次"选股"= N 只股票 × 16 策略 × (训练 + 测试) 回测
+records_s 只统计成交/权益记录相关环节（_execute + _calculate_metrics + _build_equity_points），
+total_s 为整轮 run_test_with_kline（含指标计算）。
+对比重构前后请在两个版本上分别运行。
+
+python -m tests.benchmark.bench_backtest_records [--stocks 5] [--bars 750] [--repeat 3]
+"""
+
+import argparse
+import functools
+import json
+import time
+
+from loguru import logger
+
+from tests.benchmark.synthetic import gbm_kline
+from app.schemas.strategy_test import StrategyTestParams
+from app.services.strategy_test_service import StrategyTestService
+
+_RECORD_STAGES = ("_execute", "_calculate_metrics")
+
+
+def _timed(fn, acc: dict):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            acc["records_s"] += time.perf_counter() - t0
+    return wrapper
+
+
+def run(stocks: int, bars: int, repeat: int) -> dict:
+    svc = StrategyTestService()
+    acc = {"records_s": 0.0}
+    for name in _RECORD_STAGES:
+        setattr(svc.backtest_service, name, _timed(getattr(svc.backtest_service, name), acc))
+    svc._build_equity_points = _timed(svc._build_equity_points, acc)
+
+    klines = [gbm_kline(bars, seed=i) for i in range(stocks)]
+    params = [
+        StrategyTestParams(
+            stock_code=f"{600000 + i}",
+            start_date=k[0]["date"], end_date=k[-1]["date"],
+        )
+        for i, k in enumerate(klines)
+    ]
+    best = None
+    for _ in range(repeat):
+        acc["records_s"] = 0.0
+        t0 = time.perf_counter()
+        for p, k in zip(params, klines):
+            svc.run_test_with_kline(p, k, p.stock_code)
+        total = time.perf_counter() - t0
+        if best is None or acc["records_s"] < best[1]:
+            best = (total, acc["records_s"])
+    return {
+        "stocks": stocks,
+        "bars": bars,
+        "repeat": repeat,
+        "total_s": round(best[0], 4),
+        "records_s": round(best[1], 4),
+        "records_ms_per_stock": round(best[1] / stocks * 1000, 3),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stocks", type=int, default=5)
+    ap.add_argument("--bars", type=int, default=750)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    logger.remove()
+    print(json.dumps(run(args.stocks, args.bars, args.repeat), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
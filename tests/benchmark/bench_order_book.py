@@ -0,0 +1,89 @@
+"""
+模拟订单簿撮合基准：单代码挂 N 笔限价单（买卖各半，价位随机分布），随后推送一串随机游走报价
+match_us_per_quote 为每次报价撮合的平均耗时（含成交回报生成），另测挂单 / 撤单吞吐。
+纯内存，不落库不联网。
+
+python -m tests.benchmark.bench_order_book [--orders 5000] [--quotes 2000] [--levels 200] [--repeat 3]
+"""
+
+import argparse
+import json
+import random
+import time
+
+from app.services.order_book import OrderBook, RestingOrder
+
+
+def _orders(n: int, levels: int, seed: int):
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        side = "BUY" if i % 2 == 0 else "SELL"
+        # 买单挂在 10 元下方、卖单挂在上方，报价游走时逐步穿越
+        tick = rnd.randint(1, levels) * 0.01
+        limit = 10.0 - tick if side == "BUY" else 10.0 + tick
+        out.append(RestingOrder(f"o{i}", "600519", side, round(limit, 2), rnd.choice((100, 200, 500))))
+    return out
+
+
+def _quotes(n: int, levels: int, seed: int):
+    rnd = random.Random(seed + 1)
+    px, out = 10.0, []
+    for _ in range(n):
+        px = min(max(px + rnd.choice((-0.01, 0.0, 0.01)) * rnd.randint(1, 5), 10.0 - levels * 0.01),
+                 10.0 + levels * 0.01)
+        out.append((round(px, 2), rnd.choice((None, 300, 1000))))
+    return out
+
+
+def run(orders: int, quotes: int, levels: int, repeat: int) -> dict:
+    best = None
+    for r in range(repeat):
+        book = OrderBook()
+        batch = _orders(orders, levels, seed=r)
+        ticks = _quotes(quotes, levels, seed=r)
+
+        t0 = time.perf_counter()
+        for o in batch:
+            book.add(o)
+        add_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        fills = 0
+        for px, liq in ticks:
+            fills += len(book.match("600519", px, liq))
+        match_s = time.perf_counter() - t0
+
+        resting = [o.order_id for o in batch if o.active]
+        t0 = time.perf_counter()
+        for oid in resting:
+            book.cancel(oid)
+        cancel_s = time.perf_counter() - t0
+
+        if best is None or match_s < best["match_s"]:
+            best = {"add_s": add_s, "match_s": match_s, "cancel_s": cancel_s,
+                    "fills": fills, "cancelled": len(resting)}
+    return {
+        "orders": orders,
+        "quotes": quotes,
+        "levels": levels,
+        "repeat": repeat,
+        "fills": best["fills"],
+        "add_us_per_order": round(best["add_s"] / orders * 1e6, 3),
+        "match_us_per_quote": round(best["match_s"] / quotes * 1e6, 3),
+        "cancel_us_per_order": round(best["cancel_s"] / max(best["cancelled"], 1) * 1e6, 3),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--orders", type=int, default=5000)
+    ap.add_argument("--quotes", type=int, default=2000)
+    ap.add_argument("--levels", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    print(json.dumps(run(args.orders, args.quotes, args.levels, args.repeat), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+离线行情源：接口与 SinaAdapter 对齐，数据来自 synthetic 生成器（按代码固定种子）
+用于基准测试时替换各服务的 self.adapter，排除网络耗时。
+"""
+
+from datetime import date
+from typing import Dict, List
+
+from app.utils.date_index import KlineSeries
+from tests.benchmark.synthetic import code_seed, synthetic_fundamentals, synthetic_kline
+
+
+class SyntheticMarketAdapter:
+    """每只股票生成一条以 end 结尾、长度 max_bars 的日 K，按 datalen 返回最近 N 条"""
+
+    def __init__(self, max_bars: int = 800, end: date = date(2025, 12, 31), seed: int = 0):
+        self.max_bars = max_bars
+        self.end = end
+        self.seed = seed
+        self._cache: Dict[str, List[dict]] = {}
+        self.calls: Dict[str, int] = {"kline": 0, "fundamental": 0, "realtime": 0}
+
+    def _series(self, code: str) -> List[dict]:
+        s = self._cache.get(code)
+        if s is None:
+            s = self._cache[code] = synthetic_kline(
+                self.max_bars, seed=code_seed(code, self.seed), end=self.end,
+            )
+        return s
+
+    async def get_kline_data(self, code: str, scale: int = 240, datalen: int = 100) -> List[dict]:
+        self.calls["kline"] += 1
+        return KlineSeries(self._series(code)[-datalen:])
+
+    async def get_fundamental_data(self, codes: List[str]) -> Dict[str, Dict]:
+        self.calls["fundamental"] += 1
+        return synthetic_fundamentals(codes, self.seed)
+
+    async def get_realtime_data(self, codes: List[str]) -> List[Dict]:
+        self.calls["realtime"] += 1
+        out = []
+        for c in codes:
+            last = self._series(c)[-1]
+            out.append({"code": c, "name": f"合成{c}", "price": last["close"], "market": "A股"})
+        return out
@@ -0,0 +1,193 @@
+"""
+计算路径基准套件（离线，合成数据，固定种子）
+覆盖：
+  backtest.<策略>          BacktestService._run_backtest_on_kline（逐策略，全部股票）
+  optimize.grid            BacktestService.run_optimize 参数网格
+  strategy_test.with_kline StrategyTestService.run_test_with_kline（16 策略 × 训练/测试）
+  smart_v2.valuation       ScreeningService._valuation_scores_pool
+  smart_v2.pipeline        ScreeningService._run_smart_v2（AI 关闭）
+  prediction.analyze_stock PredictionService._analyze_stock
+  offline_sim.run          OfflineSimulationService.run_simulation
+每项记录多次运行的最短/中位耗时，以及单独一轮 tracemalloc 峰值内存；结果输出为 JSON。
+
+python -m tests.benchmark.run_suite [--stocks 4] [--bars 600] [--repeat 3] [--only backtest,optimize] \
+    [--no-memory] [--out bench.json]
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from loguru import logger
+
+from tests.benchmark.fake_adapter import SyntheticMarketAdapter
+from app.core.config import settings
+from app.schemas.auto_trade import OfflineSimConfig
+from app.schemas.backtest import BacktestOptimizeParams, BacktestParams
+from app.schemas.screening import SmartScreenParams
+from app.schemas.strategy_test import StrategyTestParams
+from app.services.backtest_service import BacktestService
+from app.services.offline_simulation_service import OfflineSimulationService
+from app.services.prediction_service import PredictionService
+from app.services.screening_service import ScreeningService
+from app.services.strategy_constants import BACKTEST_STRATEGIES
+from app.services.strategy_test_service import StrategyTestService
+
+SUITE_VERSION = 1
+CODES = ["600519", "000001", "002594", "000858", "600036", "601318", "300750", "600900"]
+
+
+def _measure(fn: Callable[[], object], repeat: int, memory: bool) -> dict:
+    runs: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    out = {
+        "min_s": round(min(runs), 4),
+        "median_s": round(statistics.median(runs), 4),
+        "runs_s": [round(r, 4) for r in runs],
+    }
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            out["peak_kib"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        finally:
+            tracemalloc.stop()
+    return out
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def build_cases(stocks: int, bars: int) -> Dict[str, Callable[[], object]]:
+    adapter = SyntheticMarketAdapter(max_bars=bars)
+    codes = CODES[:stocks]
+    klines = {c: asyncio.run(adapter.get_kline_data(c, datalen=bars)) for c in codes}
+    funds = asyncio.run(adapter.get_fundamental_data(codes))
+    names = {c: c for c in codes}
+    first = klines[codes[0]]
+    # 交易区间：跳过前 ~120 根留给指标 warmup
+    start_date = first[min(120, len(first) - 1)]["date"][:10]
+    end_date = first[-1]["date"][:10]
+
+    bt = BacktestService()
+    bt.adapter = adapter
+    st = StrategyTestService()
+    st.adapter = adapter
+    sc = ScreeningService()
+    sc.adapter = adapter
+    pr = PredictionService()
+    pr.adapter = adapter
+    sim = OfflineSimulationService()
+    sim.adapter = adapter
+
+    cases: Dict[str, Callable[[], object]] = {}
+
+    seen = set()
+    for strategy, sw, lw, _label in BACKTEST_STRATEGIES:
+        key = f"backtest.{strategy}_{sw}_{lw}"
+        if key in seen:
+            continue
+        seen.add(key)
+        params = [
+            BacktestParams(stock_code=c, strategy=strategy, start_date=start_date,
+                           end_date=end_date, short_window=sw, long_window=lw)
+            for c in codes
+        ]
+        cases[key] = (lambda ps=params: [bt._run_backtest_on_kline(p, klines[p.stock_code]) for p in ps])
+
+    opt = BacktestOptimizeParams(
+        stock_code=codes[0], strategy="ma_cross", start_date=start_date, end_date=end_date,
+        param_grid={"short_window": [5, 10], "long_window": [20, 30, 60], "stop_loss_pct": [0.05, 0.08]},
+    )
+    cases["optimize.grid"] = lambda: asyncio.run(bt.run_optimize(opt))
+
+    st_params = [
+        StrategyTestParams(stock_code=c, start_date=start_date, end_date=end_date) for c in codes
+    ]
+    cases["strategy_test.with_kline"] = lambda: [
+        st.run_test_with_kline(p, klines[p.stock_code], p.stock_code) for p in st_params
+    ]
+
+    cases["smart_v2.valuation"] = lambda: sc._valuation_scores_pool(
+        funds, [c for c in codes if (funds[c].get("pe") or 0) > 0]
+    )
+    screen = SmartScreenParams(
+        stock_pool="custom", custom_codes=",".join(codes), start_date=start_date,
+        end_date=end_date, mode="smart_v2",
+    )
+    cases["smart_v2.pipeline"] = lambda: asyncio.run(
+        sc._run_smart_v2(screen, codes, klines, names, len(codes), time.time())
+    )
+
+    cases["prediction.analyze_stock"] = lambda: [
+        pr._analyze_stock(c, c, klines[c], funds[c], 6, 100000.0) for c in codes
+    ]
+
+    sim_start = first[max(0, len(first) - 250)]["date"][:10]
+    sim_cfg = OfflineSimConfig(
+        stock_codes=codes, start_date=sim_start, end_date=end_date,
+        validate_months=max(3, min(12, (len(first) - 250) // 21 - 3)), benchmarks=["hs300"],
+    )
+    cases["offline_sim.run"] = lambda: asyncio.run(sim.run_simulation(sim_cfg))
+    return cases
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stocks", type=int, default=4)
+    ap.add_argument("--bars", type=int, default=600)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--only", default="", help="逗号分隔的用例前缀，如 backtest,optimize")
+    ap.add_argument("--no-memory", action="store_true", help="跳过 tracemalloc 峰值内存测量")
+    ap.add_argument("--out", default="", help="JSON 输出路径（默认打印到标准输出）")
+    args = ap.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+    settings.DEEPSEEK_API_KEY = None  # AI 分析走降级分支，不联网
+
+    cases = build_cases(args.stocks, args.bars)
+    prefixes = [p for p in args.only.split(",") if p]
+    results = {}
+    for name, fn in cases.items():
+        if prefixes and not any(name.startswith(p) for p in prefixes):
+            continue
+        results[name] = _measure(fn, args.repeat, not args.no_memory)
+        print(f"{name:<40} {results[name]['min_s']:>9.4f}s", file=sys.stderr)
+
+    report = {
+        "suite_version": SUITE_VERSION,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"stocks": args.stocks, "bars": args.bars, "repeat": args.repeat},
+        "cases": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
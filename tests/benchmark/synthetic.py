@@ -0,0 +1,151 @@
+"""
+合成日 K 线生成器（固定随机种子，可复现）
+- gbm_kline      : 纯几何布朗运动
+- synthetic_kline: GBM + 马尔可夫状态切换（牛/熊/震荡）+ 跳空缺口 + 停牌零成交日
+- synthetic_fundamentals: 与 SinaAdapter.get_fundamental_data 字段一致的基本面
+"""
+
+import math
+import random
+import zlib
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+# 状态: (年化漂移, 年化波动)
+REGIMES = {
+    "bull": (0.35, 0.22),
+    "bear": (-0.30, 0.35),
+    "range": (0.0, 0.15),
+}
+# 每日状态转移概率（保持当前状态的概率较高，平均持续约 2~3 个月）
+_REGIME_STAY = 0.985
+
+
+def code_seed(code: str, salt: int = 0) -> int:
+    """股票代码 → 稳定种子"""
+    return zlib.crc32(code.encode()) ^ salt
+
+
+def _trading_days(n: int, end: Optional[date], start: date) -> List[date]:
+    """生成 n 个工作日；指定 end 时向前倒推"""
+    days: List[date] = []
+    if end is not None:
+        d = end
+        while len(days) < n:
+            if d.weekday() < 5:
+                days.append(d)
+            d -= timedelta(days=1)
+        days.reverse()
+        return days
+    d = start
+    while len(days) < n:
+        if d.weekday() < 5:
+            days.append(d)
+        d += timedelta(days=1)
+    return days
+
+
+def gbm_kline(
+    n: int = 1000,
+    seed: int = 0,
+    start_price: float = 20.0,
+    mu: float = 0.08,
+    sigma: float = 0.30,
+    start: date = date(2019, 1, 2),
+) -> List[dict]:
+    """几何布朗运动日 K 线，只含交易日（跳过周末），字段与 SinaAdapter.get_kline_data 一致"""
+    rng = random.Random(seed)
+    dt = 1 / 252
+    out: List[dict] = []
+    price = start_price
+    for d in _trading_days(n, None, start):
+        prev = price
+        price = prev * math.exp((mu - 0.5 * sigma ** 2) * dt + sigma * math.sqrt(dt) * rng.gauss(0, 1))
+        o = prev * (1 + rng.gauss(0, 0.003))
+        h = max(o, price) * (1 + abs(rng.gauss(0, 0.006)))
+        l = min(o, price) * (1 - abs(rng.gauss(0, 0.006)))
+        vol = max(0.0, rng.lognormvariate(13.5, 0.4))
+        out.append({
+            "date": d.isoformat(),
+            "open": round(o, 2), "high": round(h, 2), "low": round(l, 2),
+            "close": round(price, 2), "volume": round(vol), "amount": round(vol * price, 2),
+        })
+    return out
+
+
+def synthetic_kline(
+    n: int = 1000,
+    seed: int = 0,
+    start_price: float = 20.0,
+    end: Optional[date] = None,
+    start: date = date(2019, 1, 2),
+    gap_prob: float = 0.02,
+    gap_size: float = 0.05,
+    suspend_prob: float = 0.005,
+    suspend_len: int = 3,
+) -> List[dict]:
+    """
+    带状态切换的合成日 K 线：
+    - 牛/熊/震荡三态马尔可夫切换，各自漂移与波动不同
+    - 以 gap_prob 概率出现 ±gap_size 量级的开盘跳空
+    - 以 suspend_prob 概率进入停牌，连续 suspend_len 天零成交、价格不变
+    指定 end 时序列以 end 为最后一个交易日（便于与"最近 N 条"接口对齐）
+    """
+    rng = random.Random(seed)
+    dt = 1 / 252
+    names = list(REGIMES)
+    regime = rng.choice(names)
+    price = start_price
+    suspended = 0
+    out: List[dict] = []
+    for d in _trading_days(n, end, start):
+        if rng.random() > _REGIME_STAY:
+            regime = rng.choice([r for r in names if r != regime])
+        mu, sigma = REGIMES[regime]
+        prev = price
+
+        if suspended == 0 and rng.random() < suspend_prob:
+            suspended = suspend_len
+        if suspended > 0:
+            suspended -= 1
+            out.append({
+                "date": d.isoformat(),
+                "open": round(prev, 2), "high": round(prev, 2), "low": round(prev, 2),
+                "close": round(prev, 2), "volume": 0.0, "amount": 0.0,
+            })
+            continue
+
+        o = prev * (1 + rng.gauss(0, 0.003))
+        if rng.random() < gap_prob:
+            o = prev * (1 + rng.choice((-1, 1)) * gap_size * (0.6 + 0.8 * rng.random()))
+        price = o * math.exp((mu - 0.5 * sigma ** 2) * dt + sigma * math.sqrt(dt) * rng.gauss(0, 1))
+        price = max(price, 0.5)
+        h = max(o, price) * (1 + abs(rng.gauss(0, 0.006)))
+        l = min(o, price) * (1 - abs(rng.gauss(0, 0.006)))
+        vol = max(0.0, rng.lognormvariate(13.5 + (0.3 if regime == "bull" else 0.0), 0.4))
+        out.append({
+            "date": d.isoformat(),
+            "open": round(o, 2), "high": round(h, 2), "low": round(l, 2),
+            "close": round(price, 2), "volume": float(round(vol)), "amount": round(vol * price, 2),
+        })
+    return out
+
+
+def synthetic_fundamentals(codes: List[str], seed: int = 0) -> Dict[str, dict]:
+    """合成基本面（部分股票 PE 为负/缺失，覆盖过滤分支）"""
+    out: Dict[str, dict] = {}
+    for code in codes:
+        rng = random.Random(code_seed(code, seed))
+        pe = round(rng.uniform(-20, 80), 2) if rng.random() > 0.1 else None
+        out[code] = {
+            "pe": pe,
+            "pb": round(rng.uniform(0.5, 12), 2),
+            "roe": round(rng.uniform(-5, 30), 2),
+            "market_cap_yi": round(rng.uniform(50, 20000), 1),
+            "float_cap_yi": round(rng.uniform(30, 15000), 1),
+            "revenue_growth": round(rng.uniform(-20, 50), 2),
+            "profit_growth": round(rng.uniform(-40, 80), 2),
+            "gross_margin": round(rng.uniform(5, 90), 2),
+            "industry": rng.choice(["银行", "白酒", "新能源", "医药", "半导体"]),
+        }
+    return out
@@ -0,0 +1,109 @@
+"""
+账户快照单元测试：成交增量更新、报价驱动市值、对账间隔、与全量对账结果一致
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "unit_test.db"))
+
+from app.core.config import settings
+from app.core.database import init_db
+from app.schemas.trade import OrderCreate
+from app.services.account_snapshot import AccountSnapshot, Holding
+from app.services.quote_cache import QuoteCache, get_quote_cache
+from app.services.trade_service import TradeService
+
+
+class TestAccountSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.quotes = QuoteCache()
+        self.snap = AccountSnapshot(self.quotes)
+        self.quotes.put("A1", 11.0)
+        self.snap.load(10000.0, 3.0, 12000.0, [
+            (Holding("A1", "甲", 100, 10.0), "A1"),
+            (Holding("B2", "乙", 200, 5.0, price=5.5), "B2"),
+        ], seq=0)
+
+    def test_quotes_drive_market_value(self):
+        self.assertEqual(self.snap.market_value, 100 * 11.0 + 200 * 5.5)
+        self.quotes.put("B2", 6.0)
+        self.quotes.put("ZZ", 99.0)                      # 非持仓代码不影响
+        acc = self.snap.account()
+        self.assertEqual((acc.market_value, acc.total_asset, acc.profit), (2300.0, 12300.0, 300.0))
+        self.assertFalse(self.snap.stale(60))
+
+    def test_fills_update_cash_and_holdings(self):
+        self.snap.apply_fill("A1", "A1", "甲", "BUY", 100, 12.0, 5.0)
+        self.snap.apply_fill("B2", "B2", "乙", "SELL", 200, 6.0, 6.0)
+        self.snap.apply_fill("C3", "C3", "丙", "BUY", 100, 3.0, 5.0)
+        self.assertEqual(self.snap.cash, 10000.0 - 1205.0 + 1194.0 - 305.0)
+        self.assertEqual(self.snap.total_fees, 19.0)
+
+        pos = {p.stock_code: p for p in self.snap.positions()}
+        self.assertEqual(sorted(pos), ["A1", "C3"])
+        self.assertEqual((pos["A1"].quantity, pos["A1"].cost_price, pos["A1"].current_price), (200, 11.025, 11.0))
+        self.assertEqual(self.snap.market_value, 200 * 11.0 + 100 * 3.0)
+
+        self.quotes.put("B2", 7.0)                       # 已清仓的代码不再计入
+        self.assertEqual(self.snap.market_value, 2500.0)
+
+    def test_fill_during_reconcile_marks_stale(self):
+        seq = self.snap.seq
+        self.snap.apply_fill("A1", "A1", "甲", "BUY", 100, 12.0, 5.0)
+        self.snap.load(0.0, 0.0, 0.0, [], seq)
+        self.assertTrue(self.snap.stale(3600))
+
+
+class TestTradeServiceSnapshot(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        asyncio.run(init_db())
+
+    def setUp(self):
+        self.svc = TradeService()
+        self.svc.snapshot = AccountSnapshot(get_quote_cache())
+        self.price = 20.0
+
+        async def fake(codes, source="auto"):
+            return [{
+                "code": c, "name": c, "market": "A股", "price": self.price, "change": 0.0,
+                "change_percent": 0.0, "volume": 0.0, "amount": 0.0, "high": self.price,
+                "low": self.price, "open": self.price, "pre_close": self.price,
+            } for c in codes]
+
+        self.fetch = AsyncMock(side_effect=fake)
+        self.svc.market_service.adapter.get_realtime_data = self.fetch
+        self.addCleanup(setattr, settings, "ACCOUNT_RECONCILE_SEC", settings.ACCOUNT_RECONCILE_SEC)
+        settings.ACCOUNT_RECONCILE_SEC = 3600.0
+
+    def test_reads_are_cached_and_match_reconcile(self):
+        async def scenario():
+            before = await self.svc.get_account_info()
+            await self.svc.place_order(OrderCreate(
+                stock_code="600948", type="BUY", order_type="MARKET", quantity=300,
+            ))
+            calls = self.fetch.await_count
+            cached = await self.svc.get_account_info()
+            positions = await self.svc.get_positions()
+            self.assertEqual(self.fetch.await_count, calls)              # 读取不取行情
+            get_quote_cache().put("600948", 21.0)
+            moved = await self.svc.get_account_info()
+            fresh = await self.svc.get_account_info(refresh=True)
+            return before, cached, positions, moved, fresh
+
+        before, cached, positions, moved, fresh = asyncio.run(scenario())
+        self.assertLess(cached.available_cash, before.available_cash)
+        self.assertAlmostEqual(cached.total_asset, before.total_asset + cached.available_cash
+                               - before.available_cash + 300 * 20.0, places=1)
+        self.assertEqual(next(p.quantity for p in positions if p.stock_code == "600948"), 300)
+        self.assertAlmostEqual(moved.market_value - cached.market_value, 300.0, places=1)
+        self.assertAlmostEqual(fresh.available_cash, moved.available_cash, places=1)
+        self.assertAlmostEqual(fresh.total_fees_paid, moved.total_fees_paid, places=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
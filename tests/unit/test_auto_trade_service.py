@@ -0,0 +1,372 @@
+"""
+全自动交易服务单元测试（不联网，行情由 mock 提供）
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+import uuid
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "unit_test.db"))
+
+from sqlalchemy import event, select, text
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, engine, init_db
+from app.models.auto_trade import (
+    AutoTradePosition, AutoTradeSession, AutoTradeSessionStock, AutoTradeSignal,
+)
+from app.services.auto_trade_service import AutoTradeService
+
+
+async def _seed_group(group_id: str, positions_per_session: dict) -> list:
+    """positions_per_session: {session_name: [(code, qty, avg_cost), ...]}"""
+    ids = []
+    async with AsyncSessionLocal() as db:
+        for name, positions in positions_per_session.items():
+            sid = str(uuid.uuid4())
+            ids.append(sid)
+            db.add(AutoTradeSession(
+                id=sid, name=name, group_id=group_id, status="running",
+                initial_capital=100_000.0, available_cash=50_000.0,
+                cycle_end_date="2099-01-01",
+            ))
+            for code, qty, cost in positions:
+                db.add(AutoTradePosition(
+                    id=str(uuid.uuid4()), session_id=sid, stock_code=code,
+                    quantity=qty, avg_cost=cost, entry_date="2024-01-02",
+                ))
+        await db.commit()
+    return ids
+
+
+def _quotes(prices: dict):
+    async def fake(codes, source="auto"):
+        # 行情返回的代码不带市场前缀
+        return [
+            {"code": c[2:] if c.startswith(("sh", "sz")) else c, "price": prices[c]}
+            for c in codes if c in prices
+        ]
+    return AsyncMock(side_effect=fake)
+
+
+class TestPositionQuotes(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        asyncio.run(init_db())
+
+    def setUp(self):
+        self.svc = AutoTradeService()
+
+    def test_forward_compare_uses_one_quote_call(self):
+        gid = str(uuid.uuid4())
+        asyncio.run(_seed_group(gid, {
+            f"FT-{p}": [("600519", 100, 10.0), ("000001", 200, 5.0), (f"60000{i}", 100, 8.0)]
+            for i, p in enumerate(("conservative", "balanced", "aggressive"))
+        }))
+        prices = {"600519": 12.0, "000001": 6.0, "600000": 9.0, "600001": 9.0, "600002": 9.0}
+        self.svc.market_adapter.get_realtime_data = _quotes(prices)
+
+        out = asyncio.run(self.svc.get_forward_test_compare(gid))
+
+        self.assertEqual(self.svc.market_adapter.get_realtime_data.await_count, 1)
+        (codes,), _ = self.svc.market_adapter.get_realtime_data.await_args
+        self.assertEqual(sorted(codes), sorted(prices))
+        self.assertEqual(len(out.sessions), 3)
+        # 1200 + 1200 + 900
+        self.assertAlmostEqual(out.sessions[0].market_value, 3300.0)
+
+    def test_missing_quote_falls_back_to_cost(self):
+        (sid,) = asyncio.run(_seed_group("", {"solo": [("600519", 100, 10.0), ("sz000002", 100, 4.0)]}))
+        self.svc.market_adapter.get_realtime_data = _quotes({"sz000002": 5.0})
+
+        positions = {p.stock_code: p for p in asyncio.run(self.svc.get_positions(sid))}
+
+        self.assertEqual(self.svc.market_adapter.get_realtime_data.await_count, 1)
+        self.assertEqual(positions["600519"].current_price, 10.0)
+        self.assertEqual(positions["sz000002"].current_price, 5.0)
+
+
+def _kline(close: float, n: int = 60):
+    return [{"date": f"2024-01-{i:02d}", "open": close, "high": close, "low": close,
+             "close": close, "volume": 1e6} for i in range(1, n + 1)]
+
+
+class _CommitCounter:
+    def __init__(self):
+        self.n = 0
+
+    def __enter__(self):
+        event.listen(engine.sync_engine, "commit", self._on_commit)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine.sync_engine, "commit", self._on_commit)
+
+    def _on_commit(self, conn):
+        self.n += 1
+
+
+class TestRunUnitOfWork(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        asyncio.run(init_db())
+
+    def setUp(self):
+        self.svc = AutoTradeService()
+
+    async def _seed_session(self, codes, positions=(), **fields):
+        sid = str(uuid.uuid4())
+        async with AsyncSessionLocal() as db:
+            db.add(AutoTradeSession(
+                id=sid, name="uow", status="running",
+                initial_capital=100_000.0, available_cash=100_000.0,
+                market_regime_filter=False, cycle_end_date="2099-01-01", **fields,
+            ))
+            db.add_all(
+                AutoTradeSessionStock(session_id=sid, stock_code=c, seq=i, strategy="macd", test_alpha_pct=5.0)
+                for i, c in enumerate(codes)
+            )
+            for code, qty, cost in positions:
+                db.add(AutoTradePosition(
+                    id=str(uuid.uuid4()), session_id=sid, stock_code=code,
+                    quantity=qty, avg_cost=cost, entry_date="2024-01-02",
+                ))
+            await db.commit()
+        return sid
+
+    async def _load(self, sid):
+        async with AsyncSessionLocal() as db:
+            sess = await db.get(AutoTradeSession, sid)
+            pos = (await db.execute(
+                select(AutoTradePosition).where(AutoTradePosition.session_id == sid)
+            )).scalars().all()
+            sigs = (await db.execute(
+                select(AutoTradeSignal).where(AutoTradeSignal.session_id == sid)
+            )).scalars().all()
+        return sess, {p.stock_code: p for p in pos}, sigs
+
+    def test_process_daily_commits_once_per_run(self):
+        sid = asyncio.run(self._seed_session(["600519", "000001"], [("000001", 1000, 10.0)]))
+        prices = {"600519": 50.0, "000001": 10.5}
+        self.svc.market_adapter.get_kline_data = AsyncMock(
+            side_effect=lambda code, **kw: _kline(prices[code])
+        )
+        self.svc.backtest_svc.get_current_signal = MagicMock(
+            side_effect=lambda strategy, kline, sw, lw: "BUY" if kline[-1]["close"] == 50.0 else "SELL"
+        )
+
+        with _CommitCounter() as commits:
+            out = asyncio.run(self.svc.process_daily(sid, trade_date="2024-03-01"))
+
+        # 乐观锁 1 次 + 本次运行 1 次
+        self.assertEqual(commits.n, 2)
+        self.assertEqual([s.signal for s in out], ["BUY", "SELL"])
+        sess, pos, sigs = asyncio.run(self._load(sid))
+        self.assertEqual(len(sigs), 2)
+        self.assertEqual(pos["000001"].quantity, 0)
+        self.assertEqual(pos["600519"].quantity, out[0].quantity)
+        expect_cash = 100_000.0 - out[0].amount - out[0].fees + out[1].amount - out[1].fees
+        self.assertAlmostEqual(sess.available_cash, expect_cash, places=2)
+        self.assertEqual(sess.last_run_date, "2024-03-01")
+
+    def test_concurrent_fetch_keeps_sequential_fill_order(self):
+        codes = ["600519", "000001", "600036"]
+        sid = asyncio.run(self._seed_session(codes, max_position_pct=0.45))
+        delays = {"600519": 0.05, "000001": 0.02, "600036": 0.0}  # 先完成的排在最后
+
+        async def fetch(code, **kw):
+            await asyncio.sleep(delays[code])
+            return _kline(20.0)
+
+        self.svc.market_adapter.get_kline_data = AsyncMock(side_effect=fetch)
+        self.svc.backtest_svc.get_current_signal = MagicMock(return_value="BUY")
+
+        out = asyncio.run(self.svc.process_daily(sid, trade_date="2024-03-01"))
+
+        self.assertEqual([s.stock_code for s in out], codes)
+        # 资金按 stock_codes 顺序占用：前两只满额，第三只只能用剩余资金
+        self.assertEqual([s.quantity for s in out], [2200, 2200, 500])
+
+    def test_intraday_stops_commit_once(self):
+        sid = asyncio.run(self._seed_session(
+            ["600519", "000001"], [("600519", 100, 10.0), ("000001", 100, 10.0)],
+            stop_loss_pct=0.05, max_hold_days=10_000,
+        ))
+        self.svc.market_adapter.get_realtime_data = _quotes({"600519": 9.0, "000001": 10.1})
+
+        with _CommitCounter() as commits:
+            out = asyncio.run(self.svc.check_intraday_stops(sid))
+
+        self.assertEqual(commits.n, 1)
+        self.assertEqual([s.stock_code for s in out], ["600519"])
+        sess, pos, sigs = asyncio.run(self._load(sid))
+        self.assertEqual(pos["600519"].quantity, 0)
+        self.assertEqual(pos["000001"].quantity, 100)
+        self.assertEqual(len(sigs), 1)
+        self.assertAlmostEqual(sess.available_cash, 100_000.0 + out[0].amount - out[0].fees, places=2)
+
+    def test_performance_reads_running_stats(self):
+        sid = asyncio.run(self._seed_session(
+            ["600519", "000001"], [("600519", 100, 10.0), ("000001", 100, 10.0)],
+            stop_loss_pct=0.05, take_profit_pct=0.05, max_hold_days=10_000,
+        ))
+        self.svc.market_adapter.get_realtime_data = _quotes({"600519": 9.0, "000001": 11.0})
+        out = asyncio.run(self.svc.check_intraday_stops(sid))
+
+        perf = asyncio.run(self.svc.get_performance(sid, price_map={}))
+
+        self.assertEqual((perf.total_trades, perf.win_trades, perf.win_rate), (2, 1, 50.0))
+        self.assertAlmostEqual(perf.realized_profit, round(sum(s.profit for s in out), 2))
+        self.assertAlmostEqual(perf.total_fees, round(sum(s.fees for s in out), 2))
+        self.assertEqual(len(perf.recent_signals), 2)
+
+        # 迁移回填口径与增量维护一致
+        from main import STATS_BACKFILL_SQL
+
+        async def backfill():
+            async with AsyncSessionLocal() as db:
+                await db.execute(text(STATS_BACKFILL_SQL))
+                await db.commit()
+
+        asyncio.run(backfill())
+        again = asyncio.run(self.svc.get_performance(sid, price_map={}))
+        self.assertEqual(
+            (again.total_trades, again.win_trades, again.realized_profit, again.total_fees),
+            (perf.total_trades, perf.win_trades, perf.realized_profit, perf.total_fees),
+        )
+
+
+def _fake_test_result(code: str):
+    best = SimpleNamespace(
+        strategy="ma_cross", strategy_label=f"MA-{code}", confidence_score=60.0,
+        train_return_pct=10.0, actual_return_pct=5.0, test_alpha_pct=2.0,
+        train_start="a", train_end="b", test_start="c", test_end="d",
+    )
+    return SimpleNamespace(items=[best], total_strategies=16)
+
+
+class TestConcurrentValidation(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        asyncio.run(init_db())
+
+    def setUp(self):
+        # 关闭速率限制，只保留并发上限，使完成顺序由模拟延迟决定
+        self._rate = settings.MARKET_FETCH_RATE_PER_SEC
+        settings.MARKET_FETCH_RATE_PER_SEC = 0
+        self.addCleanup(setattr, settings, "MARKET_FETCH_RATE_PER_SEC", self._rate)
+        self.svc = AutoTradeService()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        delays = {"600519": 0.06, "000001": 0.03, "600036": 0.0, "000002": 0.0}
+
+        async def fetch(code, **kw):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(delays[code])
+            self.in_flight -= 1
+            return [] if code == "000002" else _kline(10.0, 120)
+
+        self.svc.market_adapter.get_kline_data = AsyncMock(side_effect=fetch)
+        self.svc.strategy_test_svc.run_test_with_kline = MagicMock(
+            side_effect=lambda params, kline, code, batch=None: _fake_test_result(code)
+        )
+
+    def test_results_in_input_order_callbacks_in_completion_order(self):
+        codes = ["600519", "000001", "600036"]
+        seen = []
+
+        async def on_result(r):
+            seen.append(r.stock_code)
+
+        results = asyncio.run(self.svc._validate_stocks(codes, 1.0, 0.8, on_result=on_result))
+
+        self.assertEqual([r.stock_code for r in results], codes)
+        self.assertEqual(seen, ["600036", "000001", "600519"])
+        self.assertGreater(self.max_in_flight, 1)
+        self.assertEqual(results[0].best_strategy_label, "MA-600519")
+
+    def test_validate_and_activate_persists_each_stock(self):
+        codes = ["600519", "000002"]
+        sid = str(uuid.uuid4())
+
+        async def scenario():
+            async with AsyncSessionLocal() as db:
+                db.add(AutoTradeSession(id=sid, name="v", status="validating"))
+                db.add_all(AutoTradeSessionStock(session_id=sid, stock_code=c, seq=i)
+                           for i, c in enumerate(codes))
+                await db.commit()
+            writes = []
+            orig = self.svc._save_strategies
+
+            async def spy(session_id, entries, session_fields=None, activate=False):
+                await orig(session_id, entries, session_fields, activate=activate)
+                writes.append((list(entries), (await self.svc.get_session(session_id)).status))
+
+            self.svc._save_strategies = spy
+            await self.svc._validate_and_activate(sid, codes, 1.0, 0.8)
+            return writes, await self.svc.get_session(sid)
+
+        writes, sess = asyncio.run(scenario())
+        # 第一只（数据不足，默认 MACD）先完成即按行落库并切换 running
+        self.assertEqual(writes[0], (["000002"], "running"))
+        self.assertEqual(sess.status, "running")
+        self.assertEqual(sess.stock_codes, codes)
+        self.assertEqual(sess.strategy_map["000002"]["strategy"], "macd")
+        self.assertEqual(sess.strategy_map["600519"]["label"], "MA-600519")
+
+    def test_stop_during_validation_is_not_undone(self):
+        codes = ["600519", "000001"]
+        sid = str(uuid.uuid4())
+
+        async def scenario():
+            async with AsyncSessionLocal() as db:
+                db.add(AutoTradeSession(id=sid, name="v", status="validating"))
+                await db.commit()
+            orig = self.svc._save_strategies
+
+            async def stop_after_first(session_id, entries, session_fields=None, activate=False):
+                await orig(session_id, entries, session_fields, activate=activate)
+                await self.svc.stop_session(session_id)
+
+            self.svc._save_strategies = stop_after_first
+            await self.svc._validate_and_activate(sid, codes, 1.0, 0.8)
+            return await self.svc.get_session(sid)
+
+        sess = asyncio.run(scenario())
+        # 后续股票的验证结果照常落库，但不再把 stopped 改回 running
+        self.assertEqual(sess.status, "stopped")
+        self.assertEqual(sess.strategy_map["600519"]["label"], "MA-600519")
+
+    def test_legacy_json_migrates_to_rows(self):
+        from main import SESSION_STOCKS_MIGRATE_SQL
+
+        sid = str(uuid.uuid4())
+        smap = {"600519": {"strategy": "ma_cross", "short_window": 5, "long_window": 20,
+                           "label": "MA(5,20)", "confidence": 70.0, "test_alpha_pct": 3.5}}
+
+        async def scenario():
+            async with AsyncSessionLocal() as db:
+                db.add(AutoTradeSession(id=sid, name="legacy", status="running",
+                                        stock_codes_json=json.dumps(["600519", "000001"]),
+                                        strategy_map_json=json.dumps(smap)))
+                await db.commit()
+                for _ in range(2):  # 重复执行幂等
+                    await db.execute(text(SESSION_STOCKS_MIGRATE_SQL))
+                    await db.commit()
+            return await self.svc.get_session(sid)
+
+        out = asyncio.run(scenario())
+        self.assertEqual(out.stock_codes, ["600519", "000001"])
+        self.assertEqual(list(out.strategy_map), ["600519"])
+        self.assertEqual(out.strategy_map["600519"]["short_window"], 5)
+        self.assertEqual(out.strategy_map["600519"]["train_return_pct"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+"""
+回测结果存储单元测试（不联网，K 线由 mock 提供）
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "unit_test.db"))
+
+from app.core.database import init_db
+from app.schemas.backtest import BacktestParams
+from app.services.backtest_service import BacktestService
+from app.services.backtest_store import backtest_key, kline_data_version
+
+
+def _make_kline(n: int, start_price: float = 10.0):
+    from datetime import date, timedelta
+    d0 = date(2023, 1, 2)
+    out = []
+    p = start_price
+    for i in range(n):
+        p = p * (1.01 if (i // 15) % 2 == 0 else 0.99)
+        out.append({
+            "date": (d0 + timedelta(days=i)).isoformat(),
+            "open": p, "high": p * 1.01, "low": p * 0.99, "close": p,
+            "volume": 1_000_000 + i, "amount": p * 1_000_000,
+        })
+    return out
+
+
+class TestBacktestStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        asyncio.run(init_db())
+
+    def setUp(self):
+        self.svc = BacktestService()
+        self.params = BacktestParams(
+            stock_code="600000", strategy="ma_cross",
+            start_date="2023-03-01", end_date="2023-12-31",
+        )
+
+    def test_key_depends_on_params_data_and_engine(self):
+        k = _make_kline(100)
+        v = kline_data_version(k)
+        base = backtest_key(self.params, v, "1")
+        self.assertEqual(base, backtest_key(self.params, v, "1"))
+        self.assertNotEqual(base, backtest_key(self.params, v, "2"))
+        self.assertNotEqual(base, backtest_key(self.params, kline_data_version(k[:-1]), "1"))
+        other = self.params.model_copy(update={"short_window": 10})
+        self.assertNotEqual(base, backtest_key(other, v, "1"))
+        self.assertNotEqual(base, backtest_key(self.params, v, "1", with_series=False))
+
+    def test_run_persists_and_serves_by_id(self):
+        kline = _make_kline(400)
+        self.svc.adapter.get_kline_data = AsyncMock(return_value=kline)
+
+        async def scenario():
+            first = await self.svc.run_backtest(self.params)
+            second = await self.svc.run_backtest(self.params)
+            fetched = await self.svc.get_backtest_result(first.id)
+            return first, second, fetched
+
+        first, second, fetched = asyncio.run(scenario())
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(first.model_dump(), fetched.model_dump())
+
+    def test_cache_hit_opens_no_write_session(self):
+        from unittest.mock import patch
+        from app.services import backtest_store
+
+        self.svc.adapter.get_kline_data = AsyncMock(return_value=_make_kline(400))
+        params = self.params.model_copy(update={"stock_code": "600005"})
+        asyncio.run(self.svc.run_backtest(params))
+        writes = []
+
+        def no_write():
+            writes.append(1)
+            raise AssertionError("cache hit must not open a write session")
+
+        with patch.object(backtest_store, "AsyncSessionLocal", side_effect=no_write):
+            hit = asyncio.run(self.svc.run_backtest(params))
+        self.assertIsNotNone(hit)
+        self.assertEqual(writes, [])
+
+    def test_newer_bars_invalidate_old_results(self):
+        kline = _make_kline(400)
+        self.svc.adapter.get_kline_data = AsyncMock(return_value=kline[:-1])
+        params = self.params.model_copy(update={"stock_code": "000001"})
+
+        async def scenario():
+            old = await self.svc.run_backtest(params)
+            self.svc.adapter.get_kline_data = AsyncMock(return_value=kline)
+            new = await self.svc.run_backtest(params)
+            return old, new, await self.svc.get_backtest_result(old.id)
+
+        old, new, stale = asyncio.run(scenario())
+        self.assertNotEqual(old.id, new.id)
+        self.assertIsNone(stale)
+
+    def test_batch_reuses_stored_results_by_series_flag(self):
+        kline = _make_kline(400)
+        params = self.params.model_copy(update={"stock_code": "600004"})
+
+        async def run(with_series):
+            batch = await self.svc.open_batch({"600004": kline})
+            result = self.svc.run_backtest_sync(params, kline, with_series=with_series, batch=batch)
+            await self.svc.close_batch(batch)
+            return batch, result
+
+        _, full = asyncio.run(run(True))
+        lean_batch, lean = asyncio.run(run(False))
+        hit_batch, again = asyncio.run(run(True))
+
+        self.assertTrue(full.price_series)
+        self.assertEqual(lean.price_series, [])                   # 不含序列的结果另存一键
+        self.assertNotEqual(full.id, lean.id)
+        self.assertNotIn(lean.id, lean_batch.stored)
+        self.assertIn(full.id, hit_batch.stored)                  # 第二次开批即预取到
+        self.assertEqual(again.model_dump(), full.model_dump())
+        self.assertEqual(asyncio.run(self.svc.get_backtest_result(full.id)).id, full.id)
+
+    def test_batch_hit_skips_engine(self):
+        from unittest.mock import patch
+
+        kline = _make_kline(400)
+        params = self.params.model_copy(update={"stock_code": "600006"})
+
+        async def scenario():
+            batch = await self.svc.open_batch({"600006": kline})
+            self.svc.run_backtest_sync(params, kline, batch=batch)
+            await self.svc.close_batch(batch)
+            batch = await self.svc.open_batch({"600006": kline})
+            with patch.object(self.svc, "_run_backtest_on_kline") as engine:
+                hit = self.svc.run_backtest_sync(params, kline, batch=batch)
+            return hit, engine
+
+        hit, engine = asyncio.run(scenario())
+        self.assertIsNotNone(hit)
+        engine.assert_not_called()
+
+
+class TestBatchPriceSeries(unittest.TestCase):
+    def test_classic_screen_keeps_price_series(self):
+        from app.schemas.screening import SmartScreenParams
+        from app.services.screening_service import ScreeningService
+
+        kline = _make_kline(400)
+        svc = ScreeningService()
+        params = SmartScreenParams(start_date="2023-03-01", end_date="2024-01-31", top_n=1)
+        ranked = svc._rank_results(["600000"], {"600000": kline}, {"600000": "浦发银行"}, params)
+        self.assertTrue(ranked)
+        self.assertTrue(ranked[0].backtest_result.price_series)      # 插件选股视图据此画图
+
+        bp = BacktestParams(stock_code="600000", strategy="ma_cross",
+                            start_date="2023-03-01", end_date="2024-01-31")
+        lean = svc.backtest_service.run_backtest_sync(bp, kline, with_series=False)
+        self.assertEqual(lean.price_series, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
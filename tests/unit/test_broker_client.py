@@ -0,0 +1,218 @@
+"""
+券商 HTTP 客户端单元测试：本地替身网关注入延迟 / 5xx / 断连 / 响应丢失，
+验证查询退避重试、下单幂等键与重试边界、有界并发、批量接口
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from typing import List, Optional
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "unit_test.db"))
+
+import httpx
+from fastapi import FastAPI, Header, Request
+
+from app.adapters.broker.generic_http import GenericHttpBrokerAdapter
+from app.core.config import settings
+from app.schemas.trade import OrderCreate
+
+
+class StandInGateway:
+    """替身网关：与 broker_gateway 同契约；features / latency / fail_status 可按用例调整"""
+
+    def __init__(self, features=(), latency: float = 0.0):
+        self.features = list(features)
+        self.latency = latency
+        self.fail_status: dict = {}          # path -> [状态码, ...]，依次消费
+        self.orders: dict = {}               # 幂等键 -> 订单
+        self.hits: dict = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.app = self._build()
+
+    def _order(self, body: dict) -> dict:
+        now = datetime.now().isoformat()
+        return {**body, "id": f"N{len(self.orders) + 1}", "stock_name": body.get("stock_name") or "",
+                "status": "PENDING", "filled_quantity": 0, "filled_price": 0.0,
+                "created_at": now, "updated_at": now}
+
+    def _build(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def inject(request: Request, call_next):
+            path = request.url.path
+            self.hits[path] = self.hits.get(path, 0) + 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                await asyncio.sleep(self.latency)
+                queue = self.fail_status.get(path)
+                if queue:
+                    return httpx_response(queue.pop(0))
+                return await call_next(request)
+            finally:
+                self.in_flight -= 1
+
+        @app.get("/health")
+        async def health():
+            return {"status": "ok", "features": self.features}
+
+        @app.get("/account")
+        async def account():
+            return {"total_asset": 1000.0, "available_cash": 400.0, "market_value": 600.0,
+                    "profit": 0.0, "profit_percent": 0.0, "total_fees_paid": 1.0}
+
+        @app.post("/order")
+        async def order(request: Request, idempotency_key: Optional[str] = Header(None)):
+            body = await request.json()
+            if idempotency_key not in self.orders:
+                self.orders[idempotency_key] = self._order(body)
+            return self.orders[idempotency_key]
+
+        @app.post("/orders/batch")
+        async def batch(request: Request):
+            out: List[dict] = []
+            for body in (await request.json())["orders"]:
+                if body["quantity"] <= 0:
+                    out.append({"error": "quantity must be positive"})
+                    continue
+                key = body["client_order_id"]
+                self.orders.setdefault(key, self._order(body))
+                out.append(self.orders[key])
+            return out
+
+        return app
+
+
+def httpx_response(status: int):
+    from fastapi.responses import JSONResponse
+    return JSONResponse({"detail": "injected"}, status_code=status)
+
+
+class FlakyTransport(httpx.AsyncBaseTransport):
+    """包在 ASGITransport 外：drop_before 次在发送前断连（未送达），lose_after 次在网关处理后丢响应"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self.inner = inner
+        self.drop_before = 0
+        self.lose_after = 0
+
+    async def handle_async_request(self, request):
+        if self.drop_before:
+            self.drop_before -= 1
+            raise httpx.ConnectError("injected connect error", request=request)
+        response = await self.inner.handle_async_request(request)
+        if self.lose_after:
+            self.lose_after -= 1
+            await response.aread()
+            raise httpx.ReadTimeout("injected read timeout", request=request)
+        return response
+
+
+def _order(code="600001", qty=100, cid=None) -> OrderCreate:
+    return OrderCreate(stock_code=code, type="BUY", order_type="MARKET", quantity=qty, client_order_id=cid)
+
+
+class TestBrokerClient(unittest.TestCase):
+    def setUp(self):
+        for name, value in (("BROKER_RETRY_BACKOFF_SEC", 0.001), ("BROKER_MAX_RETRIES", 3),
+                            ("BROKER_MAX_CONCURRENCY", 3)):
+            self.addCleanup(setattr, settings, name, getattr(settings, name))
+            setattr(settings, name, value)
+
+    def _adapter(self, gw: StandInGateway):
+        transport = FlakyTransport(httpx.ASGITransport(app=gw.app))
+        broker = GenericHttpBrokerAdapter("http://gateway", transport=transport)
+        asyncio.run(broker.features())                         # 先探测能力，注入的故障只作用于被测请求
+        return broker, transport
+
+    def test_queries_retry_with_backoff(self):
+        gw = StandInGateway()
+        gw.fail_status["/account"] = [503, 502]
+        broker, transport = self._adapter(gw)
+        transport.drop_before = 1
+
+        acc = asyncio.run(broker.get_account())
+        self.assertEqual(acc.available_cash, 400.0)
+        self.assertEqual(gw.hits["/account"], 3)               # 断连 1 次未送达 + 2 次 5xx + 成功
+
+        gw.fail_status["/account"] = [503] * 5
+        with self.assertRaises(httpx.HTTPStatusError):
+            asyncio.run(broker.get_account())
+
+    def test_order_retry_requires_idempotent_gateway(self):
+        gw = StandInGateway()
+        broker, transport = self._adapter(gw)
+
+        transport.drop_before = 1                              # 未送达：总可重试
+        self.assertEqual(asyncio.run(broker.place_order(_order())).id, "N1")
+
+        transport.lose_after = 1                               # 已送达但响应丢失：网关不支持幂等则不重试
+        with self.assertRaises(httpx.ReadTimeout):
+            asyncio.run(broker.place_order(_order()))
+        gw.fail_status["/order"] = [503]
+        with self.assertRaises(httpx.HTTPStatusError):
+            asyncio.run(broker.place_order(_order()))
+        self.assertEqual(len(gw.orders), 2)
+
+    def test_idempotent_retry_does_not_duplicate(self):
+        gw = StandInGateway(features=["idempotency"])
+        broker, transport = self._adapter(gw)
+        transport.lose_after = 1
+        gw.fail_status["/order"] = [503]
+
+        order = asyncio.run(broker.place_order(_order(cid="rebal-1")))
+        again = asyncio.run(broker.place_order(_order(cid="rebal-1")))
+        self.assertEqual((order.id, again.id), ("N1", "N1"))
+        self.assertEqual(len(gw.orders), 1)
+        self.assertEqual(gw.hits["/order"], 3)                 # 丢响应 1 次 + 重试成功 + 同键再提交
+
+    def test_bounded_concurrent_submission(self):
+        gw = StandInGateway(latency=0.05)
+        broker, _ = self._adapter(gw)
+        orders = [_order(code=f"6000{i:02d}") for i in range(9)]
+
+        async def run():
+            t0 = time.perf_counter()
+            res = await broker.place_orders(orders)
+            return res, time.perf_counter() - t0
+
+        results, elapsed = asyncio.run(run())
+        self.assertEqual(sorted(r.id for r in results), sorted(f"N{i}" for i in range(1, 10)))
+        self.assertEqual(gw.max_in_flight, 3)
+        self.assertLess(elapsed, 9 * 0.05 * 0.8)                 # 明显快于串行
+
+    def test_batch_endpoint_when_supported(self):
+        gw = StandInGateway(features=["batch_order", "idempotency"])
+        broker, transport = self._adapter(gw)
+        transport.lose_after = 1
+        orders = [_order(code="600010", cid="b1"), _order(qty=0, cid="b2"), _order(code="600011", cid="b3")]
+
+        results = asyncio.run(broker.place_orders(orders))
+        self.assertEqual([getattr(r, "stock_code", None) for r in results], ["600010", None, "600011"])
+        self.assertIsInstance(results[1], RuntimeError)
+        self.assertEqual(gw.hits.get("/order"), None)
+        self.assertEqual(gw.hits["/orders/batch"], 2)            # 响应丢失后按同一批次重试
+        self.assertEqual(len(gw.orders), 2)
+
+    def test_failed_probe_is_cached_and_not_retried(self):
+        gw = StandInGateway(features=["idempotency"])
+        gw.fail_status["/health"] = [503]
+        broker = GenericHttpBrokerAdapter("http://gateway", transport=httpx.ASGITransport(app=gw.app))
+
+        self.assertEqual(asyncio.run(broker.features()), set())
+        self.assertEqual(asyncio.run(broker.features()), set())
+        self.assertEqual(gw.hits["/health"], 1)                  # 不重试，失败在 TTL 内复用
+
+        broker._features_failed_at -= settings.BROKER_FEATURES_RETRY_SEC
+        self.assertEqual(asyncio.run(broker.features()), {"idempotency"})
+        self.assertEqual(gw.hits["/health"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
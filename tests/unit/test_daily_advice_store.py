@@ -0,0 +1,106 @@
+"""
+每日建议落库单元测试：批量写入、活跃快照、上一日活跃集加载
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+import uuid
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "unit_test.db"))
+
+from sqlalchemy import delete, event, select, text
+
+from app.core.database import AsyncSessionLocal, engine, init_db
+from app.models.recommendation import RecommendationHistory, RecommendationSnapshot
+from app.services.daily_advice_service import DailyAdviceService
+
+
+def _row(date: str, code: str, status: str) -> dict:
+    return {
+        "id": str(uuid.uuid4()), "date": date, "market": "A股", "stock_code": code,
+        "stock_name": code, "strategy": "macd", "strategy_label": "MACD", "signal": "看涨",
+        "entry_ref_price": 10.0, "current_price": 10.5, "target_price": 11.0, "stop_loss": 9.2,
+        "confidence": 60.0, "composite_score": 70.0, "predicted_return_pct": 5.0,
+        "pe": None, "pb": None, "roe": None, "ai_comment": "", "status": status,
+        "first_recommended_date": date, "days_held": 0, "return_since_rec_pct": 5.0,
+        "miss_count": 0, "exit_reason": "" if status != "exit" else "触及止损",
+    }
+
+
+class TestDailyAdviceStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        asyncio.run(init_db())
+
+    def setUp(self):
+        self.svc = DailyAdviceService()
+        self.year = 2001
+
+    def d(self, day: int) -> str:
+        return f"{self.year}-03-{day:02d}"
+
+    def test_persist_is_one_executemany_and_rerun_replaces(self):
+        inserts = []
+
+        def spy(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("INSERT INTO recommendation_history"):
+                inserts.append(executemany)
+
+        rows = [_row(self.d(1), c, "new") for c in ("600519", "000001", "600036")]
+        event.listen(engine.sync_engine, "before_cursor_execute", spy)
+        try:
+            asyncio.run(self.svc._persist(self.d(1), rows))
+            asyncio.run(self.svc._persist(self.d(1), rows[:2]))
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", spy)
+
+        self.assertEqual(inserts, [True, True])
+
+        async def count():
+            async with AsyncSessionLocal() as db:
+                return len((await db.execute(
+                    select(RecommendationHistory.id).where(RecommendationHistory.date == self.d(1))
+                )).all())
+
+        self.assertEqual(asyncio.run(count()), 2)
+
+    def test_prior_active_from_snapshot_and_fallback(self):
+        self.year = 2002  # 与其它用例的日期错开
+        day1 = [_row(self.d(1), "600519", "new"), _row(self.d(1), "000001", "holding"),
+                _row(self.d(1), "600036", "exit")]
+        asyncio.run(self.svc._persist(self.d(1), day1))
+        asyncio.run(self.svc._persist(self.d(2), [_row(self.d(2), "000002", "new")]))
+
+        prior = asyncio.run(self.svc._load_prior_active(self.d(2)))
+        self.assertEqual(sorted(prior), ["000001", "600519"])
+        # 同日重跑不影响"上一日"
+        asyncio.run(self.svc._persist(self.d(2), [_row(self.d(2), "000002", "exit")]))
+        self.assertEqual(sorted(asyncio.run(self.svc._load_prior_active(self.d(2)))), ["000001", "600519"])
+        self.assertEqual(asyncio.run(self.svc._load_prior_active(self.d(3))), {})
+
+        async def drop_snapshots():
+            async with AsyncSessionLocal() as db:
+                await db.execute(delete(RecommendationSnapshot))
+                await db.commit()
+
+        asyncio.run(drop_snapshots())  # 模拟迁移前无快照：走 history 复合索引回退
+        self.assertEqual(sorted(asyncio.run(self.svc._load_prior_active(self.d(2)))), ["000001", "600519"])
+
+        # 迁移回填与写入口径一致
+        from main import SNAPSHOT_BACKFILL_SQL
+
+        async def backfill():
+            async with AsyncSessionLocal() as db:
+                await db.execute(text(SNAPSHOT_BACKFILL_SQL))
+                await db.commit()
+                return await db.get(RecommendationSnapshot, self.d(1))
+
+        snap = asyncio.run(backfill())
+        self.assertEqual(sorted(json.loads(snap.active_ids_json)), sorted(r["id"] for r in day1[:2]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+数据库层单元测试：WAL / PRAGMA、只读连接、写事务进行中读不阻塞、写事务排队不超时
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+import uuid
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "unit_test.db"))
+
+from sqlalchemy import func, select, text
+
+from app.core.database import AsyncReadSessionLocal, AsyncSessionLocal, engine, init_db
+from app.models.auto_trade import AutoTradeSession
+
+
+class TestDatabaseLayer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        asyncio.run(init_db())
+
+    def test_wal_and_read_only_pragmas(self):
+        async def run():
+            async with AsyncSessionLocal() as db:
+                mode = (await db.execute(text("PRAGMA journal_mode"))).scalar()
+            async with AsyncReadSessionLocal() as db:
+                ro = (await db.execute(text("PRAGMA query_only"))).scalar()
+                with self.assertRaises(Exception):
+                    await db.execute(text("CREATE TABLE should_fail (x INTEGER)"))
+            return mode, ro
+
+        mode, ro = asyncio.run(run())
+        self.assertEqual(mode.lower(), "wal")
+        self.assertEqual(ro, 1)
+
+    def test_read_not_blocked_by_open_write_transaction(self):
+        sid = str(uuid.uuid4())
+
+        async def count():
+            async with AsyncReadSessionLocal() as db:
+                return (await db.execute(
+                    select(func.count()).select_from(AutoTradeSession).where(AutoTradeSession.id == sid)
+                )).scalar()
+
+        async def run():
+            async with AsyncSessionLocal() as db:
+                db.add(AutoTradeSession(id=sid, name="wal", status="running"))
+                await db.flush()  # 写事务持有写锁，尚未提交
+                during = await asyncio.wait_for(count(), timeout=2)
+                await db.commit()
+            return during, await count()
+
+        during, after = asyncio.run(run())
+        self.assertEqual((during, after), (0, 1))
+
+    def test_overlapping_writers_queue_without_timeout(self):
+        ids = [str(uuid.uuid4()), str(uuid.uuid4())]
+        order = []
+
+        async def writer(i, hold):
+            async with AsyncSessionLocal() as db:
+                db.add(AutoTradeSession(id=ids[i], name=f"w{i}", status="stopped"))
+                await db.flush()
+                order.append(f"start{i}")
+                await asyncio.sleep(hold)
+                await db.commit()
+                order.append(f"commit{i}")
+
+        async def run():
+            first = asyncio.create_task(writer(0, 0.3))
+            await asyncio.sleep(0.05)
+            await writer(1, 0)
+            await first
+            # 排队等待过的连接池队列绑定了本事件循环，重建连接池以免影响其他用例
+            await engine.dispose()
+            async with AsyncReadSessionLocal() as db:
+                return (await db.execute(
+                    select(func.count()).select_from(AutoTradeSession).where(AutoTradeSession.id.in_(ids))
+                )).scalar()
+
+        # 默认不设排队上限：第二个写者等到第一个提交，而不是 30 秒后 TimeoutError
+        self.assertIsNone(engine.pool.timeout())
+        self.assertEqual(asyncio.run(run()), 2)
+        self.assertEqual(order, ["start0", "commit0", "start1", "commit1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
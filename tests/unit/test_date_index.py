@@ -0,0 +1,57 @@
+"""
+K 线日期索引单元测试：与逐根字符串比较的结果一致
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import unittest
+from datetime import date, timedelta
+
+from app.utils.date_index import DateIndex, KlineSeries, date_index_of, slice_by_date
+
+
+def _daily(n: int, start: date = date(2024, 1, 1)):
+    out = []
+    d = start
+    while len(out) < n:
+        if d.weekday() < 5:
+            out.append({"date": d.isoformat(), "close": 1.0})
+        d += timedelta(days=1)
+    return out
+
+
+class TestDateIndex(unittest.TestCase):
+    def test_range_matches_linear_filter(self):
+        kline = _daily(120)
+        probes = ["2023-12-01", "2024-01-01", "2024-01-06", "2024-02-29", "2024-06-14", "2024-12-31"]
+        for s in probes:
+            for e in probes:
+                expect = [k for k in kline if s <= k["date"][:10] <= e]
+                self.assertEqual(slice_by_date(kline, s, e), expect, (s, e))
+
+    def test_trade_window_bounds(self):
+        kline = _daily(30)
+        idx = DateIndex(kline)
+        # 周末 → 下一个/上一个交易日
+        self.assertEqual(kline[idx.first_at_or_after("2024-01-06")]["date"], "2024-01-08")
+        self.assertEqual(kline[idx.last_at_or_before("2024-01-07")]["date"], "2024-01-05")
+        self.assertEqual(idx.first_at_or_after("2030-01-01"), len(kline))
+        self.assertEqual(idx.last_at_or_before("2000-01-01"), -1)
+
+    def test_intraday_maps_to_first_bar_of_day(self):
+        kline = [
+            {"date": "2024-01-02 10:00"}, {"date": "2024-01-02 14:00"},
+            {"date": "2024-01-03 10:00"}, {"date": "2024-01-03 14:00"},
+        ]
+        idx = DateIndex(kline)
+        self.assertEqual(idx.index_of("2024-01-03"), 2)
+        self.assertIsNone(idx.index_of("2024-01-04"))
+        self.assertEqual(idx.range("2024-01-02", "2024-01-02"), (0, 2))
+
+    def test_series_caches_index(self):
+        series = KlineSeries(_daily(10))
+        self.assertIs(date_index_of(series), date_index_of(series))
+        series.extend(_daily(1, date(2024, 3, 1)))
+        self.assertEqual(len(date_index_of(series)), 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
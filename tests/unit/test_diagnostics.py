@@ -0,0 +1,53 @@
+"""
+管线诊断单元测试：阶段切换、上下文计数、子任务继承、指标导出
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import asyncio
+import unittest
+
+from app.core import diagnostics
+from app.core.diagnostics import PIPELINE_EVENTS, Diagnostics
+
+
+class TestDiagnostics(unittest.TestCase):
+    def test_stages_accumulate_and_counts_scoped(self):
+        diagnostics.count("http_calls")  # 无激活管线：空操作
+        with Diagnostics("unit_stages") as diag:
+            diag.begin("a")
+            diag.begin("b")
+            diag.begin("a")
+            diagnostics.count("http_calls", 2)
+            diagnostics.stage("c")
+        self.assertIsNone(diagnostics.current())
+        out = diag.to_schema()
+        self.assertEqual([s.name for s in out.stages], ["a", "b", "c"])
+        self.assertEqual(out.counters, {"http_calls": 2})
+        self.assertGreaterEqual(out.total_seconds, sum(s.seconds for s in out.stages) - 0.01)
+
+    def test_gathered_tasks_report_to_parent(self):
+        async def fetch():
+            await asyncio.sleep(0)
+            diagnostics.count("http_calls")
+
+        async def run():
+            with Diagnostics("unit_gather") as diag:
+                await asyncio.gather(*(fetch() for _ in range(5)))
+            return diag
+
+        diag = asyncio.run(run())
+        self.assertEqual(diag.counters["http_calls"], 5)
+
+    def test_nested_pipeline_isolated_and_exported(self):
+        with Diagnostics("unit_outer") as outer:
+            with Diagnostics("unit_inner") as inner:
+                diagnostics.count("backtests", 3)
+            outer.attach(inner.to_schema())
+            diagnostics.count("backtests")
+        self.assertEqual(outer.counters, {"backtests": 1})
+        self.assertEqual(outer.to_schema().children[0].counters, {"backtests": 3})
+        self.assertEqual(PIPELINE_EVENTS.get("unit_inner", "backtests"), 3)
+        self.assertEqual(PIPELINE_EVENTS.get("unit_outer", "backtests"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+指标注册表与 /metrics 输出单元测试
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "unit_test.db"))
+
+import httpx
+
+from app.core.compute import run_compute
+from app.core.instrumentation import UPSTREAM_ERRORS, UPSTREAM_SECONDS, InstrumentedAsyncTransport
+from app.core.metrics import Registry
+
+
+class TestMetrics(unittest.TestCase):
+    def test_render_prometheus_text(self):
+        reg = Registry()
+        c = reg.counter("t_total", "test counter", ("host",))
+        g = reg.gauge("t_in_flight", "test gauge")
+        h = reg.histogram("t_seconds", "test histogram", ("route",), buckets=(0.1, 1.0))
+        c.inc('a"b')
+        g.inc()
+        g.inc()
+        g.dec()
+        for v in (0.05, 0.5, 5.0):
+            h.observe(v, "/x")
+        text = reg.render()
+        self.assertIn('t_total{host="a\\"b"} 1', text)
+        self.assertIn("t_in_flight 1", text)
+        self.assertIn('t_seconds_bucket{route="/x",le="0.1"} 1', text)
+        self.assertIn('t_seconds_bucket{route="/x",le="1"} 2', text)
+        self.assertIn('t_seconds_bucket{route="/x",le="+Inf"} 3', text)
+        self.assertIn('t_seconds_count{route="/x"} 3', text)
+        self.assertIn("# TYPE t_seconds histogram", text)
+
+    def test_registry_rejects_kind_conflict(self):
+        reg = Registry()
+        reg.counter("dup", "x")
+        with self.assertRaises(ValueError):
+            reg.histogram("dup", "x")
+
+    def test_upstream_transport_records_latency_and_errors(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(503 if request.url.path == "/down" else 200)
+
+        async def run():
+            transport = InstrumentedAsyncTransport(httpx.MockTransport(handler))
+            async with httpx.AsyncClient(transport=transport) as client:
+                await client.get("http://unit.upstream/ok")
+                await client.get("http://unit.upstream/down")
+
+        before = UPSTREAM_ERRORS.get("unit.upstream", "http_5xx")
+        asyncio.run(run())
+        self.assertEqual(UPSTREAM_ERRORS.get("unit.upstream", "http_5xx"), before + 1)
+        rows = dict(UPSTREAM_SECONDS.samples())
+        self.assertGreaterEqual(sum(rows[("unit.upstream",)][:-1]), 2)
+
+    def test_compute_pool_runs_task(self):
+        self.assertEqual(asyncio.run(run_compute(sum, [1, 2, 3])), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
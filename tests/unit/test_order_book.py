@@ -0,0 +1,201 @@
+"""
+模拟限价订单簿单元测试：价格/时间优先、部分成交、撤单、DAY 到期，以及 TradeService 挂单→撮合→落库
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "unit_test.db"))
+
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal, init_db
+from app.models.position import Position as PositionModel
+from app.schemas.trade import OrderCreate
+from app.services.account_snapshot import roll_position
+from app.services.order_book import OrderBook, RestingOrder
+from app.services.trade_service import TradeService
+
+
+class TestOrderBook(unittest.TestCase):
+    def setUp(self):
+        self.book = OrderBook()
+
+    def test_price_time_priority_and_price_improvement(self):
+        b = self.book
+        b.add(RestingOrder("b1", "X", "BUY", 10.0, 100))
+        b.add(RestingOrder("b2", "X", "BUY", 10.2, 100))
+        b.add(RestingOrder("b3", "X", "BUY", 10.2, 100))
+        b.add(RestingOrder("b4", "X", "BUY", 9.8, 100))
+        b.add(RestingOrder("s1", "X", "SELL", 10.5, 100))
+
+        self.assertEqual(b.match("X", 10.3), [])
+        fills = b.match("X", 10.1, liquidity=150)
+        # 高价优先，同价先到先成；成交价取现价（优于限价）
+        self.assertEqual([(f.order_id, f.price, f.quantity, f.done) for f in fills],
+                         [("b2", 10.1, 100, True), ("b3", 10.1, 50, False)])
+        self.assertEqual(b.resting_quantity("X", "BUY"), 250)
+
+        fills = b.match("X", 9.9)
+        self.assertEqual([(f.order_id, f.quantity) for f in fills], [("b3", 50), ("b1", 100)])
+        self.assertEqual(b.resting_quantity("X", "BUY"), 100)        # 只剩 9.8
+
+        fills = b.match("X", 10.6)
+        self.assertEqual([(f.order_id, f.price) for f in fills], [("s1", 10.6)])
+        self.assertEqual(sorted(b.codes()), ["X"])
+
+    def test_cancel_and_day_expiry(self):
+        b = self.book
+        b.add(RestingOrder("d1", "Y", "SELL", 5.0, 200, "DAY", trade_date=date(2025, 6, 3)))
+        b.add(RestingOrder("g1", "Y", "SELL", 5.0, 100, "GTC", trade_date=date(2025, 6, 3)))
+        b.add(RestingOrder("c1", "Y", "SELL", 4.9, 100))
+
+        self.assertIsNotNone(b.cancel("c1"))
+        self.assertIsNone(b.cancel("c1"))
+        self.assertEqual([o.order_id for o in b.expire(date(2025, 6, 4))], ["d1"])
+        self.assertEqual(b.expire(date(2025, 6, 4)), [])
+
+        fills = b.match("Y", 5.1)
+        self.assertEqual([f.order_id for f in fills], ["g1"])
+        self.assertEqual(len(b), 0)
+        self.assertEqual(b.codes(), [])
+
+
+class TestTradeServiceLimitOrders(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        asyncio.run(init_db())
+
+    def setUp(self):
+        self.svc = TradeService()
+        self.svc.calendar = SimpleNamespace(is_open=lambda *a: True, next_open=lambda dt, *a: dt)
+        self.quote = {"price": 10.5, "volume": 0.0}
+
+        async def fake(codes, source="auto"):
+            p = self.quote["price"]
+            return [{"code": c, "name": c, "market": "A股", "change": 0.0, "change_percent": 0.0,
+                     "amount": 0.0, "high": p, "low": p, "open": p, "pre_close": p, **self.quote}
+                    for c in codes]
+
+        self.svc.market_service.adapter.get_realtime_data = AsyncMock(side_effect=fake)
+
+    def test_rest_partial_fill_then_cancel(self):
+        async def scenario():
+            order = await self.svc.place_order(OrderCreate(
+                stock_code="600946", type="BUY", order_type="LIMIT", price=10.0, quantity=500,
+            ))
+            self.assertEqual((order.status, order.filled_quantity), ("PENDING", 0))
+
+            self.quote = {"price": 9.9, "volume": 1000.0}
+            self.assertEqual(await self.svc.match_quotes(["600946"]), [])   # 首个报价只记成交量基准
+            self.quote = {"price": 9.9, "volume": 2000.0}                     # 增量 1000 × 0.25 = 200 股
+            fills = await self.svc.match_quotes(["600946"])
+            self.assertEqual([(f.price, f.quantity) for f in fills], [(9.9, 200)])
+
+            self.assertTrue(await self.svc.cancel_order(order.id))
+            async with AsyncSessionLocal() as db:
+                pos = (await db.execute(
+                    select(PositionModel).where(PositionModel.stock_code == "600946")
+                )).scalar_one()
+            return await self.svc._get_order(order.id), pos
+
+        order, pos = asyncio.run(scenario())
+        self.assertEqual((order.status, order.filled_quantity, order.filled_price), ("CANCELLED", 200, 9.9))
+        self.assertEqual(order.commission, 5.0)
+        self.assertEqual(pos.quantity, 200)
+        self.assertEqual(self.svc.book.resting_quantity("600946", "BUY"), 0)
+
+    def test_ioc_and_fok(self):
+        async def scenario():
+            fok = await self.svc.place_order(OrderCreate(
+                stock_code="600947", type="BUY", order_type="LIMIT", price=10.0, quantity=100,
+                time_in_force="FOK",
+            ))
+            ioc = await self.svc.place_order(OrderCreate(
+                stock_code="600947", type="BUY", order_type="LIMIT", price=10.8, quantity=100,
+                time_in_force="IOC",
+            ))
+            return fok, ioc
+
+        fok, ioc = asyncio.run(scenario())
+        self.assertEqual((fok.status, fok.filled_quantity), ("CANCELLED", 0))
+        self.assertEqual((ioc.status, ioc.filled_quantity, ioc.filled_price), ("FILLED", 100, 10.5))
+
+    def test_marketable_placement_fills_only_new_order(self):
+        async def scenario():
+            self.quote = {"price": 11.0, "volume": 0.0}
+            old = await self.svc.place_order(OrderCreate(
+                stock_code="600951", type="BUY", order_type="LIMIT", price=10.6, quantity=300,
+            ))
+            self.quote = {"price": 10.5, "volume": 0.0}           # 报价下穿，旧挂单等撮合循环按成交量成交
+            new = await self.svc.place_order(OrderCreate(
+                stock_code="600951", type="BUY", order_type="LIMIT", price=10.8, quantity=100,
+            ))
+            return await self.svc._get_order(old.id), new
+
+        old, new = asyncio.run(scenario())
+        self.assertEqual((new.status, new.filled_quantity, new.filled_price), ("FILLED", 100, 10.5))
+        self.assertEqual((old.status, old.filled_quantity), ("PENDING", 0))
+        self.assertEqual(self.svc.book.resting_quantity("600951", "BUY"), 300)
+
+    def test_resting_sell_reserves_position_against_market_sell(self):
+        async def scenario():
+            await self.svc.place_order(OrderCreate(
+                stock_code="600949", type="BUY", order_type="LIMIT", price=10.8, quantity=100,
+            ))
+            rest = await self.svc.place_order(OrderCreate(
+                stock_code="600949", type="SELL", order_type="LIMIT", price=11.0, quantity=100,
+                time_in_force="GTC",
+            ))
+            with self.assertRaises(ValueError):                  # 100 股已被挂单占用
+                await self.svc.place_order(OrderCreate(
+                    stock_code="600949", type="SELL", order_type="MARKET", quantity=100,
+                ))
+            self.quote = {"price": 11.2, "volume": 1000.0}
+            await self.svc.match_quotes(["600949"])
+            self.quote = {"price": 11.2, "volume": 2000.0}
+            await self.svc.match_quotes(["600949"])
+            async with AsyncSessionLocal() as db:
+                pos = (await db.execute(
+                    select(PositionModel).where(PositionModel.stock_code == "600949")
+                )).scalar_one()
+            return await self.svc._get_order(rest.id), pos
+
+        rest, pos = asyncio.run(scenario())
+        self.assertEqual((rest.status, rest.filled_quantity, rest.filled_price), ("FILLED", 100, 11.2))
+        self.assertEqual(pos.quantity, 0)
+
+    def test_sell_fill_beyond_position_is_clamped(self):
+        async def scenario():
+            await self.svc.place_order(OrderCreate(
+                stock_code="600950", type="BUY", order_type="LIMIT", price=10.8, quantity=100,
+            ))
+            rest = await self.svc.place_order(OrderCreate(
+                stock_code="600950", type="SELL", order_type="LIMIT", price=11.0, quantity=100,
+                time_in_force="GTC",
+            ))
+            # 绕过下单检查直接卖掉持仓，模拟挂单占用被破坏
+            async with AsyncSessionLocal() as db:
+                await TradeService._apply_position(db, "600950", "", "SELL", 60, 10.5, 0.0)
+                await db.commit()
+            await self.svc._apply_fills(self.svc.book.match("600950", 11.2))
+            async with AsyncSessionLocal() as db:
+                pos = (await db.execute(
+                    select(PositionModel).where(PositionModel.stock_code == "600950")
+                )).scalar_one()
+            return await self.svc._get_order(rest.id), pos
+
+        rest, pos = asyncio.run(scenario())
+        self.assertEqual((rest.status, rest.filled_quantity), ("CANCELLED", 40))
+        self.assertEqual(pos.quantity, 0)
+        with self.assertRaises(ValueError):
+            roll_position(100, 10.0, 0.0, 0.0, "SELL", 200, 10.0, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
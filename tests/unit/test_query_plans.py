@@ -0,0 +1,90 @@
+"""
+全自动交易热点查询的执行计划回归测试：EXPLAIN QUERY PLAN 必须命中复合索引
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "unit_test.db"))
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import sqlite
+
+from app.core.database import engine, init_db, migrate_indexes
+from app.models.auto_trade import (
+    AutoTradePosition as P, AutoTradeSessionStock as K, AutoTradeSignal as S,
+)
+
+
+def _plan(stmt) -> str:
+    sql = str(stmt.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+
+    async def run():
+        async with engine.connect() as conn:
+            rows = (await conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))).all()
+        return "\n".join(r[-1] for r in rows)
+
+    return asyncio.run(run())
+
+
+class TestAutoTradeQueryPlans(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        asyncio.run(init_db())
+
+    def assertUsesIndex(self, stmt, index: str):
+        plan = _plan(stmt)
+        self.assertIn(index, plan, plan)
+        self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", plan, plan)
+
+    def test_recent_signals(self):
+        stmt = (select(S).where(S.session_id == "s1")
+                .order_by(S.created_at.desc()).limit(100))
+        self.assertUsesIndex(stmt, "ix_auto_trade_signals_session_created")
+
+    def test_signals_by_date(self):
+        stmt = select(S).where(S.session_id == "s1").where(S.date == "2024-03-01")
+        self.assertUsesIndex(stmt, "ix_auto_trade_signals_session_date")
+
+    def test_executed_signal_stats(self):
+        stmt = (select(S.signal, func.count(), func.sum(S.profit))
+                .where(S.session_id == "s1").where(S.executed == True)  # noqa: E712
+                .group_by(S.signal))
+        self.assertUsesIndex(stmt, "ix_auto_trade_signals_session_exec")
+
+    def test_open_positions(self):
+        stmt = select(P).where(P.session_id == "s1").where(P.quantity > 0)
+        self.assertUsesIndex(stmt, "ix_auto_trade_positions_session_qty")
+
+    def test_single_position(self):
+        stmt = select(P).where(P.session_id == "s1").where(P.stock_code == "600519")
+        self.assertUsesIndex(stmt, "ix_auto_trade_positions_session_code")
+
+    def test_session_stock_pool(self):
+        stmt = (select(K).where(K.session_id.in_(["s1", "s2"]))
+                .order_by(K.session_id, K.seq))
+        self.assertUsesIndex(stmt, "ix_auto_trade_session_stocks_session_seq")
+
+    def test_migration_restores_missing_index(self):
+        async def run():
+            async with engine.begin() as conn:
+                await conn.execute(text("DROP INDEX ix_auto_trade_signals_session_date"))
+                await conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_auto_trade_signals_session_id "
+                    "ON auto_trade_signals (session_id)"
+                ))
+                await conn.run_sync(migrate_indexes, ("ix_auto_trade_signals_session_id",))
+                rows = await conn.execute(text(
+                    "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='auto_trade_signals'"
+                ))
+                return {r[0] for r in rows}
+
+        names = asyncio.run(run())
+        self.assertIn("ix_auto_trade_signals_session_date", names)
+        self.assertNotIn("ix_auto_trade_signals_session_id", names)
+
+
+if __name__ == "__main__":
+    unittest.main()
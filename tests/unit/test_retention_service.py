@@ -0,0 +1,178 @@
+"""
+数据保留与归档单元测试：整月归档、月汇总、热表删除、归档查询、ANALYZE/VACUUM
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+import uuid
+from datetime import date, datetime
+from unittest.mock import AsyncMock
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "unit_test.db"))
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, init_db
+from app.models.archive import ArchiveBatch
+from app.models.auto_trade import AutoTradeSignal
+from app.models.order import Order
+from app.models.recommendation import RecommendationHistory, RecommendationSnapshot
+from app.services.account_snapshot import AccountSnapshot
+from app.services.quote_cache import get_quote_cache
+from app.services.retention_service import RetentionService
+from app.services.trade_service import TradeService
+
+
+class TestRetention(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        asyncio.run(init_db())
+
+    def setUp(self):
+        self.addCleanup(setattr, settings, "ARCHIVE_DIR", settings.ARCHIVE_DIR)
+        settings.ARCHIVE_DIR = tempfile.mkdtemp()
+        for name in ("RETENTION_SIGNAL_DAYS", "RETENTION_ORDER_DAYS", "RETENTION_ADVICE_DAYS"):
+            self.addCleanup(setattr, settings, name, getattr(settings, name))
+            setattr(settings, name, 30)
+        self.svc = RetentionService()
+        self.sid = str(uuid.uuid4())
+
+    async def _seed(self):
+        async with AsyncSessionLocal() as db:
+            for d, sig, executed, profit in (
+                ("1993-01-05", "BUY", True, 0.0),
+                ("1993-01-20", "SELL", True, 120.0),
+                ("1993-01-21", "HOLD", False, 0.0),
+                ("1993-02-03", "SELL", True, -30.0),
+                ("1993-06-01", "BUY", True, 0.0),       # 保留期内
+            ):
+                db.add(AutoTradeSignal(
+                    id=str(uuid.uuid4()), session_id=self.sid, date=d, stock_code="600519",
+                    signal=sig, executed=executed, quantity=100, amount=1000.0, fees=5.0, profit=profit,
+                ))
+            for when, status in ((datetime(1993, 1, 8, 10), "FILLED"), (datetime(1993, 1, 9, 10), "PENDING")):
+                db.add(Order(stock_code="R93", type="BUY", order_type="LIMIT", price=10.0, quantity=100,
+                             status=status, filled_quantity=100 if status == "FILLED" else 0,
+                             filled_price=10.0, total_fee=5.0, created_at=when))
+            db.add(RecommendationHistory(date="1993-01-04", stock_code="R93", status="new", confidence=60.0))
+            db.add(RecommendationSnapshot(date="1993-01-04", active_ids_json="[]"))
+            await db.commit()
+
+    def test_run_archives_whole_months_and_rolls_up(self):
+        async def scenario():
+            await self._seed()
+            archived = await self.svc.run(today=date(1993, 6, 15), vacuum=True)
+            async with AsyncSessionLocal() as db:
+                hot = (await db.execute(
+                    select(AutoTradeSignal.date).where(AutoTradeSignal.session_id == self.sid)
+                )).scalars().all()
+                pending = (await db.execute(
+                    select(func.count()).select_from(Order).where(Order.stock_code == "R93")
+                )).scalar()
+                snap = await db.get(RecommendationSnapshot, "1993-01-04")
+                batches = (await db.execute(
+                    select(ArchiveBatch.table_name, ArchiveBatch.month, ArchiveBatch.rows)
+                    .where(ArchiveBatch.month.like("1993-%"))
+                )).all()
+            monthly = await self.svc.get_monthly("auto_trade_signals", "1993-01", "1993-01",
+                                                 {"session_id": self.sid})
+            rows = await self.svc.query_archive("auto_trade_signals", filters={"session_id": self.sid})
+            return archived, hot, pending, snap, batches, monthly, rows
+
+        archived, hot, pending, snap, batches, monthly, rows = asyncio.run(scenario())
+        # 保留 30 天 → 早于 1993-05-01 的整月归档，6 月明细留在热表
+        self.assertGreaterEqual(archived["auto_trade_signals"], 4)
+        self.assertEqual(hot, ["1993-06-01"])
+        self.assertEqual(pending, 1)               # 未终结订单不归档
+        self.assertIsNone(snap)
+        self.assertIn(("auto_trade_signals", "1993-01", 3), batches)
+
+        sells = next(m for m in monthly if m["signal"] == "SELL")
+        self.assertEqual((sells["rows"], sells["wins"], sells["profit"]), (1, 1, 120.0))
+        hold = next(m for m in monthly if m["signal"] == "HOLD")
+        self.assertEqual((hold["rows"], hold["executed"], hold["fees"]), (1, 0, 0.0))
+        self.assertEqual(sorted(r["date"] for r in rows), ["1993-01-05", "1993-01-20", "1993-01-21", "1993-02-03"])
+
+    def test_rerun_appends_without_duplicating_reads(self):
+        async def scenario():
+            async with AsyncSessionLocal() as db:
+                db.add(RecommendationHistory(id="dup-1", date="1994-03-02", stock_code="R94", status="new"))
+                await db.commit()
+            await self.svc.run(today=date(1995, 1, 1))
+            # 模拟"写完文件、删库前崩溃"：同一行再次出现在热表并被再归档一次
+            async with AsyncSessionLocal() as db:
+                db.add(RecommendationHistory(id="dup-1", date="1994-03-02", stock_code="R94", status="new"))
+                await db.commit()
+            await self.svc.run(today=date(1995, 1, 1))
+            return await self.svc.query_archive("recommendation_history", "1994-03", "1994-03",
+                                                {"stock_code": "R94"})
+
+        rows = asyncio.run(scenario())
+        self.assertEqual([r["id"] for r in rows], ["dup-1"])
+
+    def test_export_and_history_read_archive_after_hot_rows(self):
+        from app.api.routes.advice import get_history
+
+        async def scenario():
+            async with AsyncSessionLocal() as db:
+                for day in (3, 20):
+                    db.add(Order(stock_code="R91", type="BUY", order_type="MARKET", quantity=100,
+                                 status="FILLED", filled_quantity=100, filled_price=10.0 + day,
+                                 total_fee=5.0, created_at=datetime(1991, 5, day, 10)))
+                db.add(Order(stock_code="R91", type="BUY", order_type="LIMIT", price=9.0, quantity=100,
+                             status="PENDING", created_at=datetime(1991, 4, 1, 10)))
+                db.add(RecommendationHistory(date="1991-05-06", stock_code="R91", status="new"))
+                await db.commit()
+            await self.svc.run(today=date(1992, 1, 1))
+            trade = TradeService()
+            rows = [r async for r in trade.export_orders(stock_code="R91")]
+            ranged = [r async for r in trade.export_orders(date(1991, 5, 10), date(1991, 5, 31), "R91")]
+            hot_only = [r async for r in trade.export_orders(stock_code="R91", include_archived=False)]
+            history = await get_history(date=None, stock_code="R91", limit=10, include_archived=True)
+            return rows, ranged, hot_only, history.data
+
+        rows, ranged, hot_only, history = asyncio.run(scenario())
+        self.assertEqual([r["status"] for r in hot_only], ["PENDING"])
+        # 热表（未终结）在前，归档按新→旧续接
+        self.assertEqual([r["created_at"][:10] for r in rows], ["1991-04-01", "1991-05-20", "1991-05-03"])
+        self.assertEqual([r["filled_price"] for r in ranged], [30.0])
+        self.assertEqual([(h["date"], h["archived"]) for h in history], [("1991-05-06", True)])
+
+    def test_retention_is_opt_in(self):
+        from app.core.config import Settings
+        self.assertFalse(Settings.model_fields["RETENTION_ENABLED"].default)
+
+    def test_sim_account_cash_unchanged_by_order_archiving(self):
+        trade = TradeService()
+        trade.snapshot = AccountSnapshot(get_quote_cache())
+        trade.market_service.adapter.get_realtime_data = AsyncMock(return_value=[])
+
+        async def account():
+            await trade.reconcile_account()
+            return trade.snapshot.account()
+
+        async def scenario():
+            async with AsyncSessionLocal() as db:
+                for when, side, price, fee in ((datetime(1992, 3, 2, 10), "BUY", 10.0, 5.0),
+                                               (datetime(1992, 3, 20, 10), "SELL", 12.5, 6.3),
+                                               (datetime(1992, 4, 1, 10), "BUY", 11.0, 5.0)):
+                    db.add(Order(stock_code="R92", type=side, order_type="MARKET", quantity=100,
+                                 status="FILLED", filled_quantity=100, filled_price=price,
+                                 total_fee=fee, created_at=when))
+                await db.commit()
+            before = await account()
+            archived = await self.svc.run(today=date(1992, 12, 1))
+            return before, archived, await account()
+
+        before, archived, after = asyncio.run(scenario())
+        self.assertGreaterEqual(archived["orders"], 3)
+        # 模拟资金 = 初始资金 + 热表已成交 + 月汇总，归档只是把明细搬进汇总
+        self.assertEqual((after.available_cash, after.total_fees_paid, after.profit),
+                         (before.available_cash, before.total_fees_paid, before.profit))
+
+
+if __name__ == "__main__":
+    unittest.main()
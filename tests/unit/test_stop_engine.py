@@ -0,0 +1,112 @@
+"""
+日内止损引擎单元测试：触发表 bisect、跨会话一次报价、只处理新穿越的触发项
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+import uuid
+from unittest.mock import AsyncMock
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "unit_test.db"))
+
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal, init_db
+from app.models.auto_trade import AutoTradePosition, AutoTradeSession, AutoTradeSignal
+from app.services.auto_trade_service import AutoTradeService
+from app.services.stop_engine import IntradayStopEngine, TriggerBook
+
+
+class TestTriggerBook(unittest.TestCase):
+    def test_crossed_pops_only_new_triggers(self):
+        book = TriggerBook()
+        for sid, cost in (("a", 10.0), ("b", 11.0), ("c", 12.0)):
+            book.add(sid, "600519", cost, "2024-03-01", 0.05, 0.30, 15, "2024-03-05")
+        # 止损价 9.5 / 10.45 / 11.4
+        self.assertEqual(book.crossed("600519", 11.5), [])
+        self.assertEqual(book.crossed("600519", 11.4), ["c"])
+        self.assertEqual(book.crossed("600519", 11.0), [])
+        self.assertEqual(sorted(book.crossed("600519", 9.0)), ["a", "b"])
+        # 已触发的会话不会再因止盈重复触发
+        self.assertEqual(book.crossed("600519", 20.0), [])
+
+    def test_take_profit_and_expiry(self):
+        book = TriggerBook()
+        book.add("a", "000001", 10.0, "2024-03-01", 0.05, 0.10, 15, "2024-03-05")
+        book.add("b", "000001", 10.0, "2024-01-01", 0.05, 0.10, 15, "2024-03-05")
+        # b 已超期：见到任意报价即触发
+        self.assertEqual(book.crossed("000001", 10.0), ["b"])
+        self.assertEqual(book.crossed("000001", 10.99), [])
+        self.assertEqual(book.crossed("000001", 11.0), ["a"])
+
+
+def _quotes(prices: dict):
+    async def fake(codes, source="auto"):
+        return [{"code": c, "price": prices[c]} for c in codes if c in prices]
+    return AsyncMock(side_effect=fake)
+
+
+class TestIntradayStopEngine(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        asyncio.run(init_db())
+
+    async def _seed(self, positions):
+        sid = str(uuid.uuid4())
+        async with AsyncSessionLocal() as db:
+            db.add(AutoTradeSession(
+                id=sid, name="engine", status="running",
+                initial_capital=100_000.0, available_cash=100_000.0,
+                stop_loss_pct=0.05, take_profit_pct=0.10, max_hold_days=10_000,
+                cycle_end_date="2099-01-01",
+            ))
+            for code, qty, cost in positions:
+                db.add(AutoTradePosition(
+                    id=str(uuid.uuid4()), session_id=sid, stock_code=code,
+                    quantity=qty, avg_cost=cost, entry_date="2024-01-02",
+                ))
+            await db.commit()
+        return sid
+
+    async def _signals(self, sid):
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(
+                select(AutoTradeSignal).where(AutoTradeSignal.session_id == sid)
+            )).scalars().all()
+
+    def test_one_quote_call_per_tick_and_fires_crossed_sessions(self):
+        sids = [
+            asyncio.run(self._seed([("688901", 100, 10.0), ("688902", 100, 10.0)])),
+            asyncio.run(self._seed([("688901", 200, 10.0)])),
+            asyncio.run(self._seed([("688901", 100, 9.0)])),
+        ]
+        svc = AutoTradeService()
+        engine = IntradayStopEngine(svc)
+        svc.market_adapter.get_realtime_data = _quotes({"688901": 9.4, "688902": 10.1})
+        svc.check_intraday_stops = AsyncMock(wraps=svc.check_intraday_stops)
+
+        fired = asyncio.run(engine.tick())
+
+        self.assertEqual(svc.market_adapter.get_realtime_data.await_count, 1)
+        (codes,), _ = svc.market_adapter.get_realtime_data.await_args
+        self.assertTrue({"688901", "688902"} <= set(codes))
+        self.assertTrue({sids[0], sids[1]} <= set(fired))
+        self.assertNotIn(sids[2], fired)
+        # 只把穿越的代码交给会话复核
+        calls = {c.args[0]: c.kwargs["price_map"] for c in svc.check_intraday_stops.await_args_list}
+        self.assertEqual(calls[sids[0]], {"688901": 9.4})
+        for sid in sids[:2]:
+            self.assertEqual([s.stock_code for s in asyncio.run(self._signals(sid))], ["688901"])
+
+        # 价格不变：无新穿越，不再复核
+        svc.check_intraday_stops.reset_mock()
+        asyncio.run(engine.tick())
+        self.assertEqual(
+            [c for c in svc.check_intraday_stops.await_args_list if c.args[0] in sids], [],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+交易导出单元测试：键集分页流式导出、日期/代码过滤、CSV/NDJSON 编码、gzip
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+from unittest import mock
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "unit_test.db"))
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.routes import trade
+from app.core.database import AsyncSessionLocal, init_db, read_engine
+from app.models.order import Order
+from app.services import trade_service
+from app.services.trade_service import TradeService
+from app.utils.export_stream import csv_chunks, encode_chunks
+
+CODE = "EXP045"
+TIE_CODE = "EXP046"
+
+
+async def _seed():
+    async with AsyncSessionLocal() as db:
+        for day in range(1, 11):
+            db.add(Order(stock_code=CODE, stock_name="导出", type="BUY", order_type="MARKET",
+                         price=10.0, quantity=100, status="FILLED", filled_quantity=100,
+                         filled_price=10.0 + day, total_fee=5.0,
+                         created_at=datetime(2003, 4, day, 10, 30)))
+        # 同一时刻的多笔订单：分页边界上按 id 区分
+        for i in range(7):
+            db.add(Order(stock_code=TIE_CODE, stock_name="导出", type="SELL", order_type="MARKET",
+                         price=10.0, quantity=100 + i, status="FILLED", filled_quantity=100,
+                         filled_price=10.0, total_fee=5.0, created_at=datetime(2003, 5, 6, 14, 0)))
+        await db.commit()
+
+
+async def _rows(n):
+    for i in range(n):
+        yield {"a": i, "b": f"行{i}"}
+
+
+class TestTradeExport(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        asyncio.run(init_db())
+        asyncio.run(_seed())
+
+    def test_export_orders_filters_and_streams(self):
+        async def collect():
+            svc = TradeService()
+            return [r async for r in svc.export_orders(date(2003, 4, 3), date(2003, 4, 5), CODE)]
+
+        rows = asyncio.run(collect())
+        self.assertEqual([r["created_at"][:10] for r in rows], ["2003-04-05", "2003-04-04", "2003-04-03"])
+        self.assertEqual(rows[0]["filled_price"], 15.0)
+
+    def test_keyset_pages_release_read_connection(self):
+        checked_out = []
+
+        async def collect():
+            rows = []
+            async for r in TradeService().export_orders(date(2003, 5, 1), date(2003, 5, 6), TIE_CODE,
+                                                         include_archived=False):
+                checked_out.append(read_engine.pool.checkedout())
+                rows.append(r)
+            return rows
+
+        with mock.patch.object(trade_service, "EXPORT_YIELD_PER", 3):
+            rows = asyncio.run(collect())
+        # 7 行同一时刻，跨 3 页：不重不漏
+        self.assertEqual(sorted(r["quantity"] for r in rows), list(range(100, 107)))
+        self.assertEqual(len({r["id"] for r in rows}), 7)
+        # 逐行 yield 时不持有读连接
+        self.assertEqual(set(checked_out), {0})
+
+    def test_csv_chunks_are_batched(self):
+        async def collect():
+            return [c async for c in csv_chunks(_rows(7), ["a", "b"], batch=3)]
+
+        chunks = asyncio.run(collect())
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(chunks[0].startswith("\ufeffa,b"))
+        parsed = list(csv.DictReader(io.StringIO("".join(chunks).lstrip("\ufeff"))))
+        self.assertEqual([r["a"] for r in parsed], [str(i) for i in range(7)])
+
+    def test_gzip_ndjson_endpoint(self):
+        app = FastAPI()
+        app.include_router(trade.router, prefix="/api/v1/trade")
+
+        async def fetch():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+                resp = await client.get("/api/v1/trade/export", params={
+                    "format": "ndjson", "stock_code": CODE, "start_date": "2003-04-09", "gzip": "true",
+                })
+                bad = await client.get("/api/v1/trade/export", params={"start_date": "2003/04/09"})
+            return resp, bad
+
+        resp, bad = asyncio.run(fetch())
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.headers["content-type"], "application/gzip")
+        self.assertIn(".ndjson.gz", resp.headers["content-disposition"])
+        lines = gzip.decompress(resp.content).decode("utf-8").splitlines()
+        self.assertEqual([json.loads(x)["created_at"][:10] for x in lines], ["2003-04-10", "2003-04-09"])
+        self.assertEqual(bad.status_code, 400)
+
+    def test_encode_chunks_gzip_roundtrip(self):
+        async def collect():
+            async def texts():
+                yield "甲\n"
+                yield "乙\n"
+            return b"".join([b async for b in encode_chunks(texts(), gzip=True)])
+
+        self.assertEqual(gzip.decompress(asyncio.run(collect())).decode("utf-8"), "甲\n乙\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
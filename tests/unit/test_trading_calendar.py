@@ -0,0 +1,95 @@
+"""
+交易日历与调度事件计算单元测试
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "unit_test.db"))
+
+from app.core.config import settings
+from app.services.auto_scheduler import AutoScheduler
+from app.utils.trading_calendar import get_calendar, market_of
+
+
+class TestTradingCalendar(unittest.TestCase):
+    def setUp(self):
+        self.cal = get_calendar()
+
+    def test_holidays_and_weekends(self):
+        self.assertFalse(self.cal.is_trading_day("2025-10-01"))
+        self.assertFalse(self.cal.is_trading_day("2025-10-04"))   # 周六
+        self.assertTrue(self.cal.is_trading_day("2025-10-09"))
+        # 港股重阳节补假，A股照常
+        self.assertTrue(self.cal.is_trading_day("2026-10-19", "cn"))
+        self.assertFalse(self.cal.is_trading_day("2026-10-19", "hk"))
+        self.assertEqual(self.cal.next_trading_day("2025-09-30"), date(2025, 10, 9))
+        self.assertEqual(self.cal.prev_trading_day("2025-10-09"), date(2025, 9, 30))
+
+    def test_sessions_lunch_break_and_half_day(self):
+        d = "2025-06-03"
+        self.assertTrue(self.cal.is_open(datetime(2025, 6, 3, 10, 0)))
+        self.assertFalse(self.cal.is_open(datetime(2025, 6, 3, 12, 0)))
+        self.assertTrue(self.cal.is_open(datetime(2025, 6, 3, 15, 0)))
+        self.assertEqual(self.cal.next_open(datetime(2025, 6, 3, 12, 0)), datetime(2025, 6, 3, 13, 0))
+        self.assertEqual(self.cal.next_open(datetime(2025, 5, 30, 16, 0)), datetime(2025, 6, 3, 9, 30))
+        self.assertEqual(self.cal.close_time(d, "hk"), datetime(2025, 6, 3, 16, 0))
+        self.assertEqual(self.cal.sessions("2025-12-24", "hk"),
+                         [(datetime(2025, 12, 24, 9, 30), datetime(2025, 12, 24, 12, 0))])
+
+    def test_bar_final_and_market_of(self):
+        now = datetime(2025, 6, 3, 14, 0)
+        self.assertTrue(self.cal.is_bar_final("2025-05-30", now))
+        self.assertFalse(self.cal.is_bar_final("2025-06-03", now))
+        self.assertTrue(self.cal.is_bar_final("2025-06-03", datetime(2025, 6, 3, 15, 0)))
+        self.assertEqual(market_of("hk00700"), "hk")
+        self.assertEqual(market_of("00700"), "hk")
+        self.assertEqual(market_of("sh600519"), "cn")
+
+
+class TestSchedulerEvents(unittest.TestCase):
+    def setUp(self):
+        for name, value in (("EMAIL_ENABLED", True), ("SMS_ENABLED", False), ("EMAIL_SEND_HOUR", 16)):
+            self.addCleanup(setattr, settings, name, getattr(settings, name))
+            setattr(settings, name, value)
+        self.sched = AutoScheduler()
+
+    def test_next_event_skips_holidays(self):
+        self.assertEqual(self.sched._next_event(datetime(2025, 9, 30, 15, 30)),
+                         (datetime(2025, 9, 30, 16, 0), "report"))
+        self.assertEqual(self.sched._next_event(datetime(2025, 9, 30, 16, 0)),
+                         (datetime(2025, 10, 9, 15, 15), "eod"))
+
+    def test_report_merged_into_eod_when_earlier(self):
+        settings.EMAIL_SEND_HOUR = 15
+        self.assertEqual(self.sched._next_event(datetime(2025, 6, 3, 9, 0)),
+                         (datetime(2025, 6, 3, 15, 15), "eod+report"))
+        settings.EMAIL_ENABLED = False
+        self.assertEqual(self.sched._next_event(datetime(2025, 6, 3, 15, 15)),
+                         (datetime(2025, 6, 4, 15, 15), "eod"))
+
+    def test_vacuum_only_on_idle_non_trading_day(self):
+        calls = []
+
+        class FakeRetention:
+            async def run(self, today=None, vacuum=False):
+                calls.append(("run", vacuum))
+                return {}
+
+            async def optimize(self, vacuum=False):
+                calls.append(("optimize", vacuum))
+
+        self.sched.retention = FakeRetention()
+        holiday = datetime(2025, 10, 4, 3, 0)
+        with self.sched._busy():
+            self.assertFalse(asyncio.run(self.sched._maintain(holiday)))
+        self.assertFalse(asyncio.run(self.sched._maintain(datetime(2025, 10, 9, 3, 0))))
+        self.assertTrue(asyncio.run(self.sched._maintain(holiday)))
+        self.assertEqual(calls, [("run", False)] * 3 + [("optimize", True)])
+
+
+if __name__ == "__main__":
+    unittest.main()
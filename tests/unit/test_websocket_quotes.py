@@ -0,0 +1,124 @@
+"""
+WebSocket 行情订阅单元测试：按代码订阅 / 退订、单一轮询取并集、只推送变化、失效连接清理、超限代码回执
+运行：cd server && python -m pytest ../tests/unit -q
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+from unittest.mock import AsyncMock
+
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "unit_test.db"))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.services import websocket_service
+from app.services.market_data_service import MarketDataService
+from app.services.websocket_service import ConnectionManager, QuotePoller, setup_websocket
+
+
+class FakeSocket:
+    def __init__(self, broken: bool = False):
+        self.sent = []
+        self.broken = broken
+        self.close_code = None
+
+    async def send_json(self, message):
+        if self.broken:
+            raise RuntimeError("closed")
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+def _quote(code, price):
+    return {"code": code, "name": code, "market": "A股", "price": price, "change": 0.0,
+            "change_percent": 0.0, "volume": 1000.0, "amount": 0.0, "high": price, "low": price,
+            "open": price, "pre_close": price, "timestamp": "2025-06-03 10:00:00"}
+
+
+class TestQuoteFanOut(unittest.TestCase):
+    def setUp(self):
+        self.prices = {"600519": 1500.0, "000001": 10.0, "hk00700": 300.0}
+        market = MarketDataService()
+
+        async def fake(codes, source="auto"):
+            return [_quote(c, self.prices[c]) for c in codes]
+
+        self.fetch = AsyncMock(side_effect=fake)
+        market.adapter.get_realtime_data = self.fetch
+        self.manager = ConnectionManager(market)
+        self.poller = QuotePoller(self.manager)
+
+    def test_union_poll_and_changed_only_push(self):
+        a, b, c = FakeSocket(), FakeSocket(), FakeSocket()
+        m = self.manager
+        m.subscribe(a, ["600519", "000001"])
+        m.subscribe(b, ["sh600519"])                          # 同一代码不同写法
+        m.subscribe(c, ["000001"])
+
+        async def scenario():
+            first = await self.poller.poll_once()
+            again = await self.poller.poll_once()
+            self.prices["000001"] = 10.1
+            moved = await self.poller.poll_once()
+            return first, again, moved
+
+        first, again, moved = asyncio.run(scenario())
+        self.assertEqual((first, again, moved), (4, 0, 2))
+        self.assertEqual(self.fetch.await_count, 3)
+        self.assertEqual(sorted(self.fetch.await_args_list[0].args[0]), ["000001", "600519"])
+        self.assertEqual([x["data"]["code"] for x in b.sent], ["600519"])
+        self.assertEqual([x["data"]["price"] for x in c.sent], [10.0, 10.1])
+        self.assertEqual(a.sent[0]["type"], "market_data")
+
+    def test_unsubscribe_and_dead_sockets(self):
+        a, dead = FakeSocket(), FakeSocket(broken=True)
+        m = self.manager
+        m.subscribe(a, ["600519", "hk00700"])
+        m.subscribe(dead, ["600519", "000001"])
+        m.unsubscribe(a, ["hk00700"])
+
+        pushed = asyncio.run(self.poller.poll_once())
+        self.assertEqual(pushed, 1)
+        self.assertEqual(sorted(self.fetch.await_args.args[0]), ["000001", "600519"])
+        self.assertEqual(sorted(m.subscribed_codes()), ["600519"])    # 发送失败的连接已整体退订
+        self.assertEqual((dead.close_code, a.close_code), (1011, None))  # 并关闭，客户端据此恢复轮询
+
+        m.disconnect(a)
+        self.assertEqual((m.subscribers, m.subscriptions), ({}, {}))
+        self.assertEqual(asyncio.run(self.poller.poll_once()), 0)
+        self.assertEqual(self.fetch.await_count, 1)                   # 无订阅不请求上游
+
+
+class TestWebSocketEndpoint(unittest.TestCase):
+    def test_subscribe_ack_replays_latest_quote(self):
+        app = FastAPI()
+        setup_websocket(app)
+        websocket_service.quote_poller._last["600000"] = ((1.0,), {"code": "600000", "price": 1.0})
+        self.addCleanup(websocket_service.quote_poller._last.pop, "600000", None)
+
+        with TestClient(app).websocket_connect("/ws") as ws:
+            ws.send_json({"type": "subscribe", "data": {"codes": ["600000"]}})
+            self.assertEqual(ws.receive_json(), {"type": "subscribed", "data": {"codes": ["600000"], "rejected": []}})
+            self.assertEqual(ws.receive_json()["data"]["price"], 1.0)
+            ws.send_json({"type": "unsubscribe", "data": {"codes": ["600000"]}})
+            self.assertEqual(ws.receive_json()["type"], "unsubscribed")
+        self.assertNotIn("600000", websocket_service.manager.subscribed_codes())
+
+    def test_subscribe_ack_lists_codes_over_the_limit(self):
+        app = FastAPI()
+        setup_websocket(app)
+        with mock.patch.object(settings, "WS_MAX_CODES_PER_CONN", 1), \
+                TestClient(app).websocket_connect("/ws") as ws:
+            ws.send_json({"type": "subscribe", "data": {"codes": ["sh600010", "600011"]}})
+            ack = ws.receive_json()
+        self.assertEqual(ack["data"], {"codes": ["600010"], "rejected": ["600011"]})
+
+
+if __name__ == "__main__":
+    unittest.main()